@@ -0,0 +1,310 @@
+"""
+catalog.py
+Persistent placement catalog: which node holds each shard of each object,
+and which nodes are healthy.
+
+The catalog is a SQLite database in WAL mode.  Every change is one
+transaction that bumps a sequence number and stamps the rows it touches
+with it, so a crash leaves the catalog at the last committed change:
+
+    objects(name, nodes, seq)   nodes = int32 node id per shard, -1 = missing
+    tombstones(name, seq)       objects removed since the last snapshot
+    nodes(node, healthy)
+    meta(key, value)            'seq', 'snapshot_seq', 'catalog_id'
+
+Loading millions of rows through SQLite costs seconds, so snapshot() also
+writes the whole placement table to ``<path>.snapshot.npz`` -- the names as
+one NUL-separated UTF-8 blob and the nodes as an (objects x shards) int32
+matrix -- tagged with the sequence number it reflects.  load() reads the
+snapshot and applies only the rows changed and removed after it.  Each
+snapshot is built the same way, from the previous one plus that delta, so
+its cost does not depend on a full table scan; once it is in place the
+tombstones it covers are pruned.  A missing or foreign snapshot is ignored
+and the catalog is read in full.
+"""
+
+from __future__ import annotations
+import os
+import sqlite3
+import threading
+import uuid
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+import config
+
+
+class CatalogState(NamedTuple):
+    names: List[str]
+    nodes: np.ndarray           # (len(names), shards) int32, -1 where a shard has no copy
+    health: Dict[int, bool]
+    seq: int
+
+
+def _encode(nodes: Sequence[int]) -> bytes:
+    return np.asarray(nodes, dtype="<i4").tobytes()
+
+
+def _decode(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype="<i4")
+
+
+def _matrix(blobs: Sequence[bytes], width: int) -> np.ndarray:
+    """Stack encoded placements into rows of *width*, padding short ones with -1."""
+    if all(len(blob) == 4 * width for blob in blobs):
+        return np.frombuffer(b"".join(blobs), dtype="<i4").reshape(len(blobs), width).astype(np.int32)
+    rows = np.full((len(blobs), width), -1, dtype=np.int32)
+    for i, blob in enumerate(blobs):
+        row = _decode(blob)
+        rows[i, :len(row)] = row
+    return rows
+
+
+class Catalog:
+    """
+    SQLite-backed placement catalog with incremental snapshots.
+
+    Args:
+        path:          Database file (default config.CATALOG_PATH); ":memory:"
+                       keeps it in memory and disables snapshots.
+        snapshot_path: Snapshot file (default ``<path>.snapshot.npz``).
+    """
+
+    def __init__(self, path: Optional[str] = None, snapshot_path: Optional[str] = None) -> None:
+        self.path = path if path is not None else config.CATALOG_PATH
+        if self.path == ":memory:":
+            self.snapshot_path = None
+        else:
+            self.snapshot_path = snapshot_path or self.path + ".snapshot.npz"
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: a crash never corrupts the catalog or splits a
+        # transaction; a power loss may drop the last few commits.
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.init_db()
+
+    def init_db(self) -> None:
+        """Creates the catalog tables if they don't exist."""
+        with self._lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS objects (
+                    name  TEXT PRIMARY KEY,
+                    nodes BLOB NOT NULL,
+                    seq   INTEGER NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS objects_seq ON objects (seq)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS tombstones (
+                    name TEXT PRIMARY KEY,
+                    seq  INTEGER NOT NULL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS nodes (
+                    node    INTEGER PRIMARY KEY,
+                    healthy INTEGER NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+            self.conn.executemany("INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)",
+                                  [("seq", 0), ("snapshot_seq", 0), ("catalog_id", uuid.uuid4().hex)])
+
+    # -- writes ----------------------------------------------------------------
+
+    def _meta(self, key: str):
+        return self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def _next_seq(self) -> int:
+        self.conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'seq'")
+        return self._meta("seq")
+
+    def record(self, name: str, nodes: Sequence[int]) -> None:
+        """Store *name*'s placement: the node of each shard, -1 for a shard with no copy."""
+        self.record_many([name], [nodes])
+
+    def record_many(self, names: Sequence[str], nodes: Iterable[Sequence[int]]) -> None:
+        """
+        record() for a batch, in one transaction.
+
+        Raises:
+            ValueError: A name is empty or contains a NUL character.
+        """
+        rows = [(name, _encode(row)) for name, row in zip(names, nodes)]
+        if any(not name or "\0" in name for name, _ in rows):
+            raise ValueError("Catalog object names must be non-empty and free of NUL characters")
+        with self._lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            seq = self._next_seq()
+            self.conn.executemany("INSERT OR REPLACE INTO objects (name, nodes, seq) VALUES (?, ?, ?)",
+                                  [(name, blob, seq) for name, blob in rows])
+            self.conn.executemany("DELETE FROM tombstones WHERE name = ?", [(name,) for name, _ in rows])
+
+    def insert_many(self, names: Sequence[str], nodes: Iterable[Sequence[int]]) -> List[str]:
+        """
+        record_many() for names not in the catalog yet: a row written in the
+        meantime (say, by an upload) is left as it is.  Returns the names
+        actually inserted.
+        """
+        rows = [(name, _encode(row)) for name, row in zip(names, nodes)]
+        if any(not name or "\0" in name for name, _ in rows):
+            raise ValueError("Catalog object names must be non-empty and free of NUL characters")
+        with self._lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            seq = self._next_seq()
+            inserted = [name for name, blob in rows if self.conn.execute(
+                "INSERT OR IGNORE INTO objects (name, nodes, seq) VALUES (?, ?, ?)", (name, blob, seq)).rowcount]
+            self.conn.executemany("DELETE FROM tombstones WHERE name = ?", [(name,) for name in inserted])
+        return inserted
+
+    def update(self, name: str, nodes: Sequence[int]) -> bool:
+        """
+        Replace the placement of *name* only if it is still in the catalog;
+        False (and nothing written) if it is not.  Unlike record(), this
+        never brings back an object removed by a concurrent remove().
+        """
+        with self._lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            if self.conn.execute("SELECT 1 FROM objects WHERE name = ?", (name,)).fetchone() is None:
+                return False
+            seq = self._next_seq()
+            self.conn.execute("UPDATE objects SET nodes = ?, seq = ? WHERE name = ?", (_encode(nodes), seq, name))
+            return True
+
+    def remove(self, name: str) -> bool:
+        """Forget *name*; False if it was not in the catalog."""
+        with self._lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            if self.conn.execute("DELETE FROM objects WHERE name = ?", (name,)).rowcount == 0:
+                return False
+            seq = self._next_seq()
+            self.conn.execute("INSERT OR REPLACE INTO tombstones (name, seq) VALUES (?, ?)", (name, seq))
+            return True
+
+    def set_node_health(self, node: int, healthy: bool) -> None:
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO nodes (node, healthy) VALUES (?, ?)", (node, int(healthy)))
+
+    # -- reads -----------------------------------------------------------------
+
+    def placement(self, name: str) -> List[int]:
+        """
+        Raises:
+            KeyError: *name* is not in the catalog.
+        """
+        with self._lock:
+            row = self.conn.execute("SELECT nodes FROM objects WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return _decode(row[0]).tolist()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM objects").fetchone()[0]
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM objects WHERE name = ?", (name,)).fetchone() is not None
+
+    @property
+    def seq(self) -> int:
+        with self._lock:
+            return self._meta("seq")
+
+    @property
+    def snapshot_due(self) -> bool:
+        """True once config.CATALOG_SNAPSHOT_EVERY changes have been made since the last snapshot."""
+        with self._lock:
+            return self._meta("seq") - self._meta("snapshot_seq") >= config.CATALOG_SNAPSHOT_EVERY
+
+    def _read_snapshot(self, catalog_id: str, seq: int):
+        if self.snapshot_path is None or not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            with np.load(self.snapshot_path, allow_pickle=False) as snap:
+                if str(snap["catalog_id"]) != catalog_id or int(snap["seq"]) > seq:
+                    return None
+                blob = snap["names"].tobytes().decode("utf-8")
+                nodes = snap["nodes"]
+                snap_seq = int(snap["seq"])
+        except (OSError, ValueError, KeyError):
+            return None
+        names = blob.split("\0") if blob else []
+        return names, nodes, snap_seq
+
+    def load(self) -> CatalogState:
+        """
+        The whole catalog, from the snapshot plus the changes made after it
+        (or from the tables alone when there is no usable snapshot).
+        """
+        with self._lock:
+            self.conn.execute("BEGIN")         # one read transaction: a consistent view
+            try:
+                seq, catalog_id = self._meta("seq"), self._meta("catalog_id")
+                snapshot = self._read_snapshot(catalog_id, seq)
+                since = snapshot[2] if snapshot else -1
+                changed = self.conn.execute("SELECT name, nodes FROM objects WHERE seq > ?", (since,)).fetchall()
+                removed = [r[0] for r in self.conn.execute("SELECT name FROM tombstones WHERE seq > ?", (since,))]
+                health = {node: bool(ok) for node, ok in self.conn.execute("SELECT node, healthy FROM nodes")}
+            finally:
+                self.conn.execute("COMMIT")
+
+        names, nodes = (snapshot[0], snapshot[1]) if snapshot else ([], np.empty((0, 0), dtype=np.int32))
+        if not changed and not removed:
+            return CatalogState(names, nodes, health, seq)
+
+        index = {name: i for i, name in enumerate(names)}
+        keep = np.ones(len(names), dtype=bool)
+        for name in removed:
+            i = index.pop(name, None)
+            if i is not None:
+                keep[i] = False
+        width = max([nodes.shape[1]] + [len(blob) // 4 for _, blob in changed])
+        rows = _matrix([blob for _, blob in changed], width)
+        at = np.fromiter((index.get(name, -1) for name, _ in changed), dtype=np.int64, count=len(changed))
+        new = at < 0
+
+        merged = np.full((len(names) + int(new.sum()), width), -1, dtype=np.int32)
+        merged[:len(names), :nodes.shape[1]] = nodes
+        merged[at[~new]] = rows[~new]
+        merged[len(names):] = rows[new]
+        keep = np.concatenate([keep, np.ones(int(new.sum()), dtype=bool)])
+        names = names + [name for (name, _), is_new in zip(changed, new.tolist()) if is_new]
+        names = [name for name, live in zip(names, keep.tolist()) if live]
+        return CatalogState(names, merged[keep], health, seq)
+
+    # -- snapshots -------------------------------------------------------------
+
+    def snapshot(self) -> int:
+        """
+        Write a snapshot of the current catalog and prune the tombstones it
+        covers.  Returns the sequence number it reflects.
+        """
+        if self.snapshot_path is None:
+            return self.seq
+        state = self.load()
+        with self._lock:
+            catalog_id = self._meta("catalog_id")
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, names=np.frombuffer("\0".join(state.names).encode("utf-8"), dtype=np.uint8),
+                     nodes=state.nodes, seq=np.int64(state.seq), catalog_id=np.str_(catalog_id))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE meta SET value = ? WHERE key = 'snapshot_seq'", (state.seq,))
+            self.conn.execute("DELETE FROM tombstones WHERE seq <= ?", (state.seq,))
+        return state.seq
+
+    def maybe_snapshot(self) -> bool:
+        """snapshot() if one is due; True if it wrote one."""
+        if self.snapshot_path is None or not self.snapshot_due:
+            return False
+        self.snapshot()
+        return True
+
+    def close(self) -> None:
+        self.conn.close()
@@ -18,7 +18,7 @@ print("\n=== ShamirVault.reconstruct_key ===")
 print(inspect.signature(ShamirVault.reconstruct_key))
 
 print("\n=== reconstruct_key return type test ===")
-import os, config
+import os, config, packfile
 
 # Write a test shard to check return type
 os.makedirs(list(config.KEY_NODES.values())[0], exist_ok=True)
@@ -32,3 +32,4 @@ print(f"Stripped: {repr(result.strip()) if isinstance(result, str) else repr(res
 for i in range(3):
     kp = os.path.join(list(config.KEY_NODES.values())[i], "__api_test__.key." + str(i))
     if os.path.exists(kp): os.remove(kp)
+    packfile.node_store(config.KEY_NODES[i]).delete("__api_test__.key." + str(i))
@@ -0,0 +1,167 @@
+"""
+compression.py
+Per-segment compression of VaultZero payloads ahead of encryption.
+
+Ciphertext does not compress, so any saving has to be made on the plaintext
+before it is sealed.  Payloads are compressed one segment at a time, on the
+same segment boundaries the AES-GCM frames use, so a byte range can still
+be served by inflating only the segments that cover it.
+
+Every compressed segment (a "body") starts with the method it was stored
+with:
+
+    body = method(1) | data
+
+``METHOD_STORED`` keeps the segment verbatim.  Before compressing, a small
+sample of the segment is checked for Shannon entropy: media, archives and
+already-encrypted data sit close to 8 bits per byte and are stored without
+spending CPU on them.  A segment that does not shrink is stored as well, so
+compression never costs more than the one method byte per segment.
+
+zlib bodies are raw DEFLATE and lzma bodies raw LZMA2: the AES-GCM tag
+already authenticates each segment, so container headers and checksums
+would only add bytes.
+"""
+
+from __future__ import annotations
+import lzma
+import zlib
+from typing import Iterable, Iterator, Optional, Union
+
+import numpy as np
+
+METHOD_STORED = 0
+CODECS = {"zlib": 1, "lzma": 2}
+ENTROPY_THRESHOLD = 7.5     # bits per byte above which a segment is stored
+
+_SAMPLE_SPAN = 1024
+_SAMPLE_SPANS = 4
+_LZMA_DICT = 1 << 20
+_DEFAULT_LEVEL = {"zlib": 6, "lzma": 1}
+
+
+def codec_name(codec_id: int) -> str:
+    """Name of a codec id as stored in a payload descriptor."""
+    for name, value in CODECS.items():
+        if value == codec_id:
+            return name
+    raise ValueError(f"Unknown compression codec id {codec_id}")
+
+
+def sample_entropy(segment) -> float:
+    """
+    Shannon entropy, in bits per byte, of a sample of *segment*.
+
+    Segments up to ``_SAMPLE_SPANS * _SAMPLE_SPAN`` bytes are measured whole;
+    larger ones through that many evenly spaced spans, so the check costs
+    the same for a 64 KiB and a 64 MiB segment.
+    """
+    view = np.frombuffer(segment, dtype=np.uint8)
+    if len(view) > _SAMPLE_SPANS * _SAMPLE_SPAN:
+        stride = (len(view) - _SAMPLE_SPAN) // (_SAMPLE_SPANS - 1)
+        view = np.concatenate([view[i * stride:i * stride + _SAMPLE_SPAN] for i in range(_SAMPLE_SPANS)])
+    if len(view) == 0:
+        return 0.0
+    counts = np.bincount(view, minlength=256)
+    p = counts[counts > 0] / len(view)
+    return float(-(p * np.log2(p)).sum())
+
+
+def _lzma_filters(level: Optional[int] = None) -> list:
+    spec = {"id": lzma.FILTER_LZMA2, "dict_size": _LZMA_DICT}
+    if level is not None:
+        spec["preset"] = level
+    return [spec]
+
+
+class SegmentCompressor:
+    """
+    Compresses plaintext segments into self-describing bodies.
+
+    Args:
+        codec:     "zlib" or "lzma".
+        level:     Codec level (zlib 0-9, lzma preset 0-9); defaults favour
+                   throughput (zlib 6, lzma 1).
+        threshold: Sample entropy, in bits per byte, above which a segment
+                   is stored without trying to compress it.
+
+    Raises:
+        ValueError: Unknown codec.
+    """
+
+    def __init__(self, codec: str = "zlib", level: Optional[int] = None,
+                 threshold: float = ENTROPY_THRESHOLD) -> None:
+        if codec not in CODECS:
+            raise ValueError(f"Unknown compression codec {codec!r}; expected one of {sorted(CODECS)}")
+        self.codec = codec
+        self.codec_id = CODECS[codec]
+        self.level = _DEFAULT_LEVEL[codec] if level is None else level
+        self.threshold = threshold
+
+    def _pack(self, segment) -> bytes:
+        if self.codec == "zlib":
+            packer = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+            return packer.compress(segment) + packer.flush()
+        return lzma.compress(segment, format=lzma.FORMAT_RAW, filters=_lzma_filters(self.level))
+
+    def compress(self, segment) -> bytes:
+        """Body for one segment: compressed if that pays off, else stored."""
+        if len(segment) and sample_entropy(segment) <= self.threshold:
+            packed = self._pack(segment)
+            if len(packed) < len(segment):
+                return bytes([self.codec_id]) + packed
+        return bytes([METHOD_STORED]) + bytes(segment)
+
+    def compress_stream(self, chunks: Iterable[bytes], segment_size: int) -> Iterator[bytes]:
+        """
+        Re-chunk *chunks* into segment_size segments and yield one body per
+        segment.  Segmentation matches the encryption framing: every segment
+        but the last is full, and an empty input still yields one body.
+        """
+        buf = bytearray()
+        for chunk in chunks:
+            buf += chunk
+            while len(buf) > segment_size:
+                yield self.compress(bytes(buf[:segment_size]))
+                del buf[:segment_size]
+        yield self.compress(bytes(buf))
+
+
+def resolve(codec: Union[None, str, SegmentCompressor]) -> Optional[SegmentCompressor]:
+    """Accept a codec name or a configured compressor; None disables compression."""
+    if codec is None or isinstance(codec, SegmentCompressor):
+        return codec
+    return SegmentCompressor(codec)
+
+
+def decompress_segment(body, limit: int) -> bytes:
+    """
+    Inflate one body, refusing to produce more than *limit* bytes.
+
+    Raises:
+        ValueError: Unknown method, corrupt data, or output beyond *limit*
+                    (a decompression bomb cannot exceed one segment).
+    """
+    if len(body) < 1:
+        raise ValueError("Corrupt segment: empty body")
+    method, data = body[0], body[1:]
+    if method == METHOD_STORED:
+        if len(data) > limit:
+            raise ValueError(f"Corrupt segment: {len(data)} stored bytes exceed the {limit}-byte segment")
+        return bytes(data)
+    try:
+        if method == CODECS["zlib"]:
+            inflater = zlib.decompressobj(-15)
+            plain = inflater.decompress(data, limit)
+            complete = inflater.eof and not inflater.unconsumed_tail
+        elif method == CODECS["lzma"]:
+            inflater = lzma.LZMADecompressor(format=lzma.FORMAT_RAW, filters=_lzma_filters())
+            plain = inflater.decompress(bytes(data), max_length=limit)
+            complete = inflater.eof
+        else:
+            raise ValueError(f"Corrupt segment: unknown compression method {method}")
+    except (zlib.error, lzma.LZMAError) as e:
+        raise ValueError(f"Corrupt segment: {e}") from e
+    if not complete:
+        raise ValueError(f"Corrupt segment: inflates beyond the {limit}-byte segment")
+    return plain
@@ -6,10 +6,66 @@ DATA_NODES = {0: "data_storage/node1", 1: "data_storage/node2", 2: "data_storage
 KEY_NODES = {0: "key_storage/node1", 1: "key_storage/node2", 2: "key_storage/node3"}
 DB_PATH = "registry.db"
 
+# NODE BACKENDS (see node_store.py)
+# A node is a local directory or a node server, "tcp://host:port" (start one
+# with `python -m ops.node_server --root <dir> --port <port>`).  Remote nodes
+# keep NODE_POOL_SIZE pipelined connections each.
+NODE_POOL_SIZE = 4
+
+# DATA SHARD ERASURE CODING (see erasure_coding.py)
+# Any ERASURE_K of the ERASURE_N data shards rebuild the ciphertext; one shard
+# per data node, so ERASURE_N must equal len(DATA_NODES).
+ERASURE_K = 2
+ERASURE_N = 3
+
+# PER-SEGMENT COMPRESSION (see compression.py)
+# Codec applied to each plaintext segment before encryption: "zlib", "lzma"
+# or None.  High-entropy segments (media, archives) are stored as-is.
+COMPRESSION = "zlib"
+
+# PACKFILE STORAGE (see packfile.py)
+# Key shards, and the data shards of uploads up to PACK_OBJECT_LIMIT bytes, are
+# appended to per-node segment files instead of one file per shard.
+# Segments whose garbage (burned or overwritten objects) reaches half their size
+# are compacted every PACK_COMPACT_INTERVAL seconds (0 disables).
+PACK_SEGMENT_BYTES = 64 * 1024 * 1024
+PACK_OBJECT_LIMIT = 4 * 1024 * 1024
+PACK_COMPACT_INTERVAL = 60
+
+# WRITE QUORUM (see write_quorum.py)
+# None: uploads return once every online node has its data and key shard.
+# An integer W (>= ERASURE_K): uploads return once W nodes have stored theirs;
+# the rest finish in the background, each failed node request retried up to
+# WRITE_RETRIES times with exponential backoff from WRITE_RETRY_BACKOFF seconds.
+WRITE_QUORUM = None
+WRITE_RETRIES = 2
+WRITE_RETRY_BACKOFF = 0.05
+
+# PLACEMENT CATALOG (see catalog.py)
+# SQLite (WAL) record of every object's shard placement and of node health.
+# A snapshot of the placements is rewritten after CATALOG_SNAPSHOT_EVERY
+# changes, so a restart reads the snapshot plus the few rows changed since.
+CATALOG_PATH = "catalog.db"
+CATALOG_SNAPSHOT_EVERY = 10_000
+
+# SHARD REPAIR (see ops/repair_daemon.py)
+# Missing key and data shards are rebuilt every REPAIR_INTERVAL seconds,
+# objects closest to losing their quorum first, spending at most
+# REPAIR_RATE_BYTES of node I/O per second (bursts up to REPAIR_BURST_BYTES).
+REPAIR_RATE_BYTES = 32 * 1024 * 1024
+REPAIR_BURST_BYTES = 64 * 1024 * 1024
+REPAIR_INTERVAL = 60
+
+# NODE LATENCY / FAULT INJECTION (see latency_model.py)
+# Zero in production. Load tests override per node id, e.g.
+#   {"default": {"kind": "lognormal", "median_ms": 4, "sigma": 0.6},
+#    2: {"kind": "stall", "probability": 0.01, "stall_ms": 250}}
+NODE_LATENCY = {"default": {"kind": "none"}}
+
 # AUTO-SETUP
 for paths in [DATA_NODES.values(), KEY_NODES.values()]:
     for path in paths:
-        if not os.path.exists(path): os.makedirs(path)
+        if not path.startswith("tcp://") and not os.path.exists(path): os.makedirs(path)
 
 # LOGGING ARCHIVE
 LATENCY_LOG = "performance_metrics.json"
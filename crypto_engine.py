@@ -2,7 +2,641 @@ from Crypto.Cipher import AES
 from Crypto.Protocol.KDF import PBKDF2
 from Crypto.Random import get_random_bytes
 import hashlib
-from typing import Optional
+import hmac
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Iterable, Iterator, Optional, Tuple, Union
+
+from compression import METHOD_STORED, SegmentCompressor, codec_name, decompress_segment, resolve
+
+# ---------------------------------------------------------------------------
+# Segmented streaming format
+# ---------------------------------------------------------------------------
+#
+#   header  = MAGIC(4) | salt(16) | descriptor(12)
+#   descriptor = nonce_prefix(7) | segment_size(4, big-endian) | flags(1)
+#   frame_i = AES-GCM(segment_i) ciphertext | tag(16)
+#
+# Every segment except the last carries exactly segment_size plaintext bytes.
+# The per-segment nonce is nonce_prefix | counter(4) | last(1), so frames
+# cannot be reordered, dropped or truncated without failing authentication.
+# The descriptor is bound to every frame as associated data.
+#
+# Envelope objects use the same frames, sealed under a random per-object
+# data key (DEK) instead of the password-derived key (KEK):
+#
+#   header = MAGIC(4) | kek_salt(16) | wrap_nonce(12) | wrapped_dek(32)
+#            | wrap_tag(16) | descriptor(12)
+#
+# Only the first 80 bytes depend on the password, so a credential rotation
+# rewrites the header and leaves every frame untouched.
+#
+# A non-zero descriptor flags byte names the codec (see compression.py) the
+# segments were compressed with before sealing.  Such payloads carry
+# variable-length frames and a trailing segment index:
+#
+#   frame_i = length(4, big-endian; top bit set on the last frame)
+#             | AES-GCM(body_i) ciphertext | tag(16)
+#   index   = frame_end(8) * count | count(4) | INDEX_MAGIC(4)
+#
+# body_i inflates to exactly segment_size bytes except for the last, so a
+# plaintext offset still maps to its segment arithmetically, and the index
+# (frame ends relative to the first frame) maps that segment to its frame.
+# The index is not authenticated; a wrong entry only points at bytes that
+# then fail the frame's tag or nonce.
+#
+# The flag is only set when at least one segment actually compressed: the
+# bodies are held back (up to CODEC_LOOKAHEAD plaintext bytes) until one
+# does, and a payload whose segments were all stored is sealed in the plain
+# fixed-frame format instead.
+
+STREAM_MAGIC = b"VZS1"
+SEGMENT_SIZE = 64 * 1024
+TAG_SIZE = 16
+_DESCRIPTOR = struct.Struct(">7sIB")
+STREAM_HEADER_SIZE = len(STREAM_MAGIC) + 16 + _DESCRIPTOR.size
+ENVELOPE_MAGIC = b"VZE1"
+ENVELOPE_HEADER_SIZE = len(ENVELOPE_MAGIC) + 16 + 12 + 32 + TAG_SIZE + _DESCRIPTOR.size
+INDEX_MAGIC = b"VZIX"
+_FRAME_LENGTH = struct.Struct(">I")
+_LAST_FRAME = 0x80000000
+_INDEX_TAIL = struct.Struct(">I4s")
+_INDEX_ENTRY = 8
+CODEC_LOOKAHEAD = 64 * 1024 * 1024
+
+StreamSource = Union[bytes, bytearray, memoryview, BinaryIO, Iterable[bytes]]
+
+
+class DerivedKeyCache:
+    """
+    Bounded, process-wide LRU cache of PBKDF2-derived AES keys.
+
+    Entries are keyed by (password digest, salt).  The password itself is
+    never stored: it is reduced to an HMAC-SHA256 under a random per-process
+    pepper, so a memory dump of the cache does not expose a fast, offline
+    crackable hash of the password.
+
+    Evicted, expired and cleared keys are held in ``bytearray`` buffers and
+    zeroed in place before being dropped.  Keys already handed out to a
+    ``CryptoEngine`` are immutable ``bytes`` copies and are not covered by
+    the wipe.
+    """
+
+    def __init__(self, max_entries: int = 128, ttl_seconds: float = 300.0) -> None:
+        """
+        Args:
+            max_entries: Maximum number of derived keys kept (LRU eviction).
+            ttl_seconds: Lifetime of an entry after it was derived.
+
+        Raises:
+            ValueError: If max_entries < 1 or ttl_seconds <= 0.
+        """
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be >= 1, got {max_entries}")
+        if ttl_seconds <= 0:
+            raise ValueError(f"ttl_seconds must be > 0, got {ttl_seconds}")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._pepper: bytes = get_random_bytes(32)
+        # (password digest, salt) -> (key buffer, expiry timestamp)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cache_key(self, password: Union[str, bytes], salt: bytes) -> tuple:
+        pw = password.encode('utf-8') if isinstance(password, str) else bytes(password)
+        return hmac.new(self._pepper, pw, hashlib.sha256).digest(), bytes(salt)
+
+    @staticmethod
+    def _wipe(buf: bytearray) -> None:
+        """Overwrite a cached key buffer with zeros."""
+        buf[:] = bytes(len(buf))
+
+    def _drop(self, cache_key: tuple) -> None:
+        buf, _ = self._entries.pop(cache_key)
+        self._wipe(buf)
+        self.evictions += 1
+
+    def _prune_expired(self, now: float) -> None:
+        expired = [ck for ck, (_, expiry) in self._entries.items() if expiry <= now]
+        for ck in expired:
+            self._drop(ck)
+
+    def get(self, password: Union[str, bytes], salt: bytes) -> Optional[bytes]:
+        """Return the cached key for (password, salt), or None on a miss."""
+        cache_key = self._cache_key(password, salt)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[1] <= time.monotonic():
+                self._drop(cache_key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return bytes(entry[0])
+
+    def put(self, password: Union[str, bytes], salt: bytes, key: bytes) -> None:
+        """Insert a derived key, evicting expired and least-recently-used entries."""
+        cache_key = self._cache_key(password, salt)
+        now = time.monotonic()
+        with self._lock:
+            if cache_key in self._entries:
+                self._drop(cache_key)
+            self._prune_expired(now)
+            while len(self._entries) >= self.max_entries:
+                self._drop(next(iter(self._entries)))
+            self._entries[cache_key] = (bytearray(key), now + self.ttl_seconds)
+
+    def clear(self) -> None:
+        """Wipe and remove every cached key."""
+        with self._lock:
+            for ck in list(self._entries):
+                self._drop(ck)
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters and the current entry count."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Opt-in process-wide cache; None means every CryptoEngine runs the full KDF.
+_KEY_CACHE: Optional[DerivedKeyCache] = None
+
+
+def _derive_key(password: Union[str, bytes], salt: bytes) -> bytes:
+    """PBKDF2 (100k iterations) with an optional trip through the key cache."""
+    cache = _KEY_CACHE
+    if cache is not None:
+        key = cache.get(password, salt)
+        if key is not None:
+            return key
+    key = PBKDF2(password, salt, dkLen=32, count=100000)
+    if cache is not None:
+        cache.put(password, salt, key)
+    return key
+
+
+def _iter_chunks(source: StreamSource, chunk_size: int) -> Iterator[bytes]:
+    """Yield raw chunks from a bytes-like object, a binary file or an iterable."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for start in range(0, len(view), chunk_size):
+            yield view[start:start + chunk_size]
+    elif hasattr(source, 'read'):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        yield from source
+
+
+def _iter_segments(chunks: Iterable[bytes], size: int) -> Iterator[Tuple[int, bytes, bool]]:
+    """
+    Re-chunk *chunks* into (index, segment, is_last) tuples of exactly *size*
+    bytes, except for the final segment which holds the 0..size remainder.
+
+    A segment is only released once a byte beyond it has been seen, so the
+    last flag is always known.  The buffer never holds more than one segment
+    plus one incoming chunk.
+    """
+    buf = bytearray()
+    index = 0
+    for chunk in chunks:
+        buf += chunk
+        while len(buf) > size:
+            yield index, bytes(buf[:size]), False
+            del buf[:size]
+            index += 1
+    yield index, bytes(buf), True
+
+
+def _take(chunks: Iterator[bytes], n: int) -> Tuple[bytes, bytes]:
+    """Pull exactly *n* bytes off a chunk iterator; return (head, leftover)."""
+    buf = bytearray()
+    for chunk in chunks:
+        buf += chunk
+        if len(buf) >= n:
+            break
+    if len(buf) < n:
+        raise ValueError(f"Truncated stream: expected at least {n} header bytes, got {len(buf)}")
+    return bytes(buf[:n]), bytes(buf[n:])
+
+
+def _segment_nonce(prefix: bytes, index: int, last: bool) -> bytes:
+    if index > 0xFFFFFFFF:
+        raise ValueError("Stream too long: segment counter exhausted")
+    return prefix + struct.pack(">IB", index, 1 if last else 0)
+
+
+def _seal_segment(key: bytes, descriptor: bytes, index: int, last: bool, segment: bytes) -> bytes:
+    """Encrypt one segment; returns ciphertext | tag."""
+    prefix = descriptor[:7]
+    cipher = AES.new(key, AES.MODE_GCM, nonce=_segment_nonce(prefix, index, last), mac_len=TAG_SIZE)
+    cipher.update(descriptor)
+    ciphertext, tag = cipher.encrypt_and_digest(segment)
+    return ciphertext + tag
+
+
+def _open_segment(key: bytes, descriptor: bytes, index: int, last: bool, frame: bytes) -> bytes:
+    """Verify and decrypt one frame (fails if tampered, reordered or truncated)."""
+    if len(frame) < TAG_SIZE:
+        raise ValueError(f"Truncated stream: segment {index} is shorter than its tag")
+    prefix = descriptor[:7]
+    cipher = AES.new(key, AES.MODE_GCM, nonce=_segment_nonce(prefix, index, last), mac_len=TAG_SIZE)
+    cipher.update(descriptor)
+    return cipher.decrypt_and_verify(frame[:-TAG_SIZE], frame[-TAG_SIZE:])
+
+
+def _ordered_map(fn, items: Iterable[tuple], workers: int, window: Optional[int] = None) -> Iterator:
+    """
+    Apply *fn* to each argument tuple on a thread pool, yielding results in
+    input order.
+
+    At most *window* tasks (default ``2 * workers``) are in flight, which
+    bounds memory to a fixed number of segments however long the input is.
+    PyCryptodome releases the GIL inside its C AES-GCM core, so threads run
+    segments on separate cores without pickling keys into worker processes.
+    """
+    if workers <= 1:
+        for args in items:
+            yield fn(*args)
+        return
+    window = window if window else 2 * workers
+    if window < 1:
+        raise ValueError(f"window must be >= 1, got {window}")
+    pending: deque = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vz-crypto") as pool:
+        try:
+            for args in items:
+                pending.append(pool.submit(fn, *args))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _parse_descriptor(descriptor: bytes) -> Tuple[bytes, int, int]:
+    prefix, segment_size, flags = _DESCRIPTOR.unpack(descriptor)
+    if segment_size < 1:
+        raise ValueError(f"Corrupt stream header: segment_size={segment_size}")
+    return prefix, segment_size, flags
+
+
+def _new_descriptor(segment_size: int, compressor: Optional[SegmentCompressor] = None) -> bytes:
+    if not 1 <= segment_size <= 0xFFFFFFFF:
+        raise ValueError(f"segment_size must be between 1 and 2**32-1, got {segment_size}")
+    if compressor is None:
+        return _DESCRIPTOR.pack(get_random_bytes(7), segment_size, 0)
+    if segment_size + 1 + TAG_SIZE >= _LAST_FRAME:
+        raise ValueError(f"segment_size must be below 2**31 - {1 + TAG_SIZE} when compressing, got {segment_size}")
+    return _DESCRIPTOR.pack(get_random_bytes(7), segment_size, compressor.codec_id)
+
+
+def _seal_body(key: bytes, descriptor: bytes, index: int, last: bool, body: bytes) -> bytes:
+    """Seal one compressed body into a length-prefixed frame."""
+    frame = _seal_segment(key, descriptor, index, last, body)
+    return _FRAME_LENGTH.pack(len(frame) | (_LAST_FRAME if last else 0)) + frame
+
+
+def _mark_last(items: Iterable[bytes]) -> Iterator[Tuple[int, bytes, bool]]:
+    """Number the items of an iterable and flag the final one."""
+    items = iter(items)
+    try:
+        current = next(items)
+    except StopIteration:
+        raise ValueError("Precompressed source yielded no segments") from None
+    index = 0
+    for item in items:
+        yield index, current, False
+        current = item
+        index += 1
+    yield index, current, True
+
+
+def _with_index(frames: Iterator[bytes]) -> Iterator[bytes]:
+    """Pass frames through, then append the segment index."""
+    ends = []
+    total = 0
+    for frame in frames:
+        total += len(frame)
+        ends.append(total)
+        yield frame
+    yield struct.pack(f">{len(ends)}Q", *ends) + _INDEX_TAIL.pack(len(ends), INDEX_MAGIC)
+
+
+def _settle_codec(source: StreamSource, segment_size: int, workers: int, window: Optional[int],
+                  compressor: Optional[SegmentCompressor],
+                  precompressed: bool) -> Tuple[Optional[SegmentCompressor], StreamSource]:
+    """
+    Compress *source* (unless it already is) and decide whether the payload
+    needs the codec flag at all.
+
+    Bodies are held back until one is not stored verbatim; if the source
+    ends first, the stored segments are handed back as plain data and the
+    compressor as None.  Past CODEC_LOOKAHEAD plaintext bytes the codec is
+    kept without looking further, which bounds what is held back.
+
+    Returns:
+        (compressor or None, bodies if compressed else plaintext chunks)
+    """
+    if compressor is None:
+        return None, source
+    if precompressed:
+        bodies = iter(source)
+    else:
+        segments = _iter_segments(_iter_chunks(source, segment_size), segment_size)
+        bodies = _ordered_map(compressor.compress, ((segment,) for _, segment, _ in segments), workers, window)
+    held = []
+    size = 0
+    for body in bodies:
+        held.append(body)
+        size += len(body) - 1
+        if body[0] != METHOD_STORED or size >= CODEC_LOOKAHEAD:
+            return compressor, chain(held, bodies)
+    if not held:
+        return compressor, held     # _mark_last() reports the empty source
+    return None, (memoryview(body)[1:] for body in held)
+
+
+def _seal_frames(key: bytes, descriptor: bytes, source: StreamSource, workers: int, window: Optional[int],
+                 compressed: bool = False) -> Iterator[bytes]:
+    if compressed:
+        jobs = ((key, descriptor, index, last, body) for index, body, last in _mark_last(source))
+        return _with_index(_ordered_map(_seal_body, jobs, workers, window))
+    _, segment_size, _ = _parse_descriptor(descriptor)
+    segments = _iter_segments(_iter_chunks(source, segment_size), segment_size)
+    jobs = ((key, descriptor, index, last, segment) for index, segment, last in segments)
+    return _ordered_map(_seal_segment, jobs, workers, window)
+
+
+def _open_body(key: bytes, descriptor: bytes, index: int, last: bool, frame: bytes, segment_size: int) -> bytes:
+    """Verify, decrypt and inflate one frame of a compressed payload."""
+    plain = decompress_segment(_open_segment(key, descriptor, index, last, frame), segment_size)
+    if not last and len(plain) != segment_size:
+        raise ValueError(f"Corrupt segment {index}: inflates to {len(plain)} bytes, expected {segment_size}")
+    return plain
+
+
+def _iter_bodies(chunks: Iterable[bytes]) -> Iterator[Tuple[int, bytes, bool]]:
+    """
+    Split a compressed payload body into (index, frame, is_last) tuples
+    (frames without their length prefix), then check the trailing index
+    against the frames actually seen.
+    """
+    buf = bytearray()
+    chunks = iter(chunks)
+    ends = []
+    total = 0
+    last = False
+    while not last:
+        while len(buf) < _FRAME_LENGTH.size:
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise ValueError(f"Truncated stream: segment {len(ends)} is missing")
+            buf += chunk
+        (word,) = _FRAME_LENGTH.unpack_from(buf)
+        length, last = word & ~_LAST_FRAME, bool(word & _LAST_FRAME)
+        need = _FRAME_LENGTH.size + length
+        while len(buf) < need:
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise ValueError(f"Truncated stream: segment {len(ends)} is shorter than its length")
+            buf += chunk
+        yield len(ends), bytes(buf[_FRAME_LENGTH.size:need]), last
+        del buf[:need]
+        total += need
+        ends.append(total)
+    for chunk in chunks:
+        buf += chunk
+    expected = struct.pack(f">{len(ends)}Q", *ends) + _INDEX_TAIL.pack(len(ends), INDEX_MAGIC)
+    if bytes(buf) != expected:
+        raise ValueError("Corrupt segment index: does not match the frames")
+
+
+def _open_frames(key: bytes, descriptor: bytes, leftover: bytes, chunks: Iterator[bytes],
+                 workers: int, window: Optional[int]) -> Iterator[bytes]:
+    _, segment_size, flags = _parse_descriptor(descriptor)
+
+    def frames() -> Iterator[bytes]:
+        yield leftover
+        yield from chunks
+
+    if flags:
+        codec_name(flags)   # rejects unknown codecs
+        jobs = ((key, descriptor, index, last, frame, segment_size)
+                for index, frame, last in _iter_bodies(frames()))
+        return _ordered_map(_open_body, jobs, workers, window)
+    segments = _iter_segments(frames(), segment_size + TAG_SIZE)
+    jobs = ((key, descriptor, index, last, frame) for index, frame, last in segments)
+    return _ordered_map(_open_segment, jobs, workers, window)
+
+
+def _open_frames_in_place(key: bytes, descriptor: bytes, view: memoryview, start: int) -> memoryview:
+    """
+    Decrypt the frames in view[start:] in place and compact the plaintext to
+    the front of *view*.
+
+    Frame i sits at start + i * (segment_size + TAG_SIZE) and its plaintext
+    belongs at i * segment_size, always at or before the frame itself, so
+    each segment is decrypted where it lies and then moved down (memoryview
+    slice assignment handles the overlap).
+    """
+    _, segment_size, flags = _parse_descriptor(descriptor)
+    if flags:
+        return _open_compressed_in_place(key, descriptor, view, start)
+    frame_size = segment_size + TAG_SIZE
+    body = len(view) - start
+    count = max(1, -(-body // frame_size))
+    prefix = descriptor[:7]
+    written = 0
+    for index in range(count):
+        offset = start + index * frame_size
+        end = min(offset + frame_size, len(view))
+        if end - offset < TAG_SIZE:
+            raise ValueError(f"Truncated stream: segment {index} is shorter than its tag")
+        last = index == count - 1
+        ciphertext = view[offset:end - TAG_SIZE]
+        cipher = AES.new(key, AES.MODE_GCM, nonce=_segment_nonce(prefix, index, last), mac_len=TAG_SIZE)
+        cipher.update(descriptor)
+        cipher.decrypt_and_verify(ciphertext, bytes(view[end - TAG_SIZE:end]), output=ciphertext)
+        view[written:written + len(ciphertext)] = ciphertext
+        written += len(ciphertext)
+    return view[:written]
+
+
+def _open_compressed_in_place(key: bytes, descriptor: bytes, view: memoryview, start: int) -> memoryview:
+    """
+    _open_frames_in_place() for compressed payloads.
+
+    Compressed segments inflate beyond their frames, so the plaintext cannot
+    overwrite the ciphertext.  Each frame is located through the trailing
+    index and decrypted where it lies; once every frame has authenticated,
+    the bodies are inflated into a single buffer of count * segment_size
+    bytes, and a view over its filled front is returned.
+    """
+    _, segment_size, flags = _parse_descriptor(descriptor)
+    codec_name(flags)   # rejects unknown codecs
+    if len(view) - start < _INDEX_TAIL.size:
+        raise ValueError("Truncated stream: segment index is missing")
+    count, magic = _INDEX_TAIL.unpack(view[len(view) - _INDEX_TAIL.size:])
+    index_start = len(view) - _INDEX_TAIL.size - count * _INDEX_ENTRY
+    if magic != INDEX_MAGIC or count < 1 or index_start < start:
+        raise ValueError("Corrupt segment index: bad magic or count")
+    ends = struct.unpack_from(f">{count}Q", view, index_start)
+    prefix = descriptor[:7]
+    bodies = []
+    offset = start
+    for index, end in enumerate(ends):
+        last = index == count - 1
+        end += start
+        if end - offset < _FRAME_LENGTH.size + TAG_SIZE or end > index_start:
+            raise ValueError(f"Truncated stream: segment {index} is shorter than its tag")
+        (word,) = _FRAME_LENGTH.unpack_from(view, offset)
+        if word != (end - offset - _FRAME_LENGTH.size) | (_LAST_FRAME if last else 0):
+            raise ValueError(f"Corrupt segment index: frame {index} length mismatch")
+        ciphertext = view[offset + _FRAME_LENGTH.size:end - TAG_SIZE]
+        cipher = AES.new(key, AES.MODE_GCM, nonce=_segment_nonce(prefix, index, last), mac_len=TAG_SIZE)
+        cipher.update(descriptor)
+        cipher.decrypt_and_verify(ciphertext, bytes(view[end - TAG_SIZE:end]), output=ciphertext)
+        bodies.append(ciphertext)
+        offset = end
+    if offset != index_start:
+        raise ValueError("Corrupt segment index: does not match the frames")
+
+    out = memoryview(bytearray(count * segment_size))
+    written = 0
+    for index, body in enumerate(bodies):
+        plain = decompress_segment(body, segment_size)
+        if index < count - 1 and len(plain) != segment_size:
+            raise ValueError(f"Corrupt segment {index}: inflates to {len(plain)} bytes, expected {segment_size}")
+        out[written:written + len(plain)] = plain
+        written += len(plain)
+    return out[:written]
+
+
+def _open_range(key: bytes, descriptor: bytes, read_at: Callable[[int, int], bytes], start: int,
+                payload_size: int, offset: int, length: int) -> bytes:
+    """
+    Decrypt plaintext [offset, offset + length) of a framed payload, reading
+    and authenticating only the frames that cover it.
+
+    Frame geometry is fixed by the descriptor, so the segment index is
+    computed rather than stored: frame i starts at
+    start + i * (segment_size + TAG_SIZE) and the frame count follows from
+    the payload size.
+    """
+    _, segment_size, flags = _parse_descriptor(descriptor)
+    if flags:
+        return _open_compressed_range(key, descriptor, read_at, start, payload_size, offset, length)
+    frame_size = segment_size + TAG_SIZE
+    count = max(1, -(-(payload_size - start) // frame_size))
+    plain_size = payload_size - start - count * TAG_SIZE
+    if plain_size < 0:
+        raise ValueError("Truncated stream: last segment is shorter than its tag")
+    end = min(offset + length, plain_size)
+    if offset >= end:
+        return b""
+    first, last = offset // segment_size, (end - 1) // segment_size
+    span_start = start + first * frame_size
+    span = read_at(span_start, min(start + (last + 1) * frame_size, payload_size) - span_start)
+    plaintext = b"".join(
+        _open_segment(key, descriptor, index, index == count - 1,
+                      span[(index - first) * frame_size:(index - first + 1) * frame_size])
+        for index in range(first, last + 1)
+    )
+    skip = offset - first * segment_size
+    return plaintext[skip:skip + end - offset]
+
+
+def _open_compressed_range(key: bytes, descriptor: bytes, read_at: Callable[[int, int], bytes], start: int,
+                           payload_size: int, offset: int, length: int) -> bytes:
+    """
+    _open_range() for compressed payloads: the trailing index locates the
+    frames of the covering segments, which are then read, authenticated
+    and inflated.
+    """
+    _, segment_size, flags = _parse_descriptor(descriptor)
+    codec_name(flags)   # rejects unknown codecs
+    if payload_size - start < _INDEX_TAIL.size:
+        raise ValueError("Truncated stream: segment index is missing")
+    count, magic = _INDEX_TAIL.unpack(bytes(read_at(payload_size - _INDEX_TAIL.size, _INDEX_TAIL.size)))
+    index_start = payload_size - _INDEX_TAIL.size - count * _INDEX_ENTRY
+    if magic != INDEX_MAGIC or count < 1 or index_start < start:
+        raise ValueError("Corrupt segment index: bad magic or count")
+    first = offset // segment_size
+    if length == 0 or first >= count:
+        return b""
+    last = min((offset + length - 1) // segment_size, count - 1)
+    lo = max(first - 1, 0)
+    raw = bytes(read_at(index_start + lo * _INDEX_ENTRY, (last + 1 - lo) * _INDEX_ENTRY))
+    entries = struct.unpack(f">{last + 1 - lo}Q", raw)
+    ends = entries[1:] if first else entries
+    span_start = entries[0] if first else 0
+    if ends[-1] > index_start - start or any(b <= a for a, b in zip((span_start,) + ends, ends)):
+        raise ValueError("Corrupt segment index: frame offsets out of order or out of range")
+    span = bytes(read_at(start + span_start, ends[-1] - span_start))
+    plaintext = []
+    pos = 0
+    for index, end in zip(range(first, last + 1), ends):
+        frame = span[pos:end - span_start]
+        pos = end - span_start
+        if len(frame) < _FRAME_LENGTH.size + TAG_SIZE:
+            raise ValueError(f"Truncated stream: segment {index} is shorter than its tag")
+        (word,) = _FRAME_LENGTH.unpack_from(frame)
+        if (word & ~_LAST_FRAME) != len(frame) - _FRAME_LENGTH.size:
+            raise ValueError(f"Corrupt segment index: frame {index} length mismatch")
+        plaintext.append(_open_body(key, descriptor, index, index == count - 1,
+                                    frame[_FRAME_LENGTH.size:], segment_size))
+    skip = offset - first * segment_size
+    return b"".join(plaintext)[skip:skip + length]
+
+
+def _wrap_dek(kek: bytes, descriptor: bytes, dek: bytes) -> bytes:
+    """Encrypt the data key under the KEK; returns wrap_nonce | wrapped_dek | tag."""
+    cipher = AES.new(kek, AES.MODE_GCM, nonce=get_random_bytes(12), mac_len=TAG_SIZE)
+    cipher.update(ENVELOPE_MAGIC + descriptor)
+    wrapped, tag = cipher.encrypt_and_digest(dek)
+    return cipher.nonce + wrapped + tag
+
+
+def _unwrap_dek(password: Union[str, bytes], header: bytes) -> bytes:
+    """Re-derive the KEK from an envelope header and recover the data key."""
+    if len(header) < ENVELOPE_HEADER_SIZE or header[:4] != ENVELOPE_MAGIC:
+        raise ValueError("Not a VaultZero envelope: bad magic or short header")
+    return _unwrap_dek_with_kek(_derive_key(password, header[4:20]), header)
+
+
+def _unwrap_dek_with_kek(kek: bytes, header: bytes) -> bytes:
+    """Recover the data key from an envelope header with an already-derived KEK."""
+    if len(header) < ENVELOPE_HEADER_SIZE or header[:4] != ENVELOPE_MAGIC:
+        raise ValueError("Not a VaultZero envelope: bad magic or short header")
+    nonce, wrapped, tag = header[20:32], header[32:64], header[64:80]
+    descriptor = header[80:ENVELOPE_HEADER_SIZE]
+    cipher = AES.new(kek, AES.MODE_GCM, nonce=nonce, mac_len=TAG_SIZE)
+    cipher.update(ENVELOPE_MAGIC + descriptor)
+    return cipher.decrypt_and_verify(wrapped, tag)
+
 
 class CryptoEngine:
     def __init__(self, password: str, salt: Optional[bytes] = None):
@@ -13,9 +647,56 @@ class CryptoEngine:
         # Generate a new 16-byte random SALT if one isn't provided.
         # This ensures identical files produce different ciphertexts.
         self.salt: bytes = salt if salt else get_random_bytes(16)
-            
+
         # Derive a 32-byte AES key using PBKDF2 (100k iterations).
-        self.key: bytes = PBKDF2(password, self.salt, dkLen=32, count=100000)
+        # Served from the derived-key cache when enable_key_cache() is active.
+        self.key: bytes = _derive_key(password, self.salt)
+
+    @classmethod
+    def from_key(cls, key: bytes, salt: bytes) -> "CryptoEngine":
+        """
+        Build an engine around an already-derived 32-byte key, skipping PBKDF2.
+
+        Used when the derived key itself was recovered from Shamir shares
+        (see ShamirVault.distribute_secret_async).  *salt* must be the salt
+        the key was derived with, since it is embedded in new ciphertexts.
+        """
+        if len(key) != 32:
+            raise ValueError(f"Derived key must be 32 bytes, got {len(key)}")
+        engine = cls.__new__(cls)
+        engine.salt = bytes(salt)
+        engine.key = bytes(key)
+        return engine
+
+    @staticmethod
+    def enable_key_cache(max_entries: int = 128, ttl_seconds: float = 300.0) -> DerivedKeyCache:
+        """
+        Turn on the process-wide derived-key cache.
+
+        Repeated reassembles of the same asset then skip the 100k-iteration
+        KDF.  Calling this again replaces (and wipes) the previous cache.
+
+        Returns:
+            The active DerivedKeyCache, for inspecting hit/miss counters.
+        """
+        global _KEY_CACHE
+        CryptoEngine.disable_key_cache()
+        _KEY_CACHE = DerivedKeyCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        return _KEY_CACHE
+
+    @staticmethod
+    def disable_key_cache() -> None:
+        """Wipe and turn off the derived-key cache (the default state)."""
+        global _KEY_CACHE
+        cache, _KEY_CACHE = _KEY_CACHE, None
+        if cache is not None:
+            cache.clear()
+
+    @staticmethod
+    def key_cache_stats() -> Optional[dict]:
+        """Counters of the active key cache, or None when caching is off."""
+        cache = _KEY_CACHE
+        return cache.stats() if cache is not None else None
 
     def encrypt_data(self, data: bytes) -> bytes:
         """
@@ -24,24 +705,239 @@ class CryptoEngine:
         """
         cipher = AES.new(self.key, AES.MODE_GCM)
         ciphertext, tag = cipher.encrypt_and_digest(data)
-        
+
         return self.salt + cipher.nonce + tag + ciphertext
 
     @staticmethod
     def decrypt_payload(password: str, encrypted_payload: bytes) -> bytes:
         """
         Extracts salt, re-derives key, and decrypts.
+
+        Envelope and stream payloads are recognised by their magic bytes and
+        decrypted in full; anything else is treated as a legacy
+        encrypt_data() blob.  (A legacy salt collides with a magic value
+        with probability 2**-32 per asset.)
         """
+        magic = bytes(encrypted_payload[:4])
+        if magic == ENVELOPE_MAGIC:
+            return b"".join(CryptoEngine.decrypt_envelope(password, encrypted_payload))
+        if magic == STREAM_MAGIC:
+            return b"".join(CryptoEngine.decrypt_stream(password, encrypted_payload))
+
         # Extract metadata
         salt_from_payload: bytes = encrypted_payload[:16]
         nonce: bytes = encrypted_payload[16:32]
         tag: bytes = encrypted_payload[32:48]
         ciphertext: bytes = encrypted_payload[48:]
-        
+
         # Re-derive the key using the extracted salt
         engine = CryptoEngine(password, salt=salt_from_payload)
-        
+
         cipher = AES.new(engine.key, AES.MODE_GCM, nonce=nonce)
-        
+
         # Verify Tag & Decrypt (Fails if tampered)
-        return cipher.decrypt_and_verify(ciphertext, tag)
\ No newline at end of file
+        return cipher.decrypt_and_verify(ciphertext, tag)
+
+    @staticmethod
+    def decrypt_with_key(key: bytes, encrypted_payload: bytes) -> bytes:
+        """
+        Decrypts any payload format with an already-derived 32-byte key.
+
+        This is the KDF-free counterpart of decrypt_payload() for callers that
+        reconstructed the derived key (rather than the password) from shards.
+        The key must have been derived with the salt stored in the payload.
+        """
+        magic = bytes(encrypted_payload[:4])
+        if magic == ENVELOPE_MAGIC:
+            chunks = _iter_chunks(encrypted_payload, SEGMENT_SIZE + TAG_SIZE)
+            header, leftover = _take(chunks, ENVELOPE_HEADER_SIZE)
+            dek = _unwrap_dek_with_kek(key, header)
+            return b"".join(_open_frames(dek, header[80:], leftover, chunks, 1, None))
+        if magic == STREAM_MAGIC:
+            chunks = _iter_chunks(encrypted_payload, SEGMENT_SIZE + TAG_SIZE)
+            header, leftover = _take(chunks, STREAM_HEADER_SIZE)
+            return b"".join(_open_frames(key, header[20:], leftover, chunks, 1, None))
+
+        nonce = encrypted_payload[16:32]
+        tag = encrypted_payload[32:48]
+        cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+        return cipher.decrypt_and_verify(encrypted_payload[48:], tag)
+
+    @staticmethod
+    def decrypt_in_place(password: str, buffer) -> memoryview:
+        """
+        Decrypts a payload held in a writable buffer without copying it.
+
+        Every format decrypt_payload() understands is supported.  The
+        plaintext overwrites the ciphertext and is returned as a memoryview
+        over the front of *buffer*, so a reassembled asset costs one buffer
+        of memory rather than ciphertext + segments + joined plaintext.  On
+        failure the buffer holds partially decrypted data and must be
+        discarded.  Compressed payloads inflate beyond their ciphertext, so
+        for them the frames are decrypted in place and inflated into one new
+        buffer of the plaintext's size, which the view is over.
+        """
+        view = memoryview(buffer).cast("B")
+        if view.readonly:
+            raise ValueError("decrypt_in_place() needs a writable buffer (e.g. a bytearray)")
+        magic = bytes(view[:4])
+        if magic == ENVELOPE_MAGIC:
+            header = bytes(view[:ENVELOPE_HEADER_SIZE])
+            dek = _unwrap_dek(password, header)
+            return _open_frames_in_place(dek, header[80:], view, ENVELOPE_HEADER_SIZE)
+        if magic == STREAM_MAGIC:
+            if len(view) < STREAM_HEADER_SIZE:
+                raise ValueError(f"Truncated stream: expected at least {STREAM_HEADER_SIZE} header bytes")
+            key = _derive_key(password, bytes(view[4:20]))
+            return _open_frames_in_place(key, bytes(view[20:STREAM_HEADER_SIZE]), view, STREAM_HEADER_SIZE)
+
+        key = _derive_key(password, bytes(view[:16]))
+        cipher = AES.new(key, AES.MODE_GCM, nonce=bytes(view[16:32]))
+        ciphertext = view[48:]
+        cipher.decrypt_and_verify(ciphertext, bytes(view[32:48]), output=ciphertext)
+        view[:len(ciphertext)] = ciphertext
+        return view[:len(ciphertext)]
+
+    @staticmethod
+    def decrypt_range(password: str, read_at: Callable[[int, int], bytes], payload_size: int,
+                      offset: int, length: int) -> bytes:
+        """
+        Decrypts plaintext bytes [offset, offset + length) of a stored payload.
+
+        For envelope and stream payloads only the header and the frames
+        covering the range are fetched and authenticated, so the cost is
+        O(length) rather than O(payload).  Legacy encrypt_data() blobs have
+        no segments and are decrypted whole.  Like a file read, the range is
+        clipped at the end of the plaintext.
+
+        Args:
+            read_at:      read_at(start, n) returns ciphertext bytes
+                          [start, start + n) of the stored payload.
+            payload_size: Total ciphertext size.
+        """
+        if offset < 0 or length < 0:
+            raise ValueError(f"offset and length must be >= 0, got {offset}, {length}")
+        magic = bytes(read_at(0, 4))
+        if magic == ENVELOPE_MAGIC:
+            header = bytes(read_at(0, ENVELOPE_HEADER_SIZE))
+            dek = _unwrap_dek(password, header)
+            return _open_range(dek, header[80:], read_at, ENVELOPE_HEADER_SIZE, payload_size, offset, length)
+        if magic == STREAM_MAGIC:
+            header = bytes(read_at(0, STREAM_HEADER_SIZE))
+            key = _derive_key(password, header[4:20])
+            descriptor = header[20:]
+            return _open_range(key, descriptor, read_at, STREAM_HEADER_SIZE, payload_size, offset, length)
+        return CryptoEngine.decrypt_payload(password, read_at(0, payload_size))[offset:offset + length]
+
+    def encrypt_stream(self, source: StreamSource, segment_size: int = SEGMENT_SIZE,
+                       workers: int = 1, window: Optional[int] = None,
+                       codec: Union[None, str, SegmentCompressor] = None,
+                       precompressed: bool = False) -> Iterator[bytes]:
+        """
+        Encrypts an arbitrarily large payload as a framed AES-GCM stream.
+
+        Yields the stream header followed by one frame per segment, so peak
+        memory is bounded by one segment (or *window* segments when running
+        in parallel) regardless of the payload size.
+
+        Args:
+            source:        bytes-like object, binary file object, or iterable
+                           of byte chunks.
+            segment_size:  Plaintext bytes per segment (default 64 KiB).
+            workers:       Threads sealing segments concurrently (default 1).
+            window:        Max segments in flight (default 2 * workers).
+            codec:         "zlib", "lzma" or a SegmentCompressor to compress
+                           each segment before sealing; recorded in the
+                           header so readers inflate transparently (and
+                           left out if no segment compresses).
+            precompressed: *source* already yields one body per segment from
+                           SegmentCompressor.compress_stream() (with the
+                           same *segment_size*); requires *codec*.
+        """
+        compressor = resolve(codec)
+        if precompressed and compressor is None:
+            raise ValueError("precompressed=True needs the codec the segments were compressed with")
+        compressor, source = _settle_codec(source, segment_size, workers, window, compressor, precompressed)
+        descriptor = _new_descriptor(segment_size, compressor)
+        yield STREAM_MAGIC + self.salt + descriptor
+        yield from _seal_frames(self.key, descriptor, source, workers, window, compressor is not None)
+
+    @staticmethod
+    def decrypt_stream(password: str, source: StreamSource,
+                       workers: int = 1, window: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Decrypts a stream produced by encrypt_stream(), one segment at a time.
+
+        Each yielded plaintext segment has already been authenticated; a
+        tampered, reordered or truncated stream raises ValueError at the
+        first bad frame.  *workers* and *window* behave as in encrypt_stream().
+        """
+        chunks = _iter_chunks(source, SEGMENT_SIZE + TAG_SIZE)
+        header, leftover = _take(chunks, STREAM_HEADER_SIZE)
+        if header[:4] != STREAM_MAGIC:
+            raise ValueError("Not a VaultZero stream: bad magic")
+        salt = header[4:20]
+        descriptor = header[20:]
+        _parse_descriptor(descriptor)
+
+        engine = CryptoEngine(password, salt=salt)
+        yield from _open_frames(engine.key, descriptor, leftover, chunks, workers, window)
+
+    def encrypt_envelope(self, source: StreamSource, segment_size: int = SEGMENT_SIZE,
+                         workers: int = 1, window: Optional[int] = None,
+                         codec: Union[None, str, SegmentCompressor] = None,
+                         precompressed: bool = False) -> Iterator[bytes]:
+        """
+        Envelope-encrypts a payload: a fresh random 256-bit data key (DEK)
+        seals the segments, and this engine's password-derived key (KEK)
+        wraps the DEK into an ENVELOPE_HEADER_SIZE-byte header.
+
+        Changing the password later only requires rewrap_envelope() on the
+        header; the segment frames never need to be re-encrypted.
+        Arguments are as in encrypt_stream().
+        """
+        compressor = resolve(codec)
+        if precompressed and compressor is None:
+            raise ValueError("precompressed=True needs the codec the segments were compressed with")
+        compressor, source = _settle_codec(source, segment_size, workers, window, compressor, precompressed)
+        descriptor = _new_descriptor(segment_size, compressor)
+        dek = get_random_bytes(32)
+        yield ENVELOPE_MAGIC + self.salt + _wrap_dek(self.key, descriptor, dek) + descriptor
+        yield from _seal_frames(dek, descriptor, source, workers, window, compressor is not None)
+
+    @staticmethod
+    def decrypt_envelope(password: str, source: StreamSource,
+                         workers: int = 1, window: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Unwraps the data key with *password* and decrypts an envelope
+        produced by encrypt_envelope(), one authenticated segment at a time.
+        """
+        chunks = _iter_chunks(source, SEGMENT_SIZE + TAG_SIZE)
+        header, leftover = _take(chunks, ENVELOPE_HEADER_SIZE)
+        dek = _unwrap_dek(password, header)
+        descriptor = header[80:]
+        yield from _open_frames(dek, descriptor, leftover, chunks, workers, window)
+
+    @staticmethod
+    def rewrap_envelope(header: bytes, old_password: str, new_password: str) -> bytes:
+        """
+        Re-wraps an envelope's data key under a new password.
+
+        Args:
+            header:       The first ENVELOPE_HEADER_SIZE bytes of the object
+                          (extra trailing bytes are ignored).
+            old_password: Current password; must unwrap the DEK.
+            new_password: Password the DEK is wrapped under afterwards.
+
+        Returns:
+            A replacement header of exactly ENVELOPE_HEADER_SIZE bytes with
+            a fresh KEK salt.  Overwrite the object's header in place; the
+            frames that follow stay valid.
+
+        Raises:
+            ValueError: If the header is malformed or old_password is wrong.
+        """
+        dek = _unwrap_dek(old_password, header)
+        descriptor = header[80:ENVELOPE_HEADER_SIZE]
+        new_engine = CryptoEngine(new_password)
+        return ENVELOPE_MAGIC + new_engine.salt + _wrap_dek(new_engine.key, descriptor, dek) + descriptor
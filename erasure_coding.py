@@ -0,0 +1,910 @@
+"""
+erasure_coding.py
+Systematic Reed-Solomon erasure coding of VaultZero data shards over GF(2^8).
+
+A payload is cut into stripes of k * unit bytes.  Every stripe adds one row
+of *unit* bytes to each shard: rows 0..k-1 are the stripe's own bytes
+(systematic) and rows k..n-1 are parity from a Cauchy matrix.  The final
+stripe is shortened to ceil(remainder / k) bytes per row, so padding never
+exceeds k - 1 bytes.  Any k of the n shards recover the payload; with the
+default 2-of-3 this matches the key-shard threshold at 1.5x storage
+overhead.  Because stripes are coded independently, a payload can be
+encoded while it streams in (DataShardWriter) with one stripe in memory.
+
+Encoding and decoding are vectorised: each parity or recovered row is an
+XOR of table lookups ``MUL[c][row]`` (see gf256.py), done in cache-sized
+column passes with no per-byte Python code.
+
+Shard file format (version 2, one file per shard):
+
+    magic "VZRS"(4) | version(1) | k(1) | n(1) | index(1)
+    | payload size(8, big-endian) | stripe unit(4) | BLAKE2b-128 checksum(16)
+    | shard bytes
+
+The checksum covers the shard bytes followed by the first 20 header bytes;
+hashing the payload first lets a streaming writer fill in the size last.
+A damaged shard is skipped in favour of another one instead of decoding to
+garbage.  Version-1 shards (a single stripe, no unit field, header hashed
+before the payload) are still read, and files without the magic are legacy
+plain-thirds slices that are simply concatenated.
+"""
+
+from __future__ import annotations
+import collections
+import functools
+import hashlib
+import hmac
+import io
+import itertools
+import mmap
+import os
+import struct
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+import gf256
+
+DATA_SHARD_MAGIC = b"VZRS"
+DATA_SHARD_VERSION = 2
+_HEADER_V1 = struct.Struct(">4sBBBBQ16s")
+_PREFIX = struct.Struct(">4sBBBBQI")
+_HEADER = struct.Struct(">4sBBBBQI16s")
+DATA_SHARD_HEADER_SIZE = _HEADER.size   # 36
+
+# Default bytes per shard row in one stripe.
+STRIPE_UNIT = 1024 * 1024
+
+# Columns processed per table-lookup pass; keeps the working rows in cache.
+_PASS_COLUMNS = 256 * 1024
+
+
+class DataShard(NamedTuple):
+    index: int      # 0-based row of the coding matrix
+    k: int
+    n: int
+    size: int       # payload size before padding
+    payload: bytes
+    unit: int = STRIPE_UNIT
+
+
+def _check_params(k: int, n: int) -> None:
+    if not 1 <= k <= n <= 255:
+        raise ValueError(f"Need 1 <= k <= n <= 255, got k={k}, n={n}")
+
+
+def stripe_layout(size: int, k: int, unit: int) -> List[Tuple[int, int]]:
+    """
+    (shard offset, row length) of every stripe of a *size*-byte payload.
+
+    All stripes but the last are full, so stripe s covers payload bytes
+    from ``k * offset`` onwards.
+    """
+    full, rest = divmod(size, k * unit)
+    layout = [(s * unit, unit) for s in range(full)]
+    if rest or not full:
+        layout.append((full * unit, max(1, -(-rest // k))))
+    return layout
+
+
+def shard_width(size: int, k: int, unit: int) -> int:
+    """Bytes per shard for a *size*-byte payload."""
+    offset, length = stripe_layout(size, k, unit)[-1]
+    return offset + length
+
+
+@functools.lru_cache(maxsize=64)
+def _coding_matrix(k: int, n: int) -> np.ndarray:
+    """(n, k) matrix: identity on top, Cauchy rows 1 / (x_i ^ y_j) below."""
+    matrix = np.zeros((n, k), dtype=np.uint8)
+    matrix[:k] = np.eye(k, dtype=np.uint8)
+    for i in range(n - k):
+        for j in range(k):
+            # x_i = k + i and y_j = j never collide, so x_i ^ y_j != 0.
+            matrix[k + i, j] = gf256.INV[(k + i) ^ j]
+    matrix.setflags(write=False)
+    return matrix
+
+
+def _invert(matrix: np.ndarray) -> np.ndarray:
+    """Gauss-Jordan inverse of a square GF(256) matrix."""
+    size = matrix.shape[0]
+    work = np.concatenate([matrix.copy(), np.eye(size, dtype=np.uint8)], axis=1)
+    for col in range(size):
+        pivot = next((r for r in range(col, size) if work[r, col]), None)
+        if pivot is None:
+            raise ValueError("Erasure decode error: singular shard subset")
+        if pivot != col:
+            work[[col, pivot]] = work[[pivot, col]]
+        work[col] = gf256.MUL[gf256.INV[work[col, col]]][work[col]]
+        for r in range(size):
+            if r != col and work[r, col]:
+                work[r] ^= gf256.MUL[work[r, col]][work[col]]
+    return work[:, size:]
+
+
+def _combine_into(weights: np.ndarray, rows: Sequence[np.ndarray], out: np.ndarray) -> None:
+    """out = XOR_i MUL[weights[i]][rows[i]], one cache-sized column pass at a time."""
+    scratch = np.empty(min(_PASS_COLUMNS, out.size), dtype=np.uint8)
+    for start in range(0, out.size, _PASS_COLUMNS):
+        stop = min(start + _PASS_COLUMNS, out.size)
+        dst, tmp = out[start:stop], scratch[:stop - start]
+        dst[:] = 0
+        for w, row in zip(weights, rows):
+            if w:
+                np.take(gf256.MUL[w], row[start:stop], out=tmp)
+                dst ^= tmp
+
+
+@functools.lru_cache(maxsize=256)
+def _decode_matrix(k: int, n: int, indices: tuple) -> np.ndarray:
+    inverse = _invert(_coding_matrix(k, n)[list(indices)])
+    inverse.setflags(write=False)
+    return inverse
+
+
+def _row_weights(k: int, n: int, indices: tuple, index: int) -> np.ndarray:
+    """
+    Coefficients giving shard *index* from the k shards *indices*: decoding
+    and re-encoding folded into one combination, so only that row is computed.
+    """
+    inverse = _decode_matrix(k, n, indices)
+    row = _coding_matrix(k, n)[index]
+    weights = np.zeros(k, dtype=np.uint8)
+    for r in range(k):
+        if row[r]:
+            weights ^= gf256.MUL[row[r]][inverse[r]]
+    return weights
+
+
+def _rebuild(k: int, n: int, layout: Sequence[Tuple[int, int]], indices: tuple,
+             source: Callable[[int, int, int], np.ndarray], out: np.ndarray, lost: Sequence[int]) -> None:
+    """
+    Decode the *lost* data rows of every stripe into the flat payload array *out*.
+
+    source(i, offset, length) returns shard i's row of the stripe at that
+    shard offset; *indices* are the k shards to decode from.
+    """
+    inverse = _decode_matrix(k, n, indices)
+    for offset, length in layout:
+        rows = [source(i, offset, length) for i in indices]
+        base = k * offset
+        for r in lost:
+            _combine_into(inverse[r], rows, out[base + r * length:base + (r + 1) * length])
+
+
+class ReedSolomon:
+    """
+    k-of-n systematic Reed-Solomon code over GF(2^8), striped in *unit*-byte rows.
+
+    Example::
+
+        rs = ReedSolomon(2, 3)
+        rows = rs.encode(blob)                      # 3 shards, 1.5x overhead
+        blob == rs.decode({0: rows[0], 2: rows[2]}, len(blob))
+    """
+
+    def __init__(self, k: int = 2, n: int = 3, unit: int = STRIPE_UNIT) -> None:
+        _check_params(k, n)
+        if unit < 1:
+            raise ValueError(f"unit must be >= 1, got {unit}")
+        self.k = k
+        self.n = n
+        self.unit = unit
+
+    def shard_size(self, size: int) -> int:
+        """Bytes per shard for a payload of *size* bytes."""
+        return shard_width(size, self.k, self.unit)
+
+    def encode_stripe(self, block) -> List[np.ndarray]:
+        """
+        Encode one stripe of at most k * unit bytes.
+
+        Returns:
+            n rows of ceil(len(block) / k) bytes.  When *block* fills its
+            rows exactly, the k data rows are views of it (no copy).
+        """
+        view = np.frombuffer(block, dtype=np.uint8)
+        if view.size > self.k * self.unit:
+            raise ValueError(f"Stripe of {view.size} bytes exceeds k * unit = {self.k * self.unit}")
+        length = max(1, -(-view.size // self.k))
+        if view.size == self.k * length:
+            data = view.reshape(self.k, length)
+        else:
+            data = np.zeros((self.k, length), dtype=np.uint8)
+            data.reshape(-1)[:view.size] = view
+        matrix = _coding_matrix(self.k, self.n)
+        parity = np.empty((self.n - self.k, length), dtype=np.uint8)
+        for row in range(self.k, self.n):
+            _combine_into(matrix[row], data, parity[row - self.k])
+        return list(data) + list(parity)
+
+    def encode_array(self, data) -> np.ndarray:
+        """
+        Encode a bytes-like payload.
+
+        Returns:
+            uint8 array of shape (n, shard_size); row i is shard i.
+        """
+        view = memoryview(data).cast("B")
+        out = np.empty((self.n, self.shard_size(len(view))), dtype=np.uint8)
+        for offset, length in stripe_layout(len(view), self.k, self.unit):
+            start = self.k * offset
+            for i, row in enumerate(self.encode_stripe(view[start:start + self.k * length])):
+                out[i, offset:offset + length] = row
+        return out
+
+    def encode(self, data) -> List[bytes]:
+        """Encode a payload into n shard byte strings."""
+        return [row.tobytes() for row in self.encode_array(data)]
+
+    def decode(self, shards: Dict[int, object], size: int) -> bytes:
+        """
+        Recover the original *size*-byte payload from any k shards.
+
+        Args:
+            shards: {shard index: bytes-like shard}; extra shards are
+                    ignored, data shards are preferred over parity.
+
+        Raises:
+            ValueError: Fewer than k shards, or shards of the wrong length.
+        """
+        if len(shards) < self.k:
+            raise ValueError(f"Erasure decode error: need {self.k} shards, got {len(shards)}")
+        if any(not 0 <= i < self.n for i in shards):
+            raise ValueError(f"Erasure decode error: shard index out of range 0..{self.n - 1}")
+        indices = tuple(sorted(shards)[:self.k])
+        width = self.shard_size(size)
+        arrays = {i: np.frombuffer(shards[i], dtype=np.uint8) for i in indices}
+        if any(a.size != width for a in arrays.values()):
+            raise ValueError(f"Erasure decode error: shards must be {width} bytes for a {size}-byte payload")
+
+        layout = stripe_layout(size, self.k, self.unit)
+        out = np.empty(self.k * width, dtype=np.uint8)
+        for r in (i for i in indices if i < self.k):
+            for offset, length in layout:
+                start = self.k * offset + r * length
+                out[start:start + length] = arrays[r][offset:offset + length]
+        lost = [r for r in range(self.k) if r not in arrays]
+        if lost:
+            _rebuild(self.k, self.n, layout, indices,
+                     lambda i, offset, length: arrays[i][offset:offset + length], out, lost)
+        return out[:size].tobytes()
+
+
+# ---------------------------------------------------------------------------
+# Shard files
+# ---------------------------------------------------------------------------
+
+class ShardHeader(NamedTuple):
+    index: int
+    k: int
+    n: int
+    size: int
+    unit: int
+    checksum: bytes
+    version: int = DATA_SHARD_VERSION
+
+    @property
+    def header_size(self) -> int:
+        return _HEADER_V1.size if self.version == 1 else _HEADER.size
+
+    @property
+    def width(self) -> int:
+        """Shard bytes that follow the header."""
+        return shard_width(self.size, self.k, self.unit)
+
+    @property
+    def geometry(self) -> Tuple[int, int, int, int]:
+        return self.k, self.n, self.size, self.unit
+
+
+class _ShardHash:
+    """Incremental checksum of one shard, in the order its version defines."""
+
+    def __init__(self, raw_header: bytes, version: int = DATA_SHARD_VERSION) -> None:
+        self._hash = hashlib.blake2b(digest_size=16)
+        self._tail = b""
+        if version == 1:
+            self._hash.update(bytes(raw_header[:16]))
+        else:
+            self._tail = bytes(raw_header[:_PREFIX.size])
+
+    def update(self, data) -> None:
+        self._hash.update(data)
+
+    def digest(self) -> bytes:
+        self._hash.update(self._tail)
+        return self._hash.digest()
+
+
+def parse_data_shard_header(raw: bytes) -> ShardHeader:
+    """
+    Parse a shard header (the payload is not checked).
+
+    Raises:
+        ValueError: If *raw* is not an erasure shard header or is inconsistent.
+    """
+    if raw[:4] != DATA_SHARD_MAGIC:
+        raise ValueError("Not an erasure-coded data shard")
+    if len(raw) < 5:
+        raise ValueError("Corrupt data shard: truncated header")
+    version = raw[4]
+    if version == 1 and len(raw) >= _HEADER_V1.size:
+        _, _, k, n, index, size, checksum = _HEADER_V1.unpack_from(raw)
+        unit = max(1, -(-size // k)) if k else 1
+    elif version == DATA_SHARD_VERSION and len(raw) >= _HEADER.size:
+        _, _, k, n, index, size, unit, checksum = _HEADER.unpack_from(raw)
+    elif version in (1, DATA_SHARD_VERSION):
+        raise ValueError("Corrupt data shard: truncated header")
+    else:
+        raise ValueError(f"Corrupt data shard: unsupported version {version}")
+    if not 1 <= k <= n or not index < n or unit < 1:
+        raise ValueError("Corrupt data shard: geometry does not match header")
+    return ShardHeader(index, k, n, size, unit, bytes(checksum), version)
+
+
+def _verify(raw_header: bytes, header: ShardHeader, payload) -> bool:
+    digest = _ShardHash(raw_header, header.version)
+    digest.update(payload)
+    return hmac.compare_digest(header.checksum, digest.digest())
+
+
+def encode_data_shard(index: int, k: int, n: int, size: int, payload, unit: int = STRIPE_UNIT) -> bytes:
+    """Serialise one shard with its self-describing header."""
+    prefix = _PREFIX.pack(DATA_SHARD_MAGIC, DATA_SHARD_VERSION, k, n, index, size, unit)
+    digest = _ShardHash(prefix)
+    digest.update(payload)
+    return prefix + digest.digest() + bytes(payload)
+
+
+def decode_data_shard(raw: bytes) -> DataShard:
+    """
+    Parse and verify one shard file.
+
+    Raises:
+        ValueError: If the shard is not in the erasure format or is corrupt.
+    """
+    header = parse_data_shard_header(raw)
+    payload = memoryview(raw)[header.header_size:]
+    if not _verify(raw, header, payload):
+        raise ValueError("Corrupt data shard: checksum mismatch")
+    if len(payload) != header.width:
+        raise ValueError("Corrupt data shard: geometry does not match header")
+    return DataShard(header.index, header.k, header.n, header.size, bytes(payload), header.unit)
+
+
+def encode_data_shards(data, k: int = 2, n: int = 3, unit: int = STRIPE_UNIT) -> List[bytes]:
+    """Erasure-code *data* into n serialised shard files (index order)."""
+    rows = ReedSolomon(k, n, unit).encode_array(data)
+    size = len(memoryview(data).cast("B"))
+    return [encode_data_shard(i, k, n, size, rows[i], unit) for i in range(n)]
+
+
+def decode_data_shards(raw_shards: Sequence[bytes]) -> bytes:
+    """
+    Rebuild the payload from whatever shard files were found.
+
+    Corrupt shards are skipped as long as k valid ones remain.  If none of
+    the files carry the erasure header they are legacy contiguous slices and
+    are concatenated in the given order.
+
+    Raises:
+        ValueError: Fewer than k valid shards, or shards from different
+                    encodings.
+    """
+    if not any(raw[:4] == DATA_SHARD_MAGIC for raw in raw_shards):
+        return b"".join(raw_shards)
+
+    valid: Dict[int, DataShard] = {}
+    corrupt = 0
+    for raw in raw_shards:
+        try:
+            shard = decode_data_shard(raw)
+        except ValueError:
+            corrupt += 1
+            continue
+        valid[shard.index] = shard
+    if len({(s.k, s.n, s.size, s.unit) for s in valid.values()}) > 1:
+        raise ValueError("Erasure decode error: shards come from different encodings")
+    if not valid:
+        raise ValueError(f"Erasure decode error: no valid data shards ({corrupt} corrupt)")
+    first = next(iter(valid.values()))
+    if len(valid) < first.k:
+        raise ValueError(
+            f"Erasure decode error: only {len(valid)} valid data shards, need {first.k} ({corrupt} corrupt)")
+    rs = ReedSolomon(first.k, first.n, first.unit)
+    return rs.decode({i: s.payload for i, s in valid.items()}, first.size)
+
+
+def rebuild_data_shard(raw_shards: Sequence[bytes], index: int) -> bytes:
+    """
+    Regenerate the serialised shard *index* from the other shard files of
+    the same object (any k valid ones), e.g. after its node lost it.
+
+    Raises:
+        ValueError: Fewer than k valid shards, shards from different
+                    encodings, legacy headerless slices (which carry no
+                    parity), or *index* outside the code.
+    """
+    valid: Dict[int, DataShard] = {}
+    for raw in raw_shards:
+        try:
+            shard = decode_data_shard(raw)
+        except ValueError:
+            continue
+        valid[shard.index] = shard
+    if not valid:
+        raise ValueError("Erasure rebuild error: no valid erasure-coded shards")
+    if len({(s.k, s.n, s.size, s.unit) for s in valid.values()}) > 1:
+        raise ValueError("Erasure rebuild error: shards come from different encodings")
+    first = next(iter(valid.values()))
+    if not 0 <= index < first.n:
+        raise ValueError(f"Erasure rebuild error: shard index {index} out of range 0..{first.n - 1}")
+    sources = tuple(sorted(i for i in valid if i != index)[:first.k])
+    if len(sources) < first.k:
+        raise ValueError(f"Erasure rebuild error: only {len(sources)} valid data shards, need {first.k}")
+    width = shard_width(first.size, first.k, first.unit)
+    rows = [np.frombuffer(valid[i].payload, dtype=np.uint8) for i in sources]
+    if any(row.size != width for row in rows):
+        raise ValueError(f"Erasure rebuild error: shards must be {width} bytes for a {first.size}-byte payload")
+    # Every stripe uses the same combination, so the whole shard is one pass.
+    out = np.empty(width, dtype=np.uint8)
+    _combine_into(_row_weights(first.k, first.n, sources, index), rows, out)
+    return encode_data_shard(index, first.k, first.n, first.size, out, first.unit)
+
+
+ShardTarget = Union[None, str, Callable[..., None]]
+
+
+def _fsync_dir(path: str) -> None:
+    """fsync the directory holding *path*, so a rename into it survives a crash."""
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass                                        # directories cannot be fsynced on every platform
+    finally:
+        os.close(fd)
+
+
+class DataShardWriter:
+    """
+    Streams stripes into n shard files without holding the payload.
+
+    Each shard is written to ``<path>.tmp`` behind a placeholder header; the
+    checksum is accumulated as rows arrive, and commit() fills in the final
+    size and checksum and renames the file into place.  ``None`` targets
+    (offline nodes) are skipped.  A callable target (e.g. a packfile put for
+    a small object) has its shard assembled in memory and receives the
+    finished shard bytes on commit.  Each shard may be written, committed
+    (commit_shard()) or discarded from its own thread, but a single shard
+    must not be handled from two at once.
+
+    With ``sync=True`` a shard is on stable storage before commit_shard()
+    returns: a shard file is fsynced before its rename and its directory
+    after it, and a callable target is called with ``sync=True`` (as
+    NodeStore.put() accepts).
+    """
+
+    def __init__(self, paths: Sequence[ShardTarget], k: int = 2, n: int = 3,
+                 unit: int = STRIPE_UNIT, sync: bool = False) -> None:
+        _check_params(k, n)
+        if len(paths) != n:
+            raise ValueError(f"Need one path (or None) per shard: {n} expected, got {len(paths)}")
+        self.k, self.n, self.unit = k, n, unit
+        self.sync = sync
+        self.paths = list(paths)
+        self._files = {}
+        self._hashes = {}
+        self._sealed = set()
+        self._written = [0] * n
+        try:
+            for i, path in enumerate(self.paths):
+                if path is None:
+                    continue
+                f = io.BytesIO() if callable(path) else open(path + ".tmp", "wb")
+                self._files[i] = f
+                f.write(bytes(_HEADER.size))
+                self._hashes[i] = hashlib.blake2b(digest_size=16)
+        except OSError:
+            self.abort()
+            raise
+
+    def write_row(self, index: int, row) -> None:
+        """Append shard *index*'s row of the next stripe."""
+        self._written[index] += len(memoryview(row).cast("B"))
+        f = self._files.get(index)
+        if f is not None:
+            f.write(row)
+            self._hashes[index].update(row)
+
+    def commit(self, size: int) -> None:
+        """
+        Finalise every shard for a *size*-byte payload.
+
+        Raises:
+            ValueError: If the rows written do not match the stripe layout.
+        """
+        width = shard_width(size, self.k, self.unit)
+        if any(w != width for w in self._written):
+            self.abort()
+            raise ValueError(f"Shard writer: wrote {self._written} bytes per shard, layout needs {width}")
+        for i in list(self._files):
+            self.commit_shard(i, size)
+
+    def commit_shard(self, index: int, size: int) -> None:
+        """
+        Finalise shard *index* alone, independently of the others.
+
+        If storing the shard fails it stays pending, so the call can be
+        retried.
+
+        Raises:
+            ValueError: If the rows written do not match the stripe layout.
+        """
+        f = self._files.get(index)
+        if f is None:
+            return
+        width = shard_width(size, self.k, self.unit)
+        if self._written[index] != width:
+            raise ValueError(f"Shard writer: wrote {self._written[index]} bytes to shard {index}, layout needs {width}")
+        if index not in self._sealed:
+            prefix = _PREFIX.pack(DATA_SHARD_MAGIC, DATA_SHARD_VERSION, self.k, self.n, index, size, self.unit)
+            self._hashes[index].update(prefix)
+            f.seek(0)
+            f.write(prefix + self._hashes[index].digest())
+            self._sealed.add(index)
+        if callable(self.paths[index]):
+            if self.sync:
+                self.paths[index](f.getvalue(), sync=True)
+            else:
+                self.paths[index](f.getvalue())
+        else:
+            if self.sync:
+                f.flush()
+                os.fsync(f.fileno())
+            f.close()
+            os.replace(self.paths[index] + ".tmp", self.paths[index])
+            if self.sync:
+                _fsync_dir(self.paths[index])
+        del self._files[index]
+
+    def abort_shard(self, index: int) -> None:
+        """Discard shard *index* if it has not been committed."""
+        f = self._files.pop(index, None)
+        if f is None:
+            return
+        f.close()
+        if not callable(self.paths[index]):
+            try:
+                os.remove(self.paths[index] + ".tmp")
+            except OSError:
+                pass
+
+    def abort(self) -> None:
+        """Discard every partially written shard."""
+        for i in list(self._files):
+            self.abort_shard(i)
+
+
+class _Scan(NamedTuple):
+    present: List[str]
+    headers: Dict[str, bytes]                       # raw header bytes per path
+    parsed: Dict[int, Tuple[str, ShardHeader]]      # shard index -> (path, header)
+    geometry: Optional[Tuple[int, int, int, int]]   # None: legacy headerless slices
+
+
+def _scan_shards(paths: Sequence[str]) -> _Scan:
+    """
+    Read the header of every existing shard file and settle on one geometry.
+
+    Shards with unreadable headers, the wrong file size or a minority
+    geometry are left out of ``parsed``.
+
+    Raises:
+        FileNotFoundError: None of the paths exist.
+        ValueError:        No shard has a usable header.
+    """
+    present = [p for p in paths if os.path.exists(p)]
+    if not present:
+        raise FileNotFoundError("Missing Data Shards: no shard files found")
+
+    headers: Dict[str, bytes] = {}
+    for path in present:
+        with open(path, "rb") as f:
+            headers[path] = f.read(_HEADER.size)
+    if not any(raw[:4] == DATA_SHARD_MAGIC for raw in headers.values()):
+        return _Scan(present, headers, {}, None)
+
+    parsed: Dict[int, Tuple[str, ShardHeader]] = {}
+    for path, raw in headers.items():
+        try:
+            header = parse_data_shard_header(raw)
+        except ValueError:
+            continue
+        if os.path.getsize(path) == header.header_size + header.width:
+            parsed.setdefault(header.index, (path, header))
+    if not parsed:
+        raise ValueError("Erasure decode error: no valid data shards")
+    geometry = collections.Counter(h.geometry for _, h in parsed.values()).most_common(1)[0][0]
+    parsed = {i: entry for i, entry in parsed.items() if entry[1].geometry == geometry}
+    return _Scan(present, headers, parsed, geometry)
+
+
+class ShardReader:
+    """
+    Random access to the payload stored in a set of shard files.
+
+    read(start, length) touches only the stripe columns under the range:
+    rows of the chosen data shards are read directly, and a row whose data
+    shard is unavailable is decoded column-by-column from the same columns
+    of k other shards.  Shard checksums cover whole files and are not
+    checked here; callers authenticate what they read (e.g. AES-GCM frames)
+    and can retry with a different shard subset via *use*.
+
+    rebuild(index, target) regenerates a lost shard from the others one
+    stripe at a time, verifying the checksums of the shards it reads.
+
+    Legacy headerless slices are read as one concatenated payload.
+    """
+
+    def __init__(self, paths: Sequence[str]) -> None:
+        scan = _scan_shards(paths)
+        self._files: Dict[int, object] = {}
+        self._headers: Dict[int, Tuple[bytes, ShardHeader]] = {}
+        self._legacy = scan.geometry is None
+        try:
+            if self._legacy:
+                self.k = self.n = len(scan.present)
+                self._spans = []
+                offset = 0
+                for i, path in enumerate(scan.present):
+                    self._files[i] = open(path, "rb")
+                    size = os.path.getsize(path)
+                    self._spans.append((offset, size))
+                    offset += size
+                self.size = offset
+                self.unit = max(1, offset)
+            else:
+                self.k, self.n, self.size, self.unit = scan.geometry
+                self._skip = {i: header.header_size for i, (_, header) in scan.parsed.items()}
+                self._headers = {i: (scan.headers[path], header) for i, (path, header) in scan.parsed.items()}
+                for i, (path, _) in scan.parsed.items():
+                    self._files[i] = open(path, "rb")
+        except OSError:
+            self.close()
+            raise
+
+    @property
+    def available(self) -> List[int]:
+        """Shard indices that can be read."""
+        return sorted(self._files)
+
+    def subsets(self) -> Iterator[Tuple[int, ...]]:
+        """Every usable choice of k shards, data-shard-heavy subsets first."""
+        if self._legacy:
+            yield tuple(self.available)
+            return
+        yield from itertools.combinations(self.available, self.k)
+
+    def _pread(self, index: int, offset: int, length: int) -> bytes:
+        f = self._files[index]
+        f.seek(self._skip[index] + offset)
+        data = f.read(length)
+        if len(data) != length:
+            raise ValueError(f"Erasure decode error: shard {index} is truncated")
+        return data
+
+    def read(self, start: int, length: int, use: Optional[Sequence[int]] = None) -> bytes:
+        """
+        Payload bytes [start, start + length), clipped at the payload end.
+
+        Args:
+            use: k shard indices to read from (default: the first subset).
+
+        Raises:
+            ValueError: Fewer than k shards are available.
+        """
+        end = min(start + length, self.size)
+        if start < 0 or length < 0:
+            raise ValueError(f"start and length must be >= 0, got {start}, {length}")
+        if start >= end:
+            return b""
+        if self._legacy:
+            out = bytearray()
+            for i, (offset, size) in enumerate(self._spans):
+                lo, hi = max(start, offset), min(end, offset + size)
+                if lo < hi:
+                    f = self._files[i]
+                    f.seek(lo - offset)
+                    out += f.read(hi - lo)
+            return bytes(out)
+
+        indices = tuple(sorted(use)) if use is not None else next(self.subsets(), None)
+        if indices is None or len(indices) < self.k or any(i not in self._files for i in indices):
+            raise ValueError(f"Erasure decode error: only {len(self._files)} valid data shards, need {self.k}")
+        indices = indices[:self.k]
+        inverse = None
+        out = bytearray()
+        stripe = self.k * self.unit
+        for offset, row_len in stripe_layout(self.size, self.k, self.unit)[start // stripe:]:
+            base = self.k * offset
+            if base >= end:
+                break
+            for r in range(self.k):
+                lo = max(start, base + r * row_len)
+                hi = min(end, base + (r + 1) * row_len)
+                if lo >= hi:
+                    continue
+                col = offset + lo - base - r * row_len
+                if r in indices:
+                    out += self._pread(r, col, hi - lo)
+                    continue
+                if inverse is None:
+                    inverse = _decode_matrix(self.k, self.n, indices)
+                rows = [np.frombuffer(self._pread(i, col, hi - lo), dtype=np.uint8) for i in indices]
+                piece = np.empty(hi - lo, dtype=np.uint8)
+                _combine_into(inverse[r], rows, piece)
+                out += piece.tobytes()
+        return bytes(out)
+
+    def rebuild(self, index: int, target: ShardTarget, charge: Optional[Callable[[int], object]] = None,
+                sync: bool = False) -> int:
+        """
+        Regenerate shard *index* into *target* (a path or a put callable, as
+        for DataShardWriter) from k of the other shards, one stripe at a
+        time: memory stays at a few stripe rows however large the shard,
+        and only that one row of each stripe is computed.  The sources'
+        checksums are verified as their rows stream past; if one fails, the
+        new shard is discarded and the next subset tried.
+
+        Args:
+            charge: Called after each stripe with the bytes it read and
+                    wrote (e.g. a rate limiter's acquire).
+            sync:   Make the new shard durable before returning.
+
+        Returns:
+            Bytes read and written.
+
+        Raises:
+            ValueError: Legacy slices (which carry no parity), *index* out
+                        of range, or no k other shards pass their checksums.
+        """
+        if self._legacy:
+            raise ValueError("Erasure rebuild error: legacy headerless slices carry no parity")
+        if not 0 <= index < self.n:
+            raise ValueError(f"Erasure rebuild error: shard index {index} out of range 0..{self.n - 1}")
+        candidates = [i for i in self.available if i != index]
+        if len(candidates) < self.k:
+            raise ValueError(f"Erasure rebuild error: only {len(candidates)} valid data shards, need {self.k}")
+        moved = 0
+        for sources in itertools.combinations(candidates, self.k):
+            weights = _row_weights(self.k, self.n, sources, index)
+            digests = {i: _ShardHash(self._headers[i][0], self._headers[i][1].version) for i in sources}
+            writer = DataShardWriter([target if i == index else None for i in range(self.n)],
+                                     self.k, self.n, self.unit, sync=sync)
+            try:
+                for offset, length in stripe_layout(self.size, self.k, self.unit):
+                    rows = []
+                    for i in sources:
+                        raw = self._pread(i, offset, length)
+                        digests[i].update(raw)
+                        rows.append(np.frombuffer(raw, dtype=np.uint8))
+                    row = np.empty(length, dtype=np.uint8)
+                    _combine_into(weights, rows, row)
+                    writer.write_row(index, row)
+                    moved += (self.k + 1) * length
+                    if charge is not None:
+                        charge((self.k + 1) * length)
+                if all(hmac.compare_digest(self._headers[i][1].checksum, digests[i].digest()) for i in sources):
+                    writer.commit_shard(index, self.size)
+                    return moved
+                writer.abort()
+            except BaseException:
+                writer.abort()
+                raise
+        raise ValueError(f"Erasure rebuild error: no {self.k} shards pass their checksums")
+
+    def close(self) -> None:
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+    def __enter__(self) -> "ShardReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def reassemble_files(paths: Sequence[str]) -> memoryview:
+    """
+    Rebuild a payload from shard files on disk into one preallocated buffer.
+
+    Data-shard rows are read with ``readinto`` straight into their final
+    place in the output, so the healthy path performs no intermediate
+    copies.  When a data shard is missing or corrupt, parity shards are
+    memory-mapped and only the lost rows are decoded, into the same buffer.
+    Legacy headerless slices are read back-to-back in *paths* order.
+
+    Args:
+        paths: Candidate shard files; missing ones are ignored.
+
+    Returns:
+        A writable memoryview of exactly the payload size, backed by a
+        bytearray (callers may decrypt it in place).
+
+    Raises:
+        FileNotFoundError: None of the paths exist.
+        ValueError:        Fewer than k valid shards.
+    """
+    scan = _scan_shards(paths)
+    if scan.geometry is None:
+        buf = bytearray(sum(os.path.getsize(p) for p in scan.present))
+        view = memoryview(buf)
+        offset = 0
+        for path in scan.present:
+            with open(path, "rb") as f:
+                offset += f.readinto(view[offset:])
+        return view[:offset]
+
+    headers, parsed, geometry = scan.headers, scan.parsed, scan.geometry
+    k, n, size, unit = geometry
+    layout = stripe_layout(size, k, unit)
+    width = shard_width(size, k, unit)
+
+    buf = bytearray(k * width)
+    view = memoryview(buf)
+    out = np.frombuffer(buf, dtype=np.uint8)
+    valid = set()
+    for index in range(k):
+        if index not in parsed:
+            continue
+        path, header = parsed[index]
+        digest = _ShardHash(headers[path], header.version)
+        with open(path, "rb") as f:
+            f.seek(header.header_size)
+            for offset, length in layout:
+                target = view[k * offset + index * length:k * offset + (index + 1) * length]
+                f.readinto(target)
+                digest.update(target)
+        if hmac.compare_digest(header.checksum, digest.digest()):
+            valid.add(index)
+
+    lost = [index for index in range(k) if index not in valid]
+    if lost:
+        maps: Dict[int, Tuple[mmap.mmap, int]] = {}
+        try:
+            for index in sorted(i for i in parsed if i >= k):
+                if len(valid) + len(maps) == k:
+                    break
+                path, header = parsed[index]
+                with open(path, "rb") as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                payload = memoryview(mm)[header.header_size:]
+                try:
+                    ok = _verify(headers[path], header, payload)
+                finally:
+                    payload.release()
+                if ok:
+                    maps[index] = (mm, header.header_size)
+                else:
+                    mm.close()
+            if len(valid) + len(maps) < k:
+                raise ValueError(f"Erasure decode error: only {len(valid) + len(maps)} valid data shards, need {k}")
+
+            def source(i: int, offset: int, length: int) -> np.ndarray:
+                if i < k:
+                    return out[k * offset + i * length:k * offset + (i + 1) * length]
+                mm, skip = maps[i]
+                return np.frombuffer(mm, dtype=np.uint8, count=length, offset=skip + offset)
+
+            _rebuild(k, n, layout, tuple(sorted(valid | set(maps))), source, out, lost)
+        finally:
+            for mm, _ in maps.values():
+                try:
+                    mm.close()
+                except BufferError:
+                    pass    # still referenced by an in-flight traceback; GC closes it
+    return view[:size]
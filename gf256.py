@@ -0,0 +1,113 @@
+"""
+gf256.py
+Vectorised GF(2^8) arithmetic for VaultZero's byte-wise secret sharing and
+erasure coding.
+
+The field is GF(2)[x] / (x^8 + x^4 + x^3 + x + 1) (the AES polynomial, 0x11B)
+with generator 3.  Addition is XOR; multiplication goes through a full
+256 x 256 product table so that multiplying a whole NumPy array by a field
+constant is a single table lookup (``MUL[c][array]``).
+"""
+
+from __future__ import annotations
+from typing import Sequence
+
+import numpy as np
+
+_POLY = 0x11B
+_GENERATOR = 3
+
+
+def _build_tables():
+    exp = np.zeros(512, dtype=np.uint8)
+    log = np.zeros(256, dtype=np.int32)
+    value = 1
+    for power in range(255):
+        exp[power] = value
+        log[value] = power
+        # multiply by the generator (x + 1): value * 2 ^ value
+        doubled = value << 1
+        if doubled & 0x100:
+            doubled ^= _POLY
+        value = doubled ^ value
+    exp[255:510] = exp[:255]
+
+    nonzero = np.arange(1, 256)
+    mul = np.zeros((256, 256), dtype=np.uint8)
+    mul[1:, 1:] = exp[log[nonzero][:, None] + log[nonzero][None, :]]
+
+    inv = np.zeros(256, dtype=np.uint8)
+    inv[nonzero] = exp[(255 - log[nonzero]) % 255]
+    return exp, log, mul, inv
+
+
+EXP, LOG, MUL, INV = _build_tables()
+
+
+def mul(a, b):
+    """Element-wise product of two uint8 scalars/arrays (broadcasting)."""
+    return MUL[a, b]
+
+
+def inv(a):
+    """Multiplicative inverse; raises ZeroDivisionError for 0."""
+    if np.any(np.asarray(a) == 0):
+        raise ZeroDivisionError("0 has no inverse in GF(256)")
+    return INV[a]
+
+
+def scale(c: int, data: np.ndarray) -> np.ndarray:
+    """Multiply every byte of *data* by the field constant *c*."""
+    return MUL[c][data]
+
+
+def poly_eval(coeffs: np.ndarray, x: int) -> np.ndarray:
+    """
+    Evaluate many polynomials at one point with Horner's rule.
+
+    Args:
+        coeffs: uint8 array of shape (degree + 1, ...); coeffs[0] is the
+                constant term of every polynomial.
+        x:      Evaluation point (0..255).
+
+    Returns:
+        uint8 array of shape coeffs.shape[1:].
+    """
+    row = MUL[x]
+    acc = coeffs[-1].copy()
+    for c in coeffs[-2::-1]:
+        acc = row[acc]
+        acc ^= c
+    return acc
+
+
+def lagrange_coefficients(xs: Sequence[int], at: int = 0) -> np.ndarray:
+    """
+    Lagrange basis weights l_i(at) for the interpolation points *xs*.
+
+    sum_i MUL[l_i][y_i] is then the interpolating polynomial evaluated at
+    *at* (the shared secret for at=0).
+
+    Raises:
+        ValueError: If *xs* contains duplicates.
+    """
+    if len(set(xs)) != len(xs):
+        raise ValueError(f"Duplicate share indices: {list(xs)}")
+    weights = np.zeros(len(xs), dtype=np.uint8)
+    for i, xi in enumerate(xs):
+        num, den = 1, 1
+        for j, xj in enumerate(xs):
+            if i != j:
+                num = int(MUL[num, at ^ xj])
+                den = int(MUL[den, xi ^ xj])
+        weights[i] = MUL[num, INV[den]]
+    return weights
+
+
+def combine_rows(weights: Sequence[int], rows: np.ndarray) -> np.ndarray:
+    """XOR-accumulate MUL[weights[i]][rows[i]] over the first axis of *rows*."""
+    acc = np.zeros(rows.shape[1:], dtype=np.uint8)
+    for w, row in zip(weights, rows):
+        if w:
+            acc ^= MUL[w][row]
+    return acc
@@ -0,0 +1,408 @@
+"""
+ingest_pipeline.py
+Streaming ingest for VaultZero: upload -> encrypted, erasure-coded node shards.
+
+Each stage runs on its own thread and hands items to the next through a
+bounded queue, so reading, encryption, parity coding, hashing and the
+per-node disk writes overlap instead of running one after another.  A full
+queue blocks its producer (backpressure), which caps memory at roughly
+``depth`` items per queue however large the upload is:
+
+    read --> [compress] --> encrypt --> stripe --+--> write node 0
+                                                 +--> write node 1
+                                                 +--> write node 2
+
+The optional compress stage splits the plaintext into encryption segments
+and compresses each one (see compression.py); the encrypt stage then seals
+those bodies and records the codec in the payload header, so readers
+inflate transparently.  It is skipped when no codec is given.
+
+Every stage records item and byte counts, busy time, time blocked on its
+input and output, and the deepest backlog seen on its input queue;
+IngestPipeline.run() returns them for tuning.
+
+With a write quorum W (see write_quorum.py) a slow node no longer paces
+the upload: the stripe stage only waits for the W-th fastest node's queue,
+lagging nodes buffer up to ``max_lag`` bytes of rows, and run() returns as
+soon as W shards are committed and fsynced.  The other node writers keep going in the
+background, retrying failed node requests; a node that still fails drops
+its shard instead of failing the upload.
+"""
+
+from __future__ import annotations
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Union
+
+import latency_model
+from compression import SegmentCompressor, resolve
+from crypto_engine import SEGMENT_SIZE, CryptoEngine, StreamSource
+from erasure_coding import STRIPE_UNIT, DataShardWriter, ReedSolomon, ShardTarget
+from write_quorum import WriteTracker, check_quorum, retry
+
+_DONE = object()
+
+
+class _Aborted(Exception):
+    """Another stage failed; unwind this one quietly."""
+
+
+class StageStats:
+    """Counters for one pipeline stage."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.items = 0
+        self.bytes = 0
+        self.busy_s = 0.0
+        self.wait_in_s = 0.0
+        self.wait_out_s = 0.0
+        self.max_depth = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "items": self.items,
+            "bytes": self.bytes,
+            "busy_ms": round(self.busy_s * 1000, 3),
+            "wait_in_ms": round(self.wait_in_s * 1000, 3),
+            "wait_out_ms": round(self.wait_out_s * 1000, 3),
+            "max_depth": self.max_depth,
+        }
+
+
+class IngestResult(NamedTuple):
+    plaintext_bytes: int
+    stored_bytes: int       # ciphertext bytes before erasure coding
+    elapsed_s: float
+    stages: Dict[str, dict]
+    writes: Optional[WriteTracker] = None   # node writes, in write-quorum mode
+
+
+class _Stage(threading.Thread):
+    """
+    Runs ``fn(inputs)`` on a thread, where *inputs* iterates the inbox and
+    every item *fn* yields goes to the outbox(es).  With several outboxes
+    each yielded item must be a sequence with one element per outbox; a
+    stage with none (a sink) yields items only to have them counted.
+    *pace*, if given, is called before each item is handed on and returns
+    once the consumers can take it (counted as output wait).
+    """
+
+    def __init__(self, name: str, fn: Callable[[Iterator], Iterable], inbox: Optional[queue.Queue],
+                 outboxes: Sequence[queue.Queue], abort: threading.Event,
+                 pace: Optional[Callable[[], bool]] = None) -> None:
+        super().__init__(name=f"vz-ingest-{name}", daemon=True)
+        self.fn = fn
+        self.inbox = inbox
+        self.outboxes = list(outboxes)
+        self.abort = abort
+        self.pace = pace
+        self.stats = StageStats(name)
+        self.error: Optional[BaseException] = None
+
+    def _get(self):
+        t0 = time.perf_counter()
+        self.stats.max_depth = max(self.stats.max_depth, self.inbox.qsize())
+        try:
+            while True:
+                try:
+                    return self.inbox.get(timeout=0.05)
+                except queue.Empty:
+                    if self.abort.is_set():
+                        raise _Aborted()
+        finally:
+            self.stats.wait_in_s += time.perf_counter() - t0
+
+    def _put(self, box: queue.Queue, item) -> None:
+        t0 = time.perf_counter()
+        try:
+            while True:
+                try:
+                    box.put(item, timeout=0.05)
+                    return
+                except queue.Full:
+                    if self.abort.is_set():
+                        raise _Aborted()
+        finally:
+            self.stats.wait_out_s += time.perf_counter() - t0
+
+    def _wait_pace(self) -> None:
+        t0 = time.perf_counter()
+        try:
+            while not self.pace():
+                if self.abort.is_set():
+                    raise _Aborted()
+                time.sleep(0.0005)
+        finally:
+            self.stats.wait_out_s += time.perf_counter() - t0
+
+    def _inputs(self) -> Iterator:
+        while True:
+            item = self._get()
+            if item is _DONE:
+                return
+            yield item
+
+    def run(self) -> None:
+        t0 = time.perf_counter()
+        try:
+            for item in self.fn(self._inputs() if self.inbox is not None else iter(())):
+                self.stats.items += 1
+                if not self.outboxes:
+                    self.stats.bytes += len(item)
+                elif len(self.outboxes) == 1:
+                    self.stats.bytes += len(item)
+                    self._put(self.outboxes[0], item)
+                else:
+                    self.stats.bytes += sum(len(part) for part in item)
+                    if self.pace is not None:
+                        self._wait_pace()
+                    for box, part in zip(self.outboxes, item):
+                        self._put(box, part)
+            for box in self.outboxes:
+                self._put(box, _DONE)
+        except _Aborted:
+            pass
+        except BaseException as e:
+            self.error = e
+            self.abort.set()
+        finally:
+            wall = time.perf_counter() - t0
+            self.stats.busy_s = max(0.0, wall - self.stats.wait_in_s - self.stats.wait_out_s)
+
+
+class IngestPipeline:
+    """
+    Encrypts (envelope format) and erasure-codes one upload straight into
+    its node shard files.
+
+    Example::
+
+        paths = [os.path.join(config.DATA_NODES[i], f"{name}.enc.{i}") for i in range(3)]
+        result = IngestPipeline(CryptoEngine(password), paths).run(upload)
+        result.stages["encrypt"]["busy_ms"]
+
+    Args:
+        engine:       Engine whose password-derived key wraps the data key.
+        paths:        One target per erasure shard: a file path, a callable
+                      storing the finished shard (e.g. a packfile put), or
+                      ``None`` for an offline node (its shard is computed
+                      but not stored).
+        k, n:         Erasure-code threshold and shard count.
+        unit:         Bytes per shard row in one stripe.
+        chunk_size:   Bytes per read from the source.
+        segment_size: Plaintext bytes per AES-GCM segment.
+        workers:      Threads sealing segments (see encrypt_envelope()).
+        depth:        Capacity of every inter-stage queue.
+        compress:     Codec ("zlib", "lzma" or a SegmentCompressor) for
+                      per-segment compression before encryption; None
+                      stores the plaintext uncompressed.
+        write_quorum: Acknowledge once this many online nodes (>= k) have
+                      committed their shard; None waits for every node.
+        retries:      Retries per failed node request in write-quorum mode.
+        backoff:      First retry delay in seconds (doubling per retry).
+        max_lag:      Bytes of rows a node may trail the quorum by before
+                      the upload waits for it too.
+        label:        Asset name the background writes are tracked under.
+    """
+
+    def __init__(self, engine: CryptoEngine, paths: Sequence[ShardTarget], k: int = 2, n: int = 3,
+                 unit: int = STRIPE_UNIT, chunk_size: int = 1024 * 1024,
+                 segment_size: int = SEGMENT_SIZE, workers: int = 1, depth: int = 4,
+                 compress: Union[None, str, SegmentCompressor] = None,
+                 write_quorum: Optional[int] = None, retries: int = 2, backoff: float = 0.05,
+                 max_lag: int = 64 * 1024 * 1024, label: str = "") -> None:
+        if depth < 1:
+            raise ValueError(f"depth must be >= 1, got {depth}")
+        if len(paths) != n:
+            raise ValueError(f"Need one path (or None) per shard: {n} expected, got {len(paths)}")
+        if write_quorum is not None:
+            check_quorum(write_quorum, k, sum(path is not None for path in paths))
+        self.engine = engine
+        self.paths = list(paths)
+        self.rs = ReedSolomon(k, n, unit)
+        self.chunk_size = chunk_size
+        self.segment_size = segment_size
+        self.workers = workers
+        self.depth = depth
+        self.compressor = resolve(compress)
+        self.write_quorum = write_quorum
+        self.retries = retries
+        self.backoff = backoff
+        self.max_lag_rows = max(depth, max_lag // unit)
+        self.label = label
+
+    # -- stage bodies --------------------------------------------------------
+
+    def _read(self, source: StreamSource, counter: List[int]) -> Callable[[Iterator], Iterable]:
+        def chunks() -> Iterator[bytes]:
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                view = memoryview(source).cast("B")
+                for start in range(0, len(view), self.chunk_size):
+                    yield view[start:start + self.chunk_size]
+            elif hasattr(source, "read"):
+                while True:
+                    chunk = source.read(self.chunk_size)
+                    if not chunk:
+                        return
+                    yield chunk
+            else:
+                yield from source
+
+        def read(_: Iterator) -> Iterator[bytes]:
+            for chunk in chunks():
+                counter[0] += len(chunk)
+                yield chunk
+        return read
+
+    def _compress(self, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        yield from self.compressor.compress_stream(chunks, self.segment_size)
+
+    def _encrypt(self, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        yield from self.engine.encrypt_envelope(chunks, segment_size=self.segment_size, workers=self.workers,
+                                                codec=self.compressor,
+                                                precompressed=self.compressor is not None)
+
+    def _stripe(self, counter: List[int]) -> Callable[[Iterator], Iterable]:
+        stripe = self.rs.k * self.rs.unit
+
+        def encode(frames: Iterator[bytes]) -> Iterator[List]:
+            buf = bytearray()
+            emitted = False
+            for frame in frames:
+                buf += frame
+                counter[0] += len(frame)
+                while len(buf) >= stripe:
+                    with memoryview(buf) as view:
+                        block = bytes(view[:stripe])
+                    del buf[:stripe]
+                    emitted = True
+                    yield self.rs.encode_stripe(block)
+            # The remainder forms the shortened last stripe (see stripe_layout).
+            if buf or not emitted:
+                yield self.rs.encode_stripe(bytes(buf))
+        return encode
+
+    def _writer(self, writer: DataShardWriter, node: int) -> Callable[[Iterator], Iterable]:
+        online = self.paths[node] is not None
+
+        def write(rows: Iterator) -> Iterator:
+            for row in rows:
+                if online:
+                    latency_model.get_injector().delay_sync(node)
+                writer.write_row(node, row)
+                yield row
+        return write
+
+    def _quorum_writer(self, writer: DataShardWriter, node: int, size: List[int],
+                       tracker: WriteTracker) -> Callable[[Iterator], Iterable]:
+        injector = latency_model.get_injector()
+
+        def write(rows: Iterator) -> Iterator:
+            error: Optional[BaseException] = None
+            try:
+                for row in rows:
+                    if error is None:
+                        try:
+                            retry(lambda: injector.delay_sync(node), self.retries, self.backoff)
+                            writer.write_row(node, row)
+                        except OSError as e:
+                            error = e
+                            writer.abort_shard(node)
+                    yield row
+            except BaseException as e:      # aborted: the tracker must still hear from this node
+                tracker.fail(node, e)
+                raise
+            # The stripe stage sends _DONE only after its last row, so size[0] is final.
+            if error is None:
+                try:
+                    retry(lambda: writer.commit_shard(node, size[0]), self.retries, self.backoff)
+                except (OSError, ValueError) as e:
+                    error = e
+                    writer.abort_shard(node)
+            if error is None:
+                tracker.succeeded(node)
+            else:
+                tracker.fail(node, error)
+        return write
+
+    def _pace(self, boxes: List[queue.Queue], tracker: WriteTracker) -> Callable[[], bool]:
+        def ready() -> bool:
+            live = sorted(boxes[i].qsize() for i in tracker.nodes if i not in tracker.failed)
+            if len(live) < self.write_quorum:
+                return True         # quorum already lost; let the writers drain
+            return live[self.write_quorum - 1] < self.depth and live[-1] < self.max_lag_rows
+        return ready
+
+    # -- driver --------------------------------------------------------------
+
+    def run(self, source: StreamSource) -> IngestResult:
+        """
+        Stream *source* (bytes-like, binary file or chunk iterable) into the
+        shard files; they are renamed into place only if every stage succeeds.
+
+        In write-quorum mode, returns once ``write_quorum`` shards are
+        committed; ``result.writes`` tracks the nodes still writing.
+
+        Raises:
+            The first stage error, after every stage has stopped and the
+            partial shard files have been removed.  In write-quorum mode,
+            ValueError if too many nodes fail for the quorum to be reached.
+        """
+        t0 = time.perf_counter()
+        abort = threading.Event()
+        read_bytes, stored_bytes = [0], [0]
+        quorum = self.write_quorum is not None
+        # An acknowledged shard must survive a power loss: the other writes may never land.
+        writer = DataShardWriter(self.paths, self.rs.k, self.rs.n, self.rs.unit, sync=quorum)
+        tracker = WriteTracker(self.label, [i for i, p in enumerate(self.paths) if p is not None],
+                               self.write_quorum) if quorum else None
+
+        def box(bounded: bool = True) -> queue.Queue:
+            return queue.Queue(maxsize=self.depth if bounded else 0)
+
+        stages: List[_Stage] = []
+        inbox = box()
+        stages.append(_Stage("read", self._read(source, read_bytes), None, [inbox], abort))
+        if self.compressor is not None:
+            nxt = box()
+            stages.append(_Stage("compress", self._compress, inbox, [nxt], abort))
+            inbox = nxt
+        nxt = box()
+        stages.append(_Stage("encrypt", self._encrypt, inbox, [nxt], abort))
+        # In quorum mode the node queues are unbounded and the stripe stage is paced instead.
+        node_boxes = [box(bounded=not quorum) for _ in range(self.rs.n)]
+        stages.append(_Stage("stripe", self._stripe(stored_bytes), nxt, node_boxes, abort,
+                             pace=self._pace(node_boxes, tracker) if quorum else None))
+        upstream = list(stages)
+        for node, node_box in enumerate(node_boxes):
+            fn = (self._quorum_writer(writer, node, stored_bytes, tracker)
+                  if quorum and self.paths[node] is not None else self._writer(writer, node))
+            stages.append(_Stage(f"write_{node}", fn, node_box, [], abort))
+
+        for stage in stages:
+            stage.start()
+        for stage in upstream if quorum else stages:
+            stage.join()
+        error = next((stage.error for stage in stages if stage.error is not None), None)
+        if quorum and error is None and not tracker.wait_quorum():
+            error = next((stage.error for stage in stages if stage.error is not None), tracker.error())
+
+        if error is not None:
+            abort.set()
+            for stage in stages:
+                stage.join()
+            writer.abort()
+            raise error
+        if quorum:
+            tracker.detach()
+        else:
+            writer.commit(stored_bytes[0])
+        return IngestResult(
+            plaintext_bytes=read_bytes[0],
+            stored_bytes=stored_bytes[0],
+            elapsed_s=time.perf_counter() - t0,
+            stages={stage.stats.name: stage.stats.as_dict() for stage in stages},
+            writes=tracker,
+        )
@@ -0,0 +1,187 @@
+"""
+latency_model.py
+Pluggable per-node latency and fault injection for VaultZero storage nodes.
+
+Production nodes add no artificial delay.  Load tests and benchmarks can
+model slow, fast or flaky nodes by describing each node in
+``config.NODE_LATENCY`` (or by installing an injector with
+``set_injector()``):
+
+    NODE_LATENCY = {
+        "default": {"kind": "none"},
+        0: {"kind": "fixed", "ms": 2},
+        1: {"kind": "lognormal", "median_ms": 4, "sigma": 0.6},
+        2: {"kind": "stall", "base": {"kind": "fixed", "ms": 2},
+            "probability": 0.01, "stall_ms": 250, "fail_probability": 0.001},
+    }
+
+Every spec may also carry ``fail_probability``; a failed draw raises
+``NodeFault`` (an ``OSError``) instead of sleeping, which exercises the same
+error paths as a real I/O failure.
+"""
+
+from __future__ import annotations
+import asyncio
+import math
+import random
+import time
+from typing import Dict, Optional, Union
+
+import config
+
+
+class NodeFault(OSError):
+    """Injected node failure (raised instead of performing the I/O)."""
+
+
+class LatencyModel:
+    """Base model: no delay.  Subclasses override sample()."""
+
+    def sample(self, rng: random.Random) -> float:
+        """Return the delay for one operation, in seconds."""
+        return 0.0
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}()"
+
+
+class FixedLatency(LatencyModel):
+    def __init__(self, ms: float) -> None:
+        if ms < 0:
+            raise ValueError(f"ms must be >= 0, got {ms}")
+        self.ms = ms
+
+    def sample(self, rng: random.Random) -> float:
+        return self.ms / 1000.0
+
+    def __repr__(self) -> str:
+        return f"FixedLatency(ms={self.ms})"
+
+
+class LogNormalLatency(LatencyModel):
+    """Log-normal delay around *median_ms*; *sigma* controls the tail."""
+
+    def __init__(self, median_ms: float, sigma: float = 0.5, cap_ms: Optional[float] = None) -> None:
+        if median_ms <= 0:
+            raise ValueError(f"median_ms must be > 0, got {median_ms}")
+        if sigma < 0:
+            raise ValueError(f"sigma must be >= 0, got {sigma}")
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.cap_ms = cap_ms
+
+    def sample(self, rng: random.Random) -> float:
+        ms = rng.lognormvariate(math.log(self.median_ms), self.sigma)
+        if self.cap_ms is not None:
+            ms = min(ms, self.cap_ms)
+        return ms / 1000.0
+
+    def __repr__(self) -> str:
+        return f"LogNormalLatency(median_ms={self.median_ms}, sigma={self.sigma}, cap_ms={self.cap_ms})"
+
+
+class StallLatency(LatencyModel):
+    """*base* latency, plus a *stall_ms* pause with the given probability."""
+
+    def __init__(self, probability: float, stall_ms: float, base: Optional[LatencyModel] = None) -> None:
+        if not 0.0 <= probability <= 1.0:
+            raise ValueError(f"probability must be in [0, 1], got {probability}")
+        self.probability = probability
+        self.stall_ms = stall_ms
+        self.base = base if base is not None else LatencyModel()
+
+    def sample(self, rng: random.Random) -> float:
+        delay = self.base.sample(rng)
+        if rng.random() < self.probability:
+            delay += self.stall_ms / 1000.0
+        return delay
+
+    def __repr__(self) -> str:
+        return f"StallLatency(probability={self.probability}, stall_ms={self.stall_ms}, base={self.base!r})"
+
+
+def build_model(spec: Optional[dict]) -> LatencyModel:
+    """
+    Build a LatencyModel from a config dict.
+
+    Raises:
+        ValueError: On an unknown ``kind``.
+    """
+    if not spec:
+        return LatencyModel()
+    kind = spec.get("kind", "none")
+    if kind == "none":
+        return LatencyModel()
+    if kind == "fixed":
+        return FixedLatency(spec.get("ms", 0.0))
+    if kind == "lognormal":
+        return LogNormalLatency(spec["median_ms"], spec.get("sigma", 0.5), spec.get("cap_ms"))
+    if kind == "stall":
+        return StallLatency(spec["probability"], spec["stall_ms"], build_model(spec.get("base")))
+    raise ValueError(f"Unknown latency model kind: {kind!r}")
+
+
+class NodeLatencyInjector:
+    """
+    Applies a latency model and fault probability per node id.
+
+    Nodes without their own entry use the default model.  With no models
+    and no faults configured, delay() returns immediately without sleeping.
+    """
+
+    def __init__(self, models: Optional[Dict[int, LatencyModel]] = None,
+                 default: Optional[LatencyModel] = None,
+                 fail_probability: Optional[Dict[int, float]] = None,
+                 seed: Optional[int] = None) -> None:
+        self.models: Dict[int, LatencyModel] = dict(models or {})
+        self.default = default if default is not None else LatencyModel()
+        self.fail_probability: Dict[Union[int, str], float] = dict(fail_probability or {})
+        self._rng = random.Random(seed)
+
+    @classmethod
+    def from_config(cls, spec: Optional[dict], seed: Optional[int] = None) -> "NodeLatencyInjector":
+        """Build an injector from a ``config.NODE_LATENCY``-style dict."""
+        spec = spec or {}
+        models, faults = {}, {}
+        for node, node_spec in spec.items():
+            if node_spec and node_spec.get("fail_probability"):
+                faults["default" if node == "default" else int(node)] = node_spec["fail_probability"]
+            if node != "default":
+                models[int(node)] = build_model(node_spec)
+        return cls(models, build_model(spec.get("default")), faults, seed)
+
+    def _draw(self, node_id: Optional[int]) -> float:
+        p_fail = self.fail_probability.get(node_id, self.fail_probability.get("default", 0.0))
+        if p_fail and self._rng.random() < p_fail:
+            raise NodeFault(f"Injected fault on node {node_id}")
+        model = self.models.get(node_id, self.default)
+        return model.sample(self._rng)
+
+    async def delay(self, node_id: Optional[int] = None) -> None:
+        """Sleep (asynchronously) for one sampled delay of *node_id*."""
+        seconds = self._draw(node_id)
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+    def delay_sync(self, node_id: Optional[int] = None) -> None:
+        """Blocking counterpart of delay() for synchronous I/O paths."""
+        seconds = self._draw(node_id)
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+_INJECTOR: Optional[NodeLatencyInjector] = None
+
+
+def get_injector() -> NodeLatencyInjector:
+    """The process-wide injector, built lazily from ``config.NODE_LATENCY``."""
+    global _INJECTOR
+    if _INJECTOR is None:
+        _INJECTOR = NodeLatencyInjector.from_config(getattr(config, "NODE_LATENCY", None))
+    return _INJECTOR
+
+
+def set_injector(injector: Optional[NodeLatencyInjector]) -> None:
+    """Install an injector (load tests); ``None`` rebuilds from config on next use."""
+    global _INJECTOR
+    _INJECTOR = injector
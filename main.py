@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 import os
 import time
+import functools
+import threading
 import json
 import hashlib
 import graphviz
@@ -9,8 +11,15 @@ import plotly.graph_objects as go
 from datetime import datetime, timedelta
 from crypto_engine import CryptoEngine
 from shamir_handler import ShamirVault
+from ingest_pipeline import IngestPipeline
+from node_store import LocalNodeStore, data_node, key_node
+from range_reader import data_shard_name, read_ciphertext
 from db_handler import DBHandler
+from catalog import Catalog
+from shard_manager import ShardManager
 import config
+import write_quorum
+from ops.repair_daemon import shared_daemon
 
 # --- 1. PAGE CONFIGURATION ---
 st.set_page_config(page_title="VaultZero Core", page_icon="🧊", layout="wide")
@@ -35,10 +44,15 @@ st.markdown("""
 
 # --- 3. SYSTEM INIT ---
 db = DBHandler()
+catalog = Catalog(config.CATALOG_PATH)
 if 'node_status'    not in st.session_state: st.session_state['node_status']    = [True, True, True]
 if 'decrypted_file' not in st.session_state: st.session_state['decrypted_file'] = None
 if 'decrypted_name' not in st.session_state: st.session_state['decrypted_name'] = ""
 if 'breach_logged'  not in st.session_state: st.session_state['breach_logged']  = False
+# Assets stored before uploads were catalogued get a row, so the repair daemon scans them too.
+if 'catalog_backfilled' not in st.session_state:
+    shared_daemon(config.CATALOG_PATH).adopt(db.get_files())
+    st.session_state['catalog_backfilled'] = True
 
 def log_audit(source, event_type, message):
     """Writes system events to the local audit trail."""
@@ -76,18 +90,60 @@ def restore_system():
     time.sleep(1); st.rerun()
 
 def delete_file_permanently(filename):
-    for i in range(3):
-        data_p = os.path.join(config.DATA_NODES[i], f"{filename}.enc.{i}")
-        key_p  = os.path.join(config.KEY_NODES[i],  f"{filename}.key.{i}")
-        if os.path.exists(data_p): os.remove(data_p)
-        if os.path.exists(key_p):  os.remove(key_p)
+    # Background writes from a quorum-acknowledged upload would resurrect burned shards,
+    # so the burn waits for them and is postponed if they are still running.
+    if not write_quorum.wait_for(filename, timeout=30):
+        log_audit("CLIENT", "⏳ BURN_POSTPONED", f"Asset '{filename}' still has shard writes in flight; burn postponed.")
+        st.error("Burn postponed: shard writes for this asset are still in flight. Try again shortly.")
+        return
+    # Out of the file list (which the catalog backfill reads) and the catalog first: a repair
+    # pass in flight then drops, rather than keeps, what it rebuilt.
     db.remove_file(filename)
+    catalog.remove(filename)
+    for i in range(3):
+        # Packed shards get a tombstone; compaction reclaims the space.
+        data_node(i).delete(data_shard_name(filename, i))
+        key_node(i).delete(f"{filename}.key.{i}")
     log_audit("CLIENT", "🔥 DATA_BURN", f"Purged asset '{filename}' and associated key shards.")
     st.session_state['decrypted_file'] = None
     st.session_state['decrypted_name'] = ""
     st.toast("Data Burned")
     time.sleep(1); st.rerun()
 
+def shard_target(i, name, packed):
+    """Where node i's data shard goes: streamed to a local file, or put whole to the node."""
+    store = data_node(i)
+    if packed or not isinstance(store, LocalNodeStore):
+        return functools.partial(store.put, name)
+    store.pack.delete(name)  # an older packed copy would shadow the new shard file
+    return store.file_path(name)
+
+def record_placement(name, online, trackers):
+    """
+    Catalog which nodes hold both shards of an upload (shard i lives on node i).
+
+    Nodes whose data or key write is still running in the background are
+    recorded as missing (-1) for now; once every write has settled the row
+    is rewritten with all nodes except those whose write failed.
+    """
+    trackers = [t for t in trackers if t is not None]
+    row = lambda lagging: [i if online[i] and i not in lagging else -1 for i in range(3)]
+    lock, remaining, final = threading.Lock(), [len(trackers)], [False]
+
+    def settled(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                final[0] = True
+                catalog.record(name, row({n for t in trackers for n in t.failed}))
+
+    interim = row({n for t in trackers for n in [*t.failed, *t.pending]})
+    with lock:
+        if not final[0]:
+            catalog.record(name, interim)
+    for t in trackers:
+        t.add_done_callback(settled)
+
 def lock_after_download():
     """
     Called on_click of Download button.
@@ -117,7 +173,12 @@ with st.sidebar:
     def toggle(i):
         st.session_state['node_status'][i] = not st.session_state['node_status'][i]
         status = "ONLINE" if st.session_state['node_status'][i] else "OFFLINE"
+        catalog.set_node_health(i, st.session_state['node_status'][i])
         log_audit("CHAOS", "⚠️ NODE_FLIP", f"Node {i+1} transition: {status}")
+        if st.session_state['node_status'][i]:
+            # Refill the shards the node missed while it was offline, under the repair I/O budget.
+            # One daemon per process: a click during a running pass only queues a rescan.
+            shared_daemon(config.CATALOG_PATH).trigger()
 
     if c1.button(f"N1 {'🟢' if st.session_state['node_status'][0] else '🔴'}"): toggle(0); st.rerun()
     if c2.button(f"N2 {'🟢' if st.session_state['node_status'][1] else '🔴'}"): toggle(1); st.rerun()
@@ -125,6 +186,7 @@ with st.sidebar:
 
     if st.button("🔄 System Reset"):
         log_audit("ADMIN", "🔄 RESET", "System session state reset performed.")
+        for i in range(3): catalog.set_node_health(i, True)
         st.session_state.clear(); st.rerun()
 
 # --- 6. MAIN UI ---
@@ -170,17 +232,25 @@ with t_ops:
                     elif sum(st.session_state['node_status']) == 0: st.error("❌ GRID OFFLINE")
                     else:
                         t0 = time.time()
-                        eng = CryptoEngine(k); d = f.getvalue(); enc = eng.encrypt_data(d)
-                        chk = (len(enc)//3)+1
-                        for i in range(3):
-                            if st.session_state['node_status'][i]:
-                                with open(os.path.join(config.DATA_NODES[i], f"{f.name}.enc.{i}"), "wb") as o: o.write(enc[i*chk:(i+1)*chk])
-                        ShamirVault.distribute_key_async(k, f.name, st.session_state['node_status'])
+                        # Small assets append to the node packfiles; large ones stream to shard files.
+                        packed = f.size <= config.PACK_OBJECT_LIMIT
+                        paths = [shard_target(i, data_shard_name(f.name, i), packed)
+                                 if st.session_state['node_status'][i] else None for i in range(3)]
+                        ingest = IngestPipeline(CryptoEngine(k), paths, config.ERASURE_K, config.ERASURE_N,
+                                                compress=config.COMPRESSION, write_quorum=config.WRITE_QUORUM,
+                                                retries=config.WRITE_RETRIES, backoff=config.WRITE_RETRY_BACKOFF,
+                                                label=f.name).run(f)
+                        keys = ShamirVault.distribute_key_async(k, f.name, st.session_state['node_status'],
+                                                                write_quorum=config.WRITE_QUORUM)
                         dur = (time.time()-t0)*1000
                         db.add_file(f.name)
+                        # Offline nodes, failed writes and writes still in flight are recorded as missing (-1).
+                        record_placement(f.name, list(st.session_state['node_status']),
+                                         [ingest.writes, keys if config.WRITE_QUORUM is not None else None])
+                        catalog.maybe_snapshot()
                         log_audit("CLIENT", "🔵 UPLOAD", f"Distributed asset '{f.name}' in {dur:.2f}ms")
                         l = json.load(open(config.LATENCY_LOG)) if os.path.exists(config.LATENCY_LOG) else []
-                        l.append({"ist": (datetime.now() + timedelta(hours=5, minutes=30)).strftime("%H:%M:%S"), "ms": dur})
+                        l.append({"ist": (datetime.now() + timedelta(hours=5, minutes=30)).strftime("%H:%M:%S"), "ms": dur, "stages": ingest.stages})
                         json.dump(l, open(config.LATENCY_LOG, 'w'))
                         st.success("Ingestion Successful")
                         time.sleep(1); st.rerun()
@@ -194,15 +264,17 @@ with t_ops:
             if st.form_submit_button("🔓 Reassemble"):
                 if sel and dk:
                     try:
-                        k_recon = ShamirVault.reconstruct_key(sel, st.session_state['node_status'])
-                        k_clean = k_recon.rstrip('\x00').strip()
+                        recon = ShamirVault.reconstruct_key_detailed(sel, st.session_state['node_status'])
+                        if recon.degraded:
+                            lost = recon.missing + recon.corrupt + recon.unreachable
+                            log_audit("SYSTEM", "🟠 DEGRADED", f"Asset '{sel}' served without node(s) {', '.join(lost)}.")
+                            st.warning(f"Degraded read: node(s) {', '.join(lost)} unavailable")
+                        k_clean = recon.as_key().rstrip('\x00').strip()
                         if k_clean == dk.strip():
-                            data = b""
-                            for i in range(3):
-                                p = os.path.join(config.DATA_NODES[i], f"{sel}.enc.{i}")
-                                if os.path.exists(p):
-                                    with open(p, "rb") as r: data += r.read()
-                            st.session_state['decrypted_file'] = CryptoEngine.decrypt_payload(k_clean, data)
+                            data = read_ciphertext(sel)
+                            # Streamlit's download button needs bytes: one copy out of the decrypted buffer.
+                            st.session_state['decrypted_file'] = CryptoEngine.decrypt_in_place(k_clean, data).tobytes()
+                            del data
                             st.session_state['decrypted_name'] = sel
                             log_audit("CLIENT", "🔑 REASSEMBLE", f"Authentication successful for asset '{sel}'.")
                             st.success("Data Reconstruction Successful")
@@ -241,8 +313,15 @@ with t_tel:
                 fig = go.Figure(data=go.Scatter(x=[x['ist'] for x in l_data], y=[x['ms'] for x in l_data], mode='lines+markers', line=dict(color='#0284c7')))
                 fig.update_layout(title="Latency (ms)", paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', height=300)
                 st.plotly_chart(fig, use_container_width=True)
+                if l_data[-1].get("stages"):
+                    st.markdown("###### Last Ingest — Pipeline Stages")
+                    st.dataframe(pd.DataFrame(l_data[-1]["stages"]).T, use_container_width=True)
             else: st.info("Telemetry ledger is empty.")
         except: st.info("Ledger reset complete.")
+    reads = ShardManager(n_nodes=3).node_latency_report()
+    if any(r["samples"] for r in reads.values()):
+        st.markdown("###### Data Node Reads — Latency and Hedging")
+        st.dataframe(pd.DataFrame(reads).T.rename(index=["Alpha", "Beta", "Gamma"].__getitem__), use_container_width=True)
 
 with t_logs:
     lc1, lc2 = st.columns([4,1])
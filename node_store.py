@@ -0,0 +1,583 @@
+"""
+node_store.py
+Storage-node backends for VaultZero.
+
+Every node is reached through the NodeStore interface -- put / get /
+delete / list / stat, each with an async twin -- so callers no longer
+join paths under ``config.DATA_NODES`` / ``config.KEY_NODES`` themselves.
+A node spec in config selects the backend:
+
+    "data_storage/node1"       LocalNodeStore: the node directory on this
+                               host (packfile store, legacy per-file objects)
+    "tcp://127.0.0.1:9101"     RemoteNodeStore: a node process running
+                               ops/node_server.py
+
+The TCP protocol is a small binary framing with request ids, so one
+connection carries many requests at once (pipelining) and responses may
+come back in any order:
+
+    request  = request_id(4) | op(1) | name_len(2) | body_len(8) | name | body
+    response = request_id(4) | status(1) | body_len(8) | body
+
+A put with ``sync=True`` travels as its own op and is only answered once
+the server has the object on stable storage.
+
+A RemoteNodeStore keeps a small pool of such connections on a shared
+background event loop and spreads requests over the least busy one.  The
+server has no authentication and binds to localhost by default; it exists
+to run the grid as separate processes on one box, not to face a network.
+"""
+
+from __future__ import annotations
+import abc
+import asyncio
+import os
+import struct
+import threading
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+import config
+import packfile
+
+MAX_OBJECT_BYTES = 1 << 32
+
+OP_PUT = 1
+OP_GET = 2
+OP_DELETE = 3
+OP_LIST = 4
+OP_STAT = 5
+OP_PUT_SYNC = 6
+
+_OK = 0
+_NOT_FOUND = 1
+_INVALID = 2
+_ERROR = 3
+
+_REQUEST = struct.Struct(">IBHQ")
+_RESPONSE = struct.Struct(">IBQ")
+_NAME_LEN = struct.Struct(">H")
+_SIZE = struct.Struct(">Q")
+_TCP_PREFIX = "tcp://"
+
+
+class LoopThread:
+    """
+    One event loop running forever on a daemon thread.
+
+    Synchronous entry points submit their coroutines here instead of
+    creating and closing a fresh loop per call, which is both cheaper and
+    safe to call from code that is itself inside a running loop.  Remote
+    node connections live on this loop too.
+    """
+
+    def __init__(self, name: str = "vz-node-io") -> None:
+        self._name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._thread is None or not self._thread.is_alive():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name=self._name, daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Run *coro* on the background loop and block for its result."""
+        loop = self.loop
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("Synchronous node call made from its own I/O loop; await the async API instead")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+    async def hop(self, coro):
+        """Await *coro* on the background loop from any other running loop."""
+        loop = self.loop
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+IO_LOOP = LoopThread()
+
+
+class ObjectStat(NamedTuple):
+    name: str
+    size: int
+
+
+class NodeStore(abc.ABC):
+    """
+    Interface of one storage node.
+
+    Subclasses implement the synchronous methods; the async twins default
+    to running them on a worker thread.  Errors: FileNotFoundError for an
+    unknown object, ValueError for an invalid name or a corrupt object,
+    other OSError (including ConnectionError) when the node is unreachable.
+    """
+
+    @abc.abstractmethod
+    def put(self, name: str, data, sync: bool = False) -> None:
+        """
+        Store *data* under *name*, replacing any previous object.  With
+        *sync* it is on stable storage by the time put() returns.
+        """
+
+    @abc.abstractmethod
+    def get(self, name: str) -> bytes:
+        """The bytes stored under *name*."""
+
+    @abc.abstractmethod
+    def delete(self, name: str) -> bool:
+        """Remove *name*; returns False if it was not stored."""
+
+    @abc.abstractmethod
+    def list(self, prefix: str = "") -> List[str]:
+        """Sorted names of the stored objects starting with *prefix*."""
+
+    @abc.abstractmethod
+    def stat(self, name: str) -> ObjectStat:
+        """Name and size in bytes of object *name*, without reading it."""
+
+    async def aput(self, name: str, data, sync: bool = False) -> None:
+        await asyncio.to_thread(self.put, name, data, sync)
+
+    async def aget(self, name: str) -> bytes:
+        return await asyncio.to_thread(self.get, name)
+
+    async def adelete(self, name: str) -> bool:
+        return await asyncio.to_thread(self.delete, name)
+
+    async def alist(self, prefix: str = "") -> List[str]:
+        return await asyncio.to_thread(self.list, prefix)
+
+    async def astat(self, name: str) -> ObjectStat:
+        return await asyncio.to_thread(self.stat, name)
+
+    def close(self) -> None:
+        pass
+
+
+def _check_name(name: str) -> None:
+    if not name or name in (".", "..") or "/" in name or os.sep in name or "\0" in name:
+        raise ValueError(f"Invalid object name {name!r}")
+
+
+def _is_internal(filename: str) -> bool:
+    return filename.endswith(".tmp") or packfile.is_segment_file(filename)
+
+
+class LocalNodeStore(NodeStore):
+    """
+    A node directory on this host.
+
+    New objects go to the directory's packfile store (``self.pack``).
+    Objects that predate it, and large data shards streamed straight to
+    disk, are per-file objects in the same directory; reads fall back to
+    them, and the packfile copy wins when both exist.
+    """
+
+    def __init__(self, root: str) -> None:
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+
+    @property
+    def pack(self) -> packfile.PackStore:
+        return packfile.node_store(self.root)
+
+    def file_path(self, name: str) -> str:
+        """Location of *name* as a per-file object (whether or not it exists)."""
+        _check_name(name)
+        return os.path.join(self.root, name)
+
+    def local_file(self, name: str) -> Optional[str]:
+        """Path of *name*'s per-file object, or None if it is packed or absent."""
+        path = self.file_path(name)
+        return path if name not in self.pack and os.path.isfile(path) else None
+
+    def put(self, name: str, data, sync: bool = False) -> None:
+        _check_name(name)
+        self.pack.put(name, data, sync)
+        try:
+            os.remove(self.file_path(name))     # superseded per-file copy
+        except FileNotFoundError:
+            pass
+
+    def get(self, name: str) -> bytes:
+        _check_name(name)
+        if name in self.pack:
+            return self.pack.get(name)
+        with open(self.file_path(name), "rb") as f:
+            return f.read()
+
+    async def aget(self, name: str) -> bytes:
+        # An absent object fails without a trip through the thread pool.
+        if self.local_file(name) is None and name not in self.pack:
+            raise FileNotFoundError(f"{name} not found on node {self.root}")
+        return await asyncio.to_thread(self.get, name)
+
+    def delete(self, name: str) -> bool:
+        _check_name(name)
+        found = self.pack.delete(name)
+        try:
+            os.remove(self.file_path(name))
+            found = True
+        except FileNotFoundError:
+            pass
+        return found
+
+    def list(self, prefix: str = "") -> List[str]:
+        names = {n for n in self.pack.names() if n.startswith(prefix)}
+        names.update(n for n in os.listdir(self.root)
+                     if n.startswith(prefix) and not _is_internal(n) and os.path.isfile(os.path.join(self.root, n)))
+        return sorted(names)
+
+    def stat(self, name: str) -> ObjectStat:
+        _check_name(name)
+        if name in self.pack:
+            return ObjectStat(name, self.pack.size(name))
+        return ObjectStat(name, os.path.getsize(self.file_path(name)))
+
+
+# ---------------------------------------------------------------------------
+# TCP client
+# ---------------------------------------------------------------------------
+
+def _raise_for(status: int, body: bytes) -> None:
+    message = body.decode("utf-8", "replace")
+    if status == _NOT_FOUND:
+        raise FileNotFoundError(message)
+    if status == _INVALID:
+        raise ValueError(message)
+    raise OSError(message)
+
+
+class _Connection:
+    """One pipelined connection: any number of requests in flight, matched by id."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader, self.writer = reader, writer
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.closed = False
+        self.in_flight = 0
+        self._next_id = 0
+        self._write_lock = asyncio.Lock()
+        self._reader_task = asyncio.ensure_future(self._read_responses())
+
+    async def _read_responses(self) -> None:
+        error: BaseException = ConnectionError("Node connection closed")
+        try:
+            while True:
+                request_id, status, length = _RESPONSE.unpack(await self.reader.readexactly(_RESPONSE.size))
+                body = await self.reader.readexactly(length) if length else b""
+                future = self.pending.pop(request_id, None)
+                if future is not None and not future.done():
+                    future.set_result((status, body))
+        except (asyncio.IncompleteReadError, OSError) as e:
+            error = ConnectionError(f"Node connection lost: {e}")
+        finally:
+            self.closed = True
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self.pending.clear()
+            self.writer.close()
+
+    async def request(self, op: int, name: str, body=b"") -> Tuple[int, bytes]:
+        if self.closed:
+            raise ConnectionError("Node connection closed")
+        raw_name = name.encode("utf-8")
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        try:
+            async with self._write_lock:
+                self.writer.write(_REQUEST.pack(request_id, op, len(raw_name), len(body)) + raw_name)
+                if len(body):
+                    self.writer.write(body)
+                await self.writer.drain()
+            return await future
+        finally:
+            self.pending.pop(request_id, None)
+
+    def close(self) -> None:
+        self._reader_task.cancel()
+
+
+class RemoteNodeStore(NodeStore):
+    """
+    Client of a node server.
+
+    Args:
+        host, port: Server address.
+        pool_size:  Connections kept open; requests are pipelined on the
+                    least busy one and a new connection is only opened when
+                    every pooled one already has requests in flight.
+        timeout:    Seconds per request (and per connect).
+    """
+
+    def __init__(self, host: str, port: int, pool_size: int = 4, timeout: float = 30.0) -> None:
+        if pool_size < 1:
+            raise ValueError(f"pool_size must be >= 1, got {pool_size}")
+        self.host, self.port = host, port
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._connections: List[_Connection] = []
+        self._connect_lock: Optional[asyncio.Lock] = None
+
+    def __repr__(self) -> str:
+        return f"RemoteNodeStore({_TCP_PREFIX}{self.host}:{self.port})"
+
+    def _least_busy(self) -> Optional[_Connection]:
+        self._connections = [c for c in self._connections if not c.closed]
+        least = min(self._connections, key=lambda c: c.in_flight, default=None)
+        if least is not None and (not least.in_flight or len(self._connections) >= self.pool_size):
+            return least
+        return None
+
+    async def _acquire(self) -> _Connection:
+        connection = self._least_busy()
+        if connection is None:
+            if self._connect_lock is None:
+                self._connect_lock = asyncio.Lock()
+            async with self._connect_lock:      # one connect at a time; waiters may reuse it
+                connection = self._least_busy()
+                if connection is None:
+                    reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port),
+                                                            self.timeout)
+                    connection = _Connection(reader, writer)
+                    self._connections.append(connection)
+        connection.in_flight += 1
+        return connection
+
+    async def _request(self, op: int, name: str, body) -> Tuple[int, bytes]:
+        connection = await self._acquire()
+        try:
+            return await asyncio.wait_for(connection.request(op, name, body), self.timeout)
+        except ConnectionError:
+            connection.closed = True
+            raise
+        finally:
+            connection.in_flight -= 1
+
+    async def _call(self, op: int, name: str, body=b"") -> bytes:
+        try:
+            status, payload = await self._request(op, name, body)
+        except ConnectionError:
+            # A pooled connection may have been dropped by the server since its
+            # last use; every operation is idempotent, so retry once on a new one.
+            status, payload = await self._request(op, name, body)
+        if status != _OK:
+            _raise_for(status, payload)
+        return payload
+
+    async def aput(self, name: str, data, sync: bool = False) -> None:
+        _check_name(name)
+        body = memoryview(data).cast("B")
+        if len(body) > MAX_OBJECT_BYTES:
+            raise ValueError(f"{name}: {len(body)} bytes exceeds the {MAX_OBJECT_BYTES}-byte object limit")
+        await IO_LOOP.hop(self._call(OP_PUT_SYNC if sync else OP_PUT, name, body))
+
+    async def aget(self, name: str) -> bytes:
+        _check_name(name)
+        return await IO_LOOP.hop(self._call(OP_GET, name))
+
+    async def adelete(self, name: str) -> bool:
+        _check_name(name)
+        return await IO_LOOP.hop(self._call(OP_DELETE, name)) == b"\x01"
+
+    async def alist(self, prefix: str = "") -> List[str]:
+        return _decode_names(await IO_LOOP.hop(self._call(OP_LIST, prefix)))
+
+    async def astat(self, name: str) -> ObjectStat:
+        _check_name(name)
+        return ObjectStat(name, _SIZE.unpack(await IO_LOOP.hop(self._call(OP_STAT, name)))[0])
+
+    def put(self, name: str, data, sync: bool = False) -> None:
+        IO_LOOP.run(self.aput(name, data, sync))
+
+    def get(self, name: str) -> bytes:
+        return IO_LOOP.run(self.aget(name))
+
+    def delete(self, name: str) -> bool:
+        return IO_LOOP.run(self.adelete(name))
+
+    def list(self, prefix: str = "") -> List[str]:
+        return IO_LOOP.run(self.alist(prefix))
+
+    def stat(self, name: str) -> ObjectStat:
+        return IO_LOOP.run(self.astat(name))
+
+    def close(self) -> None:
+        connections, self._connections = self._connections, []
+
+        async def shut() -> None:
+            for connection in connections:
+                connection.close()
+        if connections:
+            IO_LOOP.run(shut())
+
+
+def _encode_names(names: List[str]) -> bytes:
+    parts = []
+    for name in names:
+        raw = name.encode("utf-8")
+        parts.append(_NAME_LEN.pack(len(raw)) + raw)
+    return b"".join(parts)
+
+
+def _decode_names(raw: bytes) -> List[str]:
+    names = []
+    pos = 0
+    while pos < len(raw):
+        (length,) = _NAME_LEN.unpack_from(raw, pos)
+        pos += _NAME_LEN.size
+        names.append(raw[pos:pos + length].decode("utf-8"))
+        pos += length
+    return names
+
+
+# ---------------------------------------------------------------------------
+# TCP server
+# ---------------------------------------------------------------------------
+
+class NodeServer:
+    """
+    Serves a NodeStore over the pipelined TCP protocol.
+
+    Requests on one connection are executed concurrently and answered as
+    they complete, so a slow get does not hold up the requests behind it.
+
+    Example::
+
+        server = NodeServer(LocalNodeStore("data_storage/node1"), port=9101)
+        await server.start()
+        await server.serve_forever()
+    """
+
+    def __init__(self, store: NodeStore, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.store = store
+        self.host, self.port = host, port
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: Set[asyncio.StreamWriter] = set()
+
+    async def start(self) -> int:
+        """Start listening; returns the bound port (useful with port=0)."""
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def serve_forever(self) -> None:
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """Stop listening and drop every client connection."""
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._clients):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _execute(self, op: int, name: str, body: bytes) -> bytes:
+        store = self.store
+        if op in (OP_PUT, OP_PUT_SYNC):
+            await store.aput(name, body, sync=op == OP_PUT_SYNC)
+            return b""
+        if op == OP_GET:
+            return await store.aget(name)
+        if op == OP_DELETE:
+            return b"\x01" if await store.adelete(name) else b"\x00"
+        if op == OP_LIST:
+            return _encode_names(await store.alist(name))
+        if op == OP_STAT:
+            return _SIZE.pack((await store.astat(name)).size)
+        raise ValueError(f"Unknown node operation {op}")
+
+    async def _answer(self, request_id: int, op: int, name: str, body: bytes,
+                      writer: asyncio.StreamWriter, lock: asyncio.Lock) -> None:
+        try:
+            status, payload = _OK, await self._execute(op, name, body)
+        except FileNotFoundError as e:
+            status, payload = _NOT_FOUND, str(e).encode("utf-8")
+        except ValueError as e:
+            status, payload = _INVALID, str(e).encode("utf-8")
+        except Exception as e:
+            status, payload = _ERROR, f"{type(e).__name__}: {e}".encode("utf-8")
+        try:
+            async with lock:
+                writer.write(_RESPONSE.pack(request_id, status, len(payload)))
+                writer.write(payload)
+                await writer.drain()
+        except (ConnectionError, RuntimeError):
+            pass    # client went away
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        lock = asyncio.Lock()
+        tasks: Set[asyncio.Task] = set()
+        self._clients.add(writer)
+        try:
+            while True:
+                request_id, op, name_len, length = _REQUEST.unpack(await reader.readexactly(_REQUEST.size))
+                if length > MAX_OBJECT_BYTES:
+                    break
+                name = (await reader.readexactly(name_len)).decode("utf-8", "replace")
+                body = await reader.readexactly(length) if length else b""
+                task = asyncio.ensure_future(self._answer(request_id, op, name, body, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            self._clients.discard(writer)
+            writer.close()
+
+
+# ---------------------------------------------------------------------------
+# Node registry
+# ---------------------------------------------------------------------------
+
+_NODES: Dict[str, NodeStore] = {}
+_NODES_LOCK = threading.Lock()
+
+
+def is_remote(spec: str) -> bool:
+    return spec.startswith(_TCP_PREFIX)
+
+
+def open_node(spec: str) -> NodeStore:
+    """The process-wide NodeStore for a node spec (directory or tcp://host:port)."""
+    with _NODES_LOCK:
+        store = _NODES.get(spec)
+        if store is None:
+            if is_remote(spec):
+                host, _, port = spec[len(_TCP_PREFIX):].rpartition(":")
+                store = RemoteNodeStore(host, int(port), pool_size=config.NODE_POOL_SIZE)
+            else:
+                store = LocalNodeStore(spec)
+            _NODES[spec] = store
+        return store
+
+
+def data_node(node: int) -> NodeStore:
+    return open_node(config.DATA_NODES[node])
+
+
+def key_node(node: int) -> NodeStore:
+    return open_node(config.KEY_NODES[node])
+
+
+def close_nodes() -> None:
+    """Close every node opened through open_node() and the packfile stores behind them."""
+    with _NODES_LOCK:
+        for store in _NODES.values():
+            store.close()
+        _NODES.clear()
+    packfile.close_stores()
@@ -0,0 +1,41 @@
+"""
+node_server.py
+Standalone VaultZero storage node.
+
+Serves one node directory over the node_store TCP protocol, so the grid can
+run as separate processes (one per node) instead of directories inside the
+client.  Point config.DATA_NODES / config.KEY_NODES at the servers with
+"tcp://host:port" specs.
+
+    python -m ops.node_server --root data_storage/node1 --port 9101
+"""
+import argparse
+import asyncio
+
+from node_store import LocalNodeStore, NodeServer
+
+
+async def serve(root: str, host: str, port: int) -> None:
+    server = NodeServer(LocalNodeStore(root), host, port)
+    bound = await server.start()
+    print(f"node {root} listening on {host}:{bound}", flush=True)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a VaultZero node directory over TCP")
+    parser.add_argument("--root", required=True, help="node directory")
+    parser.add_argument("--host", default="127.0.0.1", help="bind address (default: localhost only)")
+    parser.add_argument("--port", type=int, default=0, help="port (default: any free port)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.root, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+"""
+repair_daemon.py
+Background repair of lost key and data shards.
+
+A shard goes missing when a node was offline during an upload, when its
+file or packfile entry is deleted, or when a node is replaced with an empty
+one.  Reads keep working from the other shards, but nothing puts the lost
+one back, and one more loss makes the asset unreadable.  This service
+closes that gap:
+
+  * scan() takes every object in the placement catalog (catalog.py), lists
+    the key and data shards actually present on each healthy node, and
+    queues the objects with a shard missing -- those with the fewest
+    surviving shards (closest to losing their quorum) first;
+  * a missing key shard is regenerated by Lagrange evaluation of the
+    surviving shares at its index (ShamirVault.rebuild_key_shard()), a
+    missing data shard by erasure-decoding the survivors and re-encoding
+    that one shard (erasure_coding.rebuild_data_shard());
+  * all repair I/O draws from a token bucket, so a node coming back after a
+    long outage is refilled at a bounded rate instead of swamping the grid.
+    Data shards kept as files are rebuilt a stripe at a time
+    (erasure_coding.ShardReader.rebuild()) and each stripe is paid for
+    before the next is read, so one large asset cannot overdraw the budget.
+
+Within one process, shared_daemon() hands out a single daemon per catalog,
+so every pass draws on the same budget, and trigger() never starts a pass
+while another one is running.
+
+    python -m ops.repair_daemon --once
+    python -m ops.repair_daemon --rate 16 --interval 30
+"""
+import argparse
+import functools
+import os
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import config
+from catalog import Catalog
+from erasure_coding import ShardReader, ShardTarget, parse_data_shard_header, rebuild_data_shard
+from node_store import LocalNodeStore, data_node, key_node
+from range_reader import data_shard_name, fetch_data_shards
+from shamir_handler import ShamirVault
+
+
+class TokenBucket:
+    """
+    Rate limiter: *rate* tokens per second, with up to *burst* banked.
+
+    acquire() of more tokens than are available sleeps until the balance is
+    back to zero, so a single request larger than the burst still goes
+    through and is paid for by a proportionally longer pause afterwards.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep) -> None:
+        if rate <= 0:
+            raise ValueError(f"rate must be > 0, got {rate}")
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self.tokens = self.burst
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float) -> float:
+        """Take *amount* tokens, waiting as needed; returns the seconds waited."""
+        with self._lock:
+            now = self._clock()
+            self.tokens = min(self.burst, self.tokens + (now - self._last) * self.rate)
+            self._last = now
+            self.tokens -= amount
+            wait = max(0.0, -self.tokens / self.rate)
+        if wait:
+            self._sleep(wait)
+        return wait
+
+
+class RepairTask(NamedTuple):
+    margin: int                 # surviving shards above the threshold (0 = one loss from unreadable)
+    name: str
+    data: tuple                 # nodes missing their data shard
+    keys: tuple                 # nodes missing their key shard
+
+
+class RepairReport(NamedTuple):
+    objects: int                # objects in the catalog
+    queued: int                 # objects with a shard missing on a healthy node
+    repaired: List[str]
+    failed: Dict[str, str]      # name -> error
+    shards: int                 # shards rebuilt
+    bytes: int                  # repair I/O charged to the token bucket
+    throttled_s: float          # time spent waiting for tokens
+
+
+class RepairDaemon:
+    """
+    Finds and rebuilds missing shards, most endangered objects first.
+
+    Shard i of every object lives on node i (see main.py), so a missing
+    shard is rebuilt on its own node; nodes the catalog marks unhealthy
+    are neither read nor written.
+
+    Args:
+        catalog: Placement catalog (default: the one at config.CATALOG_PATH).
+        rate:    Repair I/O budget in bytes per second.
+        burst:   Bytes that may be spent at once after an idle period.
+        k, n:    Reconstruction threshold and shards per object.
+    """
+
+    def __init__(self, catalog: Optional[Catalog] = None, rate: float = config.REPAIR_RATE_BYTES,
+                 burst: Optional[float] = config.REPAIR_BURST_BYTES,
+                 k: int = config.ERASURE_K, n: int = config.ERASURE_N) -> None:
+        self.catalog = catalog if catalog is not None else Catalog()
+        self.bucket = TokenBucket(rate, burst)
+        self.k = k
+        self.n = n
+        self._health: List[bool] = [True] * n
+        self._objects = 0
+        self._throttled = 0.0
+        self._pass = threading.Lock()
+        self._flight = threading.Lock()
+        self._running = False
+        self._rescan = False
+
+    def _listing(self, store_for: Callable[[int], object]) -> Dict[int, set]:
+        listed = {}
+        for i in range(self.n):
+            if not self._health[i]:
+                continue
+            try:
+                listed[i] = set(store_for(i).list())
+            except OSError:
+                self._health[i] = False     # unreachable this pass: neither source nor target
+        return listed
+
+    def scan(self) -> List[RepairTask]:
+        """Objects with a shard missing on a healthy node, fewest surviving shards first."""
+        state = self.catalog.load()
+        self._health = [state.health.get(i, True) for i in range(self.n)]
+        self._objects = len(state.names)
+        data_listed = self._listing(data_node)
+        key_listed = self._listing(key_node)
+
+        tasks = []
+        for name in state.names:
+            data = [i in data_listed and data_shard_name(name, i) in data_listed[i] for i in range(self.n)]
+            keys = [i in key_listed and f"{name}.key.{i}" in key_listed[i] for i in range(self.n)]
+            data_missing = tuple(i for i in data_listed if not data[i])
+            key_missing = tuple(i for i in key_listed if not keys[i])
+            if data_missing or key_missing:
+                margin = min(sum(data), sum(keys)) - self.k
+                tasks.append(RepairTask(margin, name, data_missing, key_missing))
+        # Most endangered first; objects already below the threshold (margin < 0) cannot
+        # be fully rebuilt and go last.
+        tasks.sort(key=lambda task: (task.margin < 0, task.margin, task.name))
+        return tasks
+
+    def adopt(self, names: Sequence[str]) -> List[str]:
+        """
+        Give a catalog row to each of *names* that has none -- assets stored
+        before uploads were catalogued -- so that scan() sees them.  A node
+        is recorded for an asset if it holds both its data and its key
+        shard; a node that cannot be listed is recorded as missing.
+
+        Returns:
+            The names added to the catalog.
+        """
+        new = [name for name in names if name not in self.catalog]
+        if not new:
+            return []
+        listed = []
+        for i in range(self.n):
+            try:
+                listed.append(set(data_node(i).list()) | set(key_node(i).list()))
+            except OSError:
+                listed.append(set())
+        rows = [[i if {data_shard_name(name, i), f"{name}.key.{i}"} <= listed[i] else -1 for i in range(self.n)]
+                for name in new]
+        added = self.catalog.insert_many(new, rows)
+        self.catalog.maybe_snapshot()
+        return added
+
+    def _charge(self, amount: int) -> None:
+        self._throttled += self.bucket.acquire(amount)
+
+    def _shard_target(self, name: str, node: int, size: int) -> ShardTarget:
+        store = data_node(node)
+        shard_name = data_shard_name(name, node)
+        # Large assets keep their data shards as files, like a fresh upload.
+        if isinstance(store, LocalNodeStore) and size > config.PACK_OBJECT_LIMIT:
+            return store.file_path(shard_name)
+        return functools.partial(store.put, shard_name)
+
+    def _shard_files(self, name: str) -> List[str]:
+        """*name*'s data shards kept as files on this host by healthy nodes."""
+        paths = []
+        for i in range(self.n):
+            store = data_node(i)
+            if self._health[i] and isinstance(store, LocalNodeStore):
+                path = store.local_file(data_shard_name(name, i))
+                if path is not None:
+                    paths.append(path)
+        return paths
+
+    def _store_data_shard(self, name: str, node: int, shard: bytes) -> None:
+        target = self._shard_target(name, node, parse_data_shard_header(shard).size)
+        if callable(target):
+            target(shard, sync=True)
+            return
+        with open(target + ".tmp", "wb") as f:
+            f.write(shard)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(target + ".tmp", target)
+
+    def _rebuild_data_shards(self, task: RepairTask) -> int:
+        paths = self._shard_files(task.name)
+        if len(paths) >= self.k:
+            # Shard files (large assets) are rebuilt a stripe at a time, and every
+            # stripe is charged to the budget before the next one is read.
+            moved = 0
+            with ShardReader(paths) as reader:
+                for node in task.data:
+                    target = self._shard_target(task.name, node, reader.size)
+                    moved += reader.rebuild(node, target, charge=self._charge, sync=True)
+                    if not callable(target):
+                        data_node(node).pack.delete(data_shard_name(task.name, node))
+            return moved
+        # Packed or remote shards are small enough to fetch whole.
+        sources = [raw for i, raw in enumerate(fetch_data_shards(task.name))
+                   if raw is not None and self._health[i]]
+        moved = sum(len(raw) for raw in sources)
+        self._charge(moved)
+        for node in task.data:
+            shard = rebuild_data_shard(sources, node)
+            self._store_data_shard(task.name, node, shard)
+            self._charge(len(shard))
+            moved += len(shard)
+        return moved
+
+    def repair(self, task: RepairTask) -> int:
+        """
+        Rebuild *task*'s missing shards, drawing on the I/O budget as it
+        goes; returns the bytes read and written.
+
+        Raises:
+            ValueError: Too few valid shards survive to rebuild from.
+        """
+        moved = self._rebuild_data_shards(task) if task.data else 0
+        for node in task.keys:
+            cost = ShamirVault.repair_key_shard(task.name, node, self._health)
+            self._charge(cost)
+            moved += cost
+        return moved
+
+    def _record(self, task: RepairTask) -> bool:
+        """
+        Mark the rebuilt shards present in *task*'s catalog row.  If the
+        object was burned while it was being repaired the row is gone: the
+        rebuilt shards are deleted again and False is returned.
+        """
+        try:
+            row = self.catalog.placement(task.name)
+        except KeyError:
+            row = None
+        if row is not None:
+            row += [-1] * (self.n - len(row))
+            for node in set(task.data) | set(task.keys):
+                row[node] = node
+            if self.catalog.update(task.name, row):
+                return True
+        for node in task.data:
+            data_node(node).delete(data_shard_name(task.name, node))
+        for node in task.keys:
+            key_node(node).delete(f"{task.name}.key.{node}")
+        return False
+
+    def run_once(self, limit: Optional[int] = None) -> RepairReport:
+        """
+        One scan and repair pass over at most *limit* queued objects.
+        Passes of the same daemon run one after another, never at once.
+        """
+        with self._pass:
+            return self._run_pass(limit)
+
+    def _run_pass(self, limit: Optional[int]) -> RepairReport:
+        tasks = self.scan()
+        repaired, failed, shards, moved = [], {}, 0, 0
+        throttled = self._throttled
+        for task in tasks[:limit]:
+            if task.name not in self.catalog:
+                continue                    # burned since the scan
+            try:
+                cost = self.repair(task)
+            except (OSError, ValueError) as e:
+                failed[task.name] = str(e)
+                continue
+            if not self._record(task):
+                continue
+            repaired.append(task.name)
+            shards += len(task.data) + len(task.keys)
+            moved += cost
+        self.catalog.maybe_snapshot()
+        return RepairReport(self._objects, len(tasks), repaired, failed, shards, moved,
+                            self._throttled - throttled)
+
+    def trigger(self) -> bool:
+        """
+        Start a pass on a background thread, unless one is already running:
+        then a single further pass is queued behind it, so shards lost after
+        the running pass scanned are still picked up.  Returns True if a new
+        thread was started.
+        """
+        with self._flight:
+            if self._running:
+                self._rescan = True
+                return False
+            self._running = True
+        threading.Thread(target=self._drain, name="vz-repair", daemon=True).start()
+        return True
+
+    def _drain(self) -> None:
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:      # keep draining; the next pass retries
+                print(f"[REPAIR] pass failed: {e}", flush=True)
+            with self._flight:
+                if not self._rescan:
+                    self._running = False
+                    return
+                self._rescan = False
+
+    def run_forever(self, interval: float = config.REPAIR_INTERVAL,
+                    stop: Optional[threading.Event] = None) -> None:
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            report = self.run_once()
+            if report.queued:
+                print(f"[REPAIR] {len(report.repaired)}/{report.queued} objects repaired, "
+                      f"{report.shards} shard(s), {report.bytes} bytes, "
+                      f"{report.throttled_s:.2f}s throttled, {len(report.failed)} failed", flush=True)
+            stop.wait(interval)
+
+
+_DAEMONS: Dict[str, RepairDaemon] = {}
+_DAEMONS_LOCK = threading.Lock()
+
+
+def shared_daemon(catalog_path: Optional[str] = None) -> RepairDaemon:
+    """The process-wide daemon for the catalog at *catalog_path* (default config.CATALOG_PATH)."""
+    path = catalog_path if catalog_path is not None else config.CATALOG_PATH
+    with _DAEMONS_LOCK:
+        daemon = _DAEMONS.get(path)
+        if daemon is None:
+            daemon = _DAEMONS[path] = RepairDaemon(Catalog(path))
+        return daemon
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Rebuild missing VaultZero key and data shards")
+    parser.add_argument("--catalog", default=config.CATALOG_PATH, help="placement catalog database")
+    parser.add_argument("--rate", type=float, default=config.REPAIR_RATE_BYTES / 2**20,
+                        help="repair I/O budget in MiB/s")
+    parser.add_argument("--interval", type=float, default=config.REPAIR_INTERVAL,
+                        help="seconds between passes")
+    parser.add_argument("--once", action="store_true", help="run a single pass and exit")
+    args = parser.parse_args(argv)
+    daemon = RepairDaemon(Catalog(args.catalog), rate=args.rate * 2**20)
+    if args.once:
+        report = daemon.run_once()
+        print(f"{len(report.repaired)} of {report.queued} objects repaired ({report.shards} shards, "
+              f"{report.bytes} bytes)", flush=True)
+        for name, error in report.failed.items():
+            print(f"  {name}: {error}", flush=True)
+        return
+    try:
+        daemon.run_forever(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+"""
+packfile.py
+Log-structured, append-only object store for one VaultZero storage node.
+
+One file per shard costs an inode, a directory entry and an open() per
+object; with millions of small assets those lookups dominate.  A PackStore
+keeps a node's objects in a few large segment files instead:
+
+    pack-000001.vzp    sealed segment
+    pack-000001.hint   its offset index
+    pack-000002.vzp    active segment: every put/delete is appended here
+
+    record = crc32(4) | kind(1) | name_len(2) | data_len(8) | name | data
+    hint   = HINT_MAGIC(4) | segment_size(8) | entry*
+    entry  = kind(1) | name_len(2) | offset(8) | data_len(8) | name
+
+The CRC covers everything after it.  Writes are sequential appends; an
+in-memory index maps each name to (segment, offset, length), so a read is
+one ``os.pread`` of the record.  When the active segment fills it is sealed
+and its hint file written, so reopening a node loads the hints and only
+scans the active segment (a torn record at its tail is truncated away).
+
+Deletes append a tombstone.  Overwritten and deleted records stay in their
+segment as garbage until compact() copies the live records of mostly-dead
+sealed segments forward and unlinks them; start_compactor() runs that on a
+background thread.
+"""
+
+from __future__ import annotations
+import os
+import re
+import struct
+import threading
+import zlib
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+import config
+
+SEGMENT_BYTES = 64 * 1024 * 1024
+HINT_MAGIC = b"VZPH"
+
+_RECORD = struct.Struct(">IBHQ")
+_HINT_HEADER = struct.Struct(">4sQ")
+_HINT_ENTRY = struct.Struct(">BHQQ")
+_PUT = 1
+_DELETE = 2
+_SEGMENT_NAME = re.compile(r"^pack-(\d{6,})\.vzp$")
+
+
+class _Entry(NamedTuple):
+    segment: int
+    offset: int        # start of the record
+    length: int        # data bytes
+    size: int          # whole record bytes
+
+
+class _Segment:
+    def __init__(self, segment_id: int, path: str, fd: int, size: int) -> None:
+        self.id = segment_id
+        self.path = path
+        self.fd = fd
+        self.size = size
+        self.live = 0                               # bytes of records still indexed
+        self.entries: List[tuple] = []              # (kind, name, offset, length) for the hint
+        self.tombstones: Dict[str, int] = {}        # name -> record size
+
+    @property
+    def hint_path(self) -> str:
+        return self.path[:-len(".vzp")] + ".hint"
+
+
+def _record(kind: int, name: bytes, data) -> bytes:
+    body = _RECORD.pack(0, kind, len(name), len(data))[4:] + name + bytes(data)
+    return struct.pack(">I", zlib.crc32(body)) + body
+
+
+class PackStore:
+    """
+    Append-only object store rooted at one node directory.
+
+    Thread-safe: one lock serialises appends, index updates and reads (each
+    read is a single pread, so holding it is brief).
+
+    Args:
+        root:          Node directory (created if missing).
+        segment_bytes: Size at which the active segment is sealed.
+        sync:          fsync after every append (durable, slower).
+    """
+
+    def __init__(self, root: str, segment_bytes: int = SEGMENT_BYTES, sync: bool = False) -> None:
+        if segment_bytes < _RECORD.size:
+            raise ValueError(f"segment_bytes must be >= {_RECORD.size}, got {segment_bytes}")
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self.sync = sync
+        self._lock = threading.RLock()
+        self._index: Dict[str, _Entry] = {}
+        self._segments: Dict[int, _Segment] = {}
+        self._compactor: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.reclaimed_bytes = 0
+        self._load()
+
+    # -- loading -------------------------------------------------------------
+
+    def _segment_path(self, segment_id: int) -> str:
+        return os.path.join(self.root, f"pack-{segment_id:06d}.vzp")
+
+    def _open_segment(self, segment_id: int) -> _Segment:
+        path = self._segment_path(segment_id)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0), 0o644)
+        segment = _Segment(segment_id, path, fd, os.fstat(fd).st_size)
+        self._segments[segment_id] = segment
+        return segment
+
+    def _load(self) -> None:
+        ids = sorted(int(m.group(1)) for m in map(_SEGMENT_NAME.match, os.listdir(self.root)) if m)
+        for position, segment_id in enumerate(ids):
+            segment = self._open_segment(segment_id)
+            entries = self._read_hint(segment)
+            if entries is None:
+                entries = self._scan(segment, truncate=position == len(ids) - 1)
+            for kind, name, offset, length in entries:
+                self._apply(segment, kind, name, offset, length)
+        if ids and self._segments[ids[-1]].size < self.segment_bytes and not os.path.exists(
+                self._segments[ids[-1]].hint_path):
+            self._active = self._segments[ids[-1]]
+        else:
+            self._active = self._open_segment(ids[-1] + 1 if ids else 1)
+        for segment in self._segments.values():
+            if segment is not self._active:
+                segment.entries = []                # only the active segment's hint is still to be written
+
+    def _read_hint(self, segment: _Segment) -> Optional[List[tuple]]:
+        try:
+            with open(segment.hint_path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return None
+        if len(raw) < _HINT_HEADER.size:
+            return None
+        magic, size = _HINT_HEADER.unpack_from(raw)
+        if magic != HINT_MAGIC or size != segment.size:
+            return None
+        entries = []
+        pos = _HINT_HEADER.size
+        while pos < len(raw):
+            kind, name_len, offset, length = _HINT_ENTRY.unpack_from(raw, pos)
+            pos += _HINT_ENTRY.size
+            entries.append((kind, raw[pos:pos + name_len].decode("utf-8"), offset, length))
+            pos += name_len
+        return entries
+
+    def _scan(self, segment: _Segment, truncate: bool) -> List[tuple]:
+        """Rebuild a segment's entries from its records; stop at the first bad one."""
+        entries = []
+        offset = 0
+        while offset + _RECORD.size <= segment.size:
+            header = os.pread(segment.fd, _RECORD.size, offset)
+            crc, kind, name_len, length = _RECORD.unpack(header)
+            end = offset + _RECORD.size + name_len + length
+            if kind not in (_PUT, _DELETE) or end > segment.size:
+                break
+            body = header[4:] + os.pread(segment.fd, name_len + length, offset + _RECORD.size)
+            if zlib.crc32(body) != crc:
+                break
+            entries.append((kind, body[_RECORD.size - 4:_RECORD.size - 4 + name_len].decode("utf-8"),
+                            offset, length))
+            offset = end
+        if offset < segment.size and truncate:
+            os.truncate(segment.path, offset)       # torn write at the tail
+            segment.size = offset
+        return entries
+
+    def _apply(self, segment: _Segment, kind: int, name: str, offset: int, length: int) -> None:
+        size = _RECORD.size + len(name.encode("utf-8")) + length
+        segment.entries.append((kind, name, offset, length))
+        old = self._index.pop(name, None)
+        if old is not None:
+            self._segments[old.segment].live -= old.size
+        if kind == _PUT:
+            self._index[name] = _Entry(segment.id, offset, length, size)
+            segment.live += size
+        else:
+            segment.tombstones[name] = size
+
+    # -- writes --------------------------------------------------------------
+
+    def _fsync_dir(self) -> None:
+        fd = os.open(self.root, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass                                    # directories cannot be fsynced on every platform
+        finally:
+            os.close(fd)
+
+    def _seal(self) -> None:
+        """Write the active segment's hint file and start a new segment."""
+        segment = self._active
+        # Always durable, whatever self.sync says: once only a hint describes a
+        # segment, compaction may unlink the older copies of its records.  One
+        # fsync per sealed segment is cheap.
+        os.fsync(segment.fd)
+        parts = [_HINT_HEADER.pack(HINT_MAGIC, segment.size)]
+        for kind, name, offset, length in segment.entries:
+            raw = name.encode("utf-8")
+            parts.append(_HINT_ENTRY.pack(kind, len(raw), offset, length) + raw)
+        tmp = segment.hint_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(b"".join(parts))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, segment.hint_path)
+        segment.entries = []
+        self._active = self._open_segment(max(self._segments) + 1)
+
+    def _append(self, kind: int, name: str, data, sync: bool = False) -> None:
+        raw_name = name.encode("utf-8")
+        if not raw_name or len(raw_name) > 0xFFFF:
+            raise ValueError(f"Object name must be 1-65535 bytes, got {len(raw_name)}")
+        record = _record(kind, raw_name, data)
+        if self._active.size and self._active.size + len(record) > self.segment_bytes:
+            self._seal()
+        segment = self._active
+        offset = segment.size
+        written = os.write(segment.fd, record)
+        if written != len(record):
+            # A short append leaves a torn record; cut it so the log stays parseable.
+            os.truncate(segment.path, offset)
+            raise OSError(f"Short write to {segment.path}: {written} of {len(record)} bytes")
+        if self.sync or sync:
+            os.fsync(segment.fd)
+        segment.size += len(record)
+        self._apply(segment, kind, name, offset, len(data))
+
+    def put(self, name: str, data, sync: bool = False) -> None:
+        """
+        Store *data* under *name*, replacing any previous object.  With
+        *sync* the record is fsynced before returning, even in a store
+        opened with sync=False.
+        """
+        with self._lock:
+            self._append(_PUT, name, memoryview(data).cast("B"), sync)
+
+    def delete(self, name: str) -> bool:
+        """Remove *name*; returns False if it was not stored."""
+        with self._lock:
+            if name not in self._index:
+                return False
+            self._append(_DELETE, name, b"")
+            return True
+
+    # -- reads ---------------------------------------------------------------
+
+    def get(self, name: str) -> bytes:
+        """
+        Read one object with a single pread.
+
+        Raises:
+            FileNotFoundError: *name* is not stored.
+            ValueError:        The record fails its CRC.
+        """
+        with self._lock:
+            entry = self._index.get(name)
+            if entry is None:
+                raise FileNotFoundError(f"{name} not found in pack store {self.root}")
+            record = os.pread(self._segments[entry.segment].fd, entry.size, entry.offset)
+        if len(record) != entry.size or zlib.crc32(record[4:]) != struct.unpack_from(">I", record)[0]:
+            raise ValueError(f"Corrupt pack record: {name} fails its checksum")
+        return record[entry.size - entry.length:]
+
+    def size(self, name: str) -> int:
+        """Length of object *name* in bytes, without reading it."""
+        with self._lock:
+            entry = self._index.get(name)
+            if entry is None:
+                raise FileNotFoundError(f"{name} not found in pack store {self.root}")
+            return entry.length
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def names(self) -> Iterator[str]:
+        """Names of every stored object (a snapshot)."""
+        with self._lock:
+            return iter(list(self._index))
+
+    def stats(self) -> dict:
+        """Segment count, object count, live and garbage bytes."""
+        with self._lock:
+            total = sum(s.size for s in self._segments.values())
+            live = sum(s.live for s in self._segments.values())
+            return {
+                "segments": len(self._segments),
+                "objects": len(self._index),
+                "live_bytes": live,
+                "garbage_bytes": total - live,
+                "reclaimed_bytes": self.reclaimed_bytes,
+            }
+
+    # -- compaction ----------------------------------------------------------
+
+    def compact(self, min_garbage: float = 0.5) -> int:
+        """
+        Rewrite every sealed segment whose garbage fraction is at least
+        *min_garbage*: live records are appended to the active segment and
+        the old segment and its hint are deleted.
+
+        A tombstone is carried forward only while an older segment, which
+        may still hold the record it deletes, exists.
+
+        Returns:
+            Bytes of segment files reclaimed.
+        """
+        with self._lock:
+            victims = sorted(
+                s.id for s in self._segments.values()
+                if s is not self._active and s.size and (s.size - s.live) / s.size >= min_garbage)
+        reclaimed = 0
+        for segment_id in victims:
+            reclaimed += self._compact_segment(segment_id)
+        return reclaimed
+
+    def _compact_segment(self, segment_id: int) -> int:
+        with self._lock:
+            segment = self._segments[segment_id]
+            live = [(name, entry) for name, entry in self._index.items() if entry.segment == segment_id]
+        for name, entry in live:
+            with self._lock:
+                if self._index.get(name) != entry:
+                    continue                        # overwritten or deleted meanwhile
+                record = os.pread(segment.fd, entry.size, entry.offset)
+                if zlib.crc32(record[4:]) != struct.unpack_from(">I", record)[0]:
+                    raise ValueError(f"Corrupt pack record: {name} fails its checksum during compaction")
+                self._append(_PUT, name, memoryview(record)[entry.size - entry.length:])
+        with self._lock:
+            older = any(other < segment_id for other in self._segments)
+            for name in segment.tombstones:
+                if older and name not in self._index:
+                    self._append(_DELETE, name, b"")
+            # The copies must be on disk before the originals go, even for a
+            # store opened with sync=False: a crash in between would otherwise
+            # lose records that had long been durable.  Segments sealed while
+            # copying were synced by _seal().
+            os.fsync(self._active.fd)
+            self._fsync_dir()
+            del self._segments[segment_id]
+            os.close(segment.fd)
+            for path in (segment.hint_path, segment.path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self.reclaimed_bytes += segment.size
+            return segment.size
+
+    def start_compactor(self, interval: float = 60.0, min_garbage: float = 0.5) -> None:
+        """Run compact() every *interval* seconds on a daemon thread until close()."""
+        if self._compactor is not None:
+            return
+
+        def loop() -> None:
+            while not self._stop.wait(interval):
+                try:
+                    self.compact(min_garbage)
+                except (OSError, ValueError):
+                    pass        # retried on the next pass; reads report corrupt records
+        self._compactor = threading.Thread(target=loop, name=f"vz-compact-{os.path.basename(self.root)}",
+                                           daemon=True)
+        self._compactor.start()
+
+    def close(self) -> None:
+        """Stop the compactor and close every segment."""
+        self._stop.set()
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+        with self._lock:
+            for segment in self._segments.values():
+                os.close(segment.fd)
+            self._segments.clear()
+            self._index.clear()
+
+    def __enter__(self) -> "PackStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def is_segment_file(filename: str) -> bool:
+    """True for a packfile segment or hint file name (as opposed to a stored object)."""
+    return bool(_SEGMENT_NAME.match(filename)) or (filename.startswith("pack-") and filename.endswith(".hint"))
+
+
+_STORES: Dict[str, PackStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def node_store(root: str) -> PackStore:
+    """
+    The process-wide PackStore for a node directory, opened on first use.
+
+    Background compaction starts with it when ``config.PACK_COMPACT_INTERVAL``
+    is set.
+    """
+    key = os.path.abspath(root)
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            store = PackStore(root, segment_bytes=config.PACK_SEGMENT_BYTES)
+            if config.PACK_COMPACT_INTERVAL:
+                store.start_compactor(config.PACK_COMPACT_INTERVAL)
+            _STORES[key] = store
+        return store
+
+
+def close_stores() -> None:
+    """Close every store opened through node_store()."""
+    with _STORES_LOCK:
+        for store in _STORES.values():
+            store.close()
+        _STORES.clear()
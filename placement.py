@@ -0,0 +1,221 @@
+"""
+placement.py
+Consistent-hash placement of object shards on a pool of storage nodes.
+
+Each node owns a number of virtual nodes (points) on a 64-bit hash ring,
+proportional to its weight.  An object's n shards go to the owners of the
+first n distinct-node points at or after the object's own hash, so every
+shard of an object lands on a different node and the load spreads in
+proportion to the weights.
+
+Adding or removing a node only changes the placement of objects whose
+walk touches that node's points -- about n/N of the objects, i.e. ~1/N of
+all shards -- instead of reshuffling everything as ``hash % N`` would.
+plan_transfers() turns such a membership change into the exact list of
+shard copies: shards stay on every node that is still part of their
+object's placement, and only the shards of nodes that left it move.
+
+Lookups are a binary search over the sorted point array; place_many()
+places whole batches with NumPy.
+"""
+
+from __future__ import annotations
+import hashlib
+from typing import Dict, Hashable, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+
+VNODES = 128                # points per unit of weight
+_WALK = 64                  # points examined per object in a vectorised batch before falling back
+
+
+def _hash64(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class Transfer(NamedTuple):
+    name: str
+    shard: int
+    source: Hashable        # node holding the shard now (it may be gone: rebuild from the others)
+    target: Hashable
+
+
+class PlacementRing:
+    """
+    Weighted consistent-hash ring with virtual nodes.
+
+    Example::
+
+        ring = PlacementRing({"node-a": 1.0, "node-b": 1.0, "node-c": 2.0})
+        ring.place("report.pdf", 3)      # ['node-a', 'node-c', 'node-b']
+
+    Args:
+        nodes:  Node ids, or a mapping of node id to weight (default 1.0).
+        vnodes: Points per unit of weight.
+
+    Raises:
+        ValueError: Non-positive weight or vnode count.
+    """
+
+    def __init__(self, nodes: Union[Iterable[Hashable], Mapping[Hashable, float]] = (),
+                 vnodes: int = VNODES) -> None:
+        if vnodes < 1:
+            raise ValueError(f"vnodes must be >= 1, got {vnodes}")
+        self.vnodes = vnodes
+        self._weights: Dict[Hashable, float] = {}
+        self._points: Optional[np.ndarray] = None     # sorted uint64 point hashes
+        self._owners: Optional[np.ndarray] = None     # member index per point
+        self._members: List[Hashable] = []
+        weights = nodes if isinstance(nodes, Mapping) else dict.fromkeys(nodes, 1.0)
+        for node, weight in weights.items():
+            self.add_node(node, weight)
+
+    # -- membership ------------------------------------------------------------
+
+    def add_node(self, node: Hashable, weight: float = 1.0) -> None:
+        """Add *node* (or change its weight)."""
+        if weight <= 0:
+            raise ValueError(f"Weight of node {node!r} must be > 0, got {weight}")
+        self._weights[node] = weight
+        self._points = None
+
+    def remove_node(self, node: Hashable) -> None:
+        """
+        Raises:
+            KeyError: *node* is not on the ring.
+        """
+        del self._weights[node]
+        self._points = None
+
+    @property
+    def nodes(self) -> Dict[Hashable, float]:
+        """Node id -> weight."""
+        return dict(self._weights)
+
+    def __len__(self) -> int:
+        return len(self._weights)
+
+    def __contains__(self, node: Hashable) -> bool:
+        return node in self._weights
+
+    def copy(self) -> "PlacementRing":
+        return PlacementRing(self._weights, self.vnodes)
+
+    def _build(self) -> None:
+        self._members = sorted(self._weights, key=repr)
+        points, owners = [], []
+        for index, node in enumerate(self._members):
+            count = max(1, round(self.vnodes * self._weights[node]))
+            points.extend(_hash64(f"{node!r}#{i}") for i in range(count))
+            owners.extend([index] * count)
+        order = np.argsort(np.array(points, dtype=np.uint64), kind="stable")
+        self._points = np.array(points, dtype=np.uint64)[order]
+        self._owners = np.array(owners, dtype=np.int32)[order]
+
+    def _ring(self):
+        if self._points is None:
+            self._build()
+        return self._points, self._owners
+
+    # -- placement -------------------------------------------------------------
+
+    def _check(self, n: int) -> None:
+        if n < 1 or n > len(self._weights):
+            raise ValueError(f"Cannot place {n} shards on distinct nodes: ring has {len(self._weights)}")
+
+    def _walk(self, start: int, n: int) -> List[int]:
+        points, owners = self._ring()
+        chosen: List[int] = []
+        for step in range(len(points)):
+            owner = int(owners[(start + step) % len(points)])
+            if owner not in chosen:
+                chosen.append(owner)
+                if len(chosen) == n:
+                    break
+        return chosen
+
+    def place(self, name: str, n: int) -> List[Hashable]:
+        """
+        The *n* distinct nodes for *name*'s shards, shard 0 first.
+
+        Raises:
+            ValueError: Fewer than *n* nodes on the ring.
+        """
+        self._check(n)
+        points, _ = self._ring()
+        start = int(np.searchsorted(points, np.uint64(_hash64(name)), side="left"))
+        return [self._members[i] for i in self._walk(start, n)]
+
+    def place_many(self, names: Sequence[str], n: int) -> np.ndarray:
+        """
+        place() for a batch: an array of shape (len(names), n) of node ids.
+
+        Each object's walk is done over a window of points at once; the rare
+        object whose window holds fewer than *n* distinct nodes is walked
+        individually.
+        """
+        self._check(n)
+        points, owners = self._ring()
+        hashes = np.fromiter((_hash64(name) for name in names), dtype=np.uint64, count=len(names))
+        starts = np.searchsorted(points, hashes, side="left")
+        width = min(len(points), max(_WALK, 4 * n))
+        window = owners[(starts[:, None] + np.arange(width)) % len(points)]
+
+        chosen = np.full((len(names), n), -1, dtype=np.int64)
+        filled = np.zeros(len(names), dtype=np.int64)
+        rows = np.arange(len(names))
+        for column in range(width):
+            candidate = window[:, column]
+            fresh = (filled < n) & ~(chosen == candidate[:, None]).any(axis=1)
+            chosen[rows[fresh], filled[fresh]] = candidate[fresh]
+            filled += fresh
+            if (filled == n).all():
+                break
+        for row in np.flatnonzero(filled < n):
+            chosen[row] = self._walk(int(starts[row]), n)
+
+        members = np.empty(len(self._members), dtype=object)
+        members[:] = self._members
+        result = members[chosen]
+        if all(isinstance(node, (int, np.integer)) for node in self._members):
+            result = result.astype(np.int64)
+        return result
+
+
+def rebalance(current: Sequence[Hashable], wanted: Sequence[Hashable]) -> List[Hashable]:
+    """
+    Move an object from its *current* shard nodes to the *wanted* set with
+    the fewest transfers: shards already on a wanted node stay put, and
+    only the others are reassigned, to the wanted nodes not yet used (in
+    ring order).
+    """
+    keep = set(wanted)
+    result: List[Optional[Hashable]] = [node if node in keep else None for node in current]
+    free = iter([node for node in wanted if node not in result])
+    return [node if node is not None else next(free) for node in result]
+
+
+def plan_transfers(assignments: Mapping[str, Sequence[Hashable]], ring: PlacementRing) -> List[Transfer]:
+    """
+    Exact shard transfers that bring every object in *assignments* (name ->
+    current node per shard) onto *ring*'s placement with minimal movement.
+
+    Objects whose node set is unchanged produce no transfer; for the rest,
+    see rebalance().  Objects may have different shard counts: each group
+    of equal count is placed in one batch.
+    """
+    by_count: Dict[int, List[str]] = {}
+    for name, current in assignments.items():
+        by_count.setdefault(len(current), []).append(name)
+    wanted: Dict[str, List[Hashable]] = {}
+    for n, names in by_count.items():
+        wanted.update(zip(names, ring.place_many(names, n).tolist()))
+    transfers: List[Transfer] = []
+    for name, current in assignments.items():
+        current, target = list(current), wanted[name]
+        if set(current) == set(target):
+            continue
+        for shard, (source, dest) in enumerate(zip(current, rebalance(current, target))):
+            if source != dest:
+                transfers.append(Transfer(name, shard, source, dest))
+    return transfers
@@ -0,0 +1,164 @@
+"""
+range_reader.py
+Reads of stored VaultZero assets: byte ranges and whole ciphertexts.
+
+read_range() serves a slice of an asset without reassembling or decrypting
+the whole object: the envelope header and the AES-GCM frames covering the
+slice are located arithmetically (frames have a fixed size), only the
+matching stripe columns are read from the data shards, and only those
+frames are authenticated and decrypted.  A preview or a resumed download
+therefore costs O(range), not O(file).
+
+If a data shard is missing, its columns are decoded from parity.  If a
+frame fails authentication (a silently corrupted shard), the read is
+retried on the next subset of k shards before giving up.
+
+Column reads need the shards as local files.  Small assets keep their data
+shards in the data nodes' packfile stores, and remote nodes (see
+node_store.py) only serve whole objects; those shards are fetched whole
+and decoded in memory.  Those fetches go through the data-node read
+scheduler (read_scheduler.py): only k nodes are asked, fastest first, with
+a hedged request to a spare when one runs late.  Reads of shard files skip
+a data shard whose node the scheduler has seen turn markedly slow and
+decode from parity instead.
+"""
+
+from __future__ import annotations
+import functools
+from typing import Dict, List, Optional
+
+import config
+import latency_model
+from crypto_engine import CryptoEngine
+from erasure_coding import DATA_SHARD_MAGIC, ShardReader, decode_data_shards, reassemble_files
+from node_store import IO_LOOP, LocalNodeStore, data_node
+from read_scheduler import DATA_READS
+from shamir_handler import ShamirVault
+
+
+def data_shard_name(filename: str, node: int) -> str:
+    return f"{filename}.enc.{node}"
+
+
+def data_shard_paths(filename: str) -> Optional[List[str]]:
+    """
+    Paths of *filename*'s per-file data shards, one per data node, or None
+    if any shard is packed or lives on a remote node.
+    """
+    paths = []
+    for i in range(len(config.DATA_NODES)):
+        store = data_node(i)
+        if not isinstance(store, LocalNodeStore):
+            return None
+        name = data_shard_name(filename, i)
+        if name in store.pack:
+            return None
+        paths.append(store.file_path(name))
+    return paths
+
+
+async def _fetch(node: int, name: str) -> bytes:
+    await latency_model.get_injector().delay(node)
+    return await data_node(node).aget(name)
+
+
+def fetch_data_shards(filename: str, need: Optional[int] = None) -> List[Optional[bytes]]:
+    """
+    *filename*'s data shards fetched whole, one list slot per data node.
+
+    With *need*, only that many nodes are read (hedged, fastest first; see
+    ReadScheduler.fetch()); otherwise every node is.  Slots are None where
+    a shard was absent, unreachable or not fetched.
+    """
+    nodes = range(len(config.DATA_NODES))
+    requests = {i: functools.partial(_fetch, i, data_shard_name(filename, i)) for i in nodes}
+    got: Dict[int, bytes] = IO_LOOP.run(DATA_READS.fetch(requests, len(requests) if need is None else need))
+    return [got.get(i) for i in nodes]
+
+
+def _decode_fetched(filename: str) -> bytes:
+    shards = [raw for raw in fetch_data_shards(filename, need=config.ERASURE_K) if raw is not None]
+    if not shards:
+        raise FileNotFoundError(f"No data shards found for {filename}")
+    # Legacy headerless slices need every node; a corrupt shard needs a replacement.
+    if any(raw[:4] == DATA_SHARD_MAGIC for raw in shards):
+        try:
+            return decode_data_shards(shards)
+        except ValueError:
+            pass
+    return decode_data_shards([raw for raw in fetch_data_shards(filename) if raw is not None])
+
+
+def _preferred_paths(paths: List[str]) -> List[str]:
+    """Shard files to read: the data shards, unless the scheduler has seen one's node turn slow."""
+    nodes = list(range(len(paths)))
+    chosen = DATA_READS.pick(nodes, config.ERASURE_K, prefer=nodes[:config.ERASURE_K])
+    return [paths[i] for i in sorted(chosen)]
+
+
+def read_ciphertext(filename: str) -> memoryview:
+    """
+    The whole stored ciphertext of *filename*, rebuilt from its data shards
+    as a writable view (see CryptoEngine.decrypt_in_place()).
+
+    Raises:
+        FileNotFoundError: No data shards exist for *filename*.
+        ValueError:        Fewer than k valid shards.
+    """
+    paths = data_shard_paths(filename)
+    if paths is None:
+        return memoryview(bytearray(_decode_fetched(filename)))
+    preferred = _preferred_paths(paths)
+    if preferred != paths[:config.ERASURE_K]:
+        try:
+            return reassemble_files(preferred)
+        except (OSError, ValueError):
+            pass
+    return reassemble_files(paths)
+
+
+def read_range(filename: str, offset: int, length: int, password: Optional[str] = None,
+               active_nodes: Optional[List[bool]] = None) -> bytes:
+    """
+    Returns plaintext bytes [offset, offset + length) of a stored asset,
+    clipped at its end.
+
+    Args:
+        filename:     Asset name as registered at upload.
+        offset:       First plaintext byte.
+        length:       Number of bytes wanted.
+        password:     Asset key; reconstructed from the key shards of
+                      *active_nodes* when omitted.
+        active_nodes: Online flags used for key reconstruction (default:
+                      all nodes).
+
+    Raises:
+        FileNotFoundError: No data shards exist for *filename*.
+        ValueError:        Authentication failed on every shard subset, or
+                           fewer than k shards are available.
+    """
+    if password is None:
+        nodes = active_nodes if active_nodes is not None else [True] * len(config.KEY_NODES)
+        password = ShamirVault.reconstruct_key(filename, nodes).rstrip('\x00').strip()
+
+    paths = data_shard_paths(filename)
+    if paths is None:
+        blob = _decode_fetched(filename)
+        return CryptoEngine.decrypt_range(password, lambda start, n: blob[start:start + n], len(blob), offset, length)
+
+    with ShardReader(paths) as reader:
+        error: Optional[Exception] = None
+        # Data-heavy subsets first (no decoding), unless they include a node seen to be slow.
+        subsets = sorted(reader.subsets(),
+                         key=lambda subset: sum(DATA_READS.is_slow(i, set(reader.available) - set(subset))
+                                                for i in subset))
+        for subset in subsets:
+            try:
+                return CryptoEngine.decrypt_range(
+                    password,
+                    lambda start, n: reader.read(start, n, use=subset),
+                    reader.size, offset, length)
+            except ValueError as e:
+                error = e
+        raise error if error is not None else ValueError(
+            f"Erasure decode error: only {len(reader.available)} valid data shards, need {reader.k}")
@@ -0,0 +1,235 @@
+"""
+read_scheduler.py
+Latency-aware, hedged reads across storage nodes.
+
+Any k of the n data shards rebuild an asset, so a read never has to wait
+for a particular node.  The scheduler keeps, per node, an exponentially
+weighted moving average (EWMA) of its read latency and the p99 of a window
+of recent samples, and uses them two ways:
+
+  * requests go to the k nodes with the lowest EWMA first, so a node that
+    has turned slow drops out of the primary set after a few reads;
+  * when a primary has not answered within its own p99 -- longer than it
+    usually takes -- a hedged request goes to the fastest spare node, and
+    whichever of them answers first is used.
+
+A node that fails is replaced by a spare at once.  Requests still running
+once k answers are in are cancelled, and their elapsed time is recorded as
+a (censored) sample, so a stalled node's average rises even though it
+never answered.
+
+Hedging costs at most one extra request per slow primary and only fires
+for the slowest ~1% of requests, which is what lets it cut the tail
+without adding noticeable load.
+"""
+
+from __future__ import annotations
+import asyncio
+import collections
+import math
+import threading
+import time
+from typing import Awaitable, Callable, Deque, Dict, Iterable, List, Mapping, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+
+EWMA_ALPHA = 0.2            # weight of the newest sample
+WINDOW = 256                # samples kept per node for the p99
+MIN_SAMPLES = 8             # below this the p99 is not trusted
+INITIAL_HEDGE_S = 0.05      # hedge delay for a node without enough history
+MIN_HEDGE_S = 0.001
+SLOW_FACTOR = 4.0           # EWMA ratio at which a preferred node is passed over
+
+
+class NodeLatency:
+    """Read latency history of one node."""
+
+    def __init__(self, window: int = WINDOW) -> None:
+        self.ewma: Optional[float] = None
+        self.samples: Deque[float] = collections.deque(maxlen=window)
+        self.requests = 0
+        self.failures = 0
+        self.hedges = 0         # hedged requests fired because this node was late
+        self.hedge_wins = 0     # hedged requests to this node that beat the late primary
+        self._p99: Optional[float] = None
+
+    def record(self, seconds: float, alpha: float = EWMA_ALPHA) -> None:
+        self.ewma = seconds if self.ewma is None else alpha * seconds + (1 - alpha) * self.ewma
+        self.samples.append(seconds)
+        self._p99 = None
+
+    @property
+    def p99(self) -> Optional[float]:
+        if not self.samples:
+            return None
+        if self._p99 is None:
+            ordered = sorted(self.samples)
+            self._p99 = ordered[min(len(ordered) - 1, math.ceil(0.99 * len(ordered)) - 1)]
+        return self._p99
+
+    def as_dict(self) -> dict:
+        p99 = self.p99
+        return {
+            "ewma_ms": None if self.ewma is None else round(self.ewma * 1000, 3),
+            "p99_ms": None if p99 is None else round(p99 * 1000, 3),
+            "samples": len(self.samples),
+            "requests": self.requests,
+            "failures": self.failures,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+class ReadScheduler:
+    """
+    Orders and hedges reads across nodes by their observed latency.
+
+    Args:
+        alpha:         EWMA weight of the newest sample.
+        window:        Recent samples kept per node for the p99.
+        min_samples:   Samples needed before a node's p99 sets its hedge delay.
+        initial_hedge: Hedge delay, in seconds, for nodes with less history.
+        hedge:         False disables hedged requests (ordering still applies).
+    """
+
+    def __init__(self, alpha: float = EWMA_ALPHA, window: int = WINDOW, min_samples: int = MIN_SAMPLES,
+                 initial_hedge: float = INITIAL_HEDGE_S, hedge: bool = True) -> None:
+        if not 0 < alpha <= 1:
+            raise ValueError(f"alpha must be in (0, 1], got {alpha}")
+        self.alpha = alpha
+        self.window = window
+        self.min_samples = min_samples
+        self.initial_hedge = initial_hedge
+        self.hedge = hedge
+        self._nodes: Dict[int, NodeLatency] = {}
+        self._lock = threading.Lock()
+
+    def node(self, node: int) -> NodeLatency:
+        with self._lock:
+            latency = self._nodes.get(node)
+            if latency is None:
+                latency = self._nodes[node] = NodeLatency(self.window)
+            return latency
+
+    def record(self, node: int, seconds: float) -> None:
+        """Add one read latency sample for *node*."""
+        latency = self.node(node)
+        with self._lock:
+            latency.record(seconds, self.alpha)
+
+    def record_failure(self, node: int) -> None:
+        self._count(node, "failures")
+
+    def _count(self, node: int, counter: str) -> None:
+        latency = self.node(node)
+        with self._lock:
+            setattr(latency, counter, getattr(latency, counter) + 1)
+
+    def expected(self, node: int) -> float:
+        """EWMA latency of *node*; 0 for a node never measured, so it gets tried."""
+        ewma = self.node(node).ewma
+        return 0.0 if ewma is None else ewma
+
+    def order(self, nodes: Iterable[int]) -> List[int]:
+        """*nodes* fastest first (stable, so equal nodes keep their given order)."""
+        return sorted(nodes, key=self.expected)
+
+    def hedge_delay(self, node: int) -> float:
+        """How long a request to *node* may run before a spare is asked too."""
+        latency = self.node(node)
+        with self._lock:
+            if len(latency.samples) < self.min_samples:
+                return self.initial_hedge
+            return max(MIN_HEDGE_S, latency.p99)
+
+    def is_slow(self, node: int, alternatives: Iterable[int]) -> bool:
+        """True if *node*'s EWMA is SLOW_FACTOR times that of the fastest measured alternative."""
+        mine = self.node(node).ewma
+        others = [e for e in (self.node(n).ewma for n in alternatives if n != node) if e is not None]
+        return mine is not None and bool(others) and mine > SLOW_FACTOR * min(others)
+
+    def pick(self, nodes: Sequence[int], need: int, prefer: Sequence[int]) -> List[int]:
+        """
+        Choose *need* of *nodes* for a read that is cheapest from *prefer*
+        (e.g. the data shards, which need no decoding): a preferred node is
+        only swapped for a spare when it is markedly slower (see is_slow()).
+        """
+        chosen = [n for n in prefer if n in nodes][:need]
+        spares = self.order(n for n in nodes if n not in chosen)
+        while len(chosen) < need and spares:
+            chosen.append(spares.pop(0))
+        for i, node in enumerate(chosen):
+            if spares and self.is_slow(node, spares[:1]):
+                chosen[i] = spares.pop(0)
+        return chosen
+
+    async def fetch(self, requests: Mapping[int, Callable[[], Awaitable[T]]], need: int) -> Dict[int, T]:
+        """
+        Run the *requests* (one per node) until *need* of them succeed.
+
+        The fastest nodes are asked first; a spare is added when a request
+        fails or runs past its node's hedge delay.  Returns the successful
+        results by node -- fewer than *need* only if every node was tried.
+        """
+        spares = self.order(requests)
+        results: Dict[int, T] = {}
+        running: Dict[asyncio.Future, tuple] = {}     # task -> (node, started, hedged-for node or None)
+        late: set = set()                             # primaries a hedge was already fired for
+
+        def launch(hedge_for: Optional[int] = None) -> None:
+            node = spares.pop(0)
+            self._count(node, "requests")
+            running[asyncio.ensure_future(requests[node]())] = (node, time.perf_counter(), hedge_for)
+
+        for _ in range(min(need, len(spares))):
+            launch()
+        try:
+            while running and len(results) < need:
+                timeout = None
+                if self.hedge and spares:
+                    now = time.perf_counter()
+                    deadlines = [started + self.hedge_delay(node) - now
+                                 for node, started, _ in running.values() if node not in late]
+                    timeout = max(0.0, min(deadlines)) if deadlines else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    node, started, hedge_for = running.pop(task)
+                    try:
+                        results[node] = task.result()
+                    except Exception:
+                        self.record_failure(node)
+                        if spares and len(results) + len(running) < need:
+                            launch()
+                        continue
+                    self.record(node, time.perf_counter() - started)
+                    if hedge_for is not None and any(n == hedge_for for n, _, _ in running.values()):
+                        self._count(node, "hedge_wins")
+                if not done:
+                    now = time.perf_counter()
+                    for node, started, _ in list(running.values()):
+                        if spares and node not in late and now - started >= self.hedge_delay(node):
+                            late.add(node)
+                            self._count(node, "hedges")
+                            launch(hedge_for=node)
+        finally:
+            now = time.perf_counter()
+            for task, (node, started, _) in running.items():
+                task.cancel()
+                if now - started > self.expected(node):
+                    self.record(node, now - started)    # censored: it took at least this long
+        return results
+
+    def stats(self, nodes: Optional[Iterable[int]] = None) -> Dict[int, dict]:
+        """Latency report per node (every node seen, or the given ones)."""
+        with self._lock:
+            # Built under the lock: record() mutates the sample windows from the I/O loop.
+            ids = sorted(self._nodes) if nodes is None else list(nodes)
+            return {node: self._nodes.get(node, NodeLatency(self.window)).as_dict() for node in ids}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._nodes.clear()
+
+
+# Process-wide scheduler for data-node reads (see range_reader.py).
+DATA_READS = ReadScheduler()
@@ -6,6 +6,7 @@ Run from VaultZero-Restructured directory with venv active:
 
 import os
 import config
+import packfile
 from crypto_engine import CryptoEngine
 from shamir_handler import ShamirVault
 
@@ -51,6 +52,7 @@ print(f"[5] Full roundtrip success  —  plaintext match: {decrypted == plaintex
 for i in range(3):
     key_p = os.path.join(list(config.KEY_NODES.values())[i], f"{TEST_FILENAME}.key.{i}")
     if os.path.exists(key_p): os.remove(key_p)
+    packfile.node_store(config.KEY_NODES[i]).delete(f"{TEST_FILENAME}.key.{i}")
 print(f"[6] Test shards cleaned up  —  no leftover files")
 
 # ── Final verdict ──────────────────────────────────────────
@@ -1,11 +1,25 @@
 import os
 import hashlib
+import struct
 import asyncio
+import functools
+import hmac
 import aiofiles
-from binascii import hexlify, unhexlify
+from binascii import unhexlify
+import numpy as np
 from Crypto.Protocol.SecretSharing import Shamir
-from typing import List
+from Crypto.Random import get_random_bytes
+from typing import List, NamedTuple, Optional, Sequence, Set, Tuple, Union
 import config
+import gf256
+import latency_model
+import node_store
+import write_quorum
+
+# Share backends understood by split_key() / reconstruct_from_shares().
+# Shares from different backends live in different fields and do not mix.
+BACKEND_PYCRYPTODOME = "pycryptodome"   # GF(2^128), exactly 16-byte secrets
+BACKEND_GF256 = "gf256"                 # byte-wise GF(2^8), any length, vectorised
 
 
 # ---------------------------------------------------------------------------
@@ -27,7 +41,8 @@ def pad_to_16(data: bytes) -> bytes:
 
     For secrets longer than 16 bytes, the hash is a lossy operation. The caller
     is responsible for knowing whether the original or the hash is needed on
-    reconstruction.
+    reconstruction.  ShamirVault.split_secret() shares secrets of any length
+    losslessly and is what distribute_key_async() uses.
 
     Args:
         data: Secret bytes of any length.
@@ -58,42 +73,398 @@ def unpad_from_16(data: bytes) -> bytes:
     return data.rstrip(b'\x00')
 
 
+# ---------------------------------------------------------------------------
+# Multi-block framing for secrets of any length
+# ---------------------------------------------------------------------------
+#
+# A secret is framed as  length(2, big-endian) | secret | zero padding  and
+# cut into 16-byte blocks; every block is split independently with the same
+# share indices, and a participant's share is the concatenation of its
+# per-block shares.  Frames are at least two blocks long, so a framed share
+# (>= 32 bytes) is never confused with a legacy single-block pad_to_16 share.
+
+_BLOCK = 16
+_LEN_PREFIX = struct.Struct(">H")
+
+
+def _frame_secret(secret: bytes) -> bytes:
+    if len(secret) > 0xFFFF:
+        raise ValueError(f"Secret too long for multi-block sharing: {len(secret)} bytes (max 65535)")
+    framed = _LEN_PREFIX.pack(len(secret)) + bytes(secret)
+    blocks = max(2, -(-len(framed) // _BLOCK))
+    return framed.ljust(blocks * _BLOCK, b'\x00')
+
+
+def _unframe_secret(framed: bytes) -> bytes:
+    (length,) = _LEN_PREFIX.unpack_from(framed)
+    if length > len(framed) - _LEN_PREFIX.size:
+        raise ValueError("Reconstruction Error: corrupt secret frame (wrong or insufficient shares?)")
+    return framed[_LEN_PREFIX.size:_LEN_PREFIX.size + length]
+
+
+# ---------------------------------------------------------------------------
+# Vectorised byte-wise Shamir over GF(2^8)
+# ---------------------------------------------------------------------------
+
+# ---------------------------------------------------------------------------
+# Memoised Lagrange interpolation weights
+# ---------------------------------------------------------------------------
+#
+# A k-of-n grid only ever produces a handful of distinct share-index subsets
+# ({1,2}, {1,3}, {2,3} for 2-of-3), and the interpolation weights depend on
+# nothing else.  They are computed once per subset and every later combine is
+# a fixed multiply-accumulate over the share values.
+
+# GF(2^128) as used by PyCryptodome's Shamir: 1 + x + x^2 + x^7 + x^128,
+# elements encoded big-endian with the LSB as the constant coefficient.
+_GF128_IRR = (1 << 128) | 0x87
+
+
+def _gf128_mul(a: int, b: int) -> int:
+    z = 0
+    while b:
+        if b & 1:
+            z ^= a
+        b >>= 1
+        a <<= 1
+        if a >> 128:
+            a ^= _GF128_IRR
+    return z
+
+
+def _gf128_inv(a: int) -> int:
+    """Binary extended Euclid; a must be non-zero."""
+    if a == 0:
+        raise ZeroDivisionError("0 has no inverse in GF(2^128)")
+    u, v, g1, g2 = a, _GF128_IRR, 1, 0
+    while u != 1:
+        shift = u.bit_length() - v.bit_length()
+        if shift < 0:
+            u, v, g1, g2 = v, u, g2, g1
+            shift = -shift
+        u ^= v << shift
+        g1 ^= g2 << shift
+    return g1
+
+
+@functools.lru_cache(maxsize=256)
+def _gf128_weights(indices: Tuple[int, ...], at: int = 0) -> Tuple[int, ...]:
+    if len(set(indices)) != len(indices):
+        raise ValueError(f"Duplicate share indices: {list(indices)}")
+    weights = []
+    for i, xi in enumerate(indices):
+        num, den = 1, 1
+        for j, xj in enumerate(indices):
+            if i != j:
+                num = _gf128_mul(num, at ^ xj)
+                den = _gf128_mul(den, xi ^ xj)
+        weights.append(_gf128_mul(num, _gf128_inv(den)))
+    return tuple(weights)
+
+
+@functools.lru_cache(maxsize=256)
+def _gf256_weights(indices: Tuple[int, ...], at: int = 0) -> np.ndarray:
+    weights = gf256.lagrange_coefficients(indices, at)
+    weights.setflags(write=False)
+    return weights
+
+
+def _combine_gf128_blocks(shares: Sequence[Tuple[int, bytes]], at: int = 0) -> bytes:
+    """
+    Interpolate PyCryptodome-compatible shares (any whole number of 16-byte
+    blocks per share) at *at* with cached weights: zero gives the secret,
+    a share index gives that participant's share.
+    """
+    weights = _gf128_weights(tuple(idx for idx, _ in shares), at)
+    size = len(shares[0][1])
+    out = []
+    for off in range(0, size, _BLOCK):
+        acc = 0
+        for w, (_, data) in zip(weights, shares):
+            acc ^= _gf128_mul(w, int.from_bytes(data[off:off + _BLOCK], 'big'))
+        out.append(acc.to_bytes(_BLOCK, 'big'))
+    return b"".join(out)
+
+
+def _check_params(k: int, n: int) -> None:
+    if not 1 <= k <= n <= 255:
+        raise ValueError(f"Need 1 <= k <= n <= 255, got k={k}, n={n}")
+
+
+class GF256Shamir:
+    """
+    Byte-wise Shamir Secret Sharing over GF(2^8) with NumPy lookup tables.
+
+    Every byte of the secret is the constant term of its own random
+    polynomial of degree k-1, and share *x* holds every polynomial evaluated
+    at *x*.  All bytes (of one long secret, or of a whole array of secrets)
+    are processed in a single vectorised pass, so there is no per-secret
+    Python or PyCryptodome call overhead.
+
+    Shares use the same (index, bytes) shape as PyCryptodome's Shamir with
+    indices 1..n, but are NOT interchangeable with GF(2^128) shares.
+    """
+
+    @staticmethod
+    def split_array(secrets: np.ndarray, k: int, n: int) -> np.ndarray:
+        """
+        Split a uint8 array of any shape.
+
+        Returns:
+            uint8 array of shape (n, *secrets.shape); row i is the share with
+            index i + 1.
+        """
+        _check_params(k, n)
+        secrets = np.ascontiguousarray(secrets, dtype=np.uint8)
+        coeffs = np.empty((k,) + secrets.shape, dtype=np.uint8)
+        coeffs[0] = secrets
+        if k > 1:
+            random = get_random_bytes((k - 1) * secrets.size)
+            coeffs[1:] = np.frombuffer(random, dtype=np.uint8).reshape((k - 1,) + secrets.shape)
+        out = np.empty((n,) + secrets.shape, dtype=np.uint8)
+        for x in range(1, n + 1):
+            out[x - 1] = gf256.poly_eval(coeffs, x)
+        return out
+
+    @staticmethod
+    def combine_array(indices: Sequence[int], shares: np.ndarray) -> np.ndarray:
+        """
+        Interpolate at zero.
+
+        Args:
+            indices: Share indices (1..255), one per row of *shares*.
+            shares:  uint8 array of shape (len(indices), ...).
+
+        Returns:
+            uint8 array of shape shares.shape[1:].
+        """
+        shares = np.asarray(shares, dtype=np.uint8)
+        if len(indices) != shares.shape[0]:
+            raise ValueError(f"{len(indices)} indices for {shares.shape[0]} share rows")
+        if any(not 1 <= x <= 255 for x in indices):
+            raise ValueError(f"Share indices must be in 1..255, got {list(indices)}")
+        weights = _gf256_weights(tuple(indices))
+        return gf256.combine_rows(weights, shares)
+
+    @staticmethod
+    def split(secret: bytes, k: int = 2, n: int = 3) -> List[Tuple[int, bytes]]:
+        """Split a secret of any length into n (index, share_bytes) tuples."""
+        rows = GF256Shamir.split_array(np.frombuffer(bytes(secret), dtype=np.uint8), k, n)
+        return [(i + 1, rows[i].tobytes()) for i in range(n)]
+
+    @staticmethod
+    def combine(shares: List[Tuple[int, bytes]]) -> bytes:
+        """Recombine at least k (index, share_bytes) tuples into the secret."""
+        if len({len(data) for _, data in shares}) != 1:
+            raise ValueError("Reconstruction Error: shares have inconsistent lengths")
+        indices = [idx for idx, _ in shares]
+        rows = np.stack([np.frombuffer(data, dtype=np.uint8) for _, data in shares])
+        return GF256Shamir.combine_array(indices, rows).tobytes()
+
+
+# Synchronous facades run their coroutines on the shared node I/O loop.
+_IO_LOOP = node_store.IO_LOOP
+
+# Key-shard writes still running after a quorum acknowledgement (strong refs).
+_BACKGROUND: Set[asyncio.Future] = set()
+
+_NODE_NAMES = ["Alpha", "Beta", "Gamma"]
+
+
+# ---------------------------------------------------------------------------
+# Binary key-shard file format
+# ---------------------------------------------------------------------------
+#
+#   magic "VZKS"(4) | version(1) | scheme(1) | index(1) | threshold(1)
+#   | share_len(4, big-endian) | BLAKE2b-128 checksum(16) | share bytes
+#
+# The checksum covers the first 12 header bytes and the share, so a flipped
+# bit, a truncated file or a shard copied to the wrong node is rejected before
+# it can poison a combine.  Files that do not start with the magic are legacy
+# hex-text shards and are still readable.
+
+KEY_SHARD_MAGIC = b"VZKS"
+KEY_SHARD_VERSION = 1
+SCHEME_GF128 = 1    # PyCryptodome-compatible GF(2^128) blocks
+SCHEME_GF256 = 2    # byte-wise GF(2^8)
+_SHARD_HEADER = struct.Struct(">4sBBBBI16s")
+
+
+class KeyShard(NamedTuple):
+    index: int
+    threshold: int
+    scheme: int
+    share: bytes
+
+
+def _shard_checksum(prefix: bytes, share: bytes) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(prefix)
+    h.update(share)
+    return h.digest()
+
+
+def encode_key_shard(index: int, share: bytes, threshold: int = 2, scheme: int = SCHEME_GF128) -> bytes:
+    """Serialise one share into the binary key-shard format."""
+    prefix = struct.pack(">4sBBBBI", KEY_SHARD_MAGIC, KEY_SHARD_VERSION, scheme, index, threshold, len(share))
+    return prefix + _shard_checksum(prefix, share) + bytes(share)
+
+
+def decode_key_shard(raw: bytes, node: Optional[int] = None) -> KeyShard:
+    """
+    Parse a key-shard file in one pass.
+
+    Binary shards are checksum-verified; legacy hex-text shards are decoded
+    with index = node + 1, threshold 2 and the GF(2^128) scheme.
+
+    Args:
+        raw:  Full file contents.
+        node: 0-based node the file was read from.  Required for legacy
+              shards; for binary shards the stored index must match it.
+
+    Raises:
+        ValueError: If the shard is corrupt, truncated or misplaced.
+    """
+    if raw[:4] == KEY_SHARD_MAGIC:
+        if len(raw) < _SHARD_HEADER.size:
+            raise ValueError("Corrupt key shard: truncated header")
+        _, version, scheme, index, threshold, length, checksum = _SHARD_HEADER.unpack_from(raw)
+        if version != KEY_SHARD_VERSION:
+            raise ValueError(f"Corrupt key shard: unsupported version {version}")
+        share = raw[_SHARD_HEADER.size:]
+        if len(share) != length:
+            raise ValueError(f"Corrupt key shard: expected {length} share bytes, found {len(share)}")
+        if not hmac.compare_digest(checksum, _shard_checksum(raw[:12], share)):
+            raise ValueError("Corrupt key shard: checksum mismatch")
+        if node is not None and index != node + 1:
+            raise ValueError(f"Corrupt key shard: index {index} stored on node {node}")
+        return KeyShard(index, threshold, scheme, bytes(share))
+
+    if node is None:
+        raise ValueError("Legacy hex key shards need the node they were read from")
+    try:
+        share = unhexlify(raw.strip())
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Corrupt key shard: not binary and not legacy hex ({e})")
+    return KeyShard(node + 1, 2, SCHEME_GF128, share)
+
+
+def migrate_key_shard(path: str, node: int) -> bool:
+    """
+    Rewrite a legacy hex shard at *path* in the binary format.
+
+    Returns:
+        True if the file was migrated, False if it was already binary.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    if raw[:4] == KEY_SHARD_MAGIC:
+        return False
+    shard = decode_key_shard(raw, node)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(encode_key_shard(shard.index, shard.share, shard.threshold, shard.scheme))
+    os.replace(tmp, path)
+    return True
+
+
+def _key_shard_name(filename: str, node: int) -> str:
+    return f"{filename}.key.{node}"
+
+
+class ReconstructionResult(NamedTuple):
+    """
+    Outcome of a quorum read.
+
+    ``degraded`` is set when a shard was missing, corrupt or unreachable but
+    the fastest online nodes still met the threshold; ``cancelled`` lists
+    nodes whose reads were abandoned once the quorum was in hand.
+    """
+    secret: bytes
+    legacy: bool
+    nodes_used: List[str]
+    missing: List[str]
+    corrupt: List[str]
+    unreachable: List[str]
+    cancelled: List[str]
+
+    @property
+    def degraded(self) -> bool:
+        return bool(self.missing or self.corrupt or self.unreachable)
+
+    def as_key(self) -> str:
+        """Decode the secret as the UTF-8 key string."""
+        try:
+            # Legacy pad_to_16 shards keep their historical whitespace strip;
+            # callers still rstrip the null padding themselves.
+            return self.secret.strip().decode('utf-8') if self.legacy else self.secret.decode('utf-8')
+        except Exception as e:
+            raise ValueError(f"Reconstruction Error: {str(e)}")
+
+
 class ShamirVault:
     @staticmethod
-    async def async_write_shard(path: str, data: bytes) -> None:
-        """Async write with 10ms simulated latency."""
-        await asyncio.sleep(0.01)
-        async with aiofiles.open(path, "w") as f:
-            await f.write(hexlify(data).decode('utf-8'))
+    async def async_write_shard(path: str, data: bytes, node_id: Optional[int] = None) -> None:
+        """
+        Async shard write of an already-encoded record (see encode_key_shard).
+
+        Node latency and faults come from the configured injector
+        (``config.NODE_LATENCY``, zero by default) instead of a fixed sleep.
+        """
+        await latency_model.get_injector().delay(node_id)
+        async with aiofiles.open(path, "wb") as f:
+            await f.write(data)
+
+    @staticmethod
+    async def _write_key_shard(filename: str, node: int, data: bytes, sync: bool = False) -> None:
+        """Store one encoded key shard on its key node (on stable storage with *sync*)."""
+        await latency_model.get_injector().delay(node)
+        await node_store.key_node(node).aput(_key_shard_name(filename, node), data, sync)
+
+    @staticmethod
+    async def distribute_key(secret_key: str, filename: str, active_nodes: List[bool],
+                             write_quorum: Optional[int] = None) -> Union[bool, "write_quorum.WriteTracker"]:
+        """
+        Async-native key distribution; runs on the caller's event loop.
+
+        The password is shared losslessly with multi-block Shamir, so keys
+        longer than 16 bytes are reconstructed exactly (no SHA-256 truncation).
+        """
+        return await ShamirVault.distribute_secret(secret_key.encode('utf-8'), filename, active_nodes,
+                                                   write_quorum)
 
     @staticmethod
-    def distribute_key_async(secret_key: str, filename: str, active_nodes: List[bool]) -> bool:
-        """Splits master key into shards and distributes to key_storage nodes."""
+    async def distribute_secret(secret: bytes, filename: str, active_nodes: List[bool],
+                                write_quorum: Optional[int] = None) -> Union[bool, "write_quorum.WriteTracker"]:
+        """
+        Splits an arbitrary-length secret (e.g. the 32-byte derived AES key)
+        into 2-of-3 multi-block shards and stores them on the online key
+        nodes concurrently on the caller's event loop.
+
+        Sharing the derived key instead of the password lets reassembly call
+        CryptoEngine.decrypt_with_key() and skip the 100k-iteration KDF.
+
+        With *write_quorum* (>= 2) this returns once that many shards are
+        stored and fsynced; the remaining writes keep running on the loop,
+        with retries, tracked under *filename* (see write_quorum.py).  They
+        only finish if the loop outlives the call, as the shared loop behind
+        the synchronous facades does.
+
+        Returns:
+            True, or with *write_quorum* the WriteTracker following the
+            shard writes (e.g. to learn which nodes' writes failed).
+        """
         try:
-            key_bytes: bytes = secret_key.encode('utf-8')
-            # Fix 7: use pad_to_16 so any password length is handled correctly.
-            # Keys <= 16 bytes are null-padded; keys > 16 bytes are hashed to 16 bytes.
-            padded_key: bytes = pad_to_16(key_bytes)
-            if len(padded_key) != 16:
-                raise ValueError(
-                    f"Secret must be exactly 16 bytes, got {len(padded_key)} bytes. "
-                    f"Pad or hash your secret to 16 bytes before splitting. "
-                    f"Example: import hashlib; secret_16 = hashlib.sha256(your_secret).digest()[:16]"
-                )
-            shares = Shamir.split(2, 3, padded_key)
-
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-
-            tasks = []
-            for idx, share_data in shares:
-                if active_nodes[idx-1]:
-                    path = os.path.join(config.KEY_NODES[idx-1], f"{filename}.key.{idx-1}")
-                    tasks.append(ShamirVault.async_write_shard(path, share_data))
-
-            if tasks:
-                loop.run_until_complete(asyncio.gather(*tasks))
-            loop.close()
+            shares = ShamirVault.split_secret(secret, 2, 3)
+            writes = [
+                (idx - 1, encode_key_shard(idx, share_data, 2))
+                for idx, share_data in shares
+                if active_nodes[idx - 1]
+            ]
+            if write_quorum is not None:
+                return await ShamirVault._distribute_quorum(filename, writes, write_quorum)
+            if writes:
+                await asyncio.gather(*(ShamirVault._write_key_shard(filename, node, data) for node, data in writes))
             return True
         except ValueError:
             raise
@@ -101,25 +472,81 @@ class ShamirVault:
             raise ValueError(f"Sharding Error: {str(e)}")
 
     @staticmethod
-    def split_key(secret: bytes, k: int = 2, n: int = 3) -> list:
+    async def _distribute_quorum(filename: str, writes: List[Tuple[int, bytes]],
+                                 quorum: int) -> "write_quorum.WriteTracker":
+        write_quorum.check_quorum(quorum, 2, len(writes))
+        tracker = write_quorum.WriteTracker(filename, [node for node, _ in writes], quorum)
+
+        async def write(node: int, data: bytes) -> None:
+            try:
+                # Synced: an acknowledged shard may be the only copy that ever lands.
+                await write_quorum.retry_async(lambda: ShamirVault._write_key_shard(filename, node, data, True),
+                                               config.WRITE_RETRIES, config.WRITE_RETRY_BACKOFF)
+            except BaseException as e:
+                tracker.fail(node, e)
+                if not isinstance(e, Exception):
+                    raise
+            else:
+                tracker.succeeded(node)
+
+        pending = {asyncio.ensure_future(write(node, data)) for node, data in writes}
+        while pending and not (tracker.acknowledged or tracker.quorum_lost):
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        if not tracker.acknowledged:
+            raise tracker.error()
+        _BACKGROUND.update(pending)
+        for task in pending:
+            task.add_done_callback(_BACKGROUND.discard)
+        tracker.detach()
+        return tracker
+
+    @staticmethod
+    def distribute_key_async(secret_key: str, filename: str, active_nodes: List[bool],
+                             write_quorum: Optional[int] = None) -> Union[bool, "write_quorum.WriteTracker"]:
+        """
+        Splits master key into shards and distributes to key_storage nodes.
+
+        Synchronous facade over distribute_key(); the shard writes run on a
+        shared long-lived background loop, not a loop created per call.
+        """
+        return _IO_LOOP.run(ShamirVault.distribute_key(secret_key, filename, active_nodes, write_quorum))
+
+    @staticmethod
+    def distribute_secret_async(secret: bytes, filename: str, active_nodes: List[bool],
+                                write_quorum: Optional[int] = None) -> Union[bool, "write_quorum.WriteTracker"]:
+        """Synchronous facade over distribute_secret() (shared background loop)."""
+        return _IO_LOOP.run(ShamirVault.distribute_secret(secret, filename, active_nodes, write_quorum))
+
+    @staticmethod
+    def split_key(secret: bytes, k: int = 2, n: int = 3, backend: str = BACKEND_PYCRYPTODOME) -> list:
         """
         In-memory Shamir split with strict 16-byte validation.
 
-        Unlike distribute_key_async() (which auto-pads), this method requires
-        an exact 16-byte secret and raises ValueError otherwise. Use pad_to_16()
-        before calling if your secret is a different length.
+        Unlike distribute_key_async() (which frames secrets of any length),
+        this method requires an exact 16-byte secret and raises ValueError
+        otherwise. Use pad_to_16() before calling, or split_secret() for a
+        lossless multi-block split.
+
+        With backend=BACKEND_GF256 the secret may have any length and is
+        split byte-wise by GF256Shamir; reconstruct with the same backend.
 
         Args:
-            secret: Exactly 16 bytes.
-            k:      Threshold (default 2).
-            n:      Total shares (default 3).
+            secret:  Exactly 16 bytes (any length for the gf256 backend).
+            k:       Threshold (default 2).
+            n:       Total shares (default 3).
+            backend: BACKEND_PYCRYPTODOME (default) or BACKEND_GF256.
 
         Returns:
             List of (index, share_bytes) tuples.
 
         Raises:
-            ValueError: If len(secret) != 16.
+            ValueError: If len(secret) != 16 (pycryptodome backend) or the
+                        backend is unknown.
         """
+        if backend == BACKEND_GF256:
+            return GF256Shamir.split(secret, k, n)
+        if backend != BACKEND_PYCRYPTODOME:
+            raise ValueError(f"Unknown Shamir backend: {backend!r}")
         if len(secret) != 16:
             raise ValueError(
                 f"Secret must be exactly 16 bytes, got {len(secret)} bytes. "
@@ -129,7 +556,7 @@ class ShamirVault:
         return list(Shamir.split(k, n, secret))
 
     @staticmethod
-    def reconstruct_from_shares(shares: list) -> bytes:
+    def reconstruct_from_shares(shares: list, backend: str = BACKEND_PYCRYPTODOME) -> bytes:
         """
         In-memory Shamir reconstruction from a list of (index, bytes) tuples.
 
@@ -137,41 +564,324 @@ class ShamirVault:
         reconstruction see reconstruct_key().
 
         Args:
-            shares: List of (index, share_bytes) tuples (at least k of them).
+            shares:  List of (index, share_bytes) tuples (at least k of them).
+            backend: Must match the backend the shares were split with.
 
         Returns:
-            Reconstructed 16-byte secret.
+            Reconstructed secret (16 bytes for the pycryptodome backend).
         """
-        return Shamir.combine(shares)
+        if backend == BACKEND_GF256:
+            return GF256Shamir.combine(shares)
+        if backend != BACKEND_PYCRYPTODOME:
+            raise ValueError(f"Unknown Shamir backend: {backend!r}")
+        if any(len(data) != _BLOCK for _, data in shares):
+            raise ValueError("PyCryptodome shares must be exactly 16 bytes")
+        return _combine_gf128_blocks(shares)
 
     @staticmethod
-    def reconstruct_key(filename: str, active_nodes: List[bool]) -> str:
-        """Reconstructs key and identifies missing shards across the grid."""
-        shares = []
-        missing_shards = []
-        node_names = ["Alpha", "Beta", "Gamma"]
+    def lagrange_cache_info() -> dict:
+        """
+        Hit/miss counters of the memoised Lagrange weights, per backend.
+
+        Returns:
+            {'pycryptodome': {...}, 'gf256': {...}} with 'hits', 'misses'
+            and 'entries' for each.
+        """
+        def _info(fn) -> dict:
+            ci = fn.cache_info()
+            return {'hits': ci.hits, 'misses': ci.misses, 'entries': ci.currsize}
+        return {BACKEND_PYCRYPTODOME: _info(_gf128_weights), BACKEND_GF256: _info(_gf256_weights)}
+
+    @staticmethod
+    def clear_lagrange_cache() -> None:
+        """Drop all memoised Lagrange weights and reset the counters."""
+        _gf128_weights.cache_clear()
+        _gf256_weights.cache_clear()
 
-        for i in range(3):
-            path = os.path.join(config.KEY_NODES[i], f"{filename}.key.{i}")
+    @staticmethod
+    def split_keys_batch(secrets: Union[Sequence[bytes], np.ndarray],
+                         k: int = 2, n: int = 3) -> List[Tuple[int, np.ndarray]]:
+        """
+        Split many equal-length secrets in one vectorised GF(256) call.
 
-            # Check if file exists physically on disk
-            if not os.path.exists(path):
-                missing_shards.append(node_names[i])
-                continue
+        Bulk ingest and key-rotation jobs should use this instead of calling
+        split_key() per file: the per-call Python overhead is paid once for
+        the whole batch.
 
-            # Only add to reconstruction if node is logically ONLINE in dashboard
-            if active_nodes[i]:
-                with open(path, "r") as f:
-                    shares.append((i + 1, unhexlify(f.read().strip())))
+        Args:
+            secrets: Sequence of m equal-length byte strings, or a uint8
+                     array of shape (m, L).
+            k:       Threshold (default 2).
+            n:       Total shares (default 3).
 
-        # If any shards are physically missing, notify the user immediately
-        if missing_shards:
-            raise FileNotFoundError(f"Missing Shards Detected: Node(s) {', '.join(missing_shards)}")
+        Returns:
+            List of n (index, buffer) tuples; each buffer is a contiguous
+            uint8 array of shape (m, L) whose row j is that index's share of
+            secret j.  Reconstruct with reconstruct_batch().
 
-        if len(shares) < 2:
-            raise ValueError(f"QUORUM FAILURE: Only {len(shares)} nodes online. Need 2.")
+        Raises:
+            ValueError: If the secrets do not all have the same length.
+        """
+        if isinstance(secrets, np.ndarray):
+            matrix = np.ascontiguousarray(secrets, dtype=np.uint8)
+            if matrix.ndim != 2:
+                raise ValueError(f"secrets array must be 2-D (m, L), got shape {matrix.shape}")
+        else:
+            lengths = {len(s) for s in secrets}
+            if len(lengths) > 1:
+                raise ValueError(f"All secrets in a batch must have the same length, got {sorted(lengths)}")
+            width = lengths.pop() if lengths else 0
+            matrix = np.frombuffer(b"".join(secrets), dtype=np.uint8).reshape(len(secrets), width)
+        rows = GF256Shamir.split_array(matrix, k, n)
+        return [(i + 1, rows[i]) for i in range(n)]
+
+    @staticmethod
+    def reconstruct_batch(share_sets: Sequence[Tuple[int, Union[bytes, np.ndarray]]],
+                          secret_len: Optional[int] = None) -> np.ndarray:
+        """
+        Reconstruct a whole batch from at least k of the buffers returned by
+        split_keys_batch().
+
+        The Lagrange weights depend only on the set of share indices, so they
+        are computed once and applied to every secret in the batch.
+
+        Args:
+            share_sets: (index, buffer) tuples, one per share index.  Buffers
+                        are (m, L) arrays, or flat bytes of length m * L when
+                        *secret_len* is given.
+            secret_len: Length L of each secret; needed for flat buffers only.
+
+        Returns:
+            uint8 array of shape (m, L); ``result[j].tobytes()`` is secret j.
+        """
+        indices = [idx for idx, _ in share_sets]
+        buffers = []
+        for _, buf in share_sets:
+            arr = buf if isinstance(buf, np.ndarray) else np.frombuffer(buf, dtype=np.uint8)
+            if arr.ndim == 1:
+                if not secret_len:
+                    raise ValueError("secret_len is required for flat share buffers")
+                arr = arr.reshape(-1, secret_len)
+            buffers.append(arr)
+        if len({b.shape for b in buffers}) != 1:
+            raise ValueError("Reconstruction Error: share buffers have inconsistent shapes")
+        return GF256Shamir.combine_array(indices, np.stack(buffers))
+
+    @staticmethod
+    def split_secret(secret: bytes, k: int = 2, n: int = 3) -> List[Tuple[int, bytes]]:
+        """
+        In-memory Shamir split of a secret of any length (up to 65535 bytes).
+
+        The secret is framed with its length, padded to whole 16-byte blocks
+        and every block is shared under the same indices.  Each returned share
+        is the concatenation of that participant's block shares.
+
+        Args:
+            secret: Secret bytes of any length (e.g. a 32-byte AES key).
+            k:      Threshold (default 2).
+            n:      Total shares (default 3).
+
+        Returns:
+            List of (index, share_bytes) tuples; share length is a multiple
+            of 16 and at least 32.
+        """
+        framed = _frame_secret(secret)
+        per_index = {i: [] for i in range(1, n + 1)}
+        for off in range(0, len(framed), _BLOCK):
+            for idx, block_share in Shamir.split(k, n, framed[off:off + _BLOCK]):
+                per_index[idx].append(block_share)
+        return [(idx, b"".join(parts)) for idx, parts in per_index.items()]
+
+    @staticmethod
+    def combine_secret(shares: List[Tuple[int, bytes]]) -> bytes:
+        """
+        Inverse of split_secret(): combines at least k multi-block shares and
+        returns the exact original secret.
 
+        Raises:
+            ValueError: If share lengths disagree or are not whole blocks.
+        """
+        lengths = {len(data) for _, data in shares}
+        if len(lengths) != 1 or lengths.pop() % _BLOCK:
+            raise ValueError("Reconstruction Error: shares have inconsistent or partial block lengths")
+        return _unframe_secret(_combine_gf128_blocks(shares))
+
+    @staticmethod
+    async def _read_key_shard(filename: str, node: int) -> KeyShard:
+        """
+        Read and validate one node's key shard (after the injected node delay):
+        one get from the node's store (see node_store.py).
+        """
+        await latency_model.get_injector().delay(node)
+        raw = await node_store.key_node(node).aget(_key_shard_name(filename, node))
+        return decode_key_shard(raw, node)
+
+    @staticmethod
+    async def _key_shard_missing(filename: str, node: int) -> bool:
+        """True if *node* positively has no key shard for *filename* (a stat, not a read)."""
+        try:
+            await node_store.key_node(node).astat(_key_shard_name(filename, node))
+        except FileNotFoundError:
+            return True
+        except (OSError, ValueError):
+            pass
+        return False
+
+    @staticmethod
+    async def reconstruct_quorum(filename: str, active_nodes: List[bool]) -> ReconstructionResult:
+        """
+        Reads the shards of all online nodes concurrently and combines as soon
+        as the first *threshold* valid shares arrive; slower reads are cancelled.
+
+        Missing, corrupt or unreachable shards do not fail the call while a
+        quorum remains -- they are reported on the (degraded) result instead.
+        The nodes whose reads were cancelled are stat'ed, so a missing shard
+        is reported however soon the quorum completed.
+
+        Raises:
+            FileNotFoundError: Quorum lost and at least one shard file is missing.
+            ValueError:        Quorum lost otherwise, or the shares do not combine.
+        """
+        tasks = {
+            asyncio.ensure_future(ShamirVault._read_key_shard(filename, i)): i
+            for i in range(len(_NODE_NAMES)) if active_nodes[i]
+        }
+        shards: List[KeyShard] = []
+        missing, corrupt, unreachable = [], [], []
+        threshold = 2
+        pending = set(tasks)
+        try:
+            while pending and len(shards) < threshold:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = _NODE_NAMES[tasks[task]]
+                    try:
+                        shard = task.result()
+                    except FileNotFoundError:
+                        missing.append(name)
+                    except ValueError:
+                        corrupt.append(name)
+                    except OSError:
+                        unreachable.append(name)
+                    else:
+                        shards.append(shard)
+                        threshold = max(threshold, shard.threshold)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        stragglers = sorted(tasks[task] for task in pending)
+        if stragglers:
+            absent = await asyncio.gather(*(ShamirVault._key_shard_missing(filename, i) for i in stragglers))
+            missing += [_NODE_NAMES[i] for i, gone in zip(stragglers, absent) if gone]
+            stragglers = [i for i, gone in zip(stragglers, absent) if not gone]
+
+        if len(shards) < threshold:
+            detail = f" Corrupt shard(s) rejected: {', '.join(corrupt)}." if corrupt else ""
+            if unreachable:
+                detail += f" Unreachable: {', '.join(unreachable)}."
+            message = f"QUORUM FAILURE: Only {len(shards)} nodes online. Need {threshold}.{detail}"
+            if missing:
+                raise FileNotFoundError(f"Missing Shards Detected: Node(s) {', '.join(missing)}. {message}")
+            raise ValueError(message)
+
+        # Present shares in index order so the Lagrange weight cache sees one key per subset.
+        shards.sort(key=lambda shard: shard.index)
+        secret, legacy = ShamirVault._combine_any([(shard.index, shard.share) for shard in shards])
+        return ReconstructionResult(
+            secret=secret,
+            legacy=legacy,
+            nodes_used=[_NODE_NAMES[shard.index - 1] for shard in shards],
+            missing=missing,
+            corrupt=corrupt,
+            unreachable=unreachable,
+            cancelled=[_NODE_NAMES[i] for i in stragglers],
+        )
+
+    @staticmethod
+    async def rebuild_key_shard(filename: str, node: int, active_nodes: List[bool]) -> int:
+        """
+        Regenerate *node*'s lost key shard from the other online nodes.
+
+        The shares are points on the sharing polynomial(s), so Lagrange
+        interpolation of *threshold* of them evaluated at the missing index
+        (node + 1) gives exactly the share that was lost.  No new randomness
+        is drawn, so every existing shard stays valid.
+
+        Returns:
+            Bytes read plus bytes written.
+
+        Raises:
+            ValueError: Fewer than *threshold* valid shards on the other nodes.
+        """
+        others = [i for i in range(len(_NODE_NAMES)) if i != node and active_nodes[i]]
+        results = await asyncio.gather(*(ShamirVault._read_key_shard(filename, i) for i in others),
+                                       return_exceptions=True)
+        shards = [r for r in results if isinstance(r, KeyShard)]
+        threshold = max([2] + [shard.threshold for shard in shards])
+        if len(shards) < threshold:
+            raise ValueError(f"Cannot rebuild key shard {node} of {filename!r}: "
+                             f"{len(shards)} valid shard(s) on other nodes, need {threshold}")
+        shards = sorted(shards, key=lambda shard: shard.index)[:threshold]
+        if len({(shard.scheme, len(shard.share)) for shard in shards}) > 1:
+            raise ValueError(f"Cannot rebuild key shard {node} of {filename!r}: shards from different splits")
+        scheme = shards[0].scheme
+        points = [(shard.index, shard.share) for shard in shards]
+        if scheme == SCHEME_GF256:
+            rows = np.stack([np.frombuffer(share, dtype=np.uint8) for _, share in points])
+            share = gf256.combine_rows(_gf256_weights(tuple(i for i, _ in points), node + 1), rows).tobytes()
+        else:
+            share = _combine_gf128_blocks(points, node + 1)
+        data = encode_key_shard(node + 1, share, threshold, scheme)
+        await ShamirVault._write_key_shard(filename, node, data, sync=True)
+        return sum(len(s) for _, s in points) + len(data)
+
+    @staticmethod
+    def repair_key_shard(filename: str, node: int, active_nodes: List[bool]) -> int:
+        """Synchronous facade over rebuild_key_shard() (shared background loop)."""
+        return _IO_LOOP.run(ShamirVault.rebuild_key_shard(filename, node, active_nodes))
+
+    @staticmethod
+    def _combine_any(shares: List[Tuple[int, bytes]]) -> Tuple[bytes, bool]:
+        """Combine legacy single-block or framed multi-block shares; returns (secret, is_legacy)."""
         try:
-            return Shamir.combine(shares).strip().decode('utf-8')
+            if all(len(data) == _BLOCK for _, data in shares):
+                return _combine_gf128_blocks(shares), True
+            return ShamirVault.combine_secret(shares), False
         except Exception as e:
             raise ValueError(f"Reconstruction Error: {str(e)}")
+
+    @staticmethod
+    def reconstruct_secret(filename: str, active_nodes: List[bool]) -> bytes:
+        """
+        Reconstructs the exact secret bytes written by distribute_secret_async().
+
+        Legacy single-block shards are returned as their raw 16-byte block.
+        """
+        return ShamirVault.reconstruct_key_detailed(filename, active_nodes).secret
+
+    @staticmethod
+    def reconstruct_key_detailed(filename: str, active_nodes: List[bool]) -> ReconstructionResult:
+        """Synchronous facade over reconstruct_quorum() (shared background loop)."""
+        return _IO_LOOP.run(ShamirVault.reconstruct_quorum(filename, active_nodes))
+
+    @staticmethod
+    def reconstruct_key(filename: str, active_nodes: List[bool]) -> str:
+        """
+        Reconstructs the key from the fastest quorum of online nodes.
+
+        A missing or corrupt shard no longer fails the call while a quorum
+        remains; use reconstruct_key_detailed() to see which nodes degraded.
+        """
+        return ShamirVault.reconstruct_key_detailed(filename, active_nodes).as_key()
+
+    @staticmethod
+    async def reconstruct_secret_async(filename: str, active_nodes: List[bool]) -> bytes:
+        """Async-native reconstruct_secret(); runs on the caller's event loop."""
+        return (await ShamirVault.reconstruct_quorum(filename, active_nodes)).secret
+
+    @staticmethod
+    async def reconstruct_key_async(filename: str, active_nodes: List[bool]) -> str:
+        """Async-native reconstruct_key(); runs on the caller's event loop."""
+        return (await ShamirVault.reconstruct_quorum(filename, active_nodes)).as_key()
@@ -11,7 +11,13 @@ or the key required to reconstruct it.
 """
 
 from __future__ import annotations
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from catalog import Catalog
+from placement import PlacementRing
+from read_scheduler import DATA_READS, ReadScheduler
 
 
 class ShardManager:
@@ -27,29 +33,43 @@ class ShardManager:
     Zero-trust guarantee: no single node holds enough information to reconstruct
     the secret; at least *threshold* nodes must be healthy simultaneously.
 
-    IMPORTANT — In-Memory Simulation
+    IMPORTANT — State and Persistence
     ---------------------------------
-    This class manages shard state in **memory only**.  All shard data and
-    node-health state are lost when the process exits or restarts.
-
-    In production, shards must be persisted to the ``config.KEY_NODES`` paths
-    via ``ShamirVault.distribute_key_async()``.  This in-memory implementation
-    is intentionally provided for unit testing and algorithmic validation only.
-
-    To bridge the gap to the persistence layer, call ``log_to_audit()`` with a
-    ``DBHandler`` instance (from ``ops/audit_ledger.py``) after each state
-    change.  When called without an argument (default ``None``), ``log_to_audit``
-    prints a reminder that state is ephemeral.
+    Shard payloads are only ever held in memory; in production they must be
+    persisted to the ``config.KEY_NODES`` paths via
+    ``ShamirVault.distribute_key_async()``.
+
+    Object placements and node health persist when a ``Catalog`` (catalog.py)
+    is passed: they are loaded from it on construction and every change is
+    written through, so a restart restores them without rescanning the node
+    directories.  Without a catalog they too live in memory only and are
+    lost when the process exits, which suits unit tests and algorithmic
+    validation.
+
+    To forward state changes to the forensic audit trail, call
+    ``log_to_audit()`` with a ``DBHandler`` instance (from
+    ``ops/audit_ledger.py``).  Called without one (default ``None``), it
+    prints where the manager's state is kept.
     """
 
-    def __init__(self, n_nodes: int = 3, threshold: int = 2) -> None:
+    def __init__(self, n_nodes: int = 3, threshold: int = 2,
+                 read_scheduler: Optional[ReadScheduler] = None,
+                 placement: Optional[PlacementRing] = None,
+                 catalog: Optional[Catalog] = None) -> None:
         """
         Args:
             n_nodes:   Total number of storage nodes (default 3).
             threshold: Minimum nodes required for reconstruction (default 2).
+            read_scheduler: Source of per-node read latency (default: the
+                       process-wide data-node scheduler, read_scheduler.DATA_READS).
+            placement: Hash ring used to place an object's shards (default:
+                       equal weights over node IDs 0..n_nodes-1).
+            catalog:   Optional persistent catalog to restore state from and
+                       record changes to.
 
         Raises:
-            ValueError: If threshold > n_nodes or either value is < 1.
+            ValueError: If threshold > n_nodes or either value is < 1, or if
+                        *placement* names a node outside 0..n_nodes-1.
         """
         if n_nodes < 1:
             raise ValueError(f"n_nodes must be >= 1, got {n_nodes}")
@@ -59,45 +79,179 @@ class ShardManager:
             )
         self.n_nodes   = n_nodes
         self.threshold = threshold
-        # Internal state: node_id → {'status': 'healthy'|'failed', 'shard': bytes|None}
-        self._nodes: Dict[int, dict] = {
-            i: {'status': 'healthy', 'shard': None}
-            for i in range(n_nodes)
-        }
+        self.read_scheduler = read_scheduler if read_scheduler is not None else DATA_READS
+        self.placement = placement if placement is not None else PlacementRing(range(n_nodes))
+        unknown = [node for node in self.placement.nodes if node not in range(n_nodes)]
+        if unknown:
+            raise ValueError(f"Placement ring has nodes outside 0..{n_nodes - 1}: {unknown}")
+        # Node state, indexed by node_id: a health bitmap with its popcount
+        # kept up to date, and the shard held (distribute_shards without object_id).
+        self._healthy = np.ones(n_nodes, dtype=bool)
+        self._healthy_count = n_nodes
+        self._shards: List[object] = [None] * n_nodes
+        # Object placements: row i holds the node of each shard of object
+        # _row_names[i] (-1 for a missing shard, or padding).
+        self._object_rows: Dict[str, int] = {}
+        self._row_names: List[str] = []
+        self._placements = np.full((0, 0), -1, dtype=np.int32)
+        self.catalog = catalog
+        if catalog is not None:
+            state = catalog.load()
+            if state.names:
+                self._store_objects(state.names, self._check_placements(state.names, state.nodes))
+            for node_id, healthy in state.health.items():
+                if 0 <= node_id < n_nodes and not healthy:
+                    self._set_health(node_id, False, persist=False)
 
     # ------------------------------------------------------------------
     # Shard distribution
     # ------------------------------------------------------------------
 
-    def distribute_shards(self, shards: list) -> Dict[int, object]:
+    def distribute_shards(self, shards: list, object_id: Optional[str] = None) -> Dict[int, object]:
         """
-        Assign shards to node IDs in round-robin order.
+        Assign shards to node IDs.
+
+        Without *object_id* the shards go to nodes 0, 1, ... in round-robin
+        order.  With it, they go to the distinct nodes the placement ring
+        picks for that object, so objects spread across a pool larger than
+        their shard count and a membership change only moves ~1/N of them.
 
         The number of shards should equal n_nodes (one per node), but this
         method handles mismatches gracefully by capping at min(len(shards), n_nodes).
 
         Args:
-            shards: List of shard objects (bytes or tuples) produced by ShamirVault.
+            shards:    List of shard objects (bytes or tuples) produced by ShamirVault.
+            object_id: Optional object name to place by consistent hashing.
 
         Returns:
             {node_id: shard} mapping for all nodes that received a shard.
         """
+        shards = list(shards)[:self.n_nodes]
+        if object_id is None or not shards:
+            targets = range(self.n_nodes)
+        else:
+            targets = self.placement.place(object_id, min(len(shards), len(self.placement)))
         result: Dict[int, object] = {}
-        for node_id, shard in zip(range(self.n_nodes), shards):
-            self._nodes[node_id]['shard'] = shard
+        for node_id, shard in zip(targets, shards):
+            self._shards[node_id] = shard
             result[node_id] = shard
+        if object_id is not None:
+            self.register_object(object_id, list(result))
         return result
 
+    def register_object(self, object_id: str, nodes: Sequence[int]) -> None:
+        """
+        Record that *object_id*'s shards live on *nodes* (shard i on nodes[i]),
+        replacing any earlier placement of it.
+
+        Raises:
+            KeyError: If a node does not exist.
+        """
+        self.register_objects([object_id], [list(nodes)])
+
+    def register_objects(self, object_ids: Sequence[str], nodes) -> None:
+        """
+        Bulk register_object(): *nodes* is an (objects x shards) array-like
+        of node IDs, padded with -1 for objects with fewer shards.
+
+        Raises:
+            KeyError: If a node does not exist.
+        """
+        if not len(object_ids):
+            return
+        nodes = self._check_placements(object_ids, nodes)
+        if self.catalog is not None:
+            self.catalog.record_many(object_ids, nodes)
+        self._store_objects(object_ids, nodes)
+
+    def _check_placements(self, object_ids: Sequence[str], nodes) -> np.ndarray:
+        nodes = np.asarray(nodes, dtype=np.int32).reshape(len(object_ids), -1)
+        if nodes.size and (nodes.min() < -1 or nodes.max() >= self.n_nodes):
+            bad = nodes[(nodes < -1) | (nodes >= self.n_nodes)][0]
+            raise KeyError(f"Node {bad} does not exist (n_nodes={self.n_nodes})")
+        return nodes
+
+    def _store_objects(self, object_ids: Sequence[str], nodes: np.ndarray) -> None:
+        if not len(object_ids):
+            return
+        if not self._row_names:
+            # Fresh manager (e.g. restoring a catalog): adopt the batch as is.
+            rows = dict(zip(object_ids, range(len(object_ids))))
+            if len(rows) == len(object_ids):
+                self._object_rows, self._row_names = rows, list(object_ids)
+                self._placements = np.array(nodes, dtype=np.int32)
+                return
+        for object_id in object_ids:
+            if object_id not in self._object_rows:
+                self._object_rows[object_id] = len(self._row_names)
+                self._row_names.append(object_id)
+        rows = np.fromiter((self._object_rows[o] for o in object_ids), dtype=np.int64, count=len(object_ids))
+        have_rows, have_width = self._placements.shape
+        need_rows, need_width = len(self._object_rows), max(have_width, nodes.shape[1])
+        if need_rows > have_rows or need_width > have_width:
+            grown = np.full((max(need_rows, 2 * have_rows, 64), need_width), -1, dtype=np.int32)
+            grown[:have_rows, :have_width] = self._placements
+            self._placements = grown
+        self._placements[rows] = -1
+        self._placements[rows, :nodes.shape[1]] = nodes
+
+    def remove_object(self, object_id: str) -> None:
+        """
+        Forget *object_id*'s placement (e.g. after a burn).  The last
+        registered object takes over its row, so removal is O(1).
+
+        Raises:
+            KeyError: If the object was never registered.
+        """
+        row = self._object_rows.pop(object_id)
+        if self.catalog is not None:
+            self.catalog.remove(object_id)
+        last, moved = len(self._row_names) - 1, self._row_names.pop()
+        if row != last:
+            self._placements[row] = self._placements[last]
+            self._row_names[row] = moved
+            self._object_rows[moved] = row
+        self._placements[last] = -1
+
+    def object_nodes(self, object_id: str) -> List[int]:
+        """
+        Nodes holding *object_id*'s shards, shard 0 first.
+
+        Raises:
+            KeyError: If the object was never registered.
+        """
+        row = self._placements[self._object_rows[object_id]]
+        return row[row >= 0].tolist()
+
+    @property
+    def object_ids(self) -> List[str]:
+        """Registered objects, in the order healthy_shards() and reconstructable() report them."""
+        return list(self._row_names)
+
     # ------------------------------------------------------------------
     # Node health management
     # ------------------------------------------------------------------
 
     def get_available_nodes(self) -> List[int]:
         """Return list of node IDs currently marked healthy."""
-        return [
-            nid for nid, info in self._nodes.items()
-            if info['status'] == 'healthy'
-        ]
+        return np.flatnonzero(self._healthy).tolist()
+
+    @property
+    def healthy_count(self) -> int:
+        """Number of healthy nodes (maintained incrementally, O(1))."""
+        return self._healthy_count
+
+    def _check_node(self, node_id: int) -> None:
+        if not 0 <= node_id < self.n_nodes:
+            raise KeyError(f"Node {node_id} does not exist (n_nodes={self.n_nodes})")
+
+    def _set_health(self, node_id: int, healthy: bool, persist: bool = True) -> None:
+        self._check_node(node_id)
+        if self._healthy[node_id] != healthy:
+            self._healthy[node_id] = healthy
+            self._healthy_count += 1 if healthy else -1
+            if persist and self.catalog is not None:
+                self.catalog.set_node_health(node_id, healthy)
 
     def mark_node_failed(self, node_id: int) -> None:
         """
@@ -109,15 +263,11 @@ class ShardManager:
         Raises:
             KeyError: If node_id does not exist.
         """
-        if node_id not in self._nodes:
-            raise KeyError(f"Node {node_id} does not exist (n_nodes={self.n_nodes})")
-        self._nodes[node_id]['status'] = 'failed'
+        self._set_health(node_id, False)
 
     def mark_node_healthy(self, node_id: int) -> None:
         """Mark a previously failed node as healthy again (e.g., after recovery)."""
-        if node_id not in self._nodes:
-            raise KeyError(f"Node {node_id} does not exist (n_nodes={self.n_nodes})")
-        self._nodes[node_id]['status'] = 'healthy'
+        self._set_health(node_id, True)
 
     # ------------------------------------------------------------------
     # Reconstruction helpers
@@ -136,9 +286,9 @@ class ShardManager:
         """
         nodes = available_nodes if available_nodes is not None else self.get_available_nodes()
         return [
-            self._nodes[nid]['shard']
+            self._shards[nid]
             for nid in nodes
-            if nid in self._nodes and self._nodes[nid]['shard'] is not None
+            if 0 <= nid < self.n_nodes and self._shards[nid] is not None
         ]
 
     def can_reconstruct(self) -> bool:
@@ -148,7 +298,44 @@ class ShardManager:
         This is a fast pre-flight check before attempting actual reconstruction
         via ShamirVault to avoid unnecessary I/O on under-provisioned clusters.
         """
-        return len(self.get_available_nodes()) >= self.threshold
+        return self._healthy_count >= self.threshold
+
+    def _rows(self, object_ids: Optional[Iterable[str]]) -> np.ndarray:
+        if object_ids is None:
+            return self._placements[:len(self._row_names)]
+        return self._placements[[self._object_rows[o] for o in object_ids]]
+
+    def healthy_shards(self, object_ids: Optional[Iterable[str]] = None) -> np.ndarray:
+        """
+        Number of each object's shards on healthy nodes.
+
+        Args:
+            object_ids: Objects to check (default: every registered object,
+                        in registration order).
+
+        Returns:
+            int array, one entry per object.
+
+        Raises:
+            KeyError: If an object was never registered.
+        """
+        rows = self._rows(object_ids)
+        # Gather the health bit of every shard's node; padding (-1) never counts.
+        on_healthy = self._healthy[rows] & (rows >= 0)
+        return on_healthy.sum(axis=1)
+
+    def reconstructable(self, object_ids: Optional[Iterable[str]] = None) -> np.ndarray:
+        """
+        Per-object counterpart of can_reconstruct(): True where at least
+        *threshold* of the object's shards sit on healthy nodes.
+
+        Computed for all objects at once from the node health bitmap, so it
+        stays cheap for millions of objects.
+
+        Returns:
+            bool array, one entry per object (see healthy_shards()).
+        """
+        return self.healthy_shards(object_ids) >= self.threshold
 
     # ------------------------------------------------------------------
     # Observability
@@ -161,35 +348,54 @@ class ShardManager:
         Returns:
             {node_id: 'healthy' | 'failed'} for every node.
         """
-        return {nid: info['status'] for nid, info in self._nodes.items()}
+        return {nid: 'healthy' if ok else 'failed' for nid, ok in enumerate(self._healthy.tolist())}
+
+    def node_latency_report(self) -> Dict[int, dict]:
+        """
+        Return read latency statistics for all nodes.
+
+        Returns:
+            {node_id: {'ewma_ms', 'p99_ms', 'samples', 'requests', 'failures',
+            'hedges', 'hedge_wins'}} for every node; the latency fields are
+            None until the node has served a read.
+        """
+        return self.read_scheduler.stats(range(self.n_nodes))
 
     def log_to_audit(self, audit_ledger=None) -> None:
         """
         Optional persistence hook — forwards the current shard health snapshot
         to an audit ledger for tamper-evident forensic logging.
 
-        This method is a **no-op** when *audit_ledger* is ``None`` (the default),
-        which is the expected behaviour in unit-test and in-memory demo mode.
+        This method only reports where state is kept when *audit_ledger* is
+        ``None`` (the default), which is the expected behaviour in unit-test
+        and demo mode.
         Pass a ``DBHandler`` instance (from ``ops/audit_ledger.py``) for
         production use.
 
-        IMPORTANT: ShardManager itself is in-memory only.  This hook is the
-        recommended bridge to the persistence layer — do NOT add direct file I/O
+        IMPORTANT: ShardManager itself does no file I/O.  Placement and health
+        state persist through a ``Catalog`` (see the class docstring); this hook
+        is the bridge to the forensic audit trail — do NOT add direct file I/O
         to this class.
 
         Args:
             audit_ledger: Optional ``DBHandler`` instance.  If ``None``, prints
-                          a reminder that state is in-memory only and will be
-                          lost on process exit.
+                          whether placement and health state persist in a
+                          catalog or are lost on process exit.
 
         Returns:
             None
         """
         if audit_ledger is None:
-            print(
-                "[ShardManager] IN-MEMORY MODE: shard state is not persisted. "
-                "Pass a DBHandler instance to log_to_audit() for persistence."
-            )
+            if self.catalog is None:
+                print(
+                    "[ShardManager] IN-MEMORY MODE: shard state is not persisted. "
+                    "Pass a Catalog to persist it, and a DBHandler to log_to_audit() for auditing."
+                )
+            else:
+                print(
+                    f"[ShardManager] CATALOG MODE: placements and node health persist in "
+                    f"{self.catalog.path}. Pass a DBHandler to log_to_audit() for auditing."
+                )
             return
         # Delegate to audit_ledger.log_event for each node in the health report.
         for node_id, status in self.node_health_report().items():
@@ -200,7 +406,7 @@ class ShardManager:
             )
 
     def __repr__(self) -> str:
-        healthy = len(self.get_available_nodes())
+        healthy = self._healthy_count
         return (
             f"ShardManager(n_nodes={self.n_nodes}, threshold={self.threshold}, "
             f"healthy={healthy}/{self.n_nodes})"
@@ -235,6 +441,6 @@ if __name__ == '__main__':
     print(f"\nReconstructed secret: {reconstructed}")
     print(f"Match: {reconstructed == secret}")
 
-    # Demonstrate in-memory disclaimer via log_to_audit(None)
+    # Demonstrate the state report via log_to_audit(None)
     print()
     manager.log_to_audit(None)
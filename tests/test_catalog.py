@@ -0,0 +1,139 @@
+"""
+test_catalog.py
+Unit tests for catalog.py — the persistent placement catalog.
+Validates: record/remove/health round-trips across reopening, loading from a
+snapshot plus later changes and removals, incremental snapshots pruning
+tombstones, ignoring a foreign or unreadable snapshot, update() never
+re-inserting a removed object, insert_many() never replacing a row, name
+validation and a ShardManager restored
+from its catalog.
+"""
+
+import sys
+import os
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config
+from catalog import Catalog
+from shard_manager import ShardManager
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "catalog.db")
+
+
+def _as_dict(state):
+    return {name: [n for n in row if n >= 0] for name, row in zip(state.names, state.nodes.tolist())}
+
+
+class TestCatalog:
+    def test_survives_reopen(self, path):
+        catalog = Catalog(path)
+        catalog.record("a.bin", [0, 1, 2])
+        catalog.record("b.bin", [2, -1, 0])
+        catalog.set_node_health(1, False)
+        # No close(): committed changes must survive the process going away.
+        reopened = Catalog(path)
+        state = reopened.load()
+        assert _as_dict(state) == {"a.bin": [0, 1, 2], "b.bin": [2, 0]}
+        assert reopened.placement("b.bin") == [2, -1, 0]
+        assert state.health == {1: False}
+        assert state.seq == 2
+        assert reopened.remove("a.bin") and not reopened.remove("a.bin")
+        with pytest.raises(KeyError):
+            reopened.placement("a.bin")
+        catalog.close()
+        reopened.close()
+
+    def test_snapshot_plus_delta(self, path):
+        catalog = Catalog(path)
+        names = [f"obj{i}" for i in range(1000)]
+        catalog.record_many(names, [[i % 7, (i + 1) % 7, (i + 2) % 7] for i in range(1000)])
+        assert catalog.snapshot() == catalog.seq
+        catalog.remove("obj3")
+        catalog.record("obj5", [6, 5])
+        catalog.record("new", [1, 2, 3, 4])
+        catalog.remove("obj9")
+        catalog.record("obj9", [0, 0, 0])
+
+        expected = {name: [i % 7, (i + 1) % 7, (i + 2) % 7] for i, name in enumerate(names)}
+        del expected["obj3"]
+        expected.update({"obj5": [6, 5], "new": [1, 2, 3, 4], "obj9": [0, 0, 0]})
+        assert _as_dict(catalog.load()) == expected
+        os.remove(catalog.snapshot_path)
+        assert _as_dict(catalog.load()) == expected      # full scan gives the same answer
+
+    def test_incremental_snapshot_prunes_tombstones(self, path):
+        catalog = Catalog(path)
+        catalog.record_many(["a", "b", "c"], [[0], [1], [2]])
+        catalog.snapshot()
+        catalog.remove("b")
+        assert catalog.conn.execute("SELECT COUNT(*) FROM tombstones").fetchone()[0] == 1
+        catalog.snapshot()
+        assert catalog.conn.execute("SELECT COUNT(*) FROM tombstones").fetchone()[0] == 0
+        catalog.remove("c")
+        assert _as_dict(Catalog(path).load()) == {"a": [0]}
+
+    def test_foreign_or_corrupt_snapshot_ignored(self, path, tmp_path):
+        other = Catalog(str(tmp_path / "other.db"), snapshot_path=path + ".snapshot.npz")
+        other.record("ghost", [1])
+        other.snapshot()
+        catalog = Catalog(path)
+        catalog.record("real", [0])
+        assert catalog.load().names == ["real"]
+        with open(catalog.snapshot_path, "wb") as f:
+            f.write(b"not a snapshot")
+        assert catalog.load().names == ["real"]
+
+    def test_update_never_inserts(self, path):
+        catalog = Catalog(path)
+        assert not catalog.update("ghost", [0, 1]) and "ghost" not in catalog
+        catalog.record("a", [0, -1, 2])
+        seq = catalog.seq
+        assert catalog.update("a", [0, 1, 2]) and catalog.placement("a") == [0, 1, 2]
+        assert catalog.seq == seq + 1
+        catalog.remove("a")
+        assert not catalog.update("a", [0, 1, 2])
+        assert catalog.load().names == []
+
+    def test_insert_many_never_replaces(self, path):
+        catalog = Catalog(path)
+        catalog.record("a", [0, 1, 2])
+        assert catalog.insert_many(["a", "b"], [[-1, -1, -1], [0, -1, 2]]) == ["b"]
+        assert catalog.placement("a") == [0, 1, 2] and catalog.placement("b") == [0, -1, 2]
+        assert catalog.load().names == ["a", "b"]
+
+    def test_snapshot_due(self, path, monkeypatch):
+        monkeypatch.setattr(config, "CATALOG_SNAPSHOT_EVERY", 2)
+        catalog = Catalog(path)
+        catalog.record("a", [0])
+        assert not catalog.maybe_snapshot()
+        catalog.record("b", [1])
+        assert catalog.maybe_snapshot() and not catalog.snapshot_due
+
+    @pytest.mark.parametrize("name", ["", "a\0b"])
+    def test_invalid_names_rejected(self, name):
+        with pytest.raises(ValueError):
+            Catalog(":memory:").record(name, [0])
+
+
+class TestShardManagerCatalog:
+    def test_state_restored_from_catalog(self, path):
+        manager = ShardManager(n_nodes=5, threshold=2, catalog=Catalog(path))
+        manager.distribute_shards([b"x", b"y", b"z"], object_id="x.bin")
+        manager.register_objects(["a", "b"], np.array([[0, 1, 2], [2, 3, 4]]))
+        manager.remove_object("a")
+        manager.mark_node_failed(2)
+
+        restored = ShardManager(n_nodes=5, threshold=2, catalog=Catalog(path))
+        assert sorted(restored.object_ids) == ["b", "x.bin"]
+        assert restored.object_nodes("x.bin") == manager.object_nodes("x.bin")
+        assert restored.node_health_report()[2] == 'failed'
+        assert restored.healthy_count == 4
+        assert restored.healthy_shards(["b"]).tolist() == [2]
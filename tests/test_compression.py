@@ -0,0 +1,85 @@
+"""
+test_compression.py
+Unit tests for compression.py — per-segment compression before encryption.
+Validates: both codecs round-trip, the entropy check stores random data
+untouched, incompressible segments never grow by more than the method
+byte, segmentation matches the encryption framing and decompression bombs
+are refused.
+"""
+
+import sys
+import os
+import zlib
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from compression import (
+    CODECS, METHOD_STORED, SegmentCompressor, codec_name, decompress_segment, sample_entropy,
+)
+
+TEXT = b"2026-01-01T00:00:00Z INFO vaultzero.node1 shard written bytes=65536\n" * 1000
+
+
+class TestSegmentCompressor:
+    @pytest.mark.parametrize("codec", ["zlib", "lzma"])
+    def test_roundtrip(self, codec):
+        body = SegmentCompressor(codec).compress(TEXT)
+        assert body[0] == CODECS[codec]
+        assert len(body) < len(TEXT) // 10
+        assert decompress_segment(body, len(TEXT)) == TEXT
+
+    def test_high_entropy_segment_stored(self, monkeypatch):
+        compressor = SegmentCompressor("zlib")
+        monkeypatch.setattr(compressor, "_pack", lambda segment: pytest.fail("random data was compressed"))
+        data = os.urandom(65536)
+        body = compressor.compress(data)
+        assert body[0] == METHOD_STORED and body[1:] == data
+
+    def test_incompressible_segment_stored(self):
+        """With the entropy check disabled, a segment that does not shrink is still stored."""
+        data = os.urandom(300)
+        body = SegmentCompressor("zlib", threshold=8.0).compress(data)
+        assert body[0] == METHOD_STORED and len(body) == len(data) + 1
+
+    def test_entropy_estimates(self):
+        assert sample_entropy(b"") == 0.0
+        assert sample_entropy(b"A" * 100_000) == 0.0
+        assert sample_entropy(os.urandom(1 << 20)) > 7.8
+        assert sample_entropy(TEXT) < 5.0
+
+    @pytest.mark.parametrize("size", [0, 1, 4096, 4097, 8192, 10_000])
+    def test_stream_segmentation_matches_framing(self, size):
+        data = os.urandom(size)
+        bodies = list(SegmentCompressor("zlib").compress_stream([data[:1000], data[1000:]], 4096))
+        assert len(bodies) == max(1, -(-size // 4096))
+        assert b"".join(decompress_segment(b, 4096) for b in bodies) == data
+
+    def test_unknown_codec(self):
+        with pytest.raises(ValueError, match="Unknown compression codec"):
+            SegmentCompressor("brotli")
+        with pytest.raises(ValueError):
+            codec_name(99)
+
+
+class TestDecompressLimits:
+    def test_bomb_refused(self):
+        packer = zlib.compressobj(9, zlib.DEFLATED, -15)
+        body = bytes([CODECS["zlib"]]) + packer.compress(b"\0" * 1_000_000) + packer.flush()
+        with pytest.raises(ValueError, match="beyond"):
+            decompress_segment(body, 65536)
+
+    def test_oversized_stored_body_refused(self):
+        with pytest.raises(ValueError):
+            decompress_segment(bytes([METHOD_STORED]) + b"x" * 10, 5)
+
+    @pytest.mark.parametrize("codec", ["zlib", "lzma"])
+    def test_garbage_raises_value_error(self, codec):
+        with pytest.raises(ValueError):
+            decompress_segment(bytes([CODECS[codec]]) + os.urandom(64), 65536)
+
+    def test_unknown_method(self):
+        with pytest.raises(ValueError, match="unknown compression method"):
+            decompress_segment(b"\x07abc", 100)
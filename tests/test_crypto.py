@@ -3,18 +3,28 @@ test_crypto.py
 Author: Mourya Reddy Udumula
 Unit tests for AES-256-GCM encryption and PBKDF2 key derivation.
 Validates: encrypt/decrypt round-trips, key derivation determinism,
-GCM authentication tag verification, invalid key rejection.
+GCM authentication tag verification, invalid key rejection,
+derived-key cache hits, LRU/TTL eviction and secure wipe, and the
+segmented streaming format (framing, truncation and reordering checks),
+parallel segment sealing, envelope encryption with key rewrapping,
+in-place decryption, byte-range reads and per-segment compression.
 """
 
 import sys
 import os
+import hashlib
+import tracemalloc
 import pytest
 
 # Ensure VaultZero root is importable when pytest is run from tests/ subdir
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, ROOT)
 
-from crypto_engine import CryptoEngine
+import crypto_engine
+from crypto_engine import (
+    CryptoEngine, DerivedKeyCache, ENVELOPE_HEADER_SIZE, ENVELOPE_MAGIC,
+    STREAM_HEADER_SIZE, STREAM_MAGIC, TAG_SIZE,
+)
 
 
 # ------------------------------------------------------------------
@@ -139,3 +149,388 @@ class TestGCMAuthentication:
         e1 = CryptoEngine(key)
         e2 = CryptoEngine(key)
         assert e1.encrypt_data(plaintext) != e2.encrypt_data(plaintext)
+
+
+class TestDerivedKeyCache:
+    @pytest.fixture(autouse=True)
+    def _reset_cache(self):
+        """Every test starts and ends with the cache switched off."""
+        CryptoEngine.disable_key_cache()
+        yield
+        CryptoEngine.disable_key_cache()
+
+    def test_cache_disabled_by_default(self):
+        """Without enable_key_cache() there are no counters to report."""
+        assert CryptoEngine.key_cache_stats() is None
+
+    def test_repeated_decrypt_hits_cache(self, key, plaintext):
+        """Reassembling the same asset twice runs the KDF only once."""
+        CryptoEngine.enable_key_cache()
+        ct = CryptoEngine(key).encrypt_data(plaintext)
+        assert CryptoEngine.decrypt_payload(key, ct) == plaintext
+        assert CryptoEngine.decrypt_payload(key, ct) == plaintext
+        stats = CryptoEngine.key_cache_stats()
+        assert stats['misses'] == 1
+        assert stats['hits'] == 2
+
+    def test_cached_key_matches_kdf(self):
+        """A cache hit returns exactly the PBKDF2 output."""
+        salt = b"\x11" * 16
+        uncached = CryptoEngine("pw", salt=salt).key
+        CryptoEngine.enable_key_cache()
+        CryptoEngine("pw", salt=salt)
+        assert CryptoEngine("pw", salt=salt).key == uncached
+
+    def test_lru_eviction_wipes_buffer(self):
+        """The least-recently-used entry is evicted and zeroed at max_entries."""
+        cache = DerivedKeyCache(max_entries=2)
+        cache.put("a", b"s" * 16, b"\x01" * 32)
+        cache.put("b", b"s" * 16, b"\x02" * 32)
+        evicted = cache._entries[cache._cache_key("b", b"s" * 16)][0]
+        cache.get("a", b"s" * 16)                 # "a" is now most recent
+        cache.put("c", b"s" * 16, b"\x03" * 32)   # evicts "b"
+        assert evicted == bytearray(32)
+        assert cache.get("b", b"s" * 16) is None
+        assert cache.get("a", b"s" * 16) == b"\x01" * 32
+        assert cache.stats()['evictions'] == 1
+
+    def test_clear_wipes_buffers(self):
+        """clear() zeroes every remaining key buffer."""
+        cache = DerivedKeyCache(max_entries=2)
+        cache.put("a", b"s" * 16, b"\x01" * 32)
+        buf = cache._entries[cache._cache_key("a", b"s" * 16)][0]
+        cache.clear()
+        assert buf == bytearray(32)
+        assert cache.get("a", b"s" * 16) is None
+
+    def test_ttl_expiry(self, monkeypatch):
+        """Entries past their TTL are treated as misses."""
+        import crypto_engine
+        now = [1000.0]
+        monkeypatch.setattr(crypto_engine.time, "monotonic", lambda: now[0])
+        cache = DerivedKeyCache(ttl_seconds=10)
+        cache.put("pw", b"s" * 16, b"\x07" * 32)
+        assert cache.get("pw", b"s" * 16) == b"\x07" * 32
+        now[0] += 11
+        assert cache.get("pw", b"s" * 16) is None
+        assert len(cache) == 0
+
+    def test_password_not_stored(self):
+        """Cache keys hold a peppered digest, never the raw password."""
+        cache = DerivedKeyCache()
+        cache.put("hunter2", b"s" * 16, b"\x00" * 32)
+        (digest, salt), = cache._entries.keys()
+        assert b"hunter2" not in digest
+        assert digest != hashlib.sha256(b"hunter2").digest()
+
+
+class TestStreamingFormat:
+    SEG = 64   # tiny segments so small payloads span many frames
+
+    def _encrypt(self, key, data, **kw):
+        return b"".join(CryptoEngine(key).encrypt_stream(data, segment_size=self.SEG, **kw))
+
+    @pytest.mark.parametrize("size", [0, 1, 63, 64, 65, 64 * 3, 1000])
+    def test_roundtrip_sizes(self, key, size):
+        """Segment boundaries (empty, exact multiple, remainder) roundtrip."""
+        data = os.urandom(size)
+        stream = self._encrypt(key, data)
+        assert b"".join(CryptoEngine.decrypt_stream(key, stream)) == data
+
+    def test_frame_layout(self, key):
+        """Header plus one tagged frame per segment; the last may be short."""
+        stream = self._encrypt(key, b"x" * 150)
+        assert stream[:4] == STREAM_MAGIC
+        assert len(stream) == STREAM_HEADER_SIZE + 150 + 3 * TAG_SIZE
+
+    def test_file_and_iterable_sources(self, key, tmp_path):
+        """encrypt_stream accepts file objects and chunk iterables."""
+        data = os.urandom(500)
+        path = tmp_path / "payload.bin"
+        path.write_bytes(data)
+        with open(path, "rb") as fh:
+            stream = list(CryptoEngine(key).encrypt_stream(fh, segment_size=self.SEG))
+        assert b"".join(CryptoEngine.decrypt_stream(key, iter(stream))) == data
+
+    def test_encrypt_is_lazy(self, key):
+        """Frames are emitted before the source is exhausted (bounded memory)."""
+        consumed = []
+
+        def source():
+            for i in range(100):
+                consumed.append(i)
+                yield b"z" * self.SEG
+
+        gen = CryptoEngine(key).encrypt_stream(source(), segment_size=self.SEG)
+        next(gen)          # header
+        next(gen)          # first frame
+        assert len(consumed) < 5
+
+    def test_truncated_stream_raises(self, key):
+        """Dropping the final frame fails the last-segment check."""
+        stream = self._encrypt(key, b"a" * 200)
+        truncated = stream[:STREAM_HEADER_SIZE + 3 * (self.SEG + TAG_SIZE)]
+        with pytest.raises(ValueError):
+            b"".join(CryptoEngine.decrypt_stream(key, truncated))
+
+    def test_reordered_frames_raise(self, key):
+        """Swapping two full frames fails authentication."""
+        stream = self._encrypt(key, os.urandom(200))
+        f = self.SEG + TAG_SIZE
+        h = STREAM_HEADER_SIZE
+        swapped = stream[:h] + stream[h + f:h + 2 * f] + stream[h:h + f] + stream[h + 2 * f:]
+        with pytest.raises(ValueError):
+            b"".join(CryptoEngine.decrypt_stream(key, swapped))
+
+    def test_tampered_frame_and_wrong_key(self, key):
+        stream = bytearray(self._encrypt(key, b"payload" * 20))
+        with pytest.raises(ValueError):
+            b"".join(CryptoEngine.decrypt_stream("wrong_key", bytes(stream)))
+        stream[STREAM_HEADER_SIZE] ^= 0x01
+        with pytest.raises(ValueError):
+            b"".join(CryptoEngine.decrypt_stream(key, bytes(stream)))
+
+    def test_bad_magic_raises(self, key):
+        legacy = CryptoEngine(key).encrypt_data(b"legacy blob")
+        with pytest.raises(ValueError, match="magic"):
+            list(CryptoEngine.decrypt_stream(key, legacy))
+
+
+class TestParallelSegmentEngine:
+    SEG = 256
+
+    @pytest.mark.parametrize("workers", [2, 4])
+    def test_parallel_roundtrip_preserves_order(self, key, workers):
+        """Parallel encrypt and decrypt agree with the serial path byte-for-byte."""
+        data = os.urandom(self.SEG * 37 + 11)
+        engine = CryptoEngine(key)
+        parallel = b"".join(engine.encrypt_stream(data, segment_size=self.SEG, workers=workers))
+        assert b"".join(CryptoEngine.decrypt_stream(key, parallel)) == data
+        serial = b"".join(engine.encrypt_stream(data, segment_size=self.SEG))
+        assert b"".join(CryptoEngine.decrypt_stream(key, serial, workers=workers)) == data
+
+    def test_window_bounds_inflight_segments(self, key):
+        """No more than *window* segments are pulled ahead of the consumer."""
+        pulled = []
+
+        def source():
+            for i in range(200):
+                pulled.append(i)
+                yield b"q" * self.SEG
+
+        gen = CryptoEngine(key).encrypt_stream(source(), segment_size=self.SEG, workers=4, window=3)
+        next(gen)   # header
+        next(gen)   # first frame
+        assert len(pulled) <= 3 + 2
+
+    def test_parallel_tamper_detected(self, key):
+        stream = bytearray(b"".join(CryptoEngine(key).encrypt_stream(b"t" * 4096, segment_size=self.SEG)))
+        stream[-1] ^= 0xFF
+        with pytest.raises(ValueError):
+            b"".join(CryptoEngine.decrypt_stream(key, bytes(stream), workers=4))
+
+
+class TestEnvelopeEncryption:
+    SEG = 128
+
+    def _seal(self, key, data):
+        return b"".join(CryptoEngine(key).encrypt_envelope(data, segment_size=self.SEG))
+
+    def test_envelope_roundtrip(self, key):
+        data = os.urandom(1000)
+        env = self._seal(key, data)
+        assert env[:4] == ENVELOPE_MAGIC
+        assert b"".join(CryptoEngine.decrypt_envelope(key, env)) == data
+
+    def test_decrypt_payload_dispatches_on_magic(self, key, plaintext):
+        """decrypt_payload handles envelope, stream and legacy payloads alike."""
+        engine = CryptoEngine(key)
+        assert CryptoEngine.decrypt_payload(key, self._seal(key, plaintext)) == plaintext
+        stream = b"".join(engine.encrypt_stream(plaintext))
+        assert CryptoEngine.decrypt_payload(key, stream) == plaintext
+        assert CryptoEngine.decrypt_payload(key, engine.encrypt_data(plaintext)) == plaintext
+
+    def test_rewrap_rewrites_only_header(self, key):
+        """Password rotation replaces the header; frames are reused untouched."""
+        data = os.urandom(5000)
+        env = self._seal(key, data)
+        new_header = CryptoEngine.rewrap_envelope(env[:ENVELOPE_HEADER_SIZE], key, "rotated_pw")
+        assert len(new_header) == ENVELOPE_HEADER_SIZE
+        rotated = new_header + env[ENVELOPE_HEADER_SIZE:]
+        assert b"".join(CryptoEngine.decrypt_envelope("rotated_pw", rotated)) == data
+        with pytest.raises(ValueError):
+            b"".join(CryptoEngine.decrypt_envelope(key, rotated))
+
+    def test_rewrap_with_wrong_password_raises(self, key):
+        env = self._seal(key, b"data")
+        with pytest.raises(ValueError):
+            CryptoEngine.rewrap_envelope(env[:ENVELOPE_HEADER_SIZE], "not_the_key", "new")
+
+    def test_data_keys_are_per_object(self, key):
+        """Two envelopes under the same password use different data keys."""
+        a = self._seal(key, b"same" * 50)
+        b = self._seal(key, b"same" * 50)
+        assert a[ENVELOPE_HEADER_SIZE:] != b[ENVELOPE_HEADER_SIZE:]
+
+    def test_tampered_wrapped_key_raises(self, key):
+        env = bytearray(self._seal(key, b"payload"))
+        env[40] ^= 0x01   # inside wrapped_dek
+        with pytest.raises(ValueError):
+            b"".join(CryptoEngine.decrypt_envelope(key, bytes(env)))
+
+
+class TestDecryptInPlace:
+    SEG = 128
+
+    @pytest.mark.parametrize("size", [0, 1, 127, 128, 129, 1000])
+    def test_envelope_in_place(self, key, size):
+        data = os.urandom(size)
+        buf = bytearray(b"".join(CryptoEngine(key).encrypt_envelope(data, segment_size=self.SEG)))
+        out = CryptoEngine.decrypt_in_place(key, buf)
+        assert out == data
+        assert out.obj is buf            # a view over the caller's buffer, not a copy
+
+    def test_stream_and_legacy_in_place(self, key, plaintext):
+        engine = CryptoEngine(key)
+        stream = bytearray(b"".join(engine.encrypt_stream(plaintext * 10, segment_size=self.SEG)))
+        assert CryptoEngine.decrypt_in_place(key, stream) == plaintext * 10
+        legacy = bytearray(engine.encrypt_data(plaintext))
+        assert CryptoEngine.decrypt_in_place(key, legacy) == plaintext
+
+    def test_tampered_frame_raises(self, key):
+        buf = bytearray(b"".join(CryptoEngine(key).encrypt_envelope(os.urandom(500), segment_size=self.SEG)))
+        buf[ENVELOPE_HEADER_SIZE + 200] ^= 0x01
+        with pytest.raises(ValueError):
+            CryptoEngine.decrypt_in_place(key, buf)
+
+    def test_truncated_stream_raises(self, key):
+        buf = bytearray(b"".join(CryptoEngine(key).encrypt_envelope(os.urandom(500), segment_size=self.SEG)))
+        with pytest.raises(ValueError):
+            CryptoEngine.decrypt_in_place(key, buf[:-(TAG_SIZE + 10)])
+
+    def test_readonly_buffer_rejected(self, key, encrypted):
+        with pytest.raises(ValueError, match="writable"):
+            CryptoEngine.decrypt_in_place(key, encrypted)
+
+
+class TestDecryptRange:
+    SEG = 128
+
+    def _reader(self, blob, log=None):
+        def read_at(start, n):
+            if log is not None:
+                log.append((start, n))
+            return blob[start:start + n]
+        return read_at
+
+    @pytest.mark.parametrize("offset,length", [(0, 1), (0, 1000), (127, 2), (300, 128), (990, 50), (2000, 5)])
+    def test_envelope_range_matches_slice(self, key, offset, length):
+        data = os.urandom(1000)
+        blob = b"".join(CryptoEngine(key).encrypt_envelope(data, segment_size=self.SEG))
+        out = CryptoEngine.decrypt_range(key, self._reader(blob), len(blob), offset, length)
+        assert out == data[offset:offset + length]
+
+    def test_only_covering_frames_are_read(self, key):
+        data = os.urandom(10 * self.SEG)
+        blob = b"".join(CryptoEngine(key).encrypt_envelope(data, segment_size=self.SEG))
+        log = []
+        CryptoEngine.decrypt_range(key, self._reader(blob, log), len(blob), 5 * self.SEG + 10, 20)
+        fetched = sum(n for start, n in log if start >= ENVELOPE_HEADER_SIZE)
+        assert fetched == self.SEG + TAG_SIZE
+
+    def test_stream_and_legacy_ranges(self, key, plaintext):
+        engine = CryptoEngine(key)
+        data = plaintext * 10
+        stream = b"".join(engine.encrypt_stream(data, segment_size=self.SEG))
+        assert CryptoEngine.decrypt_range(key, self._reader(stream), len(stream), 100, 200) == data[100:300]
+        legacy = engine.encrypt_data(plaintext)
+        assert CryptoEngine.decrypt_range(key, self._reader(legacy), len(legacy), 5, 10) == plaintext[5:15]
+
+    def test_tampered_frame_in_range_raises(self, key):
+        blob = bytearray(b"".join(CryptoEngine(key).encrypt_envelope(os.urandom(500), segment_size=self.SEG)))
+        blob[ENVELOPE_HEADER_SIZE + self.SEG + TAG_SIZE + 3] ^= 0x01   # inside frame 1
+        read_at = self._reader(bytes(blob))
+        assert CryptoEngine.decrypt_range(key, read_at, len(blob), 0, 10)   # frame 0 untouched
+        with pytest.raises(ValueError):
+            CryptoEngine.decrypt_range(key, read_at, len(blob), self.SEG, 10)
+
+    def test_truncated_last_frame_raises(self, key):
+        blob = b"".join(CryptoEngine(key).encrypt_envelope(os.urandom(500), segment_size=self.SEG))
+        blob = blob[:-(TAG_SIZE + 10)]
+        with pytest.raises(ValueError):
+            CryptoEngine.decrypt_range(key, self._reader(blob), len(blob), 400, 10)
+
+
+class TestCompressedFormat:
+    SEG = 4096
+    TEXT = b"2026-01-01 INFO shard written node=2 bytes=4096\n" * 2000
+
+    @pytest.mark.parametrize("codec", ["zlib", "lzma"])
+    def test_codec_recorded_and_roundtrip(self, key, codec):
+        blob = b"".join(CryptoEngine(key).encrypt_envelope(self.TEXT, segment_size=self.SEG, codec=codec))
+        assert blob[ENVELOPE_HEADER_SIZE - 1] == {"zlib": 1, "lzma": 2}[codec]   # descriptor flags
+        assert len(blob) < len(self.TEXT) // 5
+        assert CryptoEngine.decrypt_payload(key, blob) == self.TEXT
+        assert CryptoEngine.decrypt_in_place(key, bytearray(blob)) == self.TEXT
+
+    def test_stream_and_parallel(self, key):
+        engine = CryptoEngine(key)
+        blob = b"".join(engine.encrypt_stream(self.TEXT, segment_size=self.SEG, codec="zlib", workers=4))
+        assert b"".join(CryptoEngine.decrypt_stream(key, blob, workers=4)) == self.TEXT
+        assert CryptoEngine.decrypt_with_key(engine.key, blob) == self.TEXT
+
+    @pytest.mark.parametrize("offset,length", [(0, 1), (4095, 2), (20_000, 30_000), (len(TEXT) - 3, 10)])
+    def test_range_reads_use_index(self, key, offset, length):
+        blob = b"".join(CryptoEngine(key).encrypt_envelope(self.TEXT, segment_size=self.SEG, codec="zlib"))
+        read_at = lambda start, n: blob[start:start + n]
+        assert CryptoEngine.decrypt_range(key, read_at, len(blob), offset, length) == self.TEXT[offset:offset + length]
+
+    def test_random_data_sealed_uncompressed(self, key):
+        data = os.urandom(50_000)
+        blob = b"".join(CryptoEngine(key).encrypt_envelope(data, segment_size=self.SEG, codec="zlib"))
+        segments = -(-len(data) // self.SEG)
+        assert blob[ENVELOPE_HEADER_SIZE - 1] == 0      # no codec flag
+        assert len(blob) == ENVELOPE_HEADER_SIZE + len(data) + segments * TAG_SIZE
+        assert CryptoEngine.decrypt_in_place(key, bytearray(blob)) == data
+
+    def test_flag_set_once_a_segment_compresses(self, key):
+        data = os.urandom(3 * self.SEG) + self.TEXT
+        blob = b"".join(CryptoEngine(key).encrypt_stream(data, segment_size=self.SEG, codec="zlib"))
+        assert blob[STREAM_HEADER_SIZE - 1] == 1
+        assert CryptoEngine.decrypt_payload(key, blob) == data
+
+    def test_flag_kept_past_lookahead(self, key, monkeypatch):
+        monkeypatch.setattr(crypto_engine, "CODEC_LOOKAHEAD", 2 * self.SEG)
+        data = os.urandom(5 * self.SEG)
+        blob = b"".join(CryptoEngine(key).encrypt_envelope(data, segment_size=self.SEG, codec="zlib"))
+        assert blob[ENVELOPE_HEADER_SIZE - 1] == 1
+        assert CryptoEngine.decrypt_in_place(key, bytearray(blob)) == data
+
+    def test_in_place_allocates_only_the_plaintext(self, key):
+        data = os.urandom(64 * self.SEG) + self.TEXT
+        buf = bytearray(b"".join(CryptoEngine(key).encrypt_envelope(data, segment_size=self.SEG, codec="zlib")))
+        tracemalloc.start()
+        try:
+            out = CryptoEngine.decrypt_in_place(key, buf)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert out == data
+        assert peak < len(data) + 32 * self.SEG     # no copy of the ciphertext or of the joined segments
+
+    def test_tampered_frame_raises(self, key):
+        blob = bytearray(b"".join(CryptoEngine(key).encrypt_envelope(self.TEXT, segment_size=self.SEG, codec="zlib")))
+        blob[ENVELOPE_HEADER_SIZE + 10] ^= 0x01
+        with pytest.raises(ValueError):
+            CryptoEngine.decrypt_payload(key, bytes(blob))
+
+    def test_truncated_payload_raises(self, key):
+        blob = b"".join(CryptoEngine(key).encrypt_envelope(self.TEXT, segment_size=self.SEG, codec="zlib"))
+        with pytest.raises(ValueError):
+            CryptoEngine.decrypt_payload(key, blob[:len(blob) // 2])
+        with pytest.raises(ValueError):
+            CryptoEngine.decrypt_payload(key, blob[:-4])
+
+    def test_precompressed_needs_codec(self, key):
+        with pytest.raises(ValueError, match="codec"):
+            b"".join(CryptoEngine(key).encrypt_envelope([b"x"], precompressed=True))
@@ -0,0 +1,296 @@
+"""
+test_erasure_coding.py
+Unit tests for erasure_coding.py — systematic Reed-Solomon data shards.
+Validates: recovery from every k-subset, the systematic layout, the shard
+file header/checksum, corrupt-shard skipping, legacy slice fallback and
+random-access reads of stripe columns.
+"""
+
+import sys
+import os
+import itertools
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from erasure_coding import (
+    DATA_SHARD_HEADER_SIZE,
+    DATA_SHARD_MAGIC,
+    DataShardWriter,
+    ReedSolomon,
+    ShardReader,
+    decode_data_shard,
+    decode_data_shards,
+    encode_data_shards,
+    reassemble_files,
+    rebuild_data_shard,
+    shard_width,
+    stripe_layout,
+)
+
+
+class TestReedSolomon:
+    @pytest.mark.parametrize("size", [0, 1, 2, 3, 17, 4096, 300_001])
+    def test_any_two_of_three_recover(self, size):
+        data = os.urandom(size)
+        rs = ReedSolomon(2, 3)
+        rows = rs.encode(data)
+        assert len(rows) == 3
+        for subset in itertools.combinations(range(3), 2):
+            assert rs.decode({i: rows[i] for i in subset}, size) == data
+
+    def test_any_k_of_n_recover(self):
+        data = os.urandom(10_000)
+        rs = ReedSolomon(4, 7)
+        rows = rs.encode(data)
+        for subset in itertools.combinations(range(7), 4):
+            assert rs.decode({i: rows[i] for i in subset}, len(data)) == data
+
+    def test_systematic_rows_are_plain_data(self):
+        data = os.urandom(1000)
+        rows = ReedSolomon(2, 3).encode(data)
+        assert rows[0] + rows[1] == data
+
+    def test_storage_overhead(self):
+        rows = ReedSolomon(2, 3).encode(os.urandom(3000))
+        assert sum(len(r) for r in rows) == 4500
+
+    def test_too_few_shards(self):
+        rs = ReedSolomon(2, 3)
+        rows = rs.encode(b"payload")
+        with pytest.raises(ValueError, match="need 2 shards"):
+            rs.decode({2: rows[2]}, 7)
+
+    def test_invalid_params(self):
+        with pytest.raises(ValueError):
+            ReedSolomon(3, 2)
+
+
+class TestShardFiles:
+    def test_roundtrip_with_one_shard_lost(self):
+        data = os.urandom(50_000)
+        files = encode_data_shards(data, 2, 3)
+        assert all(f.startswith(DATA_SHARD_MAGIC) for f in files)
+        assert len(files[0]) == DATA_SHARD_HEADER_SIZE + 25_000
+        assert decode_data_shards([files[0], files[2]]) == data
+        assert decode_data_shards([files[1], files[2]]) == data
+
+    def test_header_is_self_describing(self):
+        files = encode_data_shards(b"x" * 10, 2, 3)
+        shard = decode_data_shard(files[2])
+        assert (shard.index, shard.k, shard.n, shard.size) == (2, 2, 3, 10)
+
+    def test_corrupt_shard_skipped(self):
+        data = os.urandom(1000)
+        files = encode_data_shards(data)
+        damaged = files[0][:-1] + bytes([files[0][-1] ^ 0xFF])
+        with pytest.raises(ValueError, match="checksum"):
+            decode_data_shard(damaged)
+        assert decode_data_shards([damaged, files[1], files[2]]) == data
+        with pytest.raises(ValueError, match="only 1 valid"):
+            decode_data_shards([damaged, files[1]])
+
+    def test_legacy_slices_concatenated(self):
+        assert decode_data_shards([b"abc", b"def", b"g"]) == b"abcdefg"
+
+    @pytest.mark.parametrize("lost", [0, 1, 2])
+    def test_rebuild_lost_shard(self, lost):
+        files = encode_data_shards(os.urandom(30_000), 2, 3, unit=4096)
+        survivors = [f for i, f in enumerate(files) if i != lost]
+        assert rebuild_data_shard(survivors, lost) == files[lost]
+
+    def test_rebuild_needs_k_valid_shards(self):
+        files = encode_data_shards(os.urandom(1000))
+        with pytest.raises(ValueError, match="only 1 valid"):
+            rebuild_data_shard([files[0]], 2)
+        with pytest.raises(ValueError, match="no valid"):
+            rebuild_data_shard([b"abc", b"def"], 2)
+
+
+class TestReassembleFiles:
+    def _write(self, tmp_path, files):
+        paths = []
+        for i, raw in enumerate(files):
+            path = tmp_path / f"asset.enc.{i}"
+            if raw is not None:
+                path.write_bytes(raw)
+            paths.append(str(path))
+        return paths
+
+    def test_healthy_read_is_exact(self, tmp_path):
+        data = os.urandom(100_001)
+        view = reassemble_files(self._write(tmp_path, encode_data_shards(data)))
+        assert isinstance(view.obj, bytearray) and not view.readonly
+        assert view == data
+
+    @pytest.mark.parametrize("lost", [0, 1, 2])
+    def test_one_shard_missing(self, tmp_path, lost):
+        data = os.urandom(70_000)
+        files = encode_data_shards(data)
+        files[lost] = None
+        assert reassemble_files(self._write(tmp_path, files)) == data
+
+    def test_corrupt_data_shard_rebuilt_from_parity(self, tmp_path):
+        data = os.urandom(5000)
+        files = encode_data_shards(data)
+        files[1] = files[1][:-1] + bytes([files[1][-1] ^ 0x55])
+        assert reassemble_files(self._write(tmp_path, files)) == data
+
+    def test_too_few_valid_shards(self, tmp_path):
+        files = encode_data_shards(os.urandom(5000))
+        files[1] = files[1][:-1] + bytes([files[1][-1] ^ 0x55])
+        files[2] = None
+        with pytest.raises(ValueError, match="only 1 valid"):
+            reassemble_files(self._write(tmp_path, files))
+
+    def test_legacy_slices(self, tmp_path):
+        assert reassemble_files(self._write(tmp_path, [b"abc", b"def", None])) == b"abcdef"
+
+    def test_nothing_found(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            reassemble_files(self._write(tmp_path, [None, None, None]))
+
+
+class TestStripes:
+    UNIT = 1000
+
+    @pytest.mark.parametrize("size", [0, 1999, 2000, 2001, 7777])
+    def test_layout_pads_at_most_k_minus_one(self, size):
+        layout = stripe_layout(size, 2, self.UNIT)
+        width = shard_width(size, 2, self.UNIT)
+        assert all(length == self.UNIT for _, length in layout[:-1])
+        assert 0 <= 2 * width - size <= 1 or size == 0
+
+    @pytest.mark.parametrize("lost", [0, 1, 2])
+    def test_multi_stripe_roundtrip(self, lost):
+        data = os.urandom(7777)
+        rs = ReedSolomon(2, 3, self.UNIT)
+        rows = rs.encode(data)
+        assert rs.decode({i: rows[i] for i in range(3) if i != lost}, len(data)) == data
+
+    def test_streaming_writer_matches_bulk_encode(self, tmp_path):
+        data = os.urandom(7777)
+        rs = ReedSolomon(2, 3, self.UNIT)
+        paths = [str(tmp_path / f"s.{i}") for i in range(3)]
+        writer = DataShardWriter(paths, 2, 3, self.UNIT)
+        for start in range(0, len(data), 2 * self.UNIT):
+            for i, row in enumerate(rs.encode_stripe(data[start:start + 2 * self.UNIT])):
+                writer.write_row(i, row)
+        writer.commit(len(data))
+        files = [open(p, "rb").read() for p in paths]
+        assert files == encode_data_shards(data, 2, 3, self.UNIT)
+        os.remove(paths[0])
+        assert reassemble_files(paths) == data
+
+    def test_writer_callable_targets(self, tmp_path):
+        data = os.urandom(5000)
+        stored = {}
+        targets = [lambda raw, i=i: stored.__setitem__(i, raw) for i in range(2)] + [None]
+        writer = DataShardWriter(targets, 2, 3, self.UNIT)
+        for start in range(0, len(data), 2 * self.UNIT):
+            for i, row in enumerate(ReedSolomon(2, 3, self.UNIT).encode_stripe(data[start:start + 2 * self.UNIT])):
+                writer.write_row(i, row)
+        assert stored == {}                        # nothing stored before commit
+        writer.commit(len(data))
+        assert decode_data_shards([stored[0], stored[1]]) == data
+        assert os.listdir(tmp_path) == []
+
+    def test_writer_rejects_wrong_size(self, tmp_path):
+        paths = [str(tmp_path / f"s.{i}") for i in range(3)]
+        writer = DataShardWriter(paths, 2, 3, self.UNIT)
+        for i, row in enumerate(ReedSolomon(2, 3, self.UNIT).encode_stripe(b"x" * 10)):
+            writer.write_row(i, row)
+        with pytest.raises(ValueError, match="layout"):
+            writer.commit(5000)
+        assert os.listdir(tmp_path) == []
+
+    def test_version_1_shards_still_read(self, tmp_path):
+        """Single-stripe shards written before the unit field existed."""
+        import hashlib, struct
+        data = os.urandom(3001)
+        rows = ReedSolomon(2, 3, unit=1501).encode(data)
+        paths = []
+        for i, row in enumerate(rows):
+            prefix = struct.pack(">4sBBBBQ", DATA_SHARD_MAGIC, 1, 2, 3, i, len(data))
+            h = hashlib.blake2b(prefix + row, digest_size=16).digest()
+            path = tmp_path / f"old.{i}"
+            path.write_bytes(prefix + h + row)
+            paths.append(str(path))
+        assert decode_data_shards([open(p, "rb").read() for p in paths[1:]]) == data
+        os.remove(paths[1])
+        assert reassemble_files(paths) == data
+
+
+class TestShardReader:
+    UNIT = 1000
+
+    def _write(self, tmp_path, data, lost=None):
+        paths = []
+        for i, raw in enumerate(encode_data_shards(data, 2, 3, self.UNIT)):
+            path = tmp_path / f"asset.enc.{i}"
+            if i != lost:
+                path.write_bytes(raw)
+            paths.append(str(path))
+        return paths
+
+    @pytest.mark.parametrize("lost", [None, 0, 1, 2])
+    @pytest.mark.parametrize("start,length", [(0, 10), (990, 20), (1999, 2), (2500, 3000), (7000, 5000)])
+    def test_ranges_across_stripes(self, tmp_path, lost, start, length):
+        data = os.urandom(7777)
+        with ShardReader(self._write(tmp_path, data, lost)) as reader:
+            assert reader.size == len(data)
+            assert reader.read(start, length) == data[start:start + length]
+
+    def test_every_subset_reads_the_same(self, tmp_path):
+        data = os.urandom(5001)
+        with ShardReader(self._write(tmp_path, data)) as reader:
+            assert list(reader.subsets()) == [(0, 1), (0, 2), (1, 2)]
+            for subset in reader.subsets():
+                assert reader.read(1500, 2000, use=subset) == data[1500:3500]
+
+    def test_too_few_shards(self, tmp_path):
+        paths = self._write(tmp_path, os.urandom(3000), lost=0)
+        os.remove(paths[1])
+        with ShardReader(paths) as reader:
+            with pytest.raises(ValueError, match="need 2"):
+                reader.read(0, 10)
+
+    @pytest.mark.parametrize("lost", [0, 1, 2])
+    def test_rebuild_stripe_by_stripe(self, tmp_path, lost):
+        data = os.urandom(7777)
+        original = encode_data_shards(data, 2, 3, self.UNIT)[lost]
+        paths = self._write(tmp_path, data, lost)
+        charges = []
+        with ShardReader(paths) as reader:
+            moved = reader.rebuild(lost, paths[lost], charge=charges.append, sync=True)
+        assert open(paths[lost], "rb").read() == original
+        assert len(charges) == len(stripe_layout(len(data), 2, self.UNIT)) and sum(charges) == moved
+        assert sorted(os.listdir(tmp_path)) == [f"asset.enc.{i}" for i in range(3)]
+
+    def test_rebuild_skips_corrupt_source(self, tmp_path):
+        data = os.urandom(5000)
+        files = encode_data_shards(data, 2, 4, self.UNIT)
+        paths = [str(tmp_path / f"asset.enc.{i}") for i in range(4)]
+        for i, raw in enumerate(files[:3]):
+            raw = bytearray(raw)
+            if i == 0:
+                raw[-1] ^= 0xFF                  # passes the header checks, fails the checksum
+            open(paths[i], "wb").write(raw)
+        with ShardReader(paths) as reader:
+            reader.rebuild(3, paths[3])
+        assert open(paths[3], "rb").read() == files[3]
+        os.remove(paths[2])
+        os.remove(paths[3])
+        with ShardReader(paths) as reader:
+            with pytest.raises(ValueError, match="checksums"):
+                reader.rebuild(3, paths[3])
+        assert not os.path.exists(paths[3]) and not os.path.exists(paths[3] + ".tmp")
+
+    def test_legacy_slices(self, tmp_path):
+        paths = [str(tmp_path / f"old.{i}") for i in range(3)]
+        for path, raw in zip(paths, [b"abc", b"def", b"g"]):
+            open(path, "wb").write(raw)
+        with ShardReader(paths) as reader:
+            assert reader.read(2, 3) == b"cde"
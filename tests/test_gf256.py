@@ -0,0 +1,80 @@
+"""
+test_gf256.py
+Unit tests for gf256.py — the vectorised GF(2^8) arithmetic behind the
+byte-wise Shamir backend.
+Validates: table consistency, known AES field products, inverses,
+Horner evaluation and Lagrange interpolation.
+"""
+
+import sys
+import os
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gf256
+
+
+def _slow_mul(a: int, b: int) -> int:
+    """Bit-by-bit reference multiplication modulo 0x11B."""
+    z = 0
+    while b:
+        if b & 1:
+            z ^= a
+        a <<= 1
+        if a & 0x100:
+            a ^= 0x11B
+        b >>= 1
+    return z
+
+
+class TestTables:
+    def test_generator_cycles_through_all_nonzero_elements(self):
+        assert sorted(gf256.EXP[:255].tolist()) == list(range(1, 256))
+
+    def test_known_aes_product(self):
+        """FIPS-197 worked example: {57} * {83} = {c1}."""
+        assert gf256.mul(0x57, 0x83) == 0xC1
+
+    def test_mul_table_matches_reference(self):
+        rng = np.random.default_rng(7)
+        for a, b in rng.integers(0, 256, size=(500, 2)):
+            assert gf256.MUL[a, b] == _slow_mul(int(a), int(b))
+
+    def test_inverses(self):
+        values = np.arange(1, 256, dtype=np.uint8)
+        assert np.all(gf256.mul(values, gf256.inv(values)) == 1)
+        with pytest.raises(ZeroDivisionError):
+            gf256.inv(0)
+
+
+class TestPolynomials:
+    def test_poly_eval_matches_scalar_horner(self):
+        coeffs = np.array([[7, 1], [3, 0], [9, 255]], dtype=np.uint8)  # 2 polynomials
+        for x in (0, 1, 2, 200):
+            for p in range(2):
+                expected = 0
+                for c in coeffs[::-1, p]:
+                    expected = _slow_mul(expected, x) ^ int(c)
+                assert gf256.poly_eval(coeffs, x)[p] == expected
+
+    def test_lagrange_recovers_constant_term(self):
+        coeffs = np.frombuffer(os.urandom(3 * 64), dtype=np.uint8).reshape(3, 64)
+        xs = (2, 5, 9)
+        ys = np.stack([gf256.poly_eval(coeffs, x) for x in xs])
+        weights = gf256.lagrange_coefficients(xs)
+        assert np.array_equal(gf256.combine_rows(weights, ys), coeffs[0])
+
+    def test_lagrange_at_other_point(self):
+        """Interpolating at a share index reproduces that share."""
+        coeffs = np.frombuffer(os.urandom(2 * 16), dtype=np.uint8).reshape(2, 16)
+        ys = np.stack([gf256.poly_eval(coeffs, x) for x in (1, 2)])
+        weights = gf256.lagrange_coefficients((1, 2), at=3)
+        assert np.array_equal(gf256.combine_rows(weights, ys), gf256.poly_eval(coeffs, 3))
+
+    def test_duplicate_points_raise(self):
+        with pytest.raises(ValueError, match="Duplicate"):
+            gf256.lagrange_coefficients((1, 1))
@@ -0,0 +1,173 @@
+"""
+test_ingest_pipeline.py
+Unit tests for ingest_pipeline.py — the staged, bounded-queue upload path.
+Validates: end-to-end roundtrip through the shard files, offline nodes,
+per-stage metrics, backpressure-bounded queues, cleanup on failure, and
+write-quorum acknowledgement with background completion and retries.
+"""
+
+import sys
+import os
+import io
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import latency_model
+import write_quorum
+from crypto_engine import CryptoEngine
+from erasure_coding import reassemble_files
+from ingest_pipeline import IngestPipeline
+from latency_model import NodeLatencyInjector
+
+PASSWORD = "pipeline_test_password"
+UNIT = 4096
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return [str(tmp_path / f"asset.enc.{i}") for i in range(3)]
+
+
+def _ingest(paths, source, **kwargs):
+    kwargs.setdefault("unit", UNIT)
+    kwargs.setdefault("chunk_size", 3000)
+    return IngestPipeline(CryptoEngine(PASSWORD), paths, **kwargs).run(source)
+
+
+class TestIngestRoundtrip:
+    @pytest.mark.parametrize("size", [0, 1, 5000, 100_000])
+    def test_roundtrip(self, paths, size):
+        data = os.urandom(size)
+        result = _ingest(paths, io.BytesIO(data))
+        assert result.plaintext_bytes == size
+        assert all(os.path.exists(p) for p in paths)
+        assert CryptoEngine.decrypt_in_place(PASSWORD, reassemble_files(paths)) == data
+
+    def test_any_two_nodes_suffice(self, paths):
+        data = os.urandom(50_000)
+        _ingest(paths, data)
+        os.remove(paths[1])
+        assert CryptoEngine.decrypt_in_place(PASSWORD, reassemble_files(paths)) == data
+
+    def test_offline_node_not_written(self, paths):
+        data = os.urandom(20_000)
+        _ingest([paths[0], None, paths[2]], data)
+        assert not os.path.exists(paths[1])
+        assert CryptoEngine.decrypt_in_place(PASSWORD, reassemble_files(paths)) == data
+
+    @pytest.mark.parametrize("codec", ["zlib", "lzma"])
+    def test_compress_stage_applied(self, paths, codec):
+        data = b"2026-01-01 INFO request ok\n" * 4000 + os.urandom(5000)
+        result = _ingest(paths, data, compress=codec, segment_size=8192)
+        assert result.stored_bytes < len(data) // 4
+        assert CryptoEngine.decrypt_in_place(PASSWORD, reassemble_files(paths)) == data
+        assert result.stages["compress"]["items"] == -(-len(data) // 8192)
+
+
+class TestStageMetrics:
+    def test_every_stage_reports(self, paths):
+        result = _ingest(paths, os.urandom(60_000), depth=2)
+        assert set(result.stages) == {"read", "encrypt", "stripe", "write_0", "write_1", "write_2"}
+        for stats in result.stages.values():
+            assert {"items", "bytes", "busy_ms", "wait_in_ms", "wait_out_ms", "max_depth"} <= set(stats)
+            assert stats["max_depth"] <= 2
+        assert result.stages["read"]["bytes"] == 60_000
+        assert result.stages["write_0"]["bytes"] == result.stages["write_2"]["bytes"]
+
+    def test_invalid_depth(self, paths):
+        with pytest.raises(ValueError):
+            IngestPipeline(CryptoEngine(PASSWORD), paths, depth=0)
+
+
+class TestFailure:
+    def test_source_error_propagates_and_cleans_up(self, paths, tmp_path):
+        def broken():
+            yield os.urandom(10_000)
+            raise OSError("upload interrupted")
+
+        with pytest.raises(OSError, match="upload interrupted"):
+            _ingest(paths, broken())
+        assert os.listdir(tmp_path) == []
+
+
+@pytest.fixture
+def injector():
+    """Install a per-node latency/fault injector for one test."""
+    def install(spec):
+        latency_model.set_injector(NodeLatencyInjector.from_config(spec, seed=1))
+    yield install
+    latency_model.set_injector(None)
+
+
+class TestWriteQuorum:
+    def test_acknowledged_before_slow_node(self, paths, injector):
+        injector({2: {"kind": "fixed", "ms": 40}})
+        data = os.urandom(100_000)
+        result = _ingest(paths, data, write_quorum=2, label="slow.bin")
+        assert os.path.exists(paths[0]) and os.path.exists(paths[1])
+        assert not os.path.exists(paths[2])
+        assert result.writes.pending == [2]
+        assert write_quorum.outstanding("slow.bin") == [result.writes]
+        assert write_quorum.wait_for("slow.bin", timeout=10)
+        assert result.writes.done[-1] == 2 and result.writes.settled_s > result.writes.acked_s
+        os.remove(paths[0])
+        assert CryptoEngine.decrypt_in_place(PASSWORD, reassemble_files(paths)) == data
+
+    def test_acknowledged_shards_synced(self, paths, monkeypatch):
+        """A node is acknowledged only once its shard (and a shard file's directory entry) is fsynced."""
+        lock, synced, at_ack = threading.Lock(), set(), {}
+        real_fsync, real_succeeded = os.fsync, write_quorum.WriteTracker.succeeded
+
+        def fsync(fd):
+            st = os.fstat(fd)
+            with lock:
+                synced.add((st.st_dev, st.st_ino))
+            real_fsync(fd)
+
+        def succeeded(tracker, node):
+            with lock:
+                at_ack[node] = set(synced)
+            real_succeeded(tracker, node)
+        monkeypatch.setattr(os, "fsync", fsync)
+        monkeypatch.setattr(write_quorum.WriteTracker, "succeeded", succeeded)
+        puts = []
+        targets = paths[:2] + [lambda data, sync=False: puts.append(sync)]
+        result = _ingest(targets, os.urandom(50_000), write_quorum=2)
+        assert result.writes.wait(10)
+        for node in (0, 1):
+            for path in (paths[node], os.path.dirname(paths[node])):
+                st = os.stat(path)
+                assert (st.st_dev, st.st_ino) in at_ack[node]
+        assert puts == [True]
+
+    def test_failed_node_dropped_not_fatal(self, paths, tmp_path, injector):
+        injector({1: {"kind": "none", "fail_probability": 1.0}})
+        data = os.urandom(30_000)
+        result = _ingest(paths, data, write_quorum=2, backoff=0.001)
+        assert result.writes.wait(10)
+        assert list(result.writes.failed) == [1]
+        assert sorted(os.listdir(tmp_path)) == ["asset.enc.0", "asset.enc.2"]
+        assert CryptoEngine.decrypt_in_place(PASSWORD, reassemble_files(paths)) == data
+
+    def test_transient_fault_retried(self, paths, injector):
+        injector({0: {"kind": "none", "fail_probability": 0.3}})
+        data = os.urandom(100_000)
+        result = _ingest(paths, data, write_quorum=3, retries=20, backoff=0.0001)
+        assert sorted(result.writes.done) == [0, 1, 2] and not result.writes.failed
+        assert CryptoEngine.decrypt_in_place(PASSWORD, reassemble_files(paths)) == data
+
+    def test_quorum_lost_raises_and_cleans_up(self, paths, tmp_path, injector):
+        injector({0: {"kind": "none", "fail_probability": 1.0},
+                  1: {"kind": "none", "fail_probability": 1.0}})
+        with pytest.raises(ValueError, match="Write quorum not reached"):
+            _ingest(paths, os.urandom(20_000), write_quorum=2, retries=1, backoff=0.001)
+        assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+    @pytest.mark.parametrize("quorum,online", [(1, 3), (4, 3), (3, 2)])
+    def test_invalid_quorum(self, paths, quorum, online):
+        with pytest.raises(ValueError, match="quorum"):
+            IngestPipeline(CryptoEngine(PASSWORD), paths[:online] + [None] * (3 - online), write_quorum=quorum)
@@ -0,0 +1,129 @@
+"""
+test_latency_model.py
+Unit tests for latency_model.py — per-node latency and fault injection.
+Validates: zero-delay production default, config parsing for fixed /
+lognormal / stall models, seeded reproducibility, injected faults, and
+that ShamirVault shard writes go through the injector.
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config
+import latency_model
+from latency_model import (
+    FixedLatency, LatencyModel, LogNormalLatency, NodeFault, NodeLatencyInjector,
+    StallLatency, build_model,
+)
+
+
+@pytest.fixture(autouse=True)
+def _reset_injector():
+    latency_model.set_injector(None)
+    yield
+    latency_model.set_injector(None)
+
+
+class TestDefaults:
+    def test_production_default_is_zero(self):
+        """config.NODE_LATENCY adds no delay out of the box."""
+        injector = latency_model.get_injector()
+        t0 = time.perf_counter()
+        for node in range(3):
+            asyncio.run(injector.delay(node))
+        assert time.perf_counter() - t0 < 0.05
+        assert type(injector.default) is LatencyModel
+
+    def test_shard_write_has_no_fixed_sleep(self, tmp_path):
+        from shamir_handler import ShamirVault
+        t0 = time.perf_counter()
+        for i in range(20):
+            asyncio.run(ShamirVault.async_write_shard(str(tmp_path / f"s{i}"), b"\x01" * 16, 0))
+        assert time.perf_counter() - t0 < 0.2   # was >= 20 * 10 ms
+
+
+class TestModels:
+    def test_build_model_kinds(self):
+        assert isinstance(build_model({"kind": "fixed", "ms": 3}), FixedLatency)
+        assert isinstance(build_model({"kind": "lognormal", "median_ms": 4}), LogNormalLatency)
+        stall = build_model({"kind": "stall", "probability": 0.5, "stall_ms": 100,
+                             "base": {"kind": "fixed", "ms": 1}})
+        assert isinstance(stall, StallLatency)
+        assert isinstance(stall.base, FixedLatency)
+        with pytest.raises(ValueError, match="kind"):
+            build_model({"kind": "gaussian"})
+
+    def test_fixed_sample(self):
+        import random
+        assert FixedLatency(7).sample(random.Random(0)) == pytest.approx(0.007)
+
+    def test_lognormal_median_and_cap(self):
+        import random
+        import statistics
+        rng = random.Random(1)
+        model = LogNormalLatency(median_ms=10, sigma=0.5)
+        samples = [model.sample(rng) for _ in range(4000)]
+        assert statistics.median(samples) == pytest.approx(0.010, rel=0.1)
+        capped = LogNormalLatency(median_ms=10, sigma=3, cap_ms=20)
+        assert max(capped.sample(rng) for _ in range(1000)) <= 0.020
+
+    def test_stall_probability(self):
+        import random
+        rng = random.Random(2)
+        model = StallLatency(probability=0.1, stall_ms=100)
+        stalls = sum(model.sample(rng) > 0 for _ in range(5000))
+        assert 350 < stalls < 650
+
+
+class TestInjector:
+    def test_per_node_overrides_default(self):
+        injector = NodeLatencyInjector.from_config({
+            "default": {"kind": "fixed", "ms": 1},
+            2: {"kind": "fixed", "ms": 50},
+        })
+        assert injector._draw(0) == pytest.approx(0.001)
+        assert injector._draw(2) == pytest.approx(0.050)
+
+    def test_seed_is_reproducible(self):
+        spec = {"default": {"kind": "lognormal", "median_ms": 5, "sigma": 1}}
+        a = NodeLatencyInjector.from_config(spec, seed=42)
+        b = NodeLatencyInjector.from_config(spec, seed=42)
+        assert [a._draw(0) for _ in range(10)] == [b._draw(0) for _ in range(10)]
+
+    def test_fault_injection_raises_oserror(self):
+        injector = NodeLatencyInjector.from_config({1: {"kind": "none", "fail_probability": 1.0}})
+        asyncio.run(injector.delay(0))
+        with pytest.raises(NodeFault):
+            asyncio.run(injector.delay(1))
+        with pytest.raises(OSError):
+            injector.delay_sync(1)
+
+    def test_string_node_ids_from_json(self):
+        """Node ids loaded as JSON object keys (strings) drive both latency and faults."""
+        injector = NodeLatencyInjector.from_config({"1": {"kind": "fixed", "ms": 5, "fail_probability": 1.0}})
+        assert injector.models[1].sample(injector._rng) == pytest.approx(0.005)
+        with pytest.raises(NodeFault):
+            injector.delay_sync(1)
+        injector.delay_sync(0)
+
+    def test_injector_reaches_shard_writes(self, tmp_path, monkeypatch):
+        """A faulty node surfaces as a Sharding Error from distribute_key_async."""
+        from shamir_handler import ShamirVault
+        nodes = {i: str(tmp_path / f"k{i}") for i in range(3)}
+        for path in nodes.values():
+            os.makedirs(path)
+        monkeypatch.setattr(config, "KEY_NODES", nodes)
+        latency_model.set_injector(
+            NodeLatencyInjector.from_config({2: {"kind": "none", "fail_probability": 1.0}}))
+        with pytest.raises(ValueError, match="Sharding Error"):
+            ShamirVault.distribute_key_async("pw", "asset", [True, True, True])
+        latency_model.set_injector(None)
+        ShamirVault.distribute_key_async("pw", "asset", [True, True, True])
+        assert ShamirVault.reconstruct_key("asset", [True, True, True]) == "pw"
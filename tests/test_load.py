@@ -24,6 +24,40 @@ To reproduce the 1,000-op benchmark locally, run:
     python tests/test_load.py --full
 This calls run_full_benchmark() which uses FULL_CONCURRENT_OPS = 1000.
 
+Segment Scaling Curve
+---------------------
+run_segment_scaling_benchmark() encrypts one large payload through
+CryptoEngine.encrypt_stream() with 1, 2, 4 and 8 worker threads and prints
+MB/s and speed-up per worker count:
+    python tests/test_load.py --scaling
+
+Erasure Coding Throughput
+-------------------------
+run_erasure_benchmark() Reed-Solomon encodes one large payload and decodes
+it from the parity shard plus one data shard (the worst case):
+    python tests/test_load.py --erasure
+
+Compression Ratio vs Latency
+----------------------------
+run_compression_benchmark() envelope-encrypts log-like text, mixed and
+random payloads with no codec, zlib and lzma, and prints the stored size
+ratio next to the encryption time each codec adds:
+    python tests/test_load.py --compression
+
+Node Backends
+-------------
+run_node_benchmark() starts a node server process and compares concurrent
+put/get throughput of the local backend with the TCP client at one and
+four pipelined connections:
+    python tests/test_load.py --nodes
+
+Write Quorum
+------------
+run_quorum_benchmark() uploads through IngestPipeline with one straggling
+node and compares acknowledgement latency when waiting for every node and
+for a 2-node write quorum:
+    python tests/test_load.py --quorum
+
 Note: the +35% and 85% figures are from the original research environment.
 Results on developer machines will vary due to GIL contention, hardware
 differences, and OS scheduling.
@@ -32,6 +66,8 @@ differences, and OS scheduling.
 import sys
 import os
 import asyncio
+import subprocess
+import tempfile
 import threading
 import time
 import pytest
@@ -39,14 +75,24 @@ import pytest
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, ROOT)
 
+import numpy as np
+
 from crypto_engine import CryptoEngine
 from Crypto.Protocol.SecretSharing import Shamir
+from shamir_handler import ShamirVault
+from erasure_coding import ReedSolomon
+from compression import SegmentCompressor
+from node_store import LocalNodeStore, RemoteNodeStore
+from ingest_pipeline import IngestPipeline
+import latency_model
+import write_quorum
 
 # ------------------------------------------------------------------
 # Configuration
 # ------------------------------------------------------------------
 CI_CONCURRENT_OPS   = 20     # Used by pytest test classes — fast, correct
 FULL_CONCURRENT_OPS = 1000   # Used by run_full_benchmark() only (--full flag)
+BULK_SECRETS        = 10000  # Secrets per vectorised GF(256) split/recon call
 PLAINTEXT  = b"VaultZero load test payload - AES-256-GCM"
 PASSWORD   = "load_test_password"
 SECRET_16  = b"LoadTestSecret!!"   # exactly 16 bytes for Shamir
@@ -74,6 +120,15 @@ def _shamir_op():
     return True
 
 
+def _gf256_bulk_op(n_secrets: int) -> int:
+    """Split and reconstruct *n_secrets* 16-byte secrets in one vectorised call each."""
+    secrets = np.frombuffer(os.urandom(n_secrets * 16), dtype=np.uint8).reshape(n_secrets, 16)
+    share_sets = ShamirVault.split_keys_batch(secrets, 2, 3)
+    recovered = ShamirVault.reconstruct_batch(share_sets[:2])
+    assert np.array_equal(recovered, secrets)
+    return n_secrets
+
+
 # ------------------------------------------------------------------
 # AsyncIO load helpers
 # ------------------------------------------------------------------
@@ -203,6 +258,20 @@ class TestThreadingBaselineLoad:
         assert len(errors) == 0
 
 
+class TestGF256BulkShamir:
+    """Vectorised GF(256) Shamir on a bulk workload (BULK_SECRETS per call)."""
+
+    def test_bulk_split_reconstruct(self):
+        """10,000 secrets split and reconstructed in one vectorised pass each."""
+        t0 = time.perf_counter()
+        done = _gf256_bulk_op(BULK_SECRETS)
+        elapsed = time.perf_counter() - t0
+
+        print("\n  [GF(256) Bulk Shamir]")
+        _print_row("GF256 bulk split/recon", done, elapsed, done, 0)
+        assert done == BULK_SECRETS
+
+
 # ------------------------------------------------------------------
 # Standalone runner helpers
 # ------------------------------------------------------------------
@@ -252,12 +321,209 @@ def run_full_benchmark(n: int = FULL_CONCURRENT_OPS) -> None:
     elapsed = time.perf_counter() - t0
     _print_row("Threading Shamir split/recon", n, elapsed, r, len(e))
 
+    # Vectorised GF(256) Shamir (one call for the whole batch)
+    t0 = time.perf_counter()
+    done = _gf256_bulk_op(n * 100)
+    elapsed = time.perf_counter() - t0
+    _print_row("GF256 bulk split/recon", done, elapsed, done, 0)
+
     print()
     print("  Full benchmark complete.")
     print(f"  Published results: AsyncIO +35% throughput vs threading,")
     print(f"  85% crash reduction at {FULL_CONCURRENT_OPS} concurrent requests.")
 
 
+def run_segment_scaling_benchmark(size_mb: int = 256,
+                                  segment_size: int = 1024 * 1024,
+                                  worker_counts=(1, 2, 4, 8)) -> None:
+    """
+    Measure encrypt_stream() throughput for one large payload per worker count.
+
+    Uses 1 MiB segments so per-task scheduling overhead stays small next to
+    the AES-GCM work.  On an 8-core machine the curve should stay close to
+    linear until memory bandwidth saturates.
+
+    Invoke with:  python tests/test_load.py --scaling
+    """
+    payload = os.urandom(size_mb * 1024 * 1024)
+    engine = CryptoEngine(PASSWORD)
+
+    print("=" * 75)
+    print(f"  VaultZero — Segment Encryption Scaling  [{size_mb} MB, "
+          f"{segment_size // 1024} KiB segments, {os.cpu_count()} CPUs]")
+    print("=" * 75)
+    print(f"  {'Workers':<10}  {'Throughput':>14}  {'Speed-up':>10}  {'Total Time':>12}")
+    print("  " + "-" * 70)
+
+    baseline = None
+    for workers in worker_counts:
+        t0 = time.perf_counter()
+        for _ in engine.encrypt_stream(payload, segment_size=segment_size, workers=workers):
+            pass
+        elapsed = time.perf_counter() - t0
+        mb_sec = size_mb / elapsed
+        baseline = baseline or mb_sec
+        print(f"  {workers:<10}  {mb_sec:>9.1f} MB/s  {mb_sec / baseline:>9.2f}x  "
+              f"{elapsed * 1000:>9.1f} ms")
+
+
+def run_erasure_benchmark(size_mb: int = 256, k: int = 2, n: int = 3) -> None:
+    """
+    Measure ReedSolomon encode and degraded-decode throughput.
+
+    Decoding uses shards 1..k (data shard 0 lost), so every byte goes
+    through the GF(256) inverse-matrix path rather than the systematic copy.
+
+    Invoke with:  python tests/test_load.py --erasure
+    """
+    payload = os.urandom(size_mb * 1024 * 1024)
+    rs = ReedSolomon(k, n)
+
+    print("=" * 75)
+    print(f"  VaultZero — Reed-Solomon {k}-of-{n}  [{size_mb} MB payload]")
+    print("=" * 75)
+
+    t0 = time.perf_counter()
+    rows = rs.encode_array(payload)
+    encode_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    rs.decode({i: rows[i] for i in range(1, k + 1)}, len(payload))
+    decode_s = time.perf_counter() - t0
+
+    print(f"  {'encode':<10}  {size_mb / encode_s:>9.1f} MB/s  {encode_s * 1000:>9.1f} ms")
+    print(f"  {'decode':<10}  {size_mb / decode_s:>9.1f} MB/s  {decode_s * 1000:>9.1f} ms")
+
+
+def _log_corpus(size: int) -> bytes:
+    """Synthetic service log: repetitive structure, varying numbers."""
+    rng = np.random.default_rng(7)
+    lines = []
+    total = 0
+    while total < size:
+        line = (f"2026-01-01T00:{rng.integers(60):02d}:{rng.integers(60):02d}Z INFO vaultzero.node"
+                f"{rng.integers(1, 4)} shard={rng.integers(1 << 20):x} bytes={rng.integers(1 << 16)} "
+                f"latency_ms={rng.random() * 50:.3f}\n").encode()
+        lines.append(line)
+        total += len(line)
+    return b"".join(lines)[:size]
+
+
+def run_compression_benchmark(size_mb: int = 16) -> None:
+    """
+    Compare stored size and encryption latency with and without per-segment
+    compression, on text, random and half-and-half payloads.
+
+    Invoke with:  python tests/test_load.py --compression
+    """
+    size = size_mb * 1024 * 1024
+    text = _log_corpus(size)
+    corpora = {
+        "log text": text,
+        "random": os.urandom(size),
+        "mixed": text[:size // 2] + os.urandom(size - size // 2),
+    }
+    codecs = {
+        "none": None,
+        "zlib-1": SegmentCompressor("zlib", level=1),
+        "zlib-6": SegmentCompressor("zlib", level=6),
+        "lzma-1": SegmentCompressor("lzma", level=1),
+    }
+    engine = CryptoEngine("benchmark_password_xyz")
+
+    print("=" * 75)
+    print(f"  VaultZero — Per-segment compression  [{size_mb} MB payloads]")
+    print("=" * 75)
+    print(f"  {'payload':<10}  {'codec':<8}  {'ratio':>7}  {'encrypt ms':>11}  {'added ms':>9}  {'decrypt ms':>11}")
+    for name, data in corpora.items():
+        baseline = None
+        for label, codec in codecs.items():
+            t0 = time.perf_counter()
+            blob = b"".join(engine.encrypt_envelope(data, codec=codec))
+            encrypt_s = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            CryptoEngine.decrypt_in_place("benchmark_password_xyz", bytearray(blob))
+            decrypt_s = time.perf_counter() - t0
+            baseline = encrypt_s if baseline is None else baseline
+            print(f"  {name:<10}  {label:<8}  {len(blob) / len(data):>7.3f}  {encrypt_s * 1000:>11.1f}  "
+                  f"{(encrypt_s - baseline) * 1000:>9.1f}  {decrypt_s * 1000:>11.1f}")
+
+
+def run_node_benchmark(n_objects: int = 2000, object_bytes: int = 4096) -> None:
+    """
+    Measure concurrent put/get throughput of small objects on a local node
+    and on a node server over TCP (pool of 1 and 4 pipelined connections).
+
+    Invoke with:  python tests/test_load.py --nodes
+    """
+    payload = os.urandom(object_bytes)
+
+    async def exercise(store) -> tuple:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(store.aput(f"obj{i}", payload) for i in range(n_objects)))
+        put_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        await asyncio.gather(*(store.aget(f"obj{i}") for i in range(n_objects)))
+        return put_s, time.perf_counter() - t0
+
+    print("=" * 75)
+    print(f"  VaultZero — Node backends  [{n_objects} x {object_bytes // 1024} KB objects]")
+    print("=" * 75)
+    print(f"  {'backend':<16}  {'put ops/s':>10}  {'get ops/s':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        server = subprocess.Popen([sys.executable, "-m", "ops.node_server", "--root", os.path.join(tmp, "remote")],
+                                  cwd=ROOT, stdout=subprocess.PIPE, text=True)
+        try:
+            port = int(server.stdout.readline().rsplit(":", 1)[1])
+            stores = {
+                "local": LocalNodeStore(os.path.join(tmp, "local")),
+                "tcp pool=1": RemoteNodeStore("127.0.0.1", port, pool_size=1),
+                "tcp pool=4": RemoteNodeStore("127.0.0.1", port, pool_size=4),
+            }
+            for label, store in stores.items():
+                put_s, get_s = asyncio.run(exercise(store))
+                store.close()
+                print(f"  {label:<16}  {n_objects / put_s:>10.0f}  {n_objects / get_s:>10.0f}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def run_quorum_benchmark(size_mb: int = 8, uploads: int = 5) -> None:
+    """
+    Measure upload acknowledgement latency with node 2 straggling (lognormal
+    row latency, occasional stalls), waiting for all nodes vs a quorum of 2.
+
+    Invoke with:  python tests/test_load.py --quorum
+    """
+    payload = os.urandom(size_mb * 1024 * 1024)
+    engine = CryptoEngine("benchmark_password_xyz")
+    latency_model.set_injector(latency_model.NodeLatencyInjector.from_config({
+        "default": {"kind": "lognormal", "median_ms": 0.5, "sigma": 0.4},
+        2: {"kind": "stall", "base": {"kind": "lognormal", "median_ms": 6, "sigma": 0.6},
+            "probability": 0.02, "stall_ms": 150},
+    }, seed=7))
+
+    print("=" * 75)
+    print(f"  VaultZero — Write quorum  [{size_mb} MB uploads, node 2 straggling]")
+    print("=" * 75)
+    print(f"  {'mode':<12}  {'ack ms (avg)':>13}  {'all nodes ms':>13}")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = [os.path.join(tmp, f"bench.enc.{i}") for i in range(3)]
+            for label, quorum in (("all nodes", None), ("quorum 2", 2)):
+                acked, settled = [], []
+                for _ in range(uploads):
+                    t0 = time.perf_counter()
+                    result = IngestPipeline(engine, paths, write_quorum=quorum, label="bench").run(payload)
+                    acked.append(time.perf_counter() - t0)
+                    write_quorum.wait_for("bench")
+                    settled.append(time.perf_counter() - t0)
+                print(f"  {label:<12}  {sum(acked) / uploads * 1000:>13.1f}  {sum(settled) / uploads * 1000:>13.1f}")
+    finally:
+        latency_model.set_injector(None)
+
+
 # ------------------------------------------------------------------
 # Standalone runner: prints comparison table
 # ------------------------------------------------------------------
@@ -267,6 +533,26 @@ if __name__ == '__main__':
         run_full_benchmark()
         sys.exit(0)
 
+    if '--scaling' in sys.argv:
+        run_segment_scaling_benchmark()
+        sys.exit(0)
+
+    if '--erasure' in sys.argv:
+        run_erasure_benchmark()
+        sys.exit(0)
+
+    if '--compression' in sys.argv:
+        run_compression_benchmark()
+        sys.exit(0)
+
+    if '--nodes' in sys.argv:
+        run_node_benchmark()
+        sys.exit(0)
+
+    if '--quorum' in sys.argv:
+        run_quorum_benchmark()
+        sys.exit(0)
+
     _print_header(CI_CONCURRENT_OPS, label="CI scale")
 
     # AsyncIO crypto
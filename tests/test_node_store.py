@@ -0,0 +1,166 @@
+"""
+test_node_store.py
+Unit tests for node_store.py — storage-node backends and the TCP node server.
+Validates: the local backend over packfile and legacy per-file objects,
+name validation, the remote client against an in-process server (errors,
+list/stat, many pipelined requests on one connection), reconnecting after
+a server restart, and key shards distributed to tcp:// key nodes.
+"""
+
+import sys
+import os
+import asyncio
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config
+import node_store
+from node_store import LocalNodeStore, LoopThread, NodeServer, ObjectStat, RemoteNodeStore, open_node
+from shamir_handler import ShamirVault
+
+SERVER_LOOP = LoopThread("test-node-server")
+
+
+@pytest.fixture
+def local(tmp_path):
+    yield LocalNodeStore(str(tmp_path / "node1"))
+    node_store.close_nodes()
+
+
+def _serve(store):
+    server = NodeServer(store)
+    SERVER_LOOP.run(server.start())
+    return server
+
+
+@pytest.fixture
+def remote(local):
+    server = _serve(local)
+    client = RemoteNodeStore("127.0.0.1", server.port, pool_size=1, timeout=10)
+    yield client
+    client.close()
+    SERVER_LOOP.run(server.close())
+
+
+class TestLocalNodeStore:
+    def test_put_get_delete(self, local):
+        local.put("a.key.0", b"alpha")
+        assert local.get("a.key.0") == b"alpha"
+        assert local.stat("a.key.0") == ObjectStat("a.key.0", 5)
+        assert local.delete("a.key.0") is True
+        assert local.delete("a.key.0") is False
+        with pytest.raises(FileNotFoundError):
+            local.get("a.key.0")
+
+    def test_legacy_file_read_and_superseded(self, local):
+        path = local.file_path("old.enc.0")
+        with open(path, "wb") as f:
+            f.write(b"legacy")
+        assert local.get("old.enc.0") == b"legacy"
+        assert local.local_file("old.enc.0") == path
+        local.put("old.enc.0", b"packed")
+        assert local.get("old.enc.0") == b"packed"
+        assert not os.path.exists(path)
+
+    def test_list_hides_pack_files(self, local):
+        local.put("b.key.0", b"1")
+        local.put("a.key.0", b"2")
+        with open(local.file_path("c.enc.0"), "wb") as f:
+            f.write(b"3")
+        assert local.list() == ["a.key.0", "b.key.0", "c.enc.0"]
+        assert local.list("b") == ["b.key.0"]
+
+    @pytest.mark.parametrize("name", ["", "..", "a/b", "x\0y"])
+    def test_invalid_names_rejected(self, local, name):
+        with pytest.raises(ValueError):
+            local.put(name, b"x")
+
+    def test_async_api(self, local):
+        async def run():
+            await local.aput("n", b"v")
+            return await local.aget("n"), await local.alist()
+        assert asyncio.run(run()) == (b"v", ["n"])
+
+    def test_incomplete_backend_rejected(self):
+        """A backend missing part of the interface fails when constructed, not on first call."""
+        class PutOnly(node_store.NodeStore):
+            def put(self, name, data):
+                pass
+        with pytest.raises(TypeError):
+            PutOnly()
+
+
+class TestRemoteNodeStore:
+    def test_roundtrip(self, remote, local):
+        remote.put("asset.enc.0", b"\x00" * 70_000 + b"end")
+        assert local.get("asset.enc.0")[-3:] == b"end"
+        assert remote.get("asset.enc.0") == local.get("asset.enc.0")
+        assert remote.stat("asset.enc.0").size == 70_003
+        assert remote.list("asset") == ["asset.enc.0"]
+        assert remote.delete("asset.enc.0") is True
+        assert remote.delete("asset.enc.0") is False
+
+    def test_synced_put_reaches_server_disk(self, remote, local, monkeypatch):
+        """put(sync=True) is only answered after the server fsyncs the record."""
+        synced = []
+        real_fsync = os.fsync
+        monkeypatch.setattr(os, "fsync", lambda fd: (synced.append(fd), real_fsync(fd)))
+        remote.put("fast", b"x")
+        assert synced == []
+        remote.put("durable", b"y", sync=True)
+        assert synced == [local.pack._active.fd]
+
+    def test_errors_map_to_exceptions(self, remote):
+        with pytest.raises(FileNotFoundError):
+            remote.get("missing")
+        with pytest.raises(FileNotFoundError):
+            remote.stat("missing")
+        with pytest.raises(ValueError):
+            remote.put("..", b"x")
+
+    def test_pipelined_requests_share_one_connection(self, remote):
+        async def run():
+            await asyncio.gather(*(remote.aput(f"obj{i}", bytes([i]) * (i + 1)) for i in range(64)))
+            return await asyncio.gather(*(remote.aget(f"obj{i}") for i in range(64)))
+        assert asyncio.run(run()) == [bytes([i]) * (i + 1) for i in range(64)]
+        assert len(remote._connections) == 1
+
+    def test_reconnects_after_server_restart(self, local):
+        server = _serve(local)
+        client = RemoteNodeStore("127.0.0.1", server.port, timeout=10)
+        client.put("k", b"v")
+        SERVER_LOOP.run(server.close())
+        server = NodeServer(local, port=server.port)
+        SERVER_LOOP.run(server.start())
+        try:
+            assert client.get("k") == b"v"
+        finally:
+            client.close()
+            SERVER_LOOP.run(server.close())
+
+    def test_unreachable_node_raises_oserror(self, tmp_path):
+        server = _serve(LocalNodeStore(str(tmp_path / "gone")))
+        port = server.port
+        SERVER_LOOP.run(server.close())
+        with pytest.raises(OSError):
+            RemoteNodeStore("127.0.0.1", port, timeout=2).get("k")
+
+
+class TestRemoteKeyNodes:
+    def test_key_shards_over_tcp(self, tmp_path, monkeypatch):
+        servers = [_serve(LocalNodeStore(str(tmp_path / f"key_node{i + 1}"))) for i in range(3)]
+        monkeypatch.setattr(config, "KEY_NODES", {i: f"tcp://127.0.0.1:{s.port}" for i, s in enumerate(servers)})
+        try:
+            assert isinstance(open_node(config.KEY_NODES[0]), RemoteNodeStore)
+            ShamirVault.distribute_key_async("pw", "asset", [True, True, True])
+            assert servers[0].store.list() == ["asset.key.0"]
+            SERVER_LOOP.run(servers[2].close())
+            result = ShamirVault.reconstruct_key_detailed("asset", [True, True, True])
+            assert result.as_key() == "pw"
+        finally:
+            node_store.close_nodes()
+            for server in servers:
+                SERVER_LOOP.run(server.close())
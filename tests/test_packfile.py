@@ -0,0 +1,176 @@
+"""
+test_packfile.py
+Unit tests for packfile.py — the per-node append-only object store.
+Validates: put/get/delete, segment rollover with hint files, recovery of
+the index on reopen (hints, scans and torn tails), checksum failures, and
+compaction reclaiming burned objects without losing or resurrecting any.
+"""
+
+import sys
+import os
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from packfile import PackStore
+
+
+@pytest.fixture
+def root(tmp_path):
+    return str(tmp_path / "node1")
+
+
+def _segments(root):
+    return sorted(name for name in os.listdir(root) if name.endswith(".vzp"))
+
+
+class TestPutGet:
+    def test_roundtrip_and_overwrite(self, root):
+        with PackStore(root) as store:
+            store.put("a.key.0", b"alpha")
+            store.put("b.key.0", b"")
+            store.put("a.key.0", b"alpha v2")
+            assert store.get("a.key.0") == b"alpha v2"
+            assert store.get("b.key.0") == b""
+            assert len(store) == 2 and "a.key.0" in store
+        assert len(_segments(root)) == 1             # small objects share one file
+
+    def test_delete(self, root):
+        with PackStore(root) as store:
+            store.put("x", b"payload")
+            assert store.delete("x") is True
+            assert store.delete("x") is False
+            with pytest.raises(FileNotFoundError):
+                store.get("x")
+
+    def test_rollover_writes_hints(self, root):
+        with PackStore(root, segment_bytes=4096) as store:
+            for i in range(50):
+                store.put(f"obj{i}", os.urandom(500))
+            assert store.stats()["segments"] > 5
+        hints = [name for name in os.listdir(root) if name.endswith(".hint")]
+        assert len(hints) == len(_segments(root)) - 1      # every sealed segment
+
+    def test_corrupt_record_raises(self, root):
+        with PackStore(root) as store:
+            store.put("x", b"secret shard bytes")
+        with open(os.path.join(root, _segments(root)[0]), "r+b") as f:
+            f.seek(-3, os.SEEK_END)
+            f.write(b"\x00")
+        with PackStore(root) as store:
+            with pytest.raises(FileNotFoundError):
+                store.get("x")                      # scan stops at the bad record
+        with PackStore(root) as store:
+            store.put("y", b"fresh")
+            assert store.get("y") == b"fresh"
+
+
+class TestReopen:
+    def test_index_rebuilt_from_hints_and_active_scan(self, root):
+        expected = {}
+        with PackStore(root, segment_bytes=4096) as store:
+            for i in range(40):
+                expected[f"obj{i % 25}"] = os.urandom(300)
+                store.put(f"obj{i % 25}", expected[f"obj{i % 25}"])
+            store.delete("obj3")
+            del expected["obj3"]
+        with PackStore(root, segment_bytes=4096) as store:
+            assert {name: store.get(name) for name in store.names()} == expected
+
+    def test_torn_tail_truncated(self, root):
+        with PackStore(root) as store:
+            store.put("whole", b"complete record")
+        path = os.path.join(root, _segments(root)[0])
+        size = os.path.getsize(path)
+        with open(path, "ab") as f:
+            f.write(b"\x12\x34\x56\x78\x01\x00")    # half a record header
+        with PackStore(root) as store:
+            assert store.get("whole") == b"complete record"
+            assert os.path.getsize(path) == size
+            store.put("next", b"appended after recovery")
+        with PackStore(root) as store:
+            assert store.get("next") == b"appended after recovery"
+
+    def test_stale_hint_ignored(self, root):
+        with PackStore(root, segment_bytes=1024) as store:
+            for i in range(10):
+                store.put(f"obj{i}", os.urandom(200))
+        hint = os.path.join(root, _segments(root)[0][:-4] + ".hint")
+        with open(hint, "r+b") as f:
+            f.seek(4)
+            f.write(b"\xff" * 8)                   # recorded size no longer matches
+        with PackStore(root, segment_bytes=1024) as store:
+            assert len(store) == 10
+
+
+class TestCompaction:
+    def test_burned_objects_reclaimed(self, root):
+        with PackStore(root, segment_bytes=8192) as store:
+            for i in range(60):
+                store.put(f"obj{i}", os.urandom(400))
+            for i in range(50):
+                store.delete(f"obj{i}")
+            before = store.stats()
+            reclaimed = store.compact(min_garbage=0.5)
+            after = store.stats()
+            assert reclaimed > 0 and after["garbage_bytes"] < before["garbage_bytes"]
+            survivors = {f"obj{i}": store.get(f"obj{i}") for i in range(50, 60)}
+        with PackStore(root, segment_bytes=8192) as store:
+            assert set(store.names()) == set(survivors)
+            assert all(store.get(name) == data for name, data in survivors.items())
+
+    def test_deleted_object_not_resurrected(self, root):
+        with PackStore(root, segment_bytes=2048) as store:
+            store.put("keep", os.urandom(1000))
+            store.put("gone", os.urandom(200))        # shares mostly-live segment 1
+            store.put("filler", os.urandom(1500))     # seals segment 1
+            store.delete("gone")
+            store.delete("filler")
+            store.put("last", os.urandom(1500))       # seals the tombstones' segment
+            store.compact(min_garbage=0.5)
+            assert os.path.exists(os.path.join(root, "pack-000001.vzp"))
+            assert not os.path.exists(os.path.join(root, "pack-000002.vzp"))
+        with PackStore(root, segment_bytes=2048) as store:
+            assert set(store.names()) == {"keep", "last"}
+
+    def test_copies_synced_before_unlink(self, root, monkeypatch):
+        """Compaction fsyncs the copied records before removing the old segment, even with sync=False."""
+        events = []
+        real_fsync, real_remove = os.fsync, os.remove
+        monkeypatch.setattr(os, "fsync", lambda fd: (events.append(("fsync", fd)), real_fsync(fd)))
+        monkeypatch.setattr(os, "remove", lambda path: (events.append(("remove", path)), real_remove(path)))
+        with PackStore(root, segment_bytes=2048, sync=False) as store:
+            store.put("keep", os.urandom(300))
+            for i in range(4):
+                store.put(f"junk{i}", os.urandom(400))
+            for i in range(4):
+                store.delete(f"junk{i}")
+            store.put("tail", os.urandom(1500))       # seals segment 1
+            events.clear()
+            store.compact(min_garbage=0.5)
+            active = store._active.fd
+            removed = [i for i, (op, path) in enumerate(events)
+                       if op == "remove" and path.endswith("pack-000001.vzp")]
+            assert removed
+            assert ("fsync", active) in events[:removed[0]]
+            assert store.get("keep")
+
+    def test_background_compactor(self, root):
+        store = PackStore(root, segment_bytes=2048)
+        try:
+            for i in range(20):
+                store.put(f"obj{i}", os.urandom(900))
+            for i in range(19):
+                store.delete(f"obj{i}")
+            store.put("tail", os.urandom(900))
+            store.start_compactor(interval=0.05)
+            deadline = time.time() + 5
+            while store.stats()["reclaimed_bytes"] == 0 and time.time() < deadline:
+                time.sleep(0.05)
+            assert store.stats()["reclaimed_bytes"] > 0
+            assert set(store.names()) == {"obj19", "tail"}
+        finally:
+            store.close()
@@ -0,0 +1,131 @@
+"""
+test_placement.py
+Unit tests for placement.py — consistent-hash shard placement.
+Validates: distinct nodes per object, determinism, weighted load, ~1/N of
+shards moving when a node joins or leaves, the exact transfer plan (also
+for objects with different shard counts), the vectorised batch placement,
+the class docstring example and the ShardManager hook.
+"""
+
+import sys
+import os
+from collections import Counter
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from placement import PlacementRing, Transfer, plan_transfers, rebalance
+from shard_manager import ShardManager
+
+NAMES = [f"asset-{i}.bin" for i in range(4000)]
+
+
+def _assign(ring, n=3):
+    return {name: list(row) for name, row in zip(NAMES, ring.place_many(NAMES, n).tolist())}
+
+
+def _moved(before, after):
+    return sum(a != b for name in before for a, b in zip(before[name], after[name]))
+
+
+class TestPlacementRing:
+    def test_shards_on_distinct_nodes(self):
+        ring = PlacementRing(range(10))
+        for name in NAMES[:500]:
+            nodes = ring.place(name, 3)
+            assert len(set(nodes)) == 3
+            assert ring.place(name, 3) == nodes
+            assert ring.place(name, 1) == nodes[:1]
+
+    def test_place_many_matches_place(self):
+        ring = PlacementRing({f"node-{i}": 1.0 + i % 3 for i in range(12)}, vnodes=16)
+        batch = ring.place_many(NAMES[:300], 5)
+        assert batch.shape == (300, 5)
+        assert [list(row) for row in batch] == [ring.place(name, 5) for name in NAMES[:300]]
+
+    def test_place_many_falls_back_on_narrow_window(self):
+        ring = PlacementRing(range(4), vnodes=64)
+        assert ring.place_many(NAMES[:200], 4).tolist() == [ring.place(name, 4) for name in NAMES[:200]]
+
+    def test_weights_skew_load(self):
+        ring = PlacementRing({0: 1.0, 1: 1.0, 2: 1.0, 3: 3.0})
+        load = Counter(node for row in ring.place_many(NAMES, 1).tolist() for node in row)
+        share = load[3] / len(NAMES)
+        assert 0.4 < share < 0.6          # 3 / 6 of the weight
+
+    def test_too_many_shards_rejected(self):
+        with pytest.raises(ValueError, match="distinct nodes"):
+            PlacementRing(range(2)).place("a", 3)
+        with pytest.raises(ValueError):
+            PlacementRing(range(2)).add_node(5, weight=0)
+
+
+class TestMembershipChange:
+    def test_adding_node_moves_about_one_nth(self):
+        ring = PlacementRing(range(10))
+        before = _assign(ring)
+        ring.add_node(10)
+        after = {name: rebalance(before[name], wanted) for name, wanted in _assign(ring).items()}
+        fraction = _moved(before, after) / (3 * len(NAMES))
+        assert 0.5 / 11 < fraction < 2 / 11
+        assert all(b == 10 for name in before for a, b in zip(before[name], after[name]) if a != b)
+
+    def test_removing_node_moves_only_its_shards(self):
+        ring = PlacementRing(range(10))
+        before = _assign(ring)
+        ring.remove_node(4)
+        after = {name: rebalance(before[name], wanted) for name, wanted in _assign(ring).items()}
+        assert _moved(before, after) == sum(row.count(4) for row in before.values())
+        assert all(4 not in row for row in after.values())
+
+    def test_plan_transfers_is_exact(self):
+        ring = PlacementRing(range(8))
+        before = _assign(ring)
+        ring.remove_node(2)
+        ring.add_node(8, weight=2.0)
+        transfers = plan_transfers(before, ring)
+        assert all(isinstance(t, Transfer) and t.source != t.target for t in transfers)
+
+        applied = {name: list(row) for name, row in before.items()}
+        for t in transfers:
+            assert applied[t.name][t.shard] == t.source
+            applied[t.name][t.shard] = t.target
+        wanted = _assign(ring)
+        assert all(sorted(applied[name]) == sorted(wanted[name]) for name in NAMES)
+        assert len(transfers) == sum(len(set(before[name]) - set(wanted[name])) for name in NAMES)
+
+    def test_mixed_shard_counts(self):
+        ring = PlacementRing(range(8))
+        before = {"pair.bin": ring.place("pair.bin", 2), "triple.bin": ring.place("triple.bin", 3)}
+        assert plan_transfers(before, ring) == []
+        ring.remove_node(before["pair.bin"][0])
+        transfers = plan_transfers(before, ring)
+        assert {(t.name, t.shard) for t in transfers if t.name == "pair.bin"} == {("pair.bin", 0)}
+        assert all(t.shard < len(before[t.name]) for t in transfers)
+
+    def test_docstring_example(self):
+        ring = PlacementRing({"node-a": 1.0, "node-b": 1.0, "node-c": 2.0})
+        assert ring.place("report.pdf", 3) == ["node-a", "node-c", "node-b"]
+
+    def test_no_change_no_transfers(self):
+        ring = PlacementRing(range(5))
+        assert plan_transfers(_assign(ring), ring) == []
+        assert plan_transfers({}, ring) == []
+
+
+class TestShardManagerPlacement:
+    def test_object_placed_on_ring_nodes(self):
+        manager = ShardManager(n_nodes=6, threshold=2)
+        placed = manager.distribute_shards([b"a", b"b", b"c"], object_id="report.pdf")
+        assert list(placed) == manager.placement.place("report.pdf", 3)
+        assert sorted(manager.recover_shards()) == [b"a", b"b", b"c"]
+
+    def test_round_robin_without_object_id(self):
+        manager = ShardManager(n_nodes=3)
+        assert list(manager.distribute_shards([b"a", b"b", b"c"])) == [0, 1, 2]
+
+    def test_ring_with_unknown_nodes_rejected(self):
+        with pytest.raises(ValueError, match="outside"):
+            ShardManager(n_nodes=3, placement=PlacementRing(range(5)))
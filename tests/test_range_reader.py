@@ -0,0 +1,137 @@
+"""
+test_range_reader.py
+Unit tests for range_reader.py — byte-range reads of stored assets.
+Validates: ranges match the plaintext slice with all shards or one lost,
+key reconstruction from the key nodes, retry on a corrupt data shard,
+compressed and packfile-resident assets, hedged reads around a slow node
+and the cost of a small read on a large object.
+"""
+
+import sys
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config
+import node_store
+import packfile
+import range_reader
+from crypto_engine import CryptoEngine, TAG_SIZE
+from erasure_coding import DATA_SHARD_HEADER_SIZE
+from ingest_pipeline import IngestPipeline
+from range_reader import data_shard_paths, read_range
+from shamir_handler import ShamirVault
+
+PASSWORD = "range_test_password"
+SEG = 512
+UNIT = 2048
+
+
+@pytest.fixture
+def nodes(tmp_path, monkeypatch):
+    """Point config.DATA_NODES and config.KEY_NODES at throwaway directories."""
+    data, keys = {}, {}
+    for i in range(3):
+        data[i] = str(tmp_path / f"data_node{i + 1}")
+        keys[i] = str(tmp_path / f"key_node{i + 1}")
+        os.makedirs(data[i])
+        os.makedirs(keys[i])
+    monkeypatch.setattr(config, "DATA_NODES", data)
+    monkeypatch.setattr(config, "KEY_NODES", keys)
+    yield data
+    node_store.close_nodes()
+
+
+@pytest.fixture
+def asset(nodes):
+    data = os.urandom(20_000)
+    IngestPipeline(CryptoEngine(PASSWORD), data_shard_paths("asset.bin"),
+                   unit=UNIT, segment_size=SEG).run(data)
+    return data
+
+
+class TestReadRange:
+    @pytest.mark.parametrize("offset,length", [(0, 1), (511, 2), (4000, 6000), (19_990, 100), (25_000, 10)])
+    def test_range_matches_slice(self, asset, offset, length):
+        assert read_range("asset.bin", offset, length, PASSWORD) == asset[offset:offset + length]
+
+    @pytest.mark.parametrize("lost", [0, 1, 2])
+    def test_one_data_shard_lost(self, asset, lost):
+        os.remove(data_shard_paths("asset.bin")[lost])
+        assert read_range("asset.bin", 3000, 5000, PASSWORD) == asset[3000:8000]
+
+    def test_key_reconstructed_from_key_nodes(self, asset):
+        ShamirVault.distribute_key_async(PASSWORD, "asset.bin", [True, True, True])
+        assert read_range("asset.bin", 100, 50, active_nodes=[True, False, True]) == asset[100:150]
+
+    def test_corrupt_shard_retried_on_next_subset(self, asset):
+        path = data_shard_paths("asset.bin")[0]
+        with open(path, "r+b") as f:
+            f.seek(DATA_SHARD_HEADER_SIZE + 200)
+            byte = f.read(1)
+            f.seek(-1, os.SEEK_CUR)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        assert read_range("asset.bin", 0, 100, PASSWORD) == asset[:100]
+
+    def test_wrong_password_raises(self, asset):
+        with pytest.raises(ValueError):
+            read_range("asset.bin", 0, 10, "not the password")
+
+    def test_small_read_touches_one_frame(self, asset, monkeypatch):
+        fetched = []
+        original = range_reader.ShardReader.read
+
+        def spy(self, start, length, use=None):
+            fetched.append(length)
+            return original(self, start, length, use)
+        monkeypatch.setattr(range_reader.ShardReader, "read", spy)
+        read_range("asset.bin", 10_000, 10, PASSWORD)
+        assert fetched[-1] == SEG + TAG_SIZE
+
+    def test_compressed_asset(self, nodes):
+        data = b"2026-01-01 INFO range read ok\n" * 2000
+        IngestPipeline(CryptoEngine(PASSWORD), data_shard_paths("log.txt"),
+                       unit=UNIT, segment_size=SEG, compress="zlib").run(data)
+        os.remove(data_shard_paths("log.txt")[0])
+        assert read_range("log.txt", 20_000, 3000, PASSWORD) == data[20_000:23_000]
+
+    def test_packed_asset(self, nodes):
+        import functools
+        from range_reader import data_shard_name, read_ciphertext
+        data = os.urandom(3000)
+        targets = [functools.partial(packfile.node_store(nodes[i]).put, data_shard_name("small.txt", i))
+                   for i in range(3)]
+        IngestPipeline(CryptoEngine(PASSWORD), targets, unit=UNIT, segment_size=SEG).run(data)
+        assert not any(name.endswith(".enc.0") for name in os.listdir(nodes[0]))
+        packfile.node_store(nodes[1]).delete(data_shard_name("small.txt", 1))
+        assert read_range("small.txt", 1000, 700, PASSWORD) == data[1000:1700]
+        assert CryptoEngine.decrypt_in_place(PASSWORD, read_ciphertext("small.txt")) == data
+
+    def test_packed_read_hedges_around_slow_node(self, nodes):
+        import functools
+        import time
+        import latency_model
+        from range_reader import data_shard_name, read_ciphertext
+        from read_scheduler import DATA_READS
+        data = os.urandom(3000)
+        targets = [functools.partial(packfile.node_store(nodes[i]).put, data_shard_name("small.txt", i))
+                   for i in range(3)]
+        IngestPipeline(CryptoEngine(PASSWORD), targets, unit=UNIT, segment_size=SEG).run(data)
+        DATA_READS.reset()
+        latency_model.set_injector(latency_model.NodeLatencyInjector({0: latency_model.FixedLatency(1000)}))
+        try:
+            t0 = time.perf_counter()
+            assert CryptoEngine.decrypt_in_place(PASSWORD, read_ciphertext("small.txt")) == data
+            assert time.perf_counter() - t0 < 0.5
+            assert DATA_READS.stats()[0]["hedges"] == 1
+            assert DATA_READS.order(range(3))[-1] == 0
+        finally:
+            latency_model.set_injector(None)
+            DATA_READS.reset()
+
+    def test_missing_asset(self, nodes):
+        with pytest.raises(FileNotFoundError):
+            read_range("nope.bin", 0, 10, PASSWORD)
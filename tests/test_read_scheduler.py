@@ -0,0 +1,136 @@
+"""
+test_read_scheduler.py
+Unit tests for read_scheduler.py — latency-tracked, hedged node reads.
+Validates: EWMA and p99 bookkeeping, fastest-first ordering, hedged
+requests beating a stalled primary, failover to spares, censored samples
+for cancelled requests, data-shard preference and the ShardManager report.
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from read_scheduler import ReadScheduler
+from shard_manager import ShardManager
+
+
+def _requests(delays, fail=()):
+    """One request per node that sleeps for its delay, then returns its id (or fails)."""
+    def request(node):
+        async def run():
+            await asyncio.sleep(delays[node])
+            if node in fail:
+                raise FileNotFoundError(f"node {node}")
+            return node
+        return run
+    return {node: request(node) for node in delays}
+
+
+class TestLatencyTracking:
+    def test_ewma_and_p99(self):
+        scheduler = ReadScheduler(alpha=0.5)
+        scheduler.record(0, 0.010)
+        scheduler.record(0, 0.020)
+        assert scheduler.node(0).ewma == pytest.approx(0.015)
+        for ms in range(1, 101):
+            scheduler.record(1, ms / 1000)
+        stats = scheduler.stats()[1]
+        assert stats["p99_ms"] == pytest.approx(99.0)
+        assert stats["samples"] == 100
+
+    def test_hedge_delay_uses_p99_once_warm(self):
+        scheduler = ReadScheduler(min_samples=4, initial_hedge=0.05)
+        assert scheduler.hedge_delay(0) == 0.05
+        for _ in range(4):
+            scheduler.record(0, 0.002)
+        assert scheduler.hedge_delay(0) == pytest.approx(0.002)
+
+    def test_order_fastest_first_unmeasured_tried(self):
+        scheduler = ReadScheduler()
+        scheduler.record(0, 0.030)
+        scheduler.record(1, 0.001)
+        assert scheduler.order([0, 1, 2]) == [2, 1, 0]
+
+    def test_stats_built_under_lock(self, monkeypatch):
+        """stats() reads the sample windows under the lock record() takes."""
+        import read_scheduler
+        scheduler = ReadScheduler()
+        scheduler.record(0, 0.001)
+        real_as_dict = read_scheduler.NodeLatency.as_dict
+
+        def as_dict(latency):
+            assert scheduler._lock.locked()
+            return real_as_dict(latency)
+        monkeypatch.setattr(read_scheduler.NodeLatency, "as_dict", as_dict)
+        assert scheduler.stats([0, 1])[0]["samples"] == 1
+
+    def test_invalid_alpha(self):
+        with pytest.raises(ValueError):
+            ReadScheduler(alpha=0)
+
+
+class TestHedgedFetch:
+    def test_hedge_beats_stalled_primary(self):
+        scheduler = ReadScheduler(initial_hedge=0.02)
+        t0 = time.perf_counter()
+        got = asyncio.run(scheduler.fetch(_requests({0: 0.001, 1: 1.0, 2: 0.001}), need=2))
+        assert time.perf_counter() - t0 < 0.5
+        assert sorted(got) == [0, 2]
+        stats = scheduler.stats()
+        assert stats[1]["hedges"] == 1 and stats[2]["hedge_wins"] == 1
+        # The cancelled primary's elapsed time counts against it.
+        assert scheduler.node(1).ewma > scheduler.node(2).ewma
+
+    def test_slow_node_leaves_primary_set(self):
+        scheduler = ReadScheduler(initial_hedge=0.01)
+        delays = {0: 0.001, 1: 0.05, 2: 0.001}
+        for _ in range(3):
+            asyncio.run(scheduler.fetch(_requests(delays), need=2))
+        requests_before = scheduler.node(1).requests
+        asyncio.run(scheduler.fetch(_requests(delays), need=2))
+        assert scheduler.order([0, 1, 2])[-1] == 1
+        assert scheduler.node(1).requests == requests_before
+
+    def test_failed_node_replaced_by_spare(self):
+        scheduler = ReadScheduler(hedge=False)
+        got = asyncio.run(scheduler.fetch(_requests({0: 0.001, 1: 0.001, 2: 0.001}, fail={0}), need=2))
+        assert sorted(got) == [1, 2]
+        assert scheduler.stats()[0]["failures"] == 1
+
+    def test_fewer_results_when_nodes_exhausted(self):
+        scheduler = ReadScheduler()
+        got = asyncio.run(scheduler.fetch(_requests({0: 0.001, 1: 0.001, 2: 0.001}, fail={0, 1}), need=2))
+        assert list(got) == [2]
+
+
+class TestPick:
+    def test_prefers_data_shards(self):
+        scheduler = ReadScheduler()
+        scheduler.record(0, 0.004)
+        scheduler.record(1, 0.003)
+        scheduler.record(2, 0.001)
+        assert scheduler.pick([0, 1, 2], 2, prefer=[0, 1]) == [0, 1]
+
+    def test_markedly_slow_preferred_node_swapped(self):
+        scheduler = ReadScheduler()
+        scheduler.record(0, 0.001)
+        scheduler.record(1, 0.050)
+        scheduler.record(2, 0.001)
+        assert sorted(scheduler.pick([0, 1, 2], 2, prefer=[0, 1])) == [0, 2]
+
+
+class TestShardManagerReport:
+    def test_latency_report_alongside_health(self):
+        scheduler = ReadScheduler()
+        manager = ShardManager(n_nodes=3, threshold=2, read_scheduler=scheduler)
+        scheduler.record(1, 0.002)
+        report = manager.node_latency_report()
+        assert set(report) == set(manager.node_health_report()) == {0, 1, 2}
+        assert report[0]["ewma_ms"] is None
+        assert report[1]["ewma_ms"] == pytest.approx(2.0)
@@ -0,0 +1,232 @@
+"""
+test_repair_daemon.py
+Unit tests for ops/repair_daemon.py — background shard repair.
+Validates: deleted key and data shards rebuilt byte-for-byte (packed and
+file-resident), shards missed by an offline node filled in and recorded in
+the catalog, most-endangered-first ordering, unhealthy nodes left alone,
+unrecoverable objects reported, objects burned mid-repair staying burned,
+shard files rebuilt under the budget a stripe at a time, rebuilt key shards
+fsynced, one pass at a time per process, uncatalogued assets adopted from
+the nodes, and the token bucket budget.
+"""
+
+import sys
+import os
+import functools
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config
+import node_store
+from catalog import Catalog
+from crypto_engine import CryptoEngine
+from ingest_pipeline import IngestPipeline
+from node_store import data_node, key_node
+from ops.repair_daemon import RepairDaemon, TokenBucket, shared_daemon
+from range_reader import data_shard_name, read_range
+from shamir_handler import ShamirVault
+
+PASSWORD = "repair_test_password"
+SEG = 512
+UNIT = 2048
+
+
+@pytest.fixture
+def grid(tmp_path, monkeypatch):
+    """Throwaway data and key nodes plus a catalog; yields a RepairDaemon over them."""
+    data, keys = {}, {}
+    for i in range(3):
+        data[i] = str(tmp_path / f"data_node{i + 1}")
+        keys[i] = str(tmp_path / f"key_node{i + 1}")
+    monkeypatch.setattr(config, "DATA_NODES", data)
+    monkeypatch.setattr(config, "KEY_NODES", keys)
+    yield RepairDaemon(Catalog(str(tmp_path / "catalog.db")), rate=1e12)
+    node_store.close_nodes()
+
+
+def _upload(daemon, name, size=20_000, active=(True, True, True), packed=True):
+    data = os.urandom(size)
+    targets = [None if not active[i] else
+               functools.partial(data_node(i).put, data_shard_name(name, i)) if packed else
+               data_node(i).file_path(data_shard_name(name, i)) for i in range(3)]
+    IngestPipeline(CryptoEngine(PASSWORD), targets, unit=UNIT, segment_size=SEG).run(data)
+    ShamirVault.distribute_key_async(PASSWORD, name, list(active))
+    daemon.catalog.record(name, [i if active[i] else -1 for i in range(3)])
+    return data
+
+
+def _shards(name):
+    return [data_node(i).get(data_shard_name(name, i)) for i in range(3)], \
+           [key_node(i).get(f"{name}.key.{i}") for i in range(3)]
+
+
+class TestRepair:
+    @pytest.mark.parametrize("packed", [True, False])
+    def test_deleted_shards_rebuilt_identically(self, grid, monkeypatch, packed):
+        monkeypatch.setattr(config, "PACK_OBJECT_LIMIT", 1024 if not packed else config.PACK_OBJECT_LIMIT)
+        _upload(grid, "asset.bin", packed=packed)
+        data_before, keys_before = _shards("asset.bin")
+        data_node(1).delete(data_shard_name("asset.bin", 1))
+        key_node(2).delete("asset.bin.key.2")
+
+        report = grid.run_once()
+        assert report.repaired == ["asset.bin"] and report.shards == 2 and not report.failed
+        assert _shards("asset.bin") == (data_before, keys_before)
+        shard_file = os.path.exists(data_node(1).file_path(data_shard_name("asset.bin", 1)))
+        assert shard_file is not packed
+        assert grid.run_once().queued == 0
+
+    def test_shard_file_rebuild_charged_per_stripe(self, grid, monkeypatch):
+        monkeypatch.setattr(config, "PACK_OBJECT_LIMIT", 1024)
+        _upload(grid, "big.bin", packed=False)
+        shard_size = len(data_node(1).get(data_shard_name("big.bin", 1)))
+        data_node(1).delete(data_shard_name("big.bin", 1))
+        charges = []
+        monkeypatch.setattr(grid.bucket, "acquire", lambda amount: charges.append(amount) or 0.0)
+
+        report = grid.run_once()
+        assert report.repaired == ["big.bin"]
+        assert len(charges) > 2 and max(charges) < shard_size
+        assert sum(charges) == report.bytes
+
+    def test_rebuilt_key_shard_synced(self, grid, monkeypatch):
+        _upload(grid, "k.bin")
+        key_node(1).delete("k.bin.key.1")
+        puts = []
+        store = key_node(1)
+        real_put = store.put
+        monkeypatch.setattr(store, "put", lambda name, data, sync=False: puts.append(sync) or real_put(name, data, sync))
+        assert grid.run_once().repaired == ["k.bin"]
+        assert puts == [True]
+
+    def test_node_offline_at_upload_filled_in(self, grid):
+        data = _upload(grid, "late.bin", active=(True, False, True))
+        assert grid.catalog.placement("late.bin") == [0, -1, 2]
+        grid.run_once()
+        assert grid.catalog.placement("late.bin") == [0, 1, 2]
+        # Node 0 can now be lost: node 1's rebuilt shards stand in for it.
+        assert ShamirVault.reconstruct_key("late.bin", [False, True, True]) == PASSWORD
+        data_node(0).delete(data_shard_name("late.bin", 0))
+        assert read_range("late.bin", 0, len(data), PASSWORD) == data
+
+    def test_unhealthy_node_left_alone(self, grid):
+        _upload(grid, "a.bin", active=(True, False, True))
+        grid.catalog.set_node_health(1, False)
+        assert grid.scan() == []
+        grid.catalog.set_node_health(1, True)
+        assert [task.data for task in grid.scan()] == [(1,)]
+
+    def test_unrecoverable_reported(self, grid):
+        _upload(grid, "gone.bin")
+        for i in range(2):
+            data_node(i).delete(data_shard_name("gone.bin", i))
+        report = grid.run_once()
+        assert report.repaired == [] and "gone.bin" in report.failed
+
+
+class TestBurnRace:
+    def test_burned_during_repair_not_resurrected(self, grid, monkeypatch):
+        _upload(grid, "burn.bin")
+        data_node(1).delete(data_shard_name("burn.bin", 1))
+        key_node(2).delete("burn.bin.key.2")
+        repair = grid.repair
+
+        def repair_then_burn(task):
+            moved = repair(task)
+            grid.catalog.remove(task.name)  # the burn lands between the rebuild and its record
+            return moved
+        monkeypatch.setattr(grid, "repair", repair_then_burn)
+        assert grid.run_once().repaired == []
+        assert "burn.bin" not in grid.catalog
+        assert data_shard_name("burn.bin", 1) not in data_node(1).list()
+        assert "burn.bin.key.2" not in key_node(2).list()
+
+    def test_burned_after_scan_skipped(self, grid, monkeypatch):
+        _upload(grid, "burn.bin")
+        key_node(0).delete("burn.bin.key.0")
+        tasks = grid.scan()
+        grid.catalog.remove("burn.bin")
+        monkeypatch.setattr(grid, "scan", lambda: tasks)
+        monkeypatch.setattr(grid, "repair", lambda task: pytest.fail("repaired a burned object"))
+        report = grid.run_once()
+        assert report.queued == 1 and report.repaired == [] and not report.failed
+        assert "burn.bin" not in grid.catalog
+
+
+class TestAdopt:
+    def test_uncatalogued_assets_adopted(self, grid):
+        _upload(grid, "old.bin")
+        _upload(grid, "new.bin")
+        grid.catalog.remove("old.bin")
+        key_node(2).delete("old.bin.key.2")         # node 2 holds only the data shard
+        assert grid.adopt(["old.bin", "new.bin"]) == ["old.bin"]
+        assert grid.catalog.placement("old.bin") == [0, 1, -1]
+        assert grid.adopt(["old.bin", "new.bin"]) == []
+        assert [task.keys for task in grid.scan()] == [(2,)]
+
+
+class TestSingleFlight:
+    def test_trigger_during_pass_queues_one_rescan(self, grid, monkeypatch):
+        started, release, passes = threading.Event(), threading.Event(), []
+        real_pass = grid._run_pass
+
+        def slow_pass(limit):
+            passes.append(limit)
+            started.set()
+            release.wait(5)
+            return real_pass(limit)
+        monkeypatch.setattr(grid, "_run_pass", slow_pass)
+
+        assert grid.trigger()
+        assert started.wait(5)
+        assert not grid.trigger() and not grid.trigger()
+        release.set()
+        for _ in range(500):
+            with grid._flight:
+                if not grid._running:
+                    break
+            threading.Event().wait(0.01)
+        assert passes == [None, None]       # the running pass plus a single rescan
+
+    def test_shared_daemon_per_catalog(self, tmp_path):
+        path = str(tmp_path / "shared.db")
+        assert shared_daemon(path) is shared_daemon(path)
+        assert shared_daemon(path) is not shared_daemon(str(tmp_path / "other.db"))
+
+
+class TestPriority:
+    def test_fewest_survivors_first(self, grid):
+        grid.k = 1
+        for name in ("one-lost", "two-lost", "all-keys-lost"):
+            _upload(grid, name)
+        key_node(0).delete("one-lost.key.0")
+        key_node(0).delete("two-lost.key.0")
+        key_node(1).delete("two-lost.key.1")
+        for i in range(3):
+            key_node(i).delete(f"all-keys-lost.key.{i}")
+        assert [(task.name, task.margin) for task in grid.scan()] == \
+            [("two-lost", 0), ("one-lost", 1), ("all-keys-lost", -1)]
+
+
+class TestTokenBucket:
+    def test_waits_for_tokens(self):
+        now, slept = [0.0], []
+
+        def sleep(seconds):
+            slept.append(seconds)
+            now[0] += seconds
+        bucket = TokenBucket(rate=100, burst=100, clock=lambda: now[0], sleep=sleep)
+        assert bucket.acquire(60) == 0
+        assert bucket.acquire(60) == pytest.approx(0.2)
+        now[0] += 10                        # idle: refills only up to the burst
+        assert bucket.acquire(100) == 0
+        assert bucket.acquire(300) == pytest.approx(3.0)
+        assert sum(slept) == pytest.approx(3.2)
+
+    def test_rate_must_be_positive(self):
+        with pytest.raises(ValueError):
+            TokenBucket(0)
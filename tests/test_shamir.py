@@ -3,7 +3,9 @@ test_shamir.py
 Author: Mourya Reddy Udumula
 Threshold reconstruction tests for Shamir Secret Sharing (k=2, n=3).
 Validates all k-of-n combinations: confirms reconstruction succeeds
-with any 2 of 3 shards and fails with only 1 shard.
+with any 2 of 3 shards and fails with only 1 shard. Also covers lossless
+multi-block sharing of secrets of any length and key shard files on disk
+(binary format with checksum, legacy hex migration).
 """
 
 import sys
@@ -15,7 +17,10 @@ ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, ROOT)
 
 from Crypto.Protocol.SecretSharing import Shamir
-from shamir_handler import ShamirVault, pad_to_16, unpad_from_16
+from shamir_handler import (
+    BACKEND_GF256, BACKEND_PYCRYPTODOME, KEY_SHARD_MAGIC, SCHEME_GF128, GF256Shamir, KeyShard,
+    ShamirVault, decode_key_shard, encode_key_shard, migrate_key_shard, pad_to_16, unpad_from_16,
+)
 
 # Default scheme parameters -- mirror VaultZero production config
 K = 2   # threshold
@@ -174,3 +179,492 @@ class TestShamirPadding:
         recovered_padded = vault.reconstruct_from_shares(shares[:2])
         recovered_original = unpad_from_16(recovered_padded)
         assert recovered_original == original
+
+
+# ------------------------------------------------------------------
+# Multi-block sharing of secrets of any length
+# ------------------------------------------------------------------
+
+@pytest.fixture
+def key_nodes(tmp_path, monkeypatch):
+    """Point config.KEY_NODES at three throwaway directories."""
+    import config
+    import node_store
+    nodes = {}
+    for i in range(3):
+        d = tmp_path / f"key_node{i + 1}"
+        d.mkdir()
+        nodes[i] = str(d)
+    monkeypatch.setattr(config, "KEY_NODES", nodes)
+    yield nodes
+    node_store.close_nodes()
+
+
+class TestMultiBlockSecrets:
+    @pytest.mark.parametrize("length", [0, 1, 14, 15, 16, 17, 32, 64, 100])
+    def test_split_combine_any_length(self, length):
+        """split_secret/combine_secret roundtrip exactly for any length."""
+        secret = os.urandom(length)
+        shares = ShamirVault.split_secret(secret)
+        for combo in itertools.combinations(shares, K):
+            assert ShamirVault.combine_secret(list(combo)) == secret
+
+    def test_share_layout(self):
+        """Shares are whole 16-byte blocks, never a single legacy-sized block."""
+        for secret in (b"", b"x", os.urandom(32)):
+            for idx, data in ShamirVault.split_secret(secret):
+                assert len(data) % 16 == 0
+                assert len(data) >= 32
+        assert [idx for idx, _ in ShamirVault.split_secret(b"k")] == [1, 2, 3]
+
+    def test_derived_aes_key_roundtrip(self):
+        """A 32-byte derived key is shared without any lossy hashing."""
+        from crypto_engine import CryptoEngine
+        engine = CryptoEngine("long password well beyond sixteen bytes")
+        ct = engine.encrypt_data(b"payload")
+        shares = ShamirVault.split_secret(engine.key)
+        recovered = ShamirVault.combine_secret(shares[1:])
+        assert recovered == engine.key
+        assert CryptoEngine.decrypt_with_key(recovered, ct) == b"payload"
+
+    def test_inconsistent_share_lengths_raise(self):
+        a = ShamirVault.split_secret(b"a" * 10)
+        b = ShamirVault.split_secret(b"b" * 40)
+        with pytest.raises(ValueError):
+            ShamirVault.combine_secret([a[0], b[1]])
+
+
+class TestKeyShardFiles:
+    def test_long_password_reconstructed_exactly(self, key_nodes):
+        """Passwords > 16 bytes survive distribute/reconstruct (no SHA-256 truncation)."""
+        password = "correct horse battery staple, 40+ chars!"
+        ShamirVault.distribute_key_async(password, "asset", [True, True, True])
+        assert ShamirVault.reconstruct_key("asset", [True, True, False]) == password
+        assert ShamirVault.reconstruct_key("asset", [False, True, True]) == password
+
+    def test_secret_bytes_roundtrip(self, key_nodes):
+        secret = os.urandom(32)
+        ShamirVault.distribute_secret_async(secret, "asset", [True, True, True])
+        assert ShamirVault.reconstruct_secret("asset", [True, False, True]) == secret
+
+    def test_legacy_single_block_shards_still_read(self, key_nodes):
+        """Hex shards written by the old pad_to_16 path reconstruct as before."""
+        from binascii import hexlify
+        for idx, data in Shamir.split(K, N, pad_to_16(b"legacy")):
+            with open(os.path.join(key_nodes[idx - 1], f"old.key.{idx - 1}"), "w") as f:
+                f.write(hexlify(data).decode())
+        recovered = ShamirVault.reconstruct_key("old", [True, True, True])
+        assert recovered.rstrip('\x00') == "legacy"
+
+    def test_missing_shard_reported(self, key_nodes):
+        """A missing shard with the quorum intact is served, but flagged degraded."""
+        ShamirVault.distribute_key_async("pw", "asset", [True, True, False])
+        result = ShamirVault.reconstruct_key_detailed("asset", [True, True, True])
+        assert result.as_key() == "pw"
+        assert result.missing == ["Gamma"]
+        assert result.degraded
+        assert result.cancelled == []
+
+    def test_missing_shard_quorum_failure(self, key_nodes):
+        ShamirVault.distribute_key_async("pw", "asset", [True, False, False])
+        with pytest.raises(FileNotFoundError, match="Beta.*QUORUM"):
+            ShamirVault.reconstruct_key("asset", [True, True, False])
+
+
+# ------------------------------------------------------------------
+# Vectorised GF(256) backend
+# ------------------------------------------------------------------
+
+class TestGF256Backend:
+    @pytest.mark.parametrize("length", [1, 16, 32, 1000])
+    def test_all_k_of_n_combinations(self, length):
+        secret = os.urandom(length)
+        shares = GF256Shamir.split(secret, K, N)
+        assert len(shares) == N
+        for combo in itertools.combinations(shares, K):
+            assert GF256Shamir.combine(list(combo)) == secret
+
+    def test_higher_threshold(self):
+        secret = os.urandom(64)
+        shares = GF256Shamir.split(secret, 3, 5)
+        assert GF256Shamir.combine([shares[4], shares[1], shares[3]]) == secret
+        assert GF256Shamir.combine(shares[:2]) != secret
+
+    def test_split_key_interop(self):
+        """split_key/reconstruct_from_shares accept the gf256 backend."""
+        vault = ShamirVault()
+        secret = os.urandom(32)          # no 16-byte restriction
+        shares = vault.split_key(secret, backend=BACKEND_GF256)
+        assert [idx for idx, _ in shares] == [1, 2, 3]
+        assert vault.reconstruct_from_shares(shares[1:], backend=BACKEND_GF256) == secret
+
+    def test_unknown_backend_raises(self):
+        with pytest.raises(ValueError, match="backend"):
+            ShamirVault.split_key(b"x" * 16, backend="rot13")
+
+    def test_array_split_is_per_byte_independent(self):
+        """split_array shares a whole matrix of secrets in one call."""
+        import numpy as np
+        secrets = np.frombuffer(os.urandom(500 * 32), dtype=np.uint8).reshape(500, 32)
+        rows = GF256Shamir.split_array(secrets, K, N)
+        assert rows.shape == (N, 500, 32)
+        assert np.array_equal(GF256Shamir.combine_array([3, 1], rows[[2, 0]]), secrets)
+
+    def test_invalid_parameters(self):
+        with pytest.raises(ValueError):
+            GF256Shamir.split(b"abc", 4, 3)
+        import numpy as np
+        rows = GF256Shamir.split_array(np.zeros(2, dtype=np.uint8), 2, 2)
+        with pytest.raises(ValueError, match="1..255"):
+            GF256Shamir.combine_array([0, 1], rows)
+
+
+class TestBatchAPI:
+    def test_batch_roundtrip(self):
+        secrets = [os.urandom(32) for _ in range(1000)]
+        share_sets = ShamirVault.split_keys_batch(secrets, K, N)
+        assert [idx for idx, _ in share_sets] == [1, 2, 3]
+        assert share_sets[0][1].shape == (1000, 32)
+        assert share_sets[0][1].flags['C_CONTIGUOUS']
+        for combo in itertools.combinations(share_sets, K):
+            recovered = ShamirVault.reconstruct_batch(list(combo))
+            assert [row.tobytes() for row in recovered] == secrets
+
+    def test_batch_rows_match_single_secret_shares(self):
+        """Row j of every buffer is a valid GF256 share set for secret j."""
+        secrets = [os.urandom(16) for _ in range(5)]
+        share_sets = ShamirVault.split_keys_batch(secrets)
+        single = [(idx, buf[3].tobytes()) for idx, buf in share_sets]
+        assert ShamirVault.reconstruct_from_shares(single[:2], backend=BACKEND_GF256) == secrets[3]
+
+    def test_flat_buffers_need_secret_len(self):
+        secrets = [os.urandom(16) for _ in range(10)]
+        flat = [(idx, buf.tobytes()) for idx, buf in ShamirVault.split_keys_batch(secrets)]
+        with pytest.raises(ValueError, match="secret_len"):
+            ShamirVault.reconstruct_batch(flat[:2])
+        recovered = ShamirVault.reconstruct_batch(flat[1:], secret_len=16)
+        assert recovered.tobytes() == b"".join(secrets)
+
+    def test_array_input_and_length_mismatch(self):
+        import numpy as np
+        matrix = np.frombuffer(os.urandom(64 * 24), dtype=np.uint8).reshape(64, 24)
+        share_sets = ShamirVault.split_keys_batch(matrix, 3, 5)
+        assert np.array_equal(ShamirVault.reconstruct_batch(share_sets[2:]), matrix)
+        with pytest.raises(ValueError, match="same length"):
+            ShamirVault.split_keys_batch([b"a" * 16, b"b" * 17])
+
+
+class TestLagrangeCache:
+    @pytest.fixture(autouse=True)
+    def _fresh_cache(self):
+        ShamirVault.clear_lagrange_cache()
+        yield
+        ShamirVault.clear_lagrange_cache()
+
+    def test_cached_combine_matches_pycryptodome(self):
+        """The memoised GF(2^128) combine is byte-identical to Shamir.combine."""
+        for _ in range(20):
+            secret = os.urandom(16)
+            shares = Shamir.split(K, N, secret)
+            for combo in itertools.combinations(shares, K):
+                assert ShamirVault.reconstruct_from_shares(list(combo)) == Shamir.combine(list(combo))
+            assert ShamirVault.reconstruct_from_shares(shares) == secret
+
+    def test_one_miss_per_index_subset(self):
+        """2-of-3 only has three index subsets; everything else is a hit."""
+        for _ in range(10):
+            shares = Shamir.split(K, N, os.urandom(16))
+            for combo in itertools.combinations(shares, K):
+                ShamirVault.reconstruct_from_shares(list(combo))
+        info = ShamirVault.lagrange_cache_info()[BACKEND_PYCRYPTODOME]
+        assert info['misses'] == 3
+        assert info['hits'] == 27
+        assert info['entries'] == 3
+
+    def test_gf256_counters(self):
+        for _ in range(5):
+            shares = GF256Shamir.split(os.urandom(32), K, N)
+            GF256Shamir.combine(shares[:2])
+        info = ShamirVault.lagrange_cache_info()[BACKEND_GF256]
+        assert (info['misses'], info['hits']) == (1, 4)
+
+    def test_multi_block_uses_one_lookup(self):
+        """A multi-block secret costs one weight lookup, not one per block."""
+        shares = ShamirVault.split_secret(os.urandom(200))
+        ShamirVault.combine_secret(shares[:2])
+        info = ShamirVault.lagrange_cache_info()[BACKEND_PYCRYPTODOME]
+        assert info['hits'] + info['misses'] == 1
+
+    def test_duplicate_indices_raise(self):
+        shares = Shamir.split(K, N, os.urandom(16))
+        with pytest.raises(ValueError, match="Duplicate"):
+            ShamirVault.reconstruct_from_shares([shares[0], shares[0]])
+
+
+class TestAsyncDistribution:
+    def test_async_api_runs_on_callers_loop(self, key_nodes):
+        """distribute_key / reconstruct_key_async work inside a running loop."""
+        import asyncio
+
+        async def scenario():
+            await ShamirVault.distribute_key("async password > 16 bytes", "asset", [True, True, True])
+            return await ShamirVault.reconstruct_key_async("asset", [True, False, True])
+
+        assert asyncio.run(scenario()) == "async password > 16 bytes"
+
+    def test_async_secret_roundtrip(self, key_nodes):
+        import asyncio
+        secret = os.urandom(32)
+
+        async def scenario():
+            await ShamirVault.distribute_secret(secret, "asset", [True, True, True])
+            return await ShamirVault.reconstruct_secret_async("asset", [False, True, True])
+
+        assert asyncio.run(scenario()) == secret
+
+    def test_sync_facade_reuses_one_loop(self, key_nodes):
+        """Repeated sync calls share a single long-lived background loop."""
+        import shamir_handler
+        ShamirVault.distribute_key_async("pw1", "a", [True, True, True])
+        loop = shamir_handler._IO_LOOP._loop
+        ShamirVault.distribute_key_async("pw2", "b", [True, True, True])
+        assert shamir_handler._IO_LOOP._loop is loop
+        assert loop.is_running()
+        assert ShamirVault.reconstruct_key("b", [True, True, True]) == "pw2"
+
+    def test_sync_facade_callable_from_running_loop(self, key_nodes):
+        """The sync facade no longer clobbers the caller's event loop."""
+        import asyncio
+
+        async def scenario():
+            ShamirVault.distribute_key_async("inside", "asset", [True, True, True])
+            return asyncio.get_running_loop()
+
+        asyncio.run(scenario())
+        assert ShamirVault.reconstruct_key("asset", [True, True, False]) == "inside"
+
+    def test_async_quorum_failure(self, key_nodes):
+        import asyncio
+        ShamirVault.distribute_key_async("pw", "asset", [True, True, True])
+        with pytest.raises(ValueError, match="QUORUM"):
+            asyncio.run(ShamirVault.reconstruct_key_async("asset", [True, False, False]))
+
+
+class TestBinaryShardFormat:
+    def test_encode_decode_roundtrip(self):
+        share = os.urandom(48)
+        raw = encode_key_shard(2, share, threshold=2)
+        assert raw[:4] == KEY_SHARD_MAGIC
+        assert len(raw) == 28 + len(share)           # raw bytes, not hex
+        shard = decode_key_shard(raw, node=1)
+        assert shard == KeyShard(2, 2, SCHEME_GF128, share)
+
+    def test_shards_on_disk_are_binary(self, key_nodes):
+        import packfile
+        ShamirVault.distribute_key_async("binary format", "asset", [True, True, True])
+        raw = packfile.node_store(key_nodes[0]).get("asset.key.0")
+        assert raw.startswith(KEY_SHARD_MAGIC)
+        assert decode_key_shard(raw, 0).index == 1
+
+    @pytest.mark.parametrize("mutate", [
+        lambda raw: raw[:-1],                                  # truncated share
+        lambda raw: raw[:-1] + bytes([raw[-1] ^ 0x01]),        # flipped share bit
+        lambda raw: raw[:6] + b"\x07" + raw[7:],               # rewritten index
+        lambda raw: raw[:10],                                  # truncated header
+    ])
+    def test_corruption_rejected(self, mutate):
+        raw = encode_key_shard(1, os.urandom(32))
+        with pytest.raises(ValueError, match="Corrupt"):
+            decode_key_shard(mutate(raw), node=0)
+
+    def test_misplaced_shard_rejected(self):
+        raw = encode_key_shard(3, os.urandom(32))
+        with pytest.raises(ValueError, match="index 3 stored on node 0"):
+            decode_key_shard(raw, node=0)
+
+    def test_corrupt_shard_skipped_when_quorum_remains(self, key_nodes):
+        ShamirVault.distribute_key_async("survivor", "asset", [True, True, True])
+        path = os.path.join(key_nodes[1], "pack-000001.vzp")
+        with open(path, "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b"\x00")
+        assert ShamirVault.reconstruct_key("asset", [True, True, True]) == "survivor"
+        with pytest.raises(ValueError, match="Corrupt shard.*Beta"):
+            ShamirVault.reconstruct_key("asset", [True, True, False])
+
+    def test_legacy_hex_migration(self, key_nodes):
+        from binascii import hexlify
+        for idx, data in Shamir.split(K, N, pad_to_16(b"old-pw")):
+            with open(os.path.join(key_nodes[idx - 1], f"old.key.{idx - 1}"), "w") as f:
+                f.write(hexlify(data).decode())
+        path = os.path.join(key_nodes[0], "old.key.0")
+        assert migrate_key_shard(path, 0) is True
+        assert migrate_key_shard(path, 0) is False
+        with open(path, "rb") as f:
+            assert f.read().startswith(KEY_SHARD_MAGIC)
+        # One migrated + two legacy shards still combine.
+        assert ShamirVault.reconstruct_key("old", [True, True, True]).rstrip('\x00') == "old-pw"
+
+
+# ------------------------------------------------------------------
+# Concurrent early-exit reconstruction
+# ------------------------------------------------------------------
+
+class TestQuorumReads:
+    @pytest.fixture
+    def slow_gamma(self):
+        import latency_model
+        latency_model.set_injector(latency_model.NodeLatencyInjector({2: latency_model.FixedLatency(2000)}))
+        yield
+        latency_model.set_injector(None)
+
+    def test_straggler_cancelled(self, key_nodes, slow_gamma):
+        import time
+        ShamirVault.distribute_key_async("fast quorum", "asset", [True, True, True])
+        t0 = time.perf_counter()
+        result = ShamirVault.reconstruct_key_detailed("asset", [True, True, True])
+        assert time.perf_counter() - t0 < 1.0
+        assert result.as_key() == "fast quorum"
+        assert result.nodes_used == ["Alpha", "Beta"]
+        assert result.cancelled == ["Gamma"]
+        assert not result.degraded
+
+    def test_missing_straggler_reported(self, key_nodes, slow_gamma):
+        """A straggler cancelled after the quorum is still checked for its shard."""
+        import time
+        ShamirVault.distribute_key_async("pw", "asset", [True, True, False])
+        t0 = time.perf_counter()
+        result = ShamirVault.reconstruct_key_detailed("asset", [True, True, True])
+        assert time.perf_counter() - t0 < 1.0
+        assert result.missing == ["Gamma"] and result.degraded
+        assert result.cancelled == []
+
+    def test_missing_shard_served_degraded(self, key_nodes):
+        ShamirVault.distribute_key_async("pw", "asset", [False, True, True])
+        result = ShamirVault.reconstruct_key_detailed("asset", [True, True, True])
+        assert result.as_key() == "pw"
+        assert result.missing == ["Alpha"]
+        assert result.nodes_used == ["Beta", "Gamma"]
+        assert result.degraded
+
+    def test_unreachable_node_reported(self, key_nodes):
+        import latency_model
+        ShamirVault.distribute_key_async("pw", "asset", [True, True, True])
+        latency_model.set_injector(latency_model.NodeLatencyInjector(fail_probability={0: 1.0}))
+        try:
+            result = ShamirVault.reconstruct_key_detailed("asset", [True, True, True])
+            assert result.unreachable == ["Alpha"] and result.degraded
+            assert result.as_key() == "pw"
+            with pytest.raises(ValueError, match="Unreachable: Alpha"):
+                ShamirVault.reconstruct_key("asset", [True, True, False])
+        finally:
+            latency_model.set_injector(None)
+
+    def test_offline_nodes_not_read(self, key_nodes):
+        ShamirVault.distribute_key_async("pw", "asset", [True, True, True])
+        result = ShamirVault.reconstruct_key_detailed("asset", [False, True, True])
+        assert result.nodes_used == ["Beta", "Gamma"]
+        assert result.cancelled == [] and not result.degraded
+
+
+class TestQuorumWrites:
+    @pytest.fixture
+    def injector(self):
+        import latency_model
+        yield latency_model.set_injector
+        latency_model.set_injector(None)
+
+    def test_acknowledged_before_slow_node(self, key_nodes, injector):
+        import time
+        import latency_model
+        import node_store
+        import write_quorum
+        injector(latency_model.NodeLatencyInjector({2: latency_model.FixedLatency(500)}))
+        t0 = time.perf_counter()
+        ShamirVault.distribute_key_async("quorum pw", "asset", [True, True, True], write_quorum=2)
+        assert time.perf_counter() - t0 < 0.4
+        assert node_store.key_node(2).list() == []
+        [tracker] = write_quorum.outstanding("asset")
+        assert tracker.pending == [2]
+        assert ShamirVault.reconstruct_key("asset", [True, True, False]) == "quorum pw"
+        assert write_quorum.wait_for("asset", timeout=10)
+        assert node_store.key_node(2).list() == ["asset.key.2"]
+        assert ShamirVault.reconstruct_key("asset", [False, True, True]) == "quorum pw"
+
+    def test_acknowledged_shards_synced(self, key_nodes, monkeypatch):
+        """Each acknowledged key shard has been fsynced into its node's packfile."""
+        import threading
+        import packfile
+        import write_quorum
+        lock, synced, at_ack = threading.Lock(), set(), {}
+        real_fsync, real_succeeded = os.fsync, write_quorum.WriteTracker.succeeded
+
+        def fsync(fd):
+            with lock:
+                synced.add(os.fstat(fd).st_ino)
+            real_fsync(fd)
+
+        def succeeded(tracker, node):
+            with lock:
+                at_ack[node] = set(synced)
+            real_succeeded(tracker, node)
+        monkeypatch.setattr(os, "fsync", fsync)
+        monkeypatch.setattr(write_quorum.WriteTracker, "succeeded", succeeded)
+        ShamirVault.distribute_key_async("pw", "asset", [True, True, True], write_quorum=2)
+        assert write_quorum.wait_for("asset", timeout=10)
+        for node in range(3):
+            segment = os.fstat(packfile.node_store(key_nodes[node])._active.fd).st_ino
+            assert segment in at_ack[node]
+
+    def test_failed_node_recorded(self, key_nodes, injector, monkeypatch):
+        import config
+        import latency_model
+        import write_quorum
+        monkeypatch.setattr(config, "WRITE_RETRY_BACKOFF", 0.001)
+        injector(latency_model.NodeLatencyInjector(fail_probability={0: 1.0}))
+        ShamirVault.distribute_key_async("pw", "asset", [True, True, True], write_quorum=2)
+        assert write_quorum.wait_for("asset", timeout=10)
+        injector(None)
+        assert ShamirVault.reconstruct_key_detailed("asset", [True, True, True]).missing == ["Alpha"]
+
+    def test_quorum_lost_raises(self, key_nodes, injector, monkeypatch):
+        import config
+        import latency_model
+        monkeypatch.setattr(config, "WRITE_RETRY_BACKOFF", 0.001)
+        injector(latency_model.NodeLatencyInjector(fail_probability={0: 1.0, 1: 1.0}))
+        with pytest.raises(ValueError, match="Write quorum not reached"):
+            ShamirVault.distribute_key_async("pw", "asset", [True, True, True], write_quorum=2)
+
+    def test_quorum_needs_enough_online_nodes(self, key_nodes):
+        with pytest.raises(ValueError, match="unreachable"):
+            ShamirVault.distribute_key_async("pw", "asset", [True, False, False], write_quorum=2)
+        with pytest.raises(ValueError, match="threshold"):
+            ShamirVault.distribute_key_async("pw", "asset", [True, True, True], write_quorum=1)
+
+
+class TestKeyShardRebuild:
+    def test_rebuilt_shard_matches_lost_one(self, key_nodes):
+        import node_store
+        ShamirVault.distribute_key_async("rebuild pw", "asset", [True, True, True])
+        original = node_store.key_node(1).get("asset.key.1")
+        node_store.key_node(1).delete("asset.key.1")
+        ShamirVault.repair_key_shard("asset", 1, [True, True, True])
+        assert node_store.key_node(1).get("asset.key.1") == original
+        assert ShamirVault.reconstruct_key("asset", [False, True, True]) == "rebuild pw"
+
+    def test_gf256_shard_rebuilt(self, key_nodes):
+        import node_store
+        from shamir_handler import SCHEME_GF256
+        for idx, share in GF256Shamir.split(b"byte-wise secret", K, N):
+            node_store.key_node(idx - 1).put(f"gf.key.{idx - 1}", encode_key_shard(idx, share, K, SCHEME_GF256))
+        original = node_store.key_node(0).get("gf.key.0")
+        node_store.key_node(0).delete("gf.key.0")
+        ShamirVault.repair_key_shard("gf", 0, [True, True, True])
+        assert node_store.key_node(0).get("gf.key.0") == original
+
+    def test_too_few_shards_raises(self, key_nodes):
+        import node_store
+        ShamirVault.distribute_key_async("pw", "asset", [True, True, True])
+        node_store.key_node(2).delete("asset.key.2")
+        with pytest.raises(ValueError, match="need 2"):
+            ShamirVault.repair_key_shard("asset", 0, [True, True, True])
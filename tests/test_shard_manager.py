@@ -0,0 +1,114 @@
+"""
+test_shard_manager.py
+Unit tests for shard_manager.py — node health and per-object availability.
+Validates: the incrementally maintained healthy count, node-level shard
+distribution and recovery, object placement records, the vectorised
+per-object reconstructable query against a direct per-object check, and
+the state report of log_to_audit().
+"""
+
+import sys
+import os
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from catalog import Catalog
+from shard_manager import ShardManager
+
+
+class TestNodeHealth:
+    def test_healthy_count_tracks_changes(self):
+        manager = ShardManager(n_nodes=3, threshold=2)
+        manager.mark_node_failed(1)
+        manager.mark_node_failed(1)
+        assert manager.healthy_count == 2 and manager.can_reconstruct()
+        manager.mark_node_failed(0)
+        assert manager.get_available_nodes() == [2]
+        assert not manager.can_reconstruct()
+        manager.mark_node_healthy(0)
+        assert manager.node_health_report() == {0: 'healthy', 1: 'failed', 2: 'healthy'}
+        assert repr(manager).endswith("healthy=2/3)")
+
+    @pytest.mark.parametrize("node_id", [-1, 3])
+    def test_unknown_node_raises(self, node_id):
+        with pytest.raises(KeyError):
+            ShardManager(n_nodes=3).mark_node_failed(node_id)
+
+    def test_recover_skips_failed_nodes(self):
+        manager = ShardManager(n_nodes=3, threshold=2)
+        manager.distribute_shards([b"a", b"b", b"c"])
+        manager.mark_node_failed(1)
+        assert manager.recover_shards() == [b"a", b"c"]
+        assert manager.recover_shards([1, 7]) == [b"b"]
+
+
+class TestObjectAvailability:
+    def test_register_and_replace(self):
+        manager = ShardManager(n_nodes=5, threshold=2)
+        manager.register_object("a", [0, 1, 2])
+        manager.register_object("b", [3, 4])
+        manager.register_object("a", [4, 3, 2, 1])
+        assert manager.object_ids == ["a", "b"]
+        assert manager.object_nodes("a") == [4, 3, 2, 1]
+        assert manager.object_nodes("b") == [3, 4]
+        with pytest.raises(KeyError):
+            manager.register_object("c", [0, 9])
+        with pytest.raises(KeyError):
+            manager.object_nodes("c")
+        manager.register_objects(["c", "d"], [[0, 1, -1], [2, 3, 4]])
+        assert manager.object_nodes("c") == [0, 1]
+        assert manager.healthy_shards(["c", "d"]).tolist() == [2, 3]
+
+    def test_reconstructable_follows_node_health(self):
+        manager = ShardManager(n_nodes=6, threshold=2)
+        manager.distribute_shards([b"x", b"y", b"z"], object_id="x.bin")
+        nodes = manager.object_nodes("x.bin")
+        manager.mark_node_failed(nodes[0])
+        assert manager.reconstructable(["x.bin"]).tolist() == [True]
+        manager.mark_node_failed(nodes[1])
+        assert manager.healthy_shards(["x.bin"]).tolist() == [1]
+        assert manager.reconstructable(["x.bin"]).tolist() == [False]
+
+    def test_matches_per_object_check_at_scale(self):
+        rng = np.random.default_rng(7)
+        manager = ShardManager(n_nodes=2000, threshold=2)
+        names = [f"obj{i}" for i in range(20_000)]
+        for name in names[:100]:
+            manager.register_object(name, rng.choice(2000, size=3, replace=False).tolist())
+        manager.register_objects(names[100:], [rng.choice(2000, size=3, replace=False) for _ in names[100:]])
+        failed = rng.choice(2000, size=900, replace=False)
+        for node in failed:
+            manager.mark_node_failed(int(node))
+        assert manager.healthy_count == 1100
+
+        down = set(failed.tolist())
+        expected = [sum(n not in down for n in manager.object_nodes(name)) >= 2 for name in names]
+        assert manager.reconstructable().tolist() == expected
+        assert manager.reconstructable(names[::-1]).tolist() == expected[::-1]
+
+    def test_remove_object_keeps_rows_compact(self):
+        manager = ShardManager(n_nodes=4, threshold=2)
+        manager.register_objects(["a", "b", "c"], [[0, 1, 2], [1, 2, 3], [2, 3, 0]])
+        manager.mark_node_failed(3)
+        manager.remove_object("a")
+        assert sorted(manager.object_ids) == ["b", "c"]
+        assert manager.object_nodes("c") == [2, 3, 0]
+        assert dict(zip(manager.object_ids, manager.healthy_shards().tolist())) == {"b": 2, "c": 2}
+        with pytest.raises(KeyError):
+            manager.remove_object("a")
+
+
+class TestAuditHook:
+    def test_in_memory_reported_without_catalog(self, capsys):
+        ShardManager().log_to_audit(None)
+        assert "IN-MEMORY MODE" in capsys.readouterr().out
+
+    def test_catalog_reported_when_persisted(self, tmp_path, capsys):
+        path = str(tmp_path / "catalog.db")
+        ShardManager(catalog=Catalog(path)).log_to_audit(None)
+        out = capsys.readouterr().out
+        assert "CATALOG MODE" in out and path in out and "IN-MEMORY" not in out
@@ -0,0 +1,116 @@
+"""
+test_write_quorum.py
+Unit tests for write_quorum.py — tracking of quorum-acknowledged writes.
+Validates: acknowledgement and loss of the quorum, registration of
+outstanding writes until they settle, quorum validation and retries.
+"""
+
+import sys
+import os
+import asyncio
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import write_quorum
+from write_quorum import WriteTracker, check_quorum, retry, retry_async
+
+
+class TestWriteTracker:
+    def test_acknowledged_then_settled(self):
+        tracker = WriteTracker("asset", [0, 1, 2], quorum=2)
+        tracker.succeeded(1)
+        assert not tracker.acknowledged
+        tracker.succeeded(0)
+        assert tracker.wait_quorum(0) and tracker.acked_s is not None
+        tracker.detach()
+        assert write_quorum.outstanding("asset") == [tracker]
+        assert not write_quorum.wait_for("asset", timeout=0.01)
+        tracker.fail(2, OSError("disk full"))
+        assert tracker.settled and tracker.pending == []
+        assert write_quorum.outstanding("asset") == []
+        assert write_quorum.wait_for("asset", timeout=0)
+
+    def test_quorum_lost_wakes_waiter(self):
+        tracker = WriteTracker("asset", [0, 1, 2], quorum=2)
+        tracker.succeeded(0)
+
+        def fail_rest():
+            tracker.fail(1, OSError("node 1 down"))
+            tracker.fail(2, OSError("node 2 down"))
+        threading.Timer(0.05, fail_rest).start()
+        assert tracker.wait_quorum(5) is False
+        assert tracker.quorum_lost
+        with pytest.raises(ValueError, match="1 of 2 writes succeeded.*node 1 down"):
+            raise tracker.error()
+
+    def test_settled_tracker_not_registered(self):
+        tracker = WriteTracker("done", [0, 1], quorum=2)
+        tracker.succeeded(0)
+        tracker.succeeded(1)
+        tracker.detach()
+        assert write_quorum.outstanding("done") == []
+
+    def test_done_callback_runs_before_waiters_wake(self):
+        tracker = WriteTracker("cb", [0, 1], quorum=1)
+        seen = []
+        tracker.add_done_callback(lambda t: seen.append(("callback", t.pending, sorted(t.failed))))
+        tracker.succeeded(0)
+        tracker.detach()
+        assert seen == []
+        tracker.fail(1, OSError("late"))
+        assert seen == [("callback", [], [1])]
+        assert write_quorum.wait_for("cb", timeout=0)
+        tracker.add_done_callback(lambda t: seen.append("already settled"))
+        assert seen[-1] == "already settled"
+
+    @pytest.mark.parametrize("quorum,online,match", [(1, 3, "threshold"), (3, 2, "unreachable")])
+    def test_check_quorum(self, quorum, online, match):
+        with pytest.raises(ValueError, match=match):
+            check_quorum(quorum, 2, online)
+
+
+class TestRetry:
+    def test_retries_oserror_until_success(self):
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise ConnectionError("reset")
+            return "ok"
+        assert retry(flaky, retries=2, backoff=0.001) == "ok"
+        assert len(calls) == 3
+
+    def test_gives_up_after_retries(self):
+        calls = []
+
+        def down():
+            calls.append(1)
+            raise OSError("down")
+        with pytest.raises(OSError):
+            retry(down, retries=1, backoff=0.001)
+        assert len(calls) == 2
+
+    def test_other_errors_not_retried(self):
+        calls = []
+
+        def corrupt():
+            calls.append(1)
+            raise ValueError("bad shard")
+        with pytest.raises(ValueError):
+            retry(corrupt, retries=3, backoff=0.001)
+        assert len(calls) == 1
+
+    def test_async_retry(self):
+        calls = []
+
+        async def flaky():
+            calls.append(1)
+            if len(calls) < 2:
+                raise OSError("timeout")
+            return 7
+        assert asyncio.run(retry_async(flaky, retries=2, backoff=0.001)) == 7
@@ -0,0 +1,187 @@
+"""
+write_quorum.py
+Quorum-acknowledged node writes.
+
+By default an upload returns once every online node has stored its data
+shard and key shard, so its latency is that of the slowest node.  With a
+write quorum W (at least the reconstruction threshold) the upload is
+acknowledged as soon as W nodes have durably stored their shard -- enough
+to read the asset back -- and the remaining writes finish in the
+background, each retried with exponential backoff.
+
+A WriteTracker follows one such set of node writes.  Trackers with writes
+still outstanding after the acknowledgement are registered under their
+label (the asset name) until they settle, so a burn or a test can wait for
+them:
+
+    write_quorum.wait_for("report.pdf", timeout=30)
+
+A node whose write still fails after its retries is recorded in
+``tracker.failed``; the asset stays readable from the quorum and the shard
+is left for repair.
+"""
+
+from __future__ import annotations
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+
+_ACTIVE: Dict[int, "WriteTracker"] = {}
+_ACTIVE_LOCK = threading.Lock()
+
+
+def check_quorum(quorum: int, threshold: int, online: int) -> None:
+    """
+    Raises:
+        ValueError: *quorum* below the reconstruction *threshold*, or more
+                    than the *online* nodes can satisfy.
+    """
+    if quorum < threshold:
+        raise ValueError(f"Write quorum {quorum} is below the reconstruction threshold {threshold}")
+    if quorum > online:
+        raise ValueError(f"Write quorum {quorum} unreachable: only {online} node(s) online")
+
+
+class WriteTracker:
+    """
+    Completion state of one write fanned out to several nodes.
+
+    Args:
+        label:  Name the writes are registered under (the asset name).
+        nodes:  Node ids being written.
+        quorum: Successful writes that acknowledge the whole write.
+    """
+
+    def __init__(self, label: str, nodes: Sequence[int], quorum: int) -> None:
+        self.label = label
+        self.nodes = list(nodes)
+        self.quorum = quorum
+        self.done: List[int] = []
+        self.failed: Dict[int, BaseException] = {}
+        self.started = time.perf_counter()
+        self.acked_s: Optional[float] = None
+        self.settled_s: Optional[float] = None
+        self._callbacks: List[Callable[["WriteTracker"], None]] = []
+        self._cond = threading.Condition()
+
+    def __repr__(self) -> str:
+        return (f"WriteTracker({self.label!r}, done={self.done}, failed={sorted(self.failed)}, "
+                f"pending={self.pending})")
+
+    @property
+    def pending(self) -> List[int]:
+        with self._cond:
+            return [n for n in self.nodes if n not in self.done and n not in self.failed]
+
+    @property
+    def acknowledged(self) -> bool:
+        return len(self.done) >= self.quorum
+
+    @property
+    def settled(self) -> bool:
+        return not self.pending
+
+    @property
+    def quorum_lost(self) -> bool:
+        return len(self.nodes) - len(self.failed) < self.quorum
+
+    def _record(self) -> None:
+        now = time.perf_counter() - self.started
+        if self.acked_s is None and self.acknowledged:
+            self.acked_s = now
+        if self.settled:
+            self.settled_s = now
+            # Callbacks run before wait_for() can see the writes settle, so a
+            # burn waiting on them cannot be overtaken by a callback.
+            callbacks, self._callbacks = self._callbacks, []
+            for callback in callbacks:
+                callback(self)
+            with _ACTIVE_LOCK:
+                _ACTIVE.pop(id(self), None)
+        self._cond.notify_all()
+
+    def succeeded(self, node: int) -> None:
+        with self._cond:
+            self.done.append(node)
+            self._record()
+
+    def fail(self, node: int, error: BaseException) -> None:
+        with self._cond:
+            self.failed[node] = error
+            self._record()
+
+    def add_done_callback(self, callback: Callable[["WriteTracker"], None]) -> None:
+        """
+        Call *callback(tracker)* once every node write has succeeded or
+        failed -- at once if they already have.  It runs on the thread that
+        settles the last write and must not wait on other trackers.
+        """
+        with self._cond:
+            if not self.settled:
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def wait_quorum(self, timeout: Optional[float] = None) -> bool:
+        """Block until the quorum is reached (True) or can no longer be (False)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.acknowledged or self.quorum_lost, timeout)
+            return self.acknowledged
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until every node write has succeeded or failed; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.settled, timeout)
+
+    def detach(self) -> None:
+        """Register the still-running writes so wait_for() can find them."""
+        with self._cond:
+            if not self.settled:
+                with _ACTIVE_LOCK:
+                    _ACTIVE[id(self)] = self
+
+    def error(self) -> ValueError:
+        causes = "; ".join(f"node {n}: {e}" for n, e in sorted(self.failed.items()))
+        return ValueError(f"Write quorum not reached for {self.label!r}: "
+                          f"{len(self.done)} of {self.quorum} writes succeeded ({causes})")
+
+
+def outstanding(label: Optional[str] = None) -> List[WriteTracker]:
+    """Trackers whose background writes have not settled (optionally for one label)."""
+    with _ACTIVE_LOCK:
+        return [t for t in _ACTIVE.values() if label is None or t.label == label]
+
+
+def wait_for(label: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+    """Wait for the background writes of *label* (or of every label); False on timeout."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for tracker in outstanding(label):
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        if not tracker.wait(remaining):
+            return False
+    return True
+
+
+def retry(fn: Callable[[], T], retries: int, backoff: float) -> T:
+    """Call *fn*, retrying OSErrors up to *retries* times with exponential backoff."""
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except OSError:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * (2 ** attempt))
+
+
+async def retry_async(fn: Callable[[], Awaitable[T]], retries: int, backoff: float) -> T:
+    """Async counterpart of retry()."""
+    for attempt in range(retries + 1):
+        try:
+            return await fn()
+        except OSError:
+            if attempt == retries:
+                raise
+            await asyncio.sleep(backoff * (2 ** attempt))